@@ -4,11 +4,14 @@ Implementa a arquitetura base para agentes da corporação
 """
 
 from abc import ABC, abstractmethod
+from collections import deque
 from typing import Dict, Any, List, Optional, Union
 from uuid import UUID, uuid4
 from datetime import datetime
 import asyncio
+import bisect
 import json
+import time
 
 from backend.core.entities.holding import Agent
 from backend.core.value_objects import AgentRole, MemoryType, LLBProtocol
@@ -32,7 +35,7 @@ class AgentTask:
         self.priority = priority  # 1-10, higher = more urgent
         self.deadline = deadline
         self.created_at = datetime.utcnow()
-        self.status = "pending"  # pending, running, completed, failed
+        self.status = "pending"  # pending, running, completed, failed, cancelled
         self.result = None
         self.error_message = None
         self.execution_time_seconds = None
@@ -72,6 +75,40 @@ class AgentTask:
         return task
 
 
+class ExecutionHistogram:
+    """Fixed-bucket histogram of task execution times (seconds)"""
+
+    DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+    def __init__(self, buckets: Optional[List[float]] = None):
+        self.buckets = tuple(sorted(buckets or self.DEFAULT_BUCKETS))
+        # Last slot counts observations above the largest bucket (+Inf)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        """Record one observation"""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Cumulative bucket counts, Prometheus style"""
+        cumulative = {}
+        running = 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            cumulative[str(bound)] = running
+        cumulative['+Inf'] = self.count
+        return {
+            'buckets': cumulative,
+            'count': self.count,
+            'sum': self.total,
+            'mean': self.total / self.count if self.count else 0.0
+        }
+
+
 class AgentCapability(ABC):
     """Abstract base class for agent capabilities"""
 
@@ -113,7 +150,9 @@ class BaseAgent(ABC):
         name: str = "",
         role: AgentRole = AgentRole.MANAGEMENT,
         specialization: str = "",
-        autonomy_level: float = 0.0
+        autonomy_level: float = 0.0,
+        max_workers: int = 4,
+        capability_concurrency: Optional[Dict[str, int]] = None
     ):
         self.id = agent_id or uuid4()
         self.name = name
@@ -135,9 +174,19 @@ class BaseAgent(ABC):
         # Capabilities registry
         self.capabilities: Dict[str, AgentCapability] = {}
 
-        # Background task for processing
-        self._processing_task: Optional[asyncio.Task] = None
-        self._shutdown_event = asyncio.Event()
+        # Worker pool for processing. Agents mostly await LLM/IO, so several
+        # workers share the queue; per-capability limits cap the load placed
+        # on any single capability. Tasks over their limit wait in a
+        # per-capability queue so workers stay free for other capabilities.
+        self.max_workers = max(1, max_workers)
+        self._workers: List[asyncio.Task] = []
+        self._capability_limits: Dict[str, int] = dict(capability_concurrency or {})
+        self._waiting: Dict[str, deque] = {}
+
+        # Processing metrics
+        self._in_flight = 0
+        self._in_flight_by_key: Dict[str, int] = {}
+        self._execution_histograms: Dict[str, ExecutionHistogram] = {}
 
     def register_capability(self, capability: AgentCapability) -> None:
         """Register a new capability for this agent"""
@@ -160,41 +209,122 @@ class BaseAgent(ABC):
         """Assign a task to the agent's queue"""
         await self.task_queue.put(task)
 
+    def set_capability_concurrency(self, key: str, limit: Optional[int]) -> None:
+        """
+        Limit concurrent executions for a capability (or custom task type).
+        Passing None removes the limit. Takes effect for tasks started afterwards;
+        tasks already waiting on the old limit start as running ones finish.
+        """
+        if limit is None:
+            self._capability_limits.pop(key, None)
+        else:
+            self._capability_limits[key] = max(1, limit)
+
     async def start_processing(self) -> None:
-        """Start the agent's task processing loop"""
-        if self._processing_task and not self._processing_task.done():
+        """Start the agent's worker pool"""
+        if any(not worker.done() for worker in self._workers):
             return
 
-        self._processing_task = asyncio.create_task(self._process_tasks())
+        self._workers = [
+            asyncio.create_task(self._worker_loop(i), name=f"{self.name or self.id}-worker-{i}")
+            for i in range(self.max_workers)
+        ]
         self.is_active = True
 
-    async def stop_processing(self) -> None:
-        """Stop the agent's task processing"""
-        self._shutdown_event.set()
-        if self._processing_task:
-            await self._processing_task
+    async def stop_processing(self, drain: bool = False) -> None:
+        """
+        Stop the agent's worker pool.
+
+        Workers are cancelled; tasks still executing are marked as cancelled.
+        With drain=True the queue is processed to completion first.
+        """
+        if drain and self._workers:
+            await self.task_queue.join()
+
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
         self.is_active = False
 
-    async def _process_tasks(self) -> None:
-        """Main task processing loop"""
-        while not self._shutdown_event.is_set():
-            try:
-                # Wait for task with timeout
-                task = await asyncio.wait_for(
-                    self.task_queue.get(),
-                    timeout=1.0
-                )
-
-                # Process the task
-                await self._execute_task(task)
-
-            except asyncio.TimeoutError:
-                # No task available, continue loop
-                continue
-            except Exception as e:
-                # Log error and continue
-                print(f"Agent {self.name}: Error processing task - {str(e)}")
-                continue
+        # Hand tasks parked on a capability limit back to the main queue
+        for waiting in self._waiting.values():
+            while waiting:
+                self.task_queue.put_nowait(waiting.popleft())
+                self.task_queue.task_done()
+
+    async def _worker_loop(self, worker_index: int) -> None:
+        """Worker coroutine: pull tasks until cancelled"""
+        while True:
+            task = await self.task_queue.get()
+            resumed = False
+            while task is not None:
+                key = self._concurrency_key(task)
+                if not self._has_capacity(key):
+                    # Park it; a worker finishing a task of this capability
+                    # picks it up, so this one moves on to the next task
+                    waiting = self._waiting.setdefault(key, deque())
+                    if resumed:
+                        waiting.appendleft(task)
+                    else:
+                        waiting.append(task)
+                    break
+
+                try:
+                    await self._process_task(task, key)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    # Log error and continue
+                    print(f"Agent {self.name}: Error processing task - {str(e)}")
+                finally:
+                    self.task_queue.task_done()
+
+                waiting = self._waiting.get(key)
+                task = waiting.popleft() if waiting else None
+                resumed = True
+
+    def _concurrency_key(self, task: AgentTask) -> str:
+        """Key used for per-capability limits and metrics"""
+        if task.task_type == "capability_execution":
+            return task.parameters.get('capability') or task.task_type
+        return task.task_type
+
+    def _has_capacity(self, key: str) -> bool:
+        limit = self._capability_limits.get(key)
+        return limit is None or self._in_flight_by_key.get(key, 0) < limit
+
+    async def _process_task(self, task: AgentTask, key: str) -> None:
+        """Run one admitted task and record metrics"""
+        self._in_flight += 1
+        self._in_flight_by_key[key] = self._in_flight_by_key.get(key, 0) + 1
+        started = time.perf_counter()
+        try:
+            await self._execute_task(task)
+        finally:
+            self._in_flight -= 1
+            self._in_flight_by_key[key] -= 1
+            histogram = self._execution_histograms.get(key)
+            if histogram is None:
+                histogram = self._execution_histograms[key] = ExecutionHistogram()
+            histogram.observe(time.perf_counter() - started)
+
+    def get_processing_metrics(self) -> Dict[str, Any]:
+        """Queue depth, in-flight count and execution-time histograms"""
+        return {
+            'workers': len([w for w in self._workers if not w.done()]),
+            'max_workers': self.max_workers,
+            'queue_depth': self.task_queue.qsize(),
+            'waiting': sum(len(waiting) for waiting in self._waiting.values()),
+            'waiting_by_capability': {k: len(v) for k, v in self._waiting.items() if v},
+            'in_flight': self._in_flight,
+            'in_flight_by_capability': {k: v for k, v in self._in_flight_by_key.items() if v},
+            'capability_limits': dict(self._capability_limits),
+            'execution_time_histograms': {
+                key: histogram.to_dict()
+                for key, histogram in self._execution_histograms.items()
+            }
+        }
 
     async def _execute_task(self, task: AgentTask) -> None:
         """Execute a single task"""
@@ -238,6 +368,12 @@ class BaseAgent(ABC):
             # Add to memory
             await self._add_task_memory(task, success=False)
 
+        except asyncio.CancelledError:
+            # Agent shutting down mid-execution
+            task.status = "cancelled"
+            task.error_message = "Cancelled during agent shutdown"
+            raise
+
         finally:
             # Calculate execution time
             end_time = datetime.utcnow()
@@ -167,7 +167,8 @@ async def get_agents_status():
                 "performance_score": auto_evolution_agent.performance_score,
                 "is_active": auto_evolution_agent.is_active,
                 "evolution_cycles_completed": auto_evolution_agent.evolution_cycles_completed,
-                "capabilities": auto_evolution_agent.get_capabilities_list()
+                "capabilities": auto_evolution_agent.get_capabilities_list(),
+                "processing": auto_evolution_agent.get_processing_metrics()
             }
         ]
     }
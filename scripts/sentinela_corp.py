@@ -4,6 +4,8 @@ Modo: Notificacoes automaticas + Operacao remota via WhatsApp
 """
 import os, sys, json, time, re
 from datetime import datetime
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from az_os.utils.log_reader import LogFollower, count_lines as count_file_lines
 try:
     import requests
 except ImportError:
@@ -46,6 +48,7 @@ CORP_COMMANDS = {
 
 cycle_count = 0
 last_line_count = 0
+log_follower = None
 last_report_time = 0
 last_bankroll = 0
 peak_bankroll = 0
@@ -491,26 +494,18 @@ def is_lock_stale():
 
 def count_lines():
     try:
-        with open(LOG_FILE, "rb") as f:
-            return sum(1 for _ in f)
+        return count_file_lines(LOG_FILE)
     except FileNotFoundError:
         return 0
 
 
-def read_new_lines(from_line):
-    lines = []
-    try:
-        with open(LOG_FILE, "r", encoding="utf-8", errors="ignore") as f:
-            for i, line in enumerate(f):
-                if i >= from_line:
-                    lines.append(line.strip())
-    except FileNotFoundError:
-        pass
-    return lines
+def read_new_lines():
+    """Linhas novas desde a ultima leitura (segue por offset, detecta rotacao)"""
+    return [line.strip() for line in log_follower.read_new_lines()]
 
 
 def main():
-    global cycle_count, last_line_count, last_report_time, last_bankroll, peak_bankroll
+    global cycle_count, last_line_count, last_report_time, last_bankroll, peak_bankroll, log_follower
 
     safe_print("====================================================")
     safe_print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] CORP SENTINEL ACTIVE")
@@ -521,6 +516,7 @@ def main():
     safe_print("====================================================")
 
     last_line_count = count_lines()
+    log_follower = LogFollower(LOG_FILE, from_end=True)
     last_report_time = time.time()
     write_heartbeat("starting")
 
@@ -559,7 +555,7 @@ def main():
         send_whatsapp(startup_msg)
         safe_print("[STARTUP] Fallback message sent")
 
-    critical_counter = 0
+    last_critical_check = time.time()
 
     while True:
         try:
@@ -571,7 +567,6 @@ def main():
                 sys.exit(0)
 
             cycle_count += 1
-            critical_counter += 1
 
             # Clean stale lock
             if is_lock_stale():
@@ -582,10 +577,9 @@ def main():
                     pass
 
             # === CHECK WHATSAPP COMMANDS ===
-            current_count = count_lines()
-            if current_count > last_line_count:
-                new_lines = read_new_lines(last_line_count)
-                last_line_count = current_count
+            new_lines = read_new_lines()
+            if new_lines:
+                last_line_count += len(new_lines)
 
                 for line in new_lines:
                     if not line:
@@ -651,8 +645,8 @@ def main():
                             safe_print(f"  [TRIGGER] Claude: query")
 
             # === CRITICAL EVENTS CHECK (every 30s) ===
-            if critical_counter * SCAN_INTERVAL >= CRITICAL_CHECK:
-                critical_counter = 0
+            if time.time() - last_critical_check >= CRITICAL_CHECK:
+                last_critical_check = time.time()
                 data = get_ecosystem_status()
                 alerts = check_critical_events(data)
                 
@@ -685,7 +679,8 @@ def main():
                 pass
 
             write_heartbeat("monitoring", {"bankroll": last_bankroll, "peak": peak_bankroll})
-            time.sleep(SCAN_INTERVAL)
+            # Acorda assim que chega mensagem nova (inotify) ou apos SCAN_INTERVAL
+            log_follower.wait(SCAN_INTERVAL)
 
         except Exception as e:
             write_heartbeat("error", {"error": str(e)})
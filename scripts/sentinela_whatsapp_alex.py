@@ -5,6 +5,8 @@ Modo: PUV Score exclusivo (2 passos: URL → Menu → Selecao → Execucao)
 """
 import os, sys, json, time, re
 from datetime import datetime
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from az_os.utils.log_reader import LogFollower, count_lines as count_file_lines
 
 BASE_DIR = "C:/Users/User/Desktop/Diana-Corporacao-Senciente"
 LOG_FILE = os.path.join(BASE_DIR, "apps/backend/integrations/whatsapp/logs/messages.jsonl")
@@ -29,6 +31,7 @@ BOT_PREFIXES = ["*PUV Score Bot"]
 
 cycle_count = 0
 last_line_count = 0
+log_follower = None
 
 
 def safe_print(msg):
@@ -69,22 +72,14 @@ def is_lock_stale():
 
 def count_lines():
     try:
-        with open(LOG_FILE, "rb") as f:
-            return sum(1 for _ in f)
+        return count_file_lines(LOG_FILE)
     except FileNotFoundError:
         return 0
 
 
-def read_new_lines(from_line):
-    lines = []
-    try:
-        with open(LOG_FILE, "r", encoding="utf-8", errors="ignore") as f:
-            for i, line in enumerate(f):
-                if i >= from_line:
-                    lines.append(line.strip())
-    except FileNotFoundError:
-        pass
-    return lines
+def read_new_lines():
+    """Linhas novas desde a ultima leitura (segue por offset, detecta rotacao)"""
+    return [line.strip() for line in log_follower.read_new_lines()]
 
 
 def detect_puv_request(text):
@@ -181,7 +176,7 @@ def dispatch(prompt_data):
 
 
 def main():
-    global cycle_count, last_line_count, TARGET_GROUP
+    global cycle_count, last_line_count, TARGET_GROUP, log_follower
 
     safe_print("====================================================")
     safe_print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] WHATSAPP PUV SENTINEL ACTIVE")
@@ -192,6 +187,7 @@ def main():
     safe_print("====================================================")
 
     last_line_count = count_lines()
+    log_follower = LogFollower(LOG_FILE, from_end=True)
     safe_print(f"[*] Log tem {last_line_count} msgs. Escutando novas...")
 
     write_heartbeat("starting")
@@ -213,10 +209,10 @@ def main():
                 except Exception:
                     pass
 
-            current_count = count_lines()
-            if current_count > last_line_count:
-                new_lines = read_new_lines(last_line_count)
-                last_line_count = current_count
+            new_lines = read_new_lines()
+            last_line_count += len(new_lines)
+            current_count = last_line_count
+            if new_lines:
 
                 for line in new_lines:
                     if not line:
@@ -311,7 +307,8 @@ def main():
                 pass
 
             write_heartbeat("scanning", {"log_lines": current_count, "has_pending": has_pending()})
-            time.sleep(SCAN_INTERVAL)
+            # Acorda assim que chega mensagem nova (inotify) ou apos SCAN_INTERVAL
+            log_follower.wait(SCAN_INTERVAL)
 
         except Exception as e:
             write_heartbeat("error", {"error": str(e)})
@@ -11,8 +11,11 @@ Uso:
 import os
 import sys
 import json
+from collections import deque
 from datetime import datetime, timedelta
 
+from ledger import LedgerReader, daily_index
+
 # Configurar encoding para Windows
 if sys.platform == 'win32':
     import io
@@ -21,6 +24,8 @@ if sys.platform == 'win32':
 # ─── CONFIG ───────────────────────────────────────────────────────────────────
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 STATE_FILE = os.path.join(SCRIPT_DIR, 'data', 'paper-trading-state.json')
+LEDGER_FILE = os.path.join(SCRIPT_DIR, 'data', 'paper-trading-bets.jsonl')
+RECENT_BETS = 5
 
 # ─── FUNÇÕES ──────────────────────────────────────────────────────────────────
 
@@ -31,20 +36,40 @@ def load_state():
             return json.load(f)
     return None
 
-def print_dashboard(state: dict):
+class RecentBets:
+    """Últimas apostas, lidas do ledger só a partir do que já foi visto"""
+    
+    def __init__(self, size: int = RECENT_BETS):
+        self.reader = None
+        self.bets = deque(maxlen=size)
+    
+    def update(self, state: dict) -> list:
+        if 'bets' in state:  # estado antigo, apostas no próprio JSON
+            self.bets.clear()
+            self.bets.extend(state['bets'])
+            return list(self.bets)
+        if self.reader is None:
+            # Começa no primeiro registro do dia mais recente, não no início do ledger
+            offsets = [day['offset'] for _, day in sorted(state['dailyIndex'].items()) if 'offset' in day]
+            self.reader = LedgerReader(LEDGER_FILE, offsets[-1] if offsets else 0)
+        self.bets.extend(self.reader.read_new(end=state['ledger']['offset']))
+        return list(self.bets)
+
+def print_dashboard(state: dict, recent: list = ()):
     """Imprime dashboard formatado"""
     m = state['metrics']
     b = state['bankroll']
+    days = daily_index(state)
     
-    # Calcular apostas de hoje
+    # Apostas de hoje (índice diário do snapshot)
     today = datetime.now().strftime('%Y-%m-%d')
-    today_bets = [bet for bet in state['bets'] if bet['executedAt'].startswith(today)]
-    today_profit = sum(bet['profit'] for bet in today_bets)
+    today_stats = days.get(today, {'bets': 0, 'profit': 0.0})
     
-    # Calcular apostas da semana
+    # Apostas da semana
     week_ago = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
-    week_bets = [bet for bet in state['bets'] if bet['executedAt'] >= week_ago]
-    week_profit = sum(bet['profit'] for bet in week_bets)
+    week_days = [day for date, day in days.items() if date >= week_ago]
+    week_count = sum(day['bets'] for day in week_days)
+    week_profit = sum(day['profit'] for day in week_days)
     
     os.system('cls' if os.name == 'nt' else 'clear')
     
@@ -75,11 +100,18 @@ def print_dashboard(state: dict):
     
     print("\n  📅 HOJE")
     print("  " + "─"*68)
-    print(f"  Apostas:  {len(today_bets):>3}  |  Lucro:  R$ {today_profit:>+8.2f}")
+    print(f"  Apostas:  {today_stats['bets']:>3}  |  Lucro:  R$ {today_stats['profit']:>+8.2f}")
     
     print("\n  📊 ESTA SEMANA")
     print("  " + "─"*68)
-    print(f"  Apostas:  {len(week_bets):>3}  |  Lucro:  R$ {week_profit:>+8.2f}")
+    print(f"  Apostas:  {week_count:>3}  |  Lucro:  R$ {week_profit:>+8.2f}")
+    
+    if recent:
+        print("\n  🎾 ÚLTIMAS APOSTAS")
+        print("  " + "─"*68)
+        for bet in reversed(recent):
+            timestamp = bet['executedAt'].replace('T', ' ').split('.')[0]
+            print(f"  {timestamp}  {bet['favorite']:<12} @ {bet['odd']:.2f}  {bet['result']:<4}  {bet['profit']:>+6.2f}")
     
     print("\n  🎯 METAS (4 SEMANAS)")
     print("  " + "─"*68)
@@ -143,12 +175,13 @@ if __name__ == '__main__':
         print_json(state)
     elif args.watch:
         import time
+        recent = RecentBets()
         try:
             while True:
-                print_dashboard(state)
+                print_dashboard(state, recent.update(state))
                 time.sleep(args.interval)
-                state = load_state()  # Recarregar estado
+                state = load_state()  # Recarregar snapshot (apostas novas vêm do ledger)
         except KeyboardInterrupt:
             print("\nDashboard encerrado.")
     else:
-        print_dashboard(state)
+        print_dashboard(state, RecentBets().update(state))
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Ledger de Apostas (append-only) + Snapshot do Estado
+Persistência crash-safe do paper trading
+
+- Apostas vão para um JSONL append-only (uma aposta por linha). Cada
+  gravação faz flush + fsync antes de seguir.
+- O resumo (banca, métricas, sequências, índice diário) é um snapshot JSON
+  pequeno, gravado de forma atômica (arquivo temporário + fsync +
+  os.replace). Ele guarda o offset do ledger até onde as apostas estão
+  confirmadas: um kill no meio do save deixa no máximo linhas além desse
+  offset, que o bot descarta ao carregar.
+- Leitores (dashboard, monitor) usam LedgerReader, que lembra o offset e
+  só lê as linhas novas.
+"""
+
+import json
+import os
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Chamado em toda gravação; o replay harness troca por um no-op para medir
+# só a CPU do pipeline
+fsync = os.fsync
+
+def _fsync_dir(path: str):
+    """fsync do diretório (persiste o rename); ignorado onde não é suportado"""
+    try:
+        fd = os.open(os.path.dirname(path) or '.', os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def atomic_write_json(path: str, data: Dict[str, Any]):
+    """Grava JSON de forma atômica: nunca deixa um arquivo pela metade"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+        f.flush()
+        fsync(f.fileno())
+    os.replace(tmp_path, path)
+    _fsync_dir(path)
+
+def append_records(path: str, records: List[Dict[str, Any]]) -> Tuple[List[int], int]:
+    """
+    Acrescenta registros ao ledger (flush + fsync).
+    Retorna (offset de início de cada registro, offset final).
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    starts = []
+    with open(path, 'ab') as f:
+        position = f.tell()
+        for record in records:
+            line = (json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+            starts.append(position)
+            f.write(line)
+            position += len(line)
+        f.flush()
+        fsync(f.fileno())
+    return starts, position
+
+def truncate_to(path: str, offset: int) -> bool:
+    """Descarta o que passou do último offset confirmado; True se cortou algo"""
+    if not os.path.exists(path) or os.path.getsize(path) <= offset:
+        return False
+    with open(path, 'r+b') as f:
+        f.truncate(offset)
+        f.flush()
+        fsync(f.fileno())
+    return True
+
+def read_records(path: str, start: int = 0, end: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """Lê registros completos entre os offsets [start, end)"""
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb') as f:
+        f.seek(start)
+        position = start
+        for line in f:
+            if end is not None and position >= end:
+                return
+            position += len(line)
+            if not line.endswith(b'\n'):
+                return  # linha incompleta (gravação em andamento)
+            yield json.loads(line)
+
+class LedgerReader:
+    """Lê incrementalmente as apostas acrescentadas desde a última leitura"""
+
+    def __init__(self, path: str, offset: int = 0):
+        self.path = path
+        self.offset = offset
+
+    def read_new(self, end: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Registros novos completos (até `end`, o offset confirmado no
+        snapshot, quando informado). Recomeça do início se o arquivo encolheu.
+        """
+        if not os.path.exists(self.path):
+            return []
+        if os.path.getsize(self.path) < self.offset:
+            self.offset = 0
+        records = []
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            for line in f:
+                if end is not None and self.offset >= end:
+                    break
+                if not line.endswith(b'\n'):
+                    break
+                self.offset += len(line)
+                records.append(json.loads(line))
+        return records
+
+# ─── LEITURA PARA DASHBOARD / MONITOR ─────────────────────────────────────────
+
+def daily_index(state: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Índice por dia do snapshot (estados antigos: montado das apostas no JSON)"""
+    if 'dailyIndex' in state:
+        return state['dailyIndex']
+    index: Dict[str, Dict[str, Any]] = {}
+    for bet in state.get('bets', []):
+        day = index.setdefault(bet['executedAt'][:10], {'bets': 0, 'profit': 0.0})
+        day['bets'] += 1
+        day['profit'] = round(day['profit'] + bet['profit'], 2)
+    return index
+
+def day_bets(path: str, state: Dict[str, Any], day: str) -> List[Dict[str, Any]]:
+    """Apostas de um dia: lê o ledger a partir do offset do primeiro registro do dia"""
+    if 'bets' in state:
+        return [bet for bet in state['bets'] if bet['executedAt'].startswith(day)]
+    entry = state.get('dailyIndex', {}).get(day)
+    if entry is None:
+        return []
+    bets = []
+    for bet in read_records(path, entry.get('offset', 0), state['ledger']['offset']):
+        bet_day = bet['executedAt'][:10]
+        if bet_day == day:
+            bets.append(bet)
+        elif bet_day > day:
+            break  # ledger em ordem cronológica
+    return bets
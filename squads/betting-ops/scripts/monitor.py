@@ -15,6 +15,8 @@ import json
 from datetime import datetime
 from typing import Dict, Any
 
+from ledger import daily_index, day_bets
+
 # Configurar encoding para Windows
 if sys.platform == 'win32':
     import io
@@ -23,6 +25,7 @@ if sys.platform == 'win32':
 # ─── CONFIG ───────────────────────────────────────────────────────────────────
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 STATE_FILE = os.path.join(SCRIPT_DIR, 'data', 'paper-trading-state.json')
+LEDGER_FILE = os.path.join(SCRIPT_DIR, 'data', 'paper-trading-bets.jsonl')
 ALERTS_FILE = os.path.join(SCRIPT_DIR, 'data', 'alerts-log.md')
 REPORTS_DIR = os.path.join(SCRIPT_DIR, 'data', 'reports')
 
@@ -59,10 +62,8 @@ def check_alerts(state: Dict[str, Any]) -> list:
         })
     
     # Stop loss diário
-    today_profit = sum(
-        b['profit'] for b in state['bets']
-        if b['executedAt'].startswith(datetime.now().strftime('%Y-%m-%d'))
-    )
+    today = daily_index(state).get(datetime.now().strftime('%Y-%m-%d'), {})
+    today_profit = today.get('profit', 0.0)
     if today_profit < -10:
         alerts.append({
             'level': '🔴',
@@ -123,11 +124,8 @@ def generate_daily_report(state: Dict[str, Any]):
     today = datetime.now().strftime('%Y-%m-%d')
     report_file = os.path.join(REPORTS_DIR, f'daily-{today}.md')
     
-    # Filtrar apostas de hoje
-    today_bets = [
-        b for b in state['bets']
-        if b['executedAt'].startswith(today)
-    ]
+    # Apostas de hoje (lidas do ledger a partir do offset do dia)
+    today_bets = day_bets(LEDGER_FILE, state, today)
     
     # Calcular métricas do dia
     today_wins = sum(1 for b in today_bets if b['result'] == 'WIN')
@@ -7,6 +7,8 @@ Uso:
   python paper-trading-bot.py              # Rodar contínuo
   python paper-trading-bot.py --once       # Uma execução
   python paper-trading-bot.py --simulate   # Simular com dados mock
+  python paper-trading-bot.py --stream replay.jsonl   # Placar ao vivo (replay)
+  python paper-trading-bot.py --socket host:porta     # Placar ao vivo (socket)
 """
 
 import os
@@ -17,6 +19,9 @@ import random
 from datetime import datetime
 from typing import Dict, List, Any
 
+from ledger import append_records, atomic_write_json, daily_index, truncate_to
+from trigger_engine import TriggerEngine, print_latency, replay_file, socket_source, trigger_key
+
 # Configurar encoding para Windows
 if sys.platform == 'win32':
     import io
@@ -25,6 +30,7 @@ if sys.platform == 'win32':
 # ─── CONFIG ───────────────────────────────────────────────────────────────────
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 STATE_FILE = os.path.join(SCRIPT_DIR, 'data', 'paper-trading-state.json')
+LEDGER_FILE = os.path.join(SCRIPT_DIR, 'data', 'paper-trading-bets.jsonl')
 LOG_FILE = os.path.join(SCRIPT_DIR, 'data', 'paper-trading-log.md')
 DATA_FILE = os.path.join(SCRIPT_DIR, '..', '..', 'modules', 'betting-platform', 'backend', 'data', 'tennis-matches.json')
 
@@ -37,13 +43,26 @@ CONFIG = {
     'stopLossDaily': 10.0,
 }
 
+# Chaves de idempotência de triggers guardadas no snapshot
+MAX_TRIGGER_KEYS = 1000
+
 # ─── FUNÇÕES AUXILIARES ───────────────────────────────────────────────────────
 
 def load_state() -> Dict[str, Any]:
-    """Carrega estado atual do paper trading"""
+    """
+    Carrega o snapshot do paper trading (sem as apostas, que ficam no ledger).
+    
+    Linhas do ledger além do offset confirmado no snapshot vêm de um save
+    interrompido e são descartadas.
+    """
     if os.path.exists(STATE_FILE):
         with open(STATE_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
+            state = ensure_accumulators(json.load(f))
+        if 'bets' in state:
+            migrate_bets_to_ledger(state)
+        elif truncate_to(LEDGER_FILE, state['ledger']['offset']):
+            print("  - Ledger: apostas não confirmadas descartadas")
+        return state
     
     # Estado inicial
     return {
@@ -68,15 +87,67 @@ def load_state() -> Dict[str, Any]:
             'longestWinStreak': 0,
             'longestLossStreak': 0
         },
-        'bets': [],
+        'accumulators': {
+            'profitSum': 0.0,
+            'peakBankroll': 1000.0,
+        },
+        'dailyIndex': {},
+        'triggerKeys': [],
+        'ledger': {
+            'bets': 0,
+            'offset': 0,
+        },
         'dailyLogs': []
     }
 
-def save_state(state: Dict[str, Any]):
-    """Salva estado atual"""
-    os.makedirs(os.path.dirname(STATE_FILE), exist_ok=True)
-    with open(STATE_FILE, 'w', encoding='utf-8') as f:
-        json.dump(state, f, indent=2, ensure_ascii=False)
+def ensure_accumulators(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Garante os acumuladores (lucro, pico da banca) e o índice por dia.
+    
+    Estados antigos não têm esses campos: são reconstruídos uma única vez a
+    partir do histórico; depois cada aposta só atualiza os acumuladores.
+    """
+    if 'accumulators' not in state:
+        state['accumulators'] = {
+            'profitSum': sum(b['profit'] for b in state['bets']),
+            'peakBankroll': max([b['bankrollAfter'] for b in state['bets']] + [state['bankroll']['initial']]),
+        }
+    if 'dailyIndex' not in state:
+        state['dailyIndex'] = daily_index(state)
+    return state
+
+def record_daily(state: Dict[str, Any], bet: Dict[str, Any]):
+    """Soma a aposta no contador do dia (chave YYYY-MM-DD de executedAt)"""
+    day = state['dailyIndex'].setdefault(bet['executedAt'][:10], {'bets': 0, 'profit': 0.0})
+    day['bets'] += 1
+    day['profit'] = round(day['profit'] + bet['profit'], 2)
+
+def today_stats(state: Dict[str, Any]) -> Dict[str, Any]:
+    """Apostas e lucro de hoje, pelo índice diário"""
+    return state['dailyIndex'].get(datetime.now().strftime('%Y-%m-%d'), {'bets': 0, 'profit': 0.0})
+
+def migrate_bets_to_ledger(state: Dict[str, Any]):
+    """Estados antigos guardam as apostas no JSON: move para o ledger uma vez"""
+    bets = state.pop('bets')
+    truncate_to(LEDGER_FILE, 0)  # sobra de uma migração interrompida
+    state['ledger'] = {'bets': 0, 'offset': 0}
+    save_state(state, bets)
+
+def save_state(state: Dict[str, Any], new_bets: List[Dict[str, Any]] = ()):
+    """
+    Acrescenta as apostas novas ao ledger e grava o snapshot do estado.
+    
+    O snapshot (atômico) é o ponto de confirmação: ele registra até que
+    offset do ledger as apostas valem.
+    """
+    if new_bets:
+        starts, end = append_records(LEDGER_FILE, list(new_bets))
+        for bet, start in zip(new_bets, starts):
+            day = state['dailyIndex'].get(bet['executedAt'][:10])
+            if day is not None:
+                day.setdefault('offset', start)
+        state['ledger'] = {'bets': state['ledger']['bets'] + len(new_bets), 'offset': end}
+    atomic_write_json(STATE_FILE, state)
 
 def load_mock_data() -> List[Dict[str, Any]]:
     """Carrega dados mock para simulação"""
@@ -177,6 +248,7 @@ def detect_triggers(matches: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
             
             if points.get(favorite, 0) == 0 and points.get(opp, 0) == 30:
                 triggers.append({
+                    'key': trigger_key(match['matchId'], game.get('setNumber', 1), game.get('gameNumber', 0)),
                     'match': match,
                     'game': game,
                     'favorite': favorite,
@@ -223,7 +295,7 @@ def execute_bet(trigger: Dict[str, Any], state: Dict[str, Any]) -> Dict[str, Any
     
     # Criar registro da aposta
     bet = {
-        'id': f"bet-{len(state['bets']) + 1}",
+        'id': f"bet-{state['metrics']['totalBets'] + 1}",
         'timestamp': trigger['timestamp'],
         'executedAt': datetime.now().isoformat(),
         'matchId': match['matchId'],
@@ -240,34 +312,42 @@ def execute_bet(trigger: Dict[str, Any], state: Dict[str, Any]) -> Dict[str, Any
         'bankrollAfter': round(state['bankroll']['current'], 2),
         'gameServer': favorite,
         'triggerScore': '30-0',
+        'triggerKey': trigger.get('key'),
     }
     
     # Atualizar métricas
     state['metrics']['totalBets'] += 1
+    # Sequência atual: positiva em vitórias, negativa em derrotas
+    streak = state['metrics']['currentStreak']
     if won:
         state['metrics']['wins'] += 1
-        state['metrics']['currentStreak'] += 1
+        state['metrics']['currentStreak'] = streak + 1 if streak > 0 else 1
         if state['metrics']['currentStreak'] > state['metrics']['longestWinStreak']:
             state['metrics']['longestWinStreak'] = state['metrics']['currentStreak']
     else:
         state['metrics']['losses'] += 1
-        state['metrics']['currentStreak'] -= 1
+        state['metrics']['currentStreak'] = streak - 1 if streak < 0 else -1
         if abs(state['metrics']['currentStreak']) > state['metrics']['longestLossStreak']:
             state['metrics']['longestLossStreak'] = abs(state['metrics']['currentStreak'])
     
-    # Calcular win rate e ROI
+    # Calcular win rate e ROI (acumuladores: custo constante por aposta)
+    acc = state['accumulators']
     total_bets = state['metrics']['totalBets']
     state['metrics']['winRate'] = round(state['metrics']['wins'] / total_bets * 100, 2) if total_bets > 0 else 0
-    total_profit = sum(b['profit'] for b in state['bets']) + profit
+    total_profit = acc['profitSum'] + profit
     state['metrics']['totalProfit'] = round(total_profit, 2)
     state['metrics']['roi'] = round(total_profit / (total_bets * stake) * 100, 2) if total_bets > 0 else 0
     
-    # Calcular drawdown
-    peak = max([b['bankrollAfter'] for b in state['bets']] + [state['bankroll']['initial']])
+    # Calcular drawdown (pico das apostas anteriores)
+    peak = acc['peakBankroll']
     current_drawdown = (peak - state['bankroll']['current']) / peak * 100
     if current_drawdown > state['metrics']['maxDrawdown']:
         state['metrics']['maxDrawdown'] = round(current_drawdown, 2)
     
+    acc['profitSum'] += bet['profit']
+    acc['peakBankroll'] = max(peak, bet['bankrollAfter'])
+    record_daily(state, bet)
+    
     return bet
 
 def update_log(state: Dict[str, Any], bet: Dict[str, Any] = None):
@@ -312,7 +392,7 @@ def update_log(state: Dict[str, Any], bet: Dict[str, Any] = None):
         elif line.startswith('- **Bankroll Atual:**'):
             lines[i] = f"- **Bankroll Atual:** {state['bankroll']['current']:.2f}\n"
         elif line.startswith('- **Lucro Hoje:**'):
-            today_profit = sum(b['profit'] for b in state['bets'] if b['executedAt'].startswith(datetime.now().strftime('%Y-%m-%d')))
+            today_profit = today_stats(state)['profit']
             lines[i] = f"- **Lucro Hoje:** {today_profit:+.2f}\n"
     
     # Salvar log
@@ -375,36 +455,87 @@ def run_once(simulate: bool = False):
     triggers = detect_triggers(matches)
     print(f"  - {len(triggers)} triggers encontrados")
     
-    # Executar apostas
-    bets_executed = 0
+    # Executar apostas (triggers já apostados em iterações anteriores são ignorados)
+    new_bets = []
+    fired = set(state.get('triggerKeys', []))
     for trigger in triggers:
-        # Verificar limites
-        today_bets = [b for b in state['bets'] if b['executedAt'].startswith(datetime.now().strftime('%Y-%m-%d'))]
-        if len(today_bets) >= CONFIG['maxBetsPerDay']:
-            print("  - Limite diário de apostas atingido")
-            break
+        if trigger['key'] in fired:
+            continue
         
-        if state['metrics']['totalProfit'] < -CONFIG['stopLossDaily']:
-            print("  - Stop loss diário atingido")
+        # Verificar limites
+        limit = check_limits(state)
+        if limit:
+            print(f"  - {limit}")
             break
         
         # Executar aposta
         bet = execute_bet(trigger, state)
         if bet:
-            state['bets'].append(bet)
-            bets_executed += 1
+            new_bets.append(bet)
+            remember_trigger(state, trigger['key'])
             print(f"  - Aposta executada: {bet['favorite']} @ {bet['odd']:.2f} = {bet['result']} ({bet['profit']:+.2f})")
     
-    # Salvar estado
-    save_state(state)
+    # Salvar estado (ledger + snapshot)
+    save_state(state, new_bets)
     
     # Atualizar log
-    if bets_executed > 0:
-        update_log(state, state['bets'][-1])
+    if new_bets:
+        update_log(state, new_bets[-1])
     
     # Imprimir status
     print_status(state)
     
+    return len(new_bets)
+
+def check_limits(state: Dict[str, Any]) -> str:
+    """Motivo para não apostar agora ('' se liberado)"""
+    if today_stats(state)['bets'] >= CONFIG['maxBetsPerDay']:
+        return "Limite diário de apostas atingido"
+    if state['metrics']['totalProfit'] < -CONFIG['stopLossDaily']:
+        return "Stop loss diário atingido"
+    return ''
+
+def remember_trigger(state: Dict[str, Any], key: str):
+    """Guarda a chave de idempotência no snapshot (últimas MAX_TRIGGER_KEYS)"""
+    keys = state.setdefault('triggerKeys', [])
+    keys.append(key)
+    del keys[:-MAX_TRIGGER_KEYS]
+
+def run_stream(events, label: str = 'stream'):
+    """
+    Modo ao vivo: consome eventos de placar ponto a ponto e decide cada
+    trigger no momento em que o 30-0 aparece (sem polling). Cada aposta é
+    gravada no ledger logo após a decisão.
+    """
+    print(f"\n[Paper Trading Bot] Modo streaming ({label})...")
+    state = load_state()
+    
+    def decide(trigger: Dict[str, Any]):
+        limit = check_limits(state)
+        if limit:
+            return limit
+        return execute_bet(trigger, state)
+    
+    engine = TriggerEngine(on_trigger=decide, fired_keys=state.get('triggerKeys', []))
+    bets_executed = 0
+    try:
+        for trigger in engine.run(events):
+            bet = trigger.decision
+            if not isinstance(bet, dict):
+                if bet:
+                    print(f"  - {trigger.key}: {bet}")
+                continue
+            remember_trigger(state, trigger.key)
+            save_state(state, [bet])
+            update_log(state, bet)
+            bets_executed += 1
+            print(f"  - Aposta executada: {bet['favorite']} @ {bet['odd']:.2f} = {bet['result']} "
+                  f"({bet['profit']:+.2f}) em {trigger.latency_ms:.3f} ms")
+    except KeyboardInterrupt:
+        print("\n\n[Paper Trading Bot] Parado pelo usuário")
+    
+    print_latency(engine)
+    print_status(state)
     return bets_executed
 
 def run_continuous(simulate: bool = False, interval: int = 60):
@@ -438,10 +569,17 @@ if __name__ == '__main__':
     parser.add_argument('--simulate', action='store_true', help='Usar dados simulados')
     parser.add_argument('--continuous', action='store_true', help='Executar continuamente')
     parser.add_argument('--interval', type=int, default=60, help='Intervalo em segundos (contínuo)')
+    parser.add_argument('--stream', help='Arquivo JSONL de eventos de placar (replay)')
+    parser.add_argument('--socket', help='Fonte de eventos de placar host:porta')
+    parser.add_argument('--speed', type=float, default=None, help='Velocidade do replay (1 = tempo real)')
     
     args = parser.parse_args()
     
-    if args.continuous:
+    if args.stream:
+        run_stream(replay_file(args.stream, args.speed), args.stream)
+    elif args.socket:
+        run_stream(socket_source(args.socket), args.socket)
+    elif args.continuous:
         run_continuous(simulate=args.simulate, interval=args.interval)
     else:
         run_once(simulate=args.simulate)
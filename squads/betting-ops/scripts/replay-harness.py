@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Replay Harness: Paper Trading
+Reproduz partidas históricas pelo pipeline trigger -> aposta -> estado -> alerta
+
+Converte um matches.json (backtest) em eventos de placar com timestamps
+das próprias partidas e os passa pelo TriggerEngine, por execute_bet /
+save_state do bot e por check_alerts do monitor. O tempo do domínio é um
+relógio virtual (datetime.now() do bot e do monitor seguem os eventos),
+então limites diários, índice por dia e timestamps das apostas saem como
+se fosse ao vivo, a milhares de vezes a velocidade real. Com a mesma seed
+o resultado é determinístico (mesmo hash do ledger).
+
+Estado, ledger e logs vão para um diretório de trabalho próprio; os
+arquivos reais do bot não são tocados. Por padrão o fsync do ledger vira
+no-op (--fsync mede o custo real em disco, reportado na etapa 'state'),
+e a comparação com o baseline usa as latências de CPU de trigger, aposta
+e alerta, que não dependem do disco.
+
+Uso:
+  python replay-harness.py                              # o mais rápido possível
+  python replay-harness.py --speed 1000                 # 1000x tempo real
+  python replay-harness.py --output baseline.json       # salvar relatório
+  python replay-harness.py --baseline baseline.json     # comparar (exit 1 se regrediu)
+  python replay-harness.py --fsync                      # incluir o fsync real
+"""
+
+import argparse
+import hashlib
+import importlib.util
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import ledger
+from trigger_engine import TriggerEngine, matches_to_events, percentile_summary
+
+# Configurar encoding para Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MATCHES = os.path.join(SCRIPT_DIR, '..', '..', 'strategy-sports', 'backtest',
+                               'tennis-favorite-30-0-comeback', 'data', 'matches.json')
+STAGES = ('trigger', 'bet', 'state', 'alert', 'endToEnd')
+# Etapas só de CPU, comparadas com o baseline
+GATED_STAGES = ('trigger', 'bet', 'alert')
+
+def load_script(name: str, filename: str):
+    """Importa um script do diretório (nomes com hífen)"""
+    spec = importlib.util.spec_from_file_location(name, os.path.join(SCRIPT_DIR, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+class VirtualClock:
+    """Relógio do domínio, avançado pelos timestamps dos eventos"""
+
+    def __init__(self, ts: float = 0.0):
+        self.ts = ts
+
+    def advance_to(self, ts: float):
+        self.ts = max(self.ts, ts)
+
+    def now(self) -> datetime:
+        return datetime.fromtimestamp(self.ts)
+
+    def datetime_class(self):
+        """Subclasse de datetime cujo now() lê este relógio (para os scripts)"""
+        clock = self
+
+        class VirtualDatetime(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return datetime.fromtimestamp(clock.ts, tz)
+
+        return VirtualDatetime
+
+def run_replay(events: List[Dict[str, Any]], workdir: str, seed: int = 42,
+               speed: Optional[float] = None, durable: bool = False) -> Dict[str, Any]:
+    """
+    Executa o replay e devolve o relatório (throughput, latências, métricas).
+    Sem durable, o fsync do ledger é um no-op durante o replay.
+    """
+    real_fsync = ledger.fsync
+    if not durable:
+        ledger.fsync = lambda fd: None
+    try:
+        return _run_replay(events, workdir, seed, speed, durable)
+    finally:
+        ledger.fsync = real_fsync
+
+def _run_replay(events: List[Dict[str, Any]], workdir: str, seed: int,
+                speed: Optional[float], durable: bool) -> Dict[str, Any]:
+    clock = VirtualClock(events[0].get('ts', 0.0) if events else 0.0)
+    bot = load_script('paper_trading_bot', 'paper-trading-bot.py')
+    monitor = load_script('monitor', 'monitor.py')
+    for module in (bot, monitor):
+        module.datetime = clock.datetime_class()
+        module.STATE_FILE = os.path.join(workdir, 'paper-trading-state.json')
+        module.LEDGER_FILE = os.path.join(workdir, 'paper-trading-bets.jsonl')
+    bot.LOG_FILE = os.path.join(workdir, 'paper-trading-log.md')
+
+    random.seed(seed)
+    state = bot.load_state()
+    timings: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+    raised = Counter()
+    active_alerts = set()
+    decision_ms = [0.0]
+
+    def decide(trigger: Dict[str, Any]):
+        started = time.perf_counter()
+        try:
+            if bot.check_limits(state):
+                return None
+            return bot.execute_bet(trigger, state)
+        finally:
+            decision_ms[0] = (time.perf_counter() - started) * 1000
+
+    engine = TriggerEngine(on_trigger=decide, fired_keys=state.get('triggerKeys', []), now=clock.now)
+    bets = 0
+    first_ts = clock.ts
+    wall_start = time.perf_counter()
+
+    for event in events:
+        ts = event.get('ts', clock.ts)
+        if speed:
+            # Ritmo: (tempo virtual decorrido / speed) em tempo real
+            ahead = (ts - first_ts) / speed - (time.perf_counter() - wall_start)
+            if ahead > 0:
+                time.sleep(ahead)
+        clock.advance_to(ts)
+
+        received = time.perf_counter()
+        decision_ms[0] = 0.0
+        trigger = engine.process(event)
+        if trigger is None:
+            continue
+        timings['trigger'].append(trigger.latency_ms - decision_ms[0])
+        timings['bet'].append(decision_ms[0])
+        bet = trigger.decision
+        if not bet:
+            continue
+
+        started = time.perf_counter()
+        bot.remember_trigger(state, trigger.key)
+        bot.save_state(state, [bet])
+        timings['state'].append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        alerts = {alert['type'] for alert in monitor.check_alerts(state)}
+        timings['alert'].append((time.perf_counter() - started) * 1000)
+        raised.update(alerts - active_alerts)
+        active_alerts = alerts
+
+        timings['endToEnd'].append((time.perf_counter() - received) * 1000)
+        bets += 1
+
+    wall = time.perf_counter() - wall_start
+    virtual = clock.ts - first_ts
+    ledger_hash = hashlib.sha256()
+    if os.path.exists(bot.LEDGER_FILE):
+        with open(bot.LEDGER_FILE, 'rb') as f:
+            ledger_hash.update(f.read())
+
+    return {
+        'seed': seed,
+        'fsync': durable,
+        'events': len(events),
+        'triggers': engine.stats['triggers'],
+        'bets': bets,
+        'wallSeconds': round(wall, 4),
+        'eventsPerSecond': round(len(events) / wall, 1) if wall > 0 else 0,
+        'virtualSeconds': round(virtual, 1),
+        'speedup': round(virtual / wall, 1) if wall > 0 else 0,
+        'stages': {stage: percentile_summary(values) for stage, values in timings.items()},
+        'metrics': state['metrics'],
+        'bankroll': round(state['bankroll']['current'], 2),
+        'alertsRaised': dict(sorted(raised.items())),
+        'ledgerSha256': ledger_hash.hexdigest(),
+    }
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """
+    Regressões em relação ao baseline: correção e p50 das etapas de CPU
+    (GATED_STAGES). O throughput total inclui o disco e só é informativo.
+    """
+    problems = []
+    for key in ('triggers', 'bets', 'metrics', 'bankroll', 'ledgerSha256'):
+        if report[key] != baseline.get(key):
+            problems.append(f"{key}: {baseline.get(key)} -> {report[key]}")
+    for stage in GATED_STAGES:
+        current = report['stages'].get(stage)
+        previous = baseline.get('stages', {}).get(stage)
+        if not current or not previous:
+            continue
+        maximum = previous['p50'] * (1 + tolerance)
+        if current['p50'] > maximum:
+            problems.append(f"{stage} p50: {current['p50']:.4f} ms > {maximum:.4f} ms "
+                            f"(baseline {previous['p50']:.4f} ms, tolerância {tolerance:.0%})")
+    return problems
+
+def print_report(report: Dict[str, Any]):
+    """Imprime o relatório do replay"""
+    print("\n" + "="*60)
+    print("REPLAY HARNESS: Paper Trading")
+    print("="*60)
+    print(f"Eventos: {report['events']} | Triggers: {report['triggers']} | Apostas: {report['bets']}")
+    print(f"Tempo real: {report['wallSeconds']:.3f}s | Tempo virtual: {report['virtualSeconds'] / 3600:.1f}h")
+    print(f"Throughput: {report['eventsPerSecond']:.0f} eventos/s | Aceleração: {report['speedup']:.0f}x "
+          f"| fsync: {'sim' if report['fsync'] else 'não'}")
+    print("-"*60)
+    print(f"{'Etapa':<10} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'max ms':>10}")
+    for stage, summary in report['stages'].items():
+        if summary:
+            print(f"{stage:<10} {summary['p50']:>10.3f} {summary['p95']:>10.3f} "
+                  f"{summary['p99']:>10.3f} {summary['max']:>10.3f}")
+    print("-"*60)
+    m = report['metrics']
+    print(f"Bankroll: {report['bankroll']:.2f} | Win Rate: {m['winRate']:.2f}% | ROI: {m['roi']:.2f}%")
+    print(f"Max Drawdown: {m['maxDrawdown']:.2f}% | Lucro: {m['totalProfit']:+.2f}")
+    if report['alertsRaised']:
+        print("Alertas: " + ", ".join(f"{name} x{count}" for name, count in report['alertsRaised'].items()))
+    print(f"Ledger sha256: {report['ledgerSha256'][:16]}...")
+    print("="*60)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Replay determinístico do pipeline de paper trading')
+    parser.add_argument('--matches', default=DEFAULT_MATCHES, help='matches.json histórico')
+    parser.add_argument('--events', help='Arquivo JSONL de eventos (em vez de --matches)')
+    parser.add_argument('--game-seconds', type=float, default=240.0, help='Duração virtual de cada game')
+    parser.add_argument('--speed', type=float, default=None, help='Vezes o tempo real (padrão: sem pausa)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--workdir', help='Diretório para estado/ledger (padrão: temporário)')
+    parser.add_argument('--output', help='Salvar relatório JSON')
+    parser.add_argument('--baseline', help='Relatório JSON para comparar')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Aumento aceito no p50 das etapas de CPU')
+    parser.add_argument('--fsync', action='store_true', help='Manter o fsync real do ledger')
+    args = parser.parse_args()
+
+    if args.events:
+        with open(args.events, 'r', encoding='utf-8') as f:
+            events = [json.loads(line) for line in f if line.strip()]
+    else:
+        with open(args.matches, 'r', encoding='utf-8') as f:
+            events = matches_to_events(json.load(f), args.game_seconds, use_dates=True)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='paper-replay-')
+    if args.workdir:
+        os.makedirs(workdir, exist_ok=True)
+        for name in ('paper-trading-state.json', 'paper-trading-bets.jsonl', 'paper-trading-log.md'):
+            if os.path.exists(os.path.join(workdir, name)):
+                os.remove(os.path.join(workdir, name))
+    try:
+        report = run_replay(events, workdir, args.seed, args.speed, args.fsync)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\n[OK] Relatório salvo: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            problems = compare(report, json.load(f), args.tolerance)
+        if problems:
+            print("\n[FAIL] Regressões em relação ao baseline:")
+            for problem in problems:
+                print(f"  - {problem}")
+            sys.exit(1)
+        print("\n[OK] Sem regressões em relação ao baseline")
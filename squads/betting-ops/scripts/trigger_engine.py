@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Motor de Triggers ao Vivo: Tennis Favorite 30-0 Comeback
+Consome o placar ponto a ponto e dispara cada trigger uma única vez
+
+Eventos (um JSON por linha, de um arquivo de replay ou de um socket TCP):
+  {"type": "match_start", "matchId": ..., "player1": {...}, "player2": {...},
+   "favorite": "player1", "tournament": ..., "surface": ...}
+  {"type": "point", "matchId": ..., "set": 1, "game": 3, "server": "player1",
+   "points": {"player1": 0, "player2": 30}}
+  {"type": "game_end", "matchId": ..., "set": 1, "game": 3, "winner": "Sinner"}
+  {"type": "match_end", "matchId": ...}
+
+Cada partida tem sua máquina de estados (partida: live -> finished; game:
+playing -> triggered -> ended). O trigger (favorito sacando, 0-30 contra
+ele) tem uma chave de idempotência matchId:set:game:30-0; chaves já
+disparadas (inclusive de execuções anteriores) nunca disparam de novo.
+
+A latência medida vai do recebimento do evento até a decisão (retorno do
+callback on_trigger). O relógio é injetável (clock=) para replays com
+relógio virtual.
+
+Uso:
+  python trigger_engine.py replay.jsonl              # dry-run: triggers + latência
+  python trigger_engine.py --export-mock replay.jsonl  # gera replay a partir do mock
+"""
+
+import json
+import os
+import socket
+import sys
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+# Configurar encoding para Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+# Chaves de partidas encerradas mantidas para deduplicar eventos atrasados
+MAX_FINISHED_KEYS = 10_000
+
+@dataclass
+class MatchState:
+    """Estado de uma partida ao vivo"""
+    match: Dict[str, Any]
+    status: str = 'live'
+    game_key: Optional[tuple] = None
+    game_phase: str = 'playing'
+    server: Optional[str] = None
+    points: Dict[str, int] = field(default_factory=dict)
+    fired: List[str] = field(default_factory=list)
+
+@dataclass
+class Trigger:
+    """Trigger disparado, no formato aceito por execute_bet()"""
+    key: str
+    match: Dict[str, Any]
+    game: Dict[str, Any]
+    favorite: str
+    timestamp: str
+    received_at: float
+    decided_at: Optional[float] = None
+    decision: Any = None
+
+    @property
+    def latency_ms(self) -> Optional[float]:
+        if self.decided_at is None:
+            return None
+        return (self.decided_at - self.received_at) * 1000
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'key': self.key,
+            'match': self.match,
+            'game': self.game,
+            'favorite': self.favorite,
+            'timestamp': self.timestamp,
+        }
+
+def trigger_key(match_id: str, set_number: int, game_number: int) -> str:
+    return f"{match_id}:{set_number}:{game_number}:30-0"
+
+class TriggerEngine:
+    """
+    Máquinas de estado por partida alimentadas por eventos de placar.
+
+    on_trigger(trigger_dict) é chamado uma vez por chave; o retorno fica em
+    Trigger.decision. fired_keys permite retomar sem redisparar.
+    """
+
+    def __init__(self, on_trigger: Optional[Callable[[Dict[str, Any]], Any]] = None,
+                 fired_keys: Iterable[str] = (), clock: Callable[[], float] = time.perf_counter,
+                 now: Callable[[], datetime] = datetime.now):
+        self.on_trigger = on_trigger
+        self.clock = clock
+        self.now = now
+        self.matches: Dict[str, MatchState] = {}
+        self.fired: 'OrderedDict[str, None]' = OrderedDict((key, None) for key in fired_keys)
+        self.latencies_ms: List[float] = []
+        self.stats = {'events': 0, 'triggers': 0, 'duplicates': 0, 'orphans': 0}
+
+    def process(self, event: Dict[str, Any]) -> Optional[Trigger]:
+        """Aplica um evento; retorna o Trigger se ele disparou agora"""
+        received_at = self.clock()
+        self.stats['events'] += 1
+        kind = event.get('type')
+        match_id = event.get('matchId')
+
+        if kind == 'match_start':
+            match = {key: value for key, value in event.items() if key != 'type'}
+            self.matches[match_id] = MatchState(match=match)
+            return None
+
+        state = self.matches.get(match_id)
+        if state is None or state.status != 'live':
+            self.stats['orphans'] += 1
+            return None
+
+        if kind == 'point':
+            return self._on_point(state, event, received_at)
+        if kind == 'game_end':
+            if state.game_key == (event.get('set'), event.get('game')):
+                state.game_phase = 'ended'
+        elif kind == 'match_end':
+            state.status = 'finished'
+            self._forget(match_id)
+        return None
+
+    def _on_point(self, state: MatchState, event: Dict[str, Any], received_at: float) -> Optional[Trigger]:
+        game_key = (event['set'], event['game'])
+        if game_key != state.game_key:
+            # Novo game
+            state.game_key = game_key
+            state.game_phase = 'playing'
+        state.server = event.get('server', state.server)
+        state.points = event.get('points', {})
+
+        favorite = state.match.get('favorite')
+        if state.game_phase != 'playing' or not favorite or state.server != favorite:
+            return None
+        opponent = 'player2' if favorite == 'player1' else 'player1'
+        if state.points.get(favorite, 0) != 0 or state.points.get(opponent, 0) != 30:
+            return None
+
+        state.game_phase = 'triggered'
+        key = trigger_key(state.match['matchId'], *game_key)
+        if key in self.fired:
+            self.stats['duplicates'] += 1
+            return None
+        self.fired[key] = None
+        state.fired.append(key)
+        self.stats['triggers'] += 1
+
+        trigger = Trigger(
+            key=key,
+            match=state.match,
+            game={'setNumber': game_key[0], 'gameNumber': game_key[1], 'server': state.server,
+                  'points': dict(state.points)},
+            favorite=favorite,
+            timestamp=self.now().isoformat(),
+            received_at=received_at,
+        )
+        if self.on_trigger is not None:
+            trigger.decision = self.on_trigger(trigger.as_dict())
+        trigger.decided_at = self.clock()
+        self.latencies_ms.append(trigger.latency_ms)
+        return trigger
+
+    def _forget(self, match_id: str):
+        """Remove a partida encerrada; as chaves ficam (limitadas) para deduplicação"""
+        self.matches.pop(match_id, None)
+        while len(self.fired) > MAX_FINISHED_KEYS:
+            self.fired.popitem(last=False)
+
+    def run(self, events: Iterable[Dict[str, Any]]) -> Iterator[Trigger]:
+        """Processa um fluxo de eventos, gerando os triggers disparados"""
+        for event in events:
+            trigger = self.process(event)
+            if trigger is not None:
+                yield trigger
+
+    def latency_summary(self) -> Dict[str, float]:
+        """Latência evento -> decisão (ms): p50, p95, p99, max"""
+        return percentile_summary(self.latencies_ms)
+
+def percentile_summary(values: List[float]) -> Dict[str, float]:
+    """count, p50, p95, p99 e max de uma lista de latências (ms)"""
+    if not values:
+        return {}
+    values = sorted(values)
+
+    def percentile(q: float) -> float:
+        return round(values[min(len(values) - 1, int(q * len(values)))], 3)
+
+    return {'count': len(values), 'p50': percentile(0.50), 'p95': percentile(0.95),
+            'p99': percentile(0.99), 'max': round(values[-1], 3)}
+
+# ─── FONTES DE EVENTOS ────────────────────────────────────────────────────────
+
+def replay_file(path: str, speed: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Eventos de um arquivo JSONL. Com speed, respeita os intervalos do campo
+    'ts' (segundos) divididos por speed; sem speed, o mais rápido possível.
+    """
+    previous_ts = None
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            event = json.loads(line)
+            if speed and 'ts' in event:
+                if previous_ts is not None and event['ts'] > previous_ts:
+                    time.sleep((event['ts'] - previous_ts) / speed)
+                previous_ts = event['ts']
+            yield event
+
+def socket_source(address: str) -> Iterator[Dict[str, Any]]:
+    """Eventos JSON por linha de um socket TCP (host:porta)"""
+    host, port = address.rsplit(':', 1)
+    with socket.create_connection((host, int(port))) as conn:
+        with conn.makefile('r', encoding='utf-8') as stream:
+            for line in stream:
+                if line.strip():
+                    yield json.loads(line)
+
+def matches_to_events(matches: List[Dict[str, Any]], point_interval: float = 15.0,
+                      use_dates: bool = False) -> List[Dict[str, Any]]:
+    """
+    Converte partidas no formato do mock (placar final de cada game) em
+    eventos ponto a ponto: match_start, um 'point' por game com o placar
+    registrado, game_end e match_end. 'ts' avança point_interval por game.
+
+    Com use_dates, cada partida começa no timestamp do seu campo 'date' e
+    os eventos saem ordenados por 'ts' (partidas simultâneas intercaladas).
+    """
+    events = []
+    ts = 0.0
+    for match in matches:
+        if use_dates:
+            ts = datetime.fromisoformat(match['date']).timestamp()
+        meta = {key: value for key, value in match.items() if key not in ('games', 'sets')}
+        events.append({'type': 'match_start', 'ts': ts, **meta})
+        for game in match.get('games', []):
+            ts += point_interval
+            base = {'matchId': match['matchId'], 'set': game.get('setNumber', 1),
+                    'game': game.get('gameNumber', 0)}
+            events.append({'type': 'point', 'ts': ts, 'server': game.get('server'),
+                           'points': game.get('points', {}), **base})
+            events.append({'type': 'game_end', 'ts': ts, 'winner': game.get('winner'), **base})
+        events.append({'type': 'match_end', 'ts': ts, 'matchId': match['matchId']})
+    if use_dates:
+        events.sort(key=lambda event: event['ts'])
+    return events
+
+def print_latency(engine: TriggerEngine):
+    """Imprime contadores e latência do motor"""
+    stats = engine.stats
+    print(f"  - Eventos: {stats['events']} | Triggers: {stats['triggers']} | "
+          f"Duplicados ignorados: {stats['duplicates']} | Sem partida: {stats['orphans']}")
+    latency = engine.latency_summary()
+    if latency:
+        print(f"  - Latência evento->decisão: p50 {latency['p50']:.3f} ms | "
+              f"p95 {latency['p95']:.3f} ms | max {latency['max']:.3f} ms")
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Motor de triggers 30-0 (dry-run)')
+    parser.add_argument('replay', help='Arquivo JSONL de eventos')
+    parser.add_argument('--export-mock', action='store_true',
+                        help='Gerar o replay a partir do mock de partidas em vez de lê-lo')
+    parser.add_argument('--matches', default=os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), '..', '..', 'modules', 'betting-platform',
+        'backend', 'data', 'tennis-matches.json'))
+    parser.add_argument('--speed', type=float, default=None, help='Velocidade do replay (1 = tempo real)')
+    args = parser.parse_args()
+
+    if args.export_mock:
+        with open(args.matches, 'r', encoding='utf-8') as f:
+            events = matches_to_events(json.load(f))
+        with open(args.replay, 'w', encoding='utf-8') as f:
+            for event in events:
+                f.write(json.dumps(event, ensure_ascii=False) + '\n')
+        print(f"[OK] {len(events)} eventos gravados em {args.replay}")
+        sys.exit(0)
+
+    engine = TriggerEngine()
+    for trigger in engine.run(replay_file(args.replay, args.speed)):
+        print(f"  - Trigger {trigger.key} ({trigger.latency_ms:.3f} ms)")
+    print_latency(engine)
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Versioned Model Artifact Store
+Persists trained models so scanning does not retrain on every run
+
+Layout:
+    <root>/<name>/v0001/model.joblib   serialized model (joblib)
+    <root>/<name>/v0001/meta.json      version, timestamps, metrics, sha256
+    <root>/<name>/LATEST               version currently served
+
+Artifacts and pointers are written to a temp file, fsynced and renamed,
+so a crash mid-save never leaves a half-written model as LATEST. The
+SHA-256 recorded in meta.json is verified on load.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime
+
+import joblib
+
+
+def _atomic_write(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ModelStore:
+    """
+    Versioned artifact store for trained models
+    """
+
+    def __init__(self, root, name='betting-predictor'):
+        """
+        Args:
+            root: Directory holding all model families
+            name: Model family (subdirectory)
+        """
+        self.path = os.path.join(root, name)
+        os.makedirs(self.path, exist_ok=True)
+
+    def versions(self):
+        """Saved versions, oldest first"""
+        return sorted(
+            entry for entry in os.listdir(self.path)
+            if entry.startswith('v') and os.path.exists(os.path.join(self.path, entry, 'meta.json'))
+        )
+
+    def latest(self):
+        """Version in the LATEST pointer (or newest complete version)"""
+        pointer = os.path.join(self.path, 'LATEST')
+        if os.path.exists(pointer):
+            with open(pointer, 'r', encoding='utf-8') as f:
+                version = f.read().strip()
+            if version:
+                return version
+        versions = self.versions()
+        return versions[-1] if versions else None
+
+    def metadata(self, version=None):
+        """meta.json of a version (default: latest)"""
+        version = version or self.latest()
+        if version is None:
+            raise FileNotFoundError(f"No model saved in {self.path}")
+        with open(os.path.join(self.path, version, 'meta.json'), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def save(self, artifact, metadata=None, promote=True):
+        """
+        Save an artifact as a new version
+
+        Args:
+            artifact: Any joblib-serializable object
+            metadata: Extra JSON-serializable fields (metrics, sample counts...)
+            promote: Point LATEST at the new version
+
+        Returns:
+            Version string (e.g. 'v0003')
+        """
+        existing = [int(entry[1:]) for entry in os.listdir(self.path)
+                    if entry.startswith('v') and entry[1:].isdigit()]
+        number = max(existing, default=0) + 1
+        while True:
+            version = f"v{number:04d}"
+            try:
+                os.mkdir(os.path.join(self.path, version))
+                break
+            except FileExistsError:
+                number += 1  # another job took this number
+
+        version_dir = os.path.join(self.path, version)
+        model_path = os.path.join(version_dir, 'model.joblib')
+        joblib.dump(artifact, f"{model_path}.tmp")
+        with open(f"{model_path}.tmp", 'ab') as f:
+            os.fsync(f.fileno())
+        os.replace(f"{model_path}.tmp", model_path)
+
+        meta = {
+            'version': version,
+            'created_at': datetime.now().isoformat(),
+            'sha256': _sha256(model_path),
+            **(metadata or {}),
+        }
+        _atomic_write(os.path.join(version_dir, 'meta.json'),
+                      json.dumps(meta, indent=2, default=str).encode('utf-8'))
+        if promote:
+            self.promote(version)
+        return version
+
+    def promote(self, version):
+        """Point LATEST at a version (e.g. to roll back)"""
+        if not os.path.exists(os.path.join(self.path, version, 'meta.json')):
+            raise FileNotFoundError(f"Unknown model version: {version}")
+        _atomic_write(os.path.join(self.path, 'LATEST'), version.encode('utf-8'))
+
+    def load(self, version=None):
+        """
+        Load an artifact
+
+        Returns:
+            (artifact, metadata)
+        """
+        meta = self.metadata(version)
+        model_path = os.path.join(self.path, meta['version'], 'model.joblib')
+        if _sha256(model_path) != meta['sha256']:
+            raise ValueError(f"Model artifact {meta['version']} is corrupted (sha256 mismatch)")
+        return joblib.load(model_path), meta
+
+    def prune(self, keep=5):
+        """Delete old versions, keeping the newest `keep` and LATEST"""
+        latest = self.latest()
+        versions = self.versions()
+        removed = []
+        for version in versions[:-keep] if keep > 0 else versions:
+            if version != latest:
+                shutil.rmtree(os.path.join(self.path, version))
+                removed.append(version)
+        return removed
@@ -4,34 +4,130 @@ Predictive Analysis for Sports Betting
 Uses machine learning to predict outcomes and calculate value bets
 """
 
+import os
 import sys
 import json
+import threading
 import numpy as np
 import pandas as pd
 from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
 from sklearn.model_selection import train_test_split, cross_val_score
 from sklearn.metrics import accuracy_score, classification_report, roc_auc_score
 from datetime import datetime
+from model_store import ModelStore
 import warnings
 warnings.filterwarnings('ignore')
 
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'models')
+
+# Outcome order used by predict_proba and the odds matrices
+OUTCOMES = ('away', 'draw', 'home')
+
+FEATURES = [
+    'home_team_elo', 'away_team_elo', 'elo_diff',
+    'home_form', 'away_form', 'form_diff',
+    'h2h_ratio', 'venue_advantage',
+    'odds_home_implied', 'odds_away_implied', 'odds_draw_implied',
+    'odds_margin'
+]
+
+VALUE_BET_DTYPE = np.dtype([
+    ('match_index', np.int64),
+    ('outcome', 'U4'),
+    ('bookmaker', np.int32),
+    ('edge_percent', np.float64),
+    ('model_probability', np.float64),
+    ('market_probability', np.float64),
+    ('odds', np.float64),
+])
+
+
+def implied_probabilities(odds, remove_overround=False):
+    """
+    Market implied probabilities for an (N, 3) odds matrix
+
+    Args:
+        odds: Decimal odds, columns in OUTCOMES order
+        remove_overround: Normalize each row to sum to 1 (proportional
+            margin removal) instead of using raw 1/odds
+
+    Returns:
+        (N, 3) implied probabilities
+    """
+    implied = 1.0 / np.asarray(odds, dtype=np.float64)
+    if remove_overround:
+        implied = implied / implied.sum(axis=1, keepdims=True)
+    return implied
+
+
+def scan_value_bets(probs, odds, edge_threshold=5.0, remove_overround=False, best_only=True):
+    """
+    Vectorized value-bet scan over many fixtures
+
+    Args:
+        probs: (N, 3) model probabilities in OUTCOMES order
+        odds: (N, 3) decimal odds, or (N, B, 3) odds from B bookmakers
+            (the best price per outcome is used)
+        edge_threshold: Minimum edge % to consider a value bet
+        remove_overround: Compare against margin-free market probabilities
+        best_only: Keep only the best outcome per fixture (as
+            find_value_bets does); otherwise every outcome over the threshold
+
+    Returns:
+        Structured array (VALUE_BET_DTYPE) sorted by edge, highest first
+    """
+    probs = np.asarray(probs, dtype=np.float64)
+    odds = np.asarray(odds, dtype=np.float64)
+    bookmaker = np.full(probs.shape, -1, dtype=np.int32)
+    if odds.ndim == 3:
+        bookmaker = odds.argmax(axis=1).astype(np.int32)
+        odds = odds.max(axis=1)
+
+    market = implied_probabilities(odds, remove_overround)
+    edges = (probs - market) / market * 100
+
+    if best_only:
+        # Ties resolve home > draw > away, like max() over the edges dict
+        rows = np.arange(len(edges))
+        cols = 2 - edges[:, ::-1].argmax(axis=1)
+        keep = edges[rows, cols] >= edge_threshold
+        rows, cols = rows[keep], cols[keep]
+    else:
+        rows, cols = np.nonzero(edges >= edge_threshold)
+
+    result = np.empty(len(rows), dtype=VALUE_BET_DTYPE)
+    result['match_index'] = rows
+    result['outcome'] = np.asarray(OUTCOMES)[cols]
+    result['bookmaker'] = bookmaker[rows, cols]
+    result['edge_percent'] = edges[rows, cols]
+    result['model_probability'] = probs[rows, cols]
+    result['market_probability'] = market[rows, cols]
+    result['odds'] = odds[rows, cols]
+    return result[np.argsort(-result['edge_percent'], kind='stable')]
+
+
 class BettingPredictor:
     """
     Machine learning predictor for sports betting outcomes
     """
 
-    def __init__(self, model_type='random_forest'):
+    def __init__(self, model_type='random_forest', n_jobs=-1):
         """
         Initialize predictor
 
         Args:
             model_type: 'random_forest' or 'gradient_boosting'
+            n_jobs: Parallel workers for RandomForest fit/predict and
+                cross-validation (-1 = all cores)
         """
+        self.model_type = model_type
+        self.n_jobs = n_jobs
         if model_type == 'random_forest':
             self.model = RandomForestClassifier(
                 n_estimators=100,
                 max_depth=10,
-                random_state=42
+                random_state=42,
+                n_jobs=n_jobs
             )
         elif model_type == 'gradient_boosting':
             self.model = GradientBoostingClassifier(
@@ -61,45 +157,61 @@ class BettingPredictor:
         - avg_draw_odds: Average draw odds
         - avg_away_odds: Average away odds
         - venue_advantage: 1 if home, 0 if neutral
-        """
-        df = pd.DataFrame(data)
-
-        # Feature engineering
-        df['elo_diff'] = df['home_team_elo'] - df['away_team_elo']
-        df['form_diff'] = df['home_form'] - df['away_form']
-        df['h2h_ratio'] = df['h2h_home_wins'] / (df['h2h_home_wins'] + df['h2h_away_wins'] + 0.01)
-        df['odds_home_implied'] = 1 / df['avg_home_odds']
-        df['odds_away_implied'] = 1 / df['avg_away_odds']
-        df['odds_draw_implied'] = 1 / df['avg_draw_odds']
-        df['odds_margin'] = (df['odds_home_implied'] + df['odds_away_implied'] + df['odds_draw_implied']) - 1
-
-        features = [
-            'home_team_elo', 'away_team_elo', 'elo_diff',
-            'home_form', 'away_form', 'form_diff',
-            'h2h_ratio', 'venue_advantage',
-            'odds_home_implied', 'odds_away_implied', 'odds_draw_implied',
-            'odds_margin'
-        ]
-
-        self.feature_names = features
-        return df[features].values
 
-    def train(self, X_train, y_train):
+        Accepts a dict of columns or a DataFrame; features are computed as
+        NumPy column operations into one (N, 12) matrix.
+        """
+        col = {name: np.asarray(data[name], dtype=np.float64) for name in (
+            'home_team_elo', 'away_team_elo', 'home_form', 'away_form',
+            'h2h_home_wins', 'h2h_away_wins', 'avg_home_odds', 'avg_draw_odds',
+            'avg_away_odds', 'venue_advantage'
+        )}
+
+        odds_home_implied = 1 / col['avg_home_odds']
+        odds_away_implied = 1 / col['avg_away_odds']
+        odds_draw_implied = 1 / col['avg_draw_odds']
+
+        X = np.column_stack([
+            col['home_team_elo'],
+            col['away_team_elo'],
+            col['home_team_elo'] - col['away_team_elo'],
+            col['home_form'],
+            col['away_form'],
+            col['home_form'] - col['away_form'],
+            col['h2h_home_wins'] / (col['h2h_home_wins'] + col['h2h_away_wins'] + 0.01),
+            col['venue_advantage'],
+            odds_home_implied,
+            odds_away_implied,
+            odds_draw_implied,
+            (odds_home_implied + odds_away_implied + odds_draw_implied) - 1,
+        ])
+
+        self.feature_names = FEATURES
+        return X
+
+    def train(self, X_train, y_train, cv=5):
         """
         Train the model
 
         Args:
             X_train: Training features (numpy array or DataFrame)
             y_train: Training labels (0=away win, 1=draw, 2=home win)
+            cv: Cross-validation folds (0 skips cross-validation)
         """
         if isinstance(X_train, pd.DataFrame):
             X_train = X_train.values
 
         self.model.fit(X_train, y_train)
         self.is_trained = True
+        if self.feature_names is None:
+            self.feature_names = FEATURES
+
+        if not cv:
+            return {}
 
         # Cross-validation score
-        cv_scores = cross_val_score(self.model, X_train, y_train, cv=5, scoring='accuracy')
+        cv_scores = cross_val_score(self.model, X_train, y_train, cv=cv, scoring='accuracy',
+                                    n_jobs=self.n_jobs)
 
         return {
             'cv_mean_accuracy': cv_scores.mean(),
@@ -137,7 +249,22 @@ class BettingPredictor:
 
         return self.model.predict(X)
 
-    def find_value_bets(self, X, odds_home, odds_draw, odds_away, edge_threshold=5.0):
+    def scan(self, X, odds, edge_threshold=5.0, remove_overround=False, best_only=True):
+        """
+        Batched value-bet scan: one predict_proba call, then matrix edges
+
+        Args:
+            X: Features for N fixtures
+            odds: (N, 3) odds in OUTCOMES order, or (N, B, 3) per bookmaker
+
+        Returns:
+            Structured array of candidate bets sorted by edge (see scan_value_bets)
+        """
+        return scan_value_bets(self.predict_proba(X), odds, edge_threshold,
+                               remove_overround, best_only)
+
+    def find_value_bets(self, X, odds_home, odds_draw, odds_away, edge_threshold=5.0,
+                        remove_overround=False):
         """
         Find value bets comparing model probabilities vs market odds
 
@@ -147,54 +274,124 @@ class BettingPredictor:
             odds_draw: Market odds for draw
             odds_away: Market odds for away win
             edge_threshold: Minimum edge % to consider a value bet
+            remove_overround: Compare against margin-free market probabilities
 
         Returns:
-            List of value bets with recommendations
+            List of value bets with recommendations, in fixture order
         """
-        probs = self.predict_proba(X)
+        odds = np.column_stack([odds_away, odds_draw, odds_home])
+        bets = self.scan(X, odds, edge_threshold, remove_overround)
+        bets = bets[np.argsort(bets['match_index'], kind='stable')]
+
+        return [
+            {
+                'match_index': int(bet['match_index']),
+                'recommendation': str(bet['outcome']),
+                'edge_percent': round(float(bet['edge_percent']), 2),
+                'model_probability': round(float(bet['model_probability']) * 100, 2),
+                'market_probability': round(float(bet['market_probability']) * 100, 2),
+                'odds': float(bet['odds'])
+            }
+            for bet in bets
+        ]
 
-        value_bets = []
+    def update(self, X_new, y_new, extra_estimators=25):
+        """
+        Incremental update: warm-start the ensemble with extra trees
+        fitted on new data only (existing trees are kept)
 
-        for i, prob in enumerate(probs):
-            prob_away, prob_draw, prob_home = prob
+        Args:
+            X_new: Features of fixtures played since the last training
+            y_new: Their outcomes
+            extra_estimators: Trees (or boosting stages) to add
+
+        Raises:
+            ValueError: if the new batch does not contain every outcome the
+                model was trained on (sklearn would reset classes_ from the
+                batch and leave the old trees inconsistent)
+        """
+        if not self.is_trained:
+            raise ValueError("Model not trained yet")
 
-            # Market implied probabilities
-            market_prob_home = 1 / odds_home[i]
-            market_prob_draw = 1 / odds_draw[i]
-            market_prob_away = 1 / odds_away[i]
+        if isinstance(X_new, pd.DataFrame):
+            X_new = X_new.values
 
-            # Calculate edges
-            edge_home = (prob_home - market_prob_home) / market_prob_home * 100
-            edge_draw = (prob_draw - market_prob_draw) / market_prob_draw * 100
-            edge_away = (prob_away - market_prob_away) / market_prob_away * 100
+        if not np.array_equal(np.unique(y_new), self.model.classes_):
+            raise ValueError(
+                f"Incremental update needs every class {self.model.classes_.tolist()} in the new data "
+                f"(got {np.unique(y_new).tolist()}); run a full retrain instead"
+            )
 
-            # Find best edge
-            edges = {
-                'home': edge_home,
-                'draw': edge_draw,
-                'away': edge_away
-            }
+        self.model.set_params(warm_start=True,
+                              n_estimators=self.model.n_estimators + extra_estimators)
+        self.model.fit(X_new, y_new)
+        self.model.set_params(warm_start=False)
+
+        return {'n_estimators': self.model.n_estimators}
+
+    def validate(self, X):
+        """
+        Check the model is servable before it is saved: it must know all
+        OUTCOMES and return one probability row per sample
+
+        Raises:
+            ValueError: describing the first problem found
+        """
+        if not self.is_trained:
+            raise ValueError("Model not trained yet")
+
+        classes = np.asarray(self.model.classes_)
+        if not np.array_equal(classes, np.arange(len(OUTCOMES))):
+            raise ValueError(f"Model classes {classes.tolist()} do not match outcomes {list(OUTCOMES)}")
+
+        probs = self.predict_proba(X[:1000])
+        if probs.shape != (min(len(X), 1000), len(OUTCOMES)) or not np.all(np.isfinite(probs)):
+            raise ValueError(f"Model returned invalid probabilities with shape {probs.shape}")
+
+    def save(self, store, metadata=None, X_check=None):
+        """
+        Save the trained model as a new version in a ModelStore
+
+        Args:
+            X_check: Sample features to validate the model on before saving
+                (the new version becomes LATEST, so a broken model would
+                break every later scan)
+
+        Returns:
+            Version string
+        """
+        if not self.is_trained:
+            raise ValueError("Model not trained yet")
+        if X_check is not None:
+            self.validate(X_check)
+
+        artifact = {
+            'model': self.model,
+            'model_type': self.model_type,
+            'feature_names': self.feature_names,
+        }
+        meta = {'model_type': self.model_type, 'n_estimators': self.model.n_estimators}
+        meta.update(metadata or {})
+        return store.save(artifact, meta)
 
-            best_outcome = max(edges, key=edges.get)
-            best_edge = edges[best_outcome]
-
-            if best_edge >= edge_threshold:
-                value_bets.append({
-                    'match_index': i,
-                    'recommendation': best_outcome,
-                    'edge_percent': round(best_edge, 2),
-                    'model_probability': round(prob[['away', 'draw', 'home'].index(best_outcome)] * 100, 2),
-                    'market_probability': round(
-                        [market_prob_away, market_prob_draw, market_prob_home][
-                            ['away', 'draw', 'home'].index(best_outcome)
-                        ] * 100, 2
-                    ),
-                    'odds': [odds_away[i], odds_draw[i], odds_home[i]][
-                        ['away', 'draw', 'home'].index(best_outcome)
-                    ]
-                })
-
-        return value_bets
+    @classmethod
+    def load(cls, store, version=None, n_jobs=None):
+        """
+        Load a trained predictor from a ModelStore (default: LATEST)
+
+        Returns:
+            (predictor, metadata)
+        """
+        artifact, meta = store.load(version)
+        predictor = cls.__new__(cls)
+        predictor.model = artifact['model']
+        predictor.model_type = artifact['model_type']
+        predictor.feature_names = artifact['feature_names']
+        predictor.n_jobs = n_jobs if n_jobs is not None else getattr(predictor.model, 'n_jobs', None)
+        if n_jobs is not None and hasattr(predictor.model, 'n_jobs'):
+            predictor.model.set_params(n_jobs=n_jobs)
+        predictor.is_trained = True
+        return predictor, meta
 
     def feature_importance(self):
         """
@@ -208,8 +405,184 @@ class BettingPredictor:
         return dict(zip(self.feature_names, importances.tolist()))
 
 
+class InferenceService:
+    """
+    In-process inference: loads the model once and serves batched
+    predict_proba / value-bet scans. refresh() swaps in a newer LATEST
+    version (e.g. after the retrain job) without restarting.
+    """
+
+    def __init__(self, store, version=None, batch_size=50000, n_jobs=None):
+        """
+        Args:
+            store: ModelStore to load from
+            version: Pin a version (default: follow LATEST)
+            batch_size: Max rows per predict_proba call
+            n_jobs: Override the model's n_jobs for inference
+        """
+        self.store = store
+        self.pinned_version = version
+        self.batch_size = batch_size
+        self.n_jobs = n_jobs
+        self.version = None
+        self.metadata = None
+        self._predictor = None
+        self._lock = threading.Lock()
+
+    @property
+    def predictor(self):
+        if self._predictor is None:
+            with self._lock:
+                if self._predictor is None:
+                    self._load(self.pinned_version or self.store.latest())
+        return self._predictor
+
+    def _load(self, version):
+        predictor, meta = BettingPredictor.load(self.store, version, self.n_jobs)
+        self._predictor, self.metadata, self.version = predictor, meta, meta['version']
+
+    def refresh(self):
+        """Reload if LATEST moved to another version; True if reloaded"""
+        if self.pinned_version is not None:
+            return False
+        latest = self.store.latest()
+        if latest is None or latest == self.version:
+            return False
+        with self._lock:
+            self._load(latest)
+        return True
+
+    def predict_proba(self, X):
+        """Probabilities in OUTCOMES order, in batches of batch_size rows"""
+        predictor = self.predictor
+        X = np.asarray(X)
+        if len(X) <= self.batch_size:
+            return predictor.predict_proba(X)
+        return np.vstack([
+            predictor.predict_proba(X[start:start + self.batch_size])
+            for start in range(0, len(X), self.batch_size)
+        ])
+
+    def scan_fixtures(self, data, edge_threshold=5.0, remove_overround=False, best_only=True):
+        """
+        Value bets for raw fixture columns (see prepare_features), using
+        the avg_*_odds columns as market odds
+
+        Returns:
+            Structured array sorted by edge (see scan_value_bets)
+        """
+        X = self.predictor.prepare_features(data)
+        odds = np.column_stack([data['avg_away_odds'], data['avg_draw_odds'], data['avg_home_odds']])
+        return scan_value_bets(self.predict_proba(X), odds, edge_threshold, remove_overround, best_only)
+
+
+def load_fixtures(path):
+    """
+    Load fixtures from JSON: a list of records or a dict of columns
+
+    Returns:
+        Dict of column name -> numpy array
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        data = {key: [record[key] for record in data] for key in data[0]} if data else {}
+    return {key: np.asarray(values) for key, values in data.items()}
+
+
+def retrain(store, data_path, model_type='random_forest', incremental=0, cv=5, keep=5, n_jobs=-1):
+    """
+    Retraining job: full retrain or warm-start update of LATEST, saved as
+    a new version. Run it on a schedule, separately from scanning.
+
+    Args:
+        data_path: Fixtures JSON with feature columns and 'outcome'
+            (0=away win, 1=draw, 2=home win)
+        incremental: Extra trees fitted on the new data on top of LATEST
+            (0 = full retrain); the new data must contain every outcome
+        keep: Versions to keep after pruning
+
+    Returns:
+        (version, training results)
+    """
+    data = load_fixtures(data_path)
+    y = data['outcome'].astype(int)
+
+    if incremental and store.latest() is not None:
+        predictor, meta = BettingPredictor.load(store, n_jobs=n_jobs)
+        X = predictor.prepare_features(data)
+        results = predictor.update(X, y, incremental)
+        results['base_version'] = meta['version']
+    else:
+        predictor = BettingPredictor(model_type=model_type, n_jobs=n_jobs)
+        X = predictor.prepare_features(data)
+        results = predictor.train(X, y, cv=cv)
+
+    version = predictor.save(store, {
+        'n_samples': int(len(y)),
+        'data_path': os.path.abspath(data_path),
+        'training': results,
+    }, X_check=X)
+    store.prune(keep)
+    return version, results
+
+
+def scan_command(args):
+    """Score fixtures with the LATEST (or pinned) model, no retraining"""
+    service = InferenceService(ModelStore(args.model_dir), version=args.version)
+    data = load_fixtures(args.data)
+    bets = service.scan_fixtures(data, args.edge, args.remove_overround)
+    print(f"[OK] Model {service.version}: {len(bets)} value bets (edge >= {args.edge}%)\n")
+    for bet in bets[:args.top]:
+        print(f"  Match #{bet['match_index']}: {bet['outcome'].upper()} @ {bet['odds']:.2f} "
+              f"edge {bet['edge_percent']:.2f}% (model {bet['model_probability'] * 100:.2f}% "
+              f"vs market {bet['market_probability'] * 100:.2f}%)")
+
+
+def retrain_command(args):
+    """Retrain job entry point"""
+    version, results = retrain(ModelStore(args.model_dir), args.data, args.model_type,
+                               args.incremental, args.cv, args.keep, args.n_jobs)
+    print(f"[OK] Saved model {version}: {json.dumps(results, default=float)}")
+
+
+def parse_args(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Betting predictor: demo, retrain job and scanning')
+    parser.add_argument('--model-dir', default=MODEL_DIR, help='Model artifact store directory')
+    commands = parser.add_subparsers(dest='command')
+
+    retrain_parser = commands.add_parser('retrain', help='Train (or warm-start) and save a new version')
+    retrain_parser.add_argument('--data', required=True, help='Fixtures JSON with outcome column')
+    retrain_parser.add_argument('--model-type', default='random_forest',
+                                choices=['random_forest', 'gradient_boosting'])
+    retrain_parser.add_argument('--incremental', type=int, default=0,
+                                help='Add N trees on new data to LATEST instead of retraining')
+    retrain_parser.add_argument('--cv', type=int, default=5, help='CV folds (0 = skip)')
+    retrain_parser.add_argument('--keep', type=int, default=5, help='Versions to keep')
+    retrain_parser.add_argument('--n-jobs', type=int, default=-1)
+
+    scan_parser = commands.add_parser('scan', help='Find value bets with a saved model')
+    scan_parser.add_argument('--data', required=True, help='Fixtures JSON with feature and odds columns')
+    scan_parser.add_argument('--version', default=None, help='Model version (default: LATEST)')
+    scan_parser.add_argument('--edge', type=float, default=5.0)
+    scan_parser.add_argument('--remove-overround', action='store_true')
+    scan_parser.add_argument('--top', type=int, default=10)
+
+    return parser.parse_args(argv)
+
+
 # CLI usage
 if __name__ == "__main__":
+    args = parse_args()
+    if args.command == 'retrain':
+        retrain_command(args)
+        sys.exit(0)
+    if args.command == 'scan':
+        scan_command(args)
+        sys.exit(0)
+
     print("\n=== BETTING PREDICTOR - PREDICTIVE ANALYSIS ===\n")
 
     # Example: Generate synthetic data for demo
@@ -297,4 +670,7 @@ if __name__ == "__main__":
             print(f"  Market Probability: {bet['market_probability']}%")
             print(f"  Odds: {bet['odds']}")
 
+    # The demo model is not persisted; the retrain job saves versions
+    print(f"\nRun 'retrain --data <fixtures.json>' to save a model to {args.model_dir}")
+
     print("\n")
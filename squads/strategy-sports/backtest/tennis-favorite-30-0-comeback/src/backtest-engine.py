@@ -2,13 +2,22 @@
 """
 Backtest Engine: Tennis Favorite 30-0 Comeback
 Executa backtest completo da estratégia
+
+Motor colunar: partidas e games são achatados uma vez em arrays NumPy;
+detecção de triggers, odds, P&L e curva de banca usam máscaras e somas
+acumuladas em vez de loops por partida/game.
 """
 
+import argparse
+import importlib.util
 import json
 import sys
 import os
+import random
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+
+import numpy as np
 
 # Configurar encoding para Windows
 if sys.platform == 'win32':
@@ -26,6 +35,14 @@ CONFIG = {
         'stakeType': 'fixed',
         'stakeValue': 1.0,
         'bankroll': 1000,
+        'stopLossDaily': 10.0,
+        'maxBetsPerDay': 20,
+    },
+    'risk': {
+        'paths': 10000,
+        'kellyFraction': 0.25,
+        'ruinFraction': 0.5,
+        'maxRiskOfRuin': 0.01,
     },
     'validation': {
         'targetROI': 0.05,
@@ -36,6 +53,16 @@ CONFIG = {
     }
 }
 
+def load_monte_carlo():
+    """Importa monte-carlo.py (nome com hífen, sem import direto)"""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'monte-carlo.py')
+    spec = importlib.util.spec_from_file_location('monte_carlo', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+monte_carlo = load_monte_carlo()
+
 def load_matches(filepath: str) -> List[Dict[str, Any]]:
     """Carrega partidas do JSON"""
     print(f"\nCarregando dados de: {filepath}")
@@ -46,159 +73,234 @@ def load_matches(filepath: str) -> List[Dict[str, Any]]:
     print(f"[OK] {len(matches)} partidas carregadas")
     return matches
 
-def detect_triggers(matches: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    """Detecta triggers 30-0 onde favorito está sacando"""
-    print("\nDetectando triggers (30-0 contra favorito no saque)...")
-    
-    triggers = []
-    
-    for match in matches:
-        favorite = match.get('favorite')
-        if not favorite:
-            continue
+# Códigos de jogador nas colunas: 0 = nenhum/desconhecido, 1 = player1, 2 = player2
+PLAYER_CODES = {'player1': 1, 'player2': 2}
+
+def flatten_matches(matches: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """
+    Achata partidas e games em colunas NumPy (uma única passada pelo JSON).
+    
+    Colunas por partida (m_*) e por game (g_*); g_match aponta para a linha
+    da partida. O vencedor do game é codificado comparando o nome com os
+    jogadores da partida, então nenhuma etapa seguinte precisa de strings.
+    """
+    m_id, m_date, m_tournament, m_surface = [], [], [], []
+    m_p1_name, m_p2_name, m_p1_rank, m_p2_rank, m_favorite = [], [], [], [], []
+    g_match, g_server, g_p1_points, g_p2_points, g_winner = [], [], [], [], []
+    
+    for i, match in enumerate(matches):
+        p1, p2 = match['player1'], match['player2']
+        m_id.append(match['matchId'])
+        m_date.append(match['date'])
+        m_tournament.append(match['tournament'])
+        m_surface.append(match['surface'])
+        m_p1_name.append(p1['name'])
+        m_p2_name.append(p2['name'])
+        m_p1_rank.append(p1.get('ranking', 50))
+        m_p2_rank.append(p2.get('ranking', 50))
+        m_favorite.append(PLAYER_CODES.get(match.get('favorite'), 0))
         
+        names = {p1['name']: 1, p2['name']: 2}
         for game in match.get('games', []):
-            # Verificar se favorito está sacando
-            server = game.get('server')
-            if server != favorite:
-                continue
-            
-            # Verificar placar exato 30-0 contra favorito
             points = game.get('points', {})
-            fav_points = points.get(favorite, 0)
-            opp = 'player2' if favorite == 'player1' else 'player1'
-            opp_points = points.get(opp, 0)
-            
-            # Exato 30-0 contra favorito
-            if fav_points == 0 and opp_points == 30:
-                triggers.append({
-                    'match': match,
-                    'game': game,
-                    'favorite': favorite,
-                    'server': server,
-                })
+            g_match.append(i)
+            g_server.append(PLAYER_CODES.get(game.get('server'), 0))
+            g_p1_points.append(points.get('player1', 0))
+            g_p2_points.append(points.get('player2', 0))
+            g_winner.append(names.get(game.get('winner', ''), 0))
+    
+    return {
+        'm_id': np.array(m_id, dtype=str),
+        'm_date': np.array(m_date, dtype=str),
+        'm_tournament': np.array(m_tournament, dtype=str),
+        'm_surface': np.array(m_surface, dtype=str),
+        'm_p1_name': np.array(m_p1_name, dtype=str),
+        'm_p2_name': np.array(m_p2_name, dtype=str),
+        'm_p1_rank': np.array(m_p1_rank, dtype=np.float64),
+        'm_p2_rank': np.array(m_p2_rank, dtype=np.float64),
+        'm_favorite': np.array(m_favorite, dtype=np.int8),
+        'g_match': np.array(g_match, dtype=np.int64),
+        'g_server': np.array(g_server, dtype=np.int8),
+        'g_p1_points': np.array(g_p1_points, dtype=np.int16),
+        'g_p2_points': np.array(g_p2_points, dtype=np.int16),
+        'g_winner': np.array(g_winner, dtype=np.int8),
+    }
+
+def load_columns(filepath: str) -> Dict[str, np.ndarray]:
+    """
+    Carrega as colunas de um matches.json, usando um cache .npz ao lado do
+    arquivo (refeito quando o JSON muda). Temporadas grandes pagam o parse
+    do JSON só uma vez.
+    """
+    cache_path = os.path.splitext(filepath)[0] + '.columns.npz'
+    if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(filepath):
+        with np.load(cache_path) as data:
+            columns = {key: data[key] for key in data.files}
+        print(f"\n[OK] {len(columns['m_id'])} partidas carregadas (cache colunar)")
+        return columns
+    
+    columns = flatten_matches(load_matches(filepath))
+    try:
+        np.savez(cache_path, **columns)
+    except OSError:
+        pass  # cache é opcional
+    return columns
+
+def detect_triggers(columns: Dict[str, np.ndarray]) -> np.ndarray:
+    """Detecta triggers 30-0 onde favorito está sacando (índices dos games)"""
+    print("\nDetectando triggers (30-0 contra favorito no saque)...")
+    
+    favorite = columns['m_favorite'][columns['g_match']]
+    fav_points = np.where(favorite == 1, columns['g_p1_points'], columns['g_p2_points'])
+    opp_points = np.where(favorite == 1, columns['g_p2_points'], columns['g_p1_points'])
+    
+    # Favorito sacando e placar exato 30-0 contra ele
+    mask = (favorite > 0) & (columns['g_server'] == favorite) & (fav_points == 0) & (opp_points == 30)
+    triggers = np.flatnonzero(mask)
     
     print(f"[OK] {len(triggers)} triggers detectados")
     return triggers
 
-def execute_bets(triggers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    """Executa apostas simuladas"""
+def raw_live_odds(columns: Dict[str, np.ndarray], triggers: np.ndarray, seed: int = 42) -> np.ndarray:
+    """
+    Odds ao vivo simuladas pelo ranking + variação aleatória, antes do clamp.
+    
+    A variação usa o mesmo gerador (random.Random) e a mesma fórmula de
+    random.uniform que o motor original, então a mesma seed gera as mesmas
+    odds. Não depende de min/max, então pode ser reaproveitada entre
+    parâmetros (parameter-optimization.py).
+    """
+    match = columns['g_match'][triggers]
+    favorite = columns['m_favorite'][match]
+    fav_rank = np.where(favorite == 1, columns['m_p1_rank'][match], columns['m_p2_rank'][match])
+    opp_rank = np.where(favorite == 1, columns['m_p2_rank'][match], columns['m_p1_rank'][match])
+    
+    # Favorito tem odd menor
+    with np.errstate(divide='ignore', invalid='ignore'):
+        base_odd = np.where(fav_rank > 0, 1.5 + (opp_rank / fav_rank) * 0.3, 1.8)
+    
+    # random.uniform(a, b) == a + (b - a) * random()
+    rng = random.Random(seed)
+    low, high = -0.1, 0.3
+    noise = np.fromiter((rng.random() for _ in range(len(triggers))), dtype=np.float64, count=len(triggers))
+    return base_odd + (low + (high - low) * noise)
+
+def round2(values: np.ndarray) -> np.ndarray:
+    """round(x, 2) do Python elemento a elemento (np.round difere em empates)"""
+    return np.array([round(value, 2) for value in values.tolist()], dtype=np.float64)
+
+def simulate_odds(columns: Dict[str, np.ndarray], triggers: np.ndarray, min_odd: float, max_odd: float,
+                  seed: int = 42) -> np.ndarray:
+    """Odds ao vivo simuladas, limitadas à faixa [min_odd, max_odd] e arredondadas"""
+    live_odd = raw_live_odds(columns, triggers, seed)
+    return round2(np.minimum(np.maximum(live_odd, min_odd), max_odd))
+
+def execute_bets(columns: Dict[str, np.ndarray], triggers: np.ndarray, seed: int = 42) -> Dict[str, np.ndarray]:
+    """Executa apostas simuladas (colunas: uma linha por aposta)"""
     print("\nExecutando apostas simuladas...")
     
-    import random
-    random.seed(42)
-    
-    bets = []
-    bankroll = CONFIG['management']['bankroll']
     stake = CONFIG['management']['stakeValue']
-    min_odd = CONFIG['strategy']['minOdds']
-    max_odd = CONFIG['strategy']['maxOdds']
-    
-    for trigger in triggers:
-        match = trigger['match']
-        game = trigger['game']
-        favorite = trigger['favorite']  # 'player1' ou 'player2'
-        
-        # Obter nome do favorito
-        favorite_name = match['player1']['name'] if favorite == 'player1' else match['player2']['name']
-        
-        # Determinar resultado baseado no winner do game
-        game_winner = game.get('winner', '')
-        
-        # Verificar se favorito venceu o game (comparar nomes)
-        won = game_winner == favorite_name
-        
-        # Simular odd baseada no ranking
-        p1_rank = match['player1'].get('ranking', 50)
-        p2_rank = match['player2'].get('ranking', 50)
-        
-        # Calcular odd simulada (favorito tem odd menor)
-        if favorite == 'player1':
-            base_odd = 1.5 + (p2_rank / p1_rank) * 0.3 if p1_rank > 0 else 1.8
-        else:
-            base_odd = 1.5 + (p1_rank / p2_rank) * 0.3 if p2_rank > 0 else 1.8
-        
-        # Adicionar variação e clamp para faixa válida
-        live_odd = base_odd + random.uniform(-0.1, 0.3)
-        live_odd = round(min(max(live_odd, min_odd), max_odd), 2)
-        
-        # Calcular profit
-        profit = stake * (live_odd - 1) if won else -stake
-        bankroll += profit
-        
-        bet = {
-            'matchId': match['matchId'],
-            'date': match['date'],
-            'tournament': match['tournament'],
-            'surface': match['surface'],
-            'favorite': favorite,
-            'favoriteName': favorite_name,
-            'opponent': match['player2']['name'] if favorite == 'player1' else match['player1']['name'],
-            'odd': live_odd,
-            'stake': stake,
-            'result': 'WIN' if won else 'LOSS',
-            'profit': round(profit, 2),
-            'bankrollAfter': round(bankroll, 2),
-        }
-        
-        bets.append(bet)
+    odds = simulate_odds(columns, triggers, CONFIG['strategy']['minOdds'], CONFIG['strategy']['maxOdds'], seed)
+    
+    # Favorito venceu o game?
+    match = columns['g_match'][triggers]
+    favorite = columns['m_favorite'][match]
+    won = columns['g_winner'][triggers] == favorite
+    
+    profit = np.where(won, stake * (odds - 1), -stake)
+    # Soma sequencial a partir da banca inicial (mesma ordem de soma do loop)
+    bankroll = np.cumsum(np.concatenate(([float(CONFIG['management']['bankroll'])], profit)))[1:]
+    
+    bets = {
+        'game': triggers,
+        'match': match,
+        'favorite': favorite,
+        'odd': odds,
+        'stake': np.full(len(triggers), stake),
+        'won': won,
+        'profit': profit,
+        'bankroll': bankroll,
+    }
     
-    print(f"[OK] {len(bets)} apostas executadas")
+    print(f"[OK] {len(triggers)} apostas executadas")
     return bets
 
-def calculate_metrics(bets: List[Dict[str, Any]]) -> Dict[str, Any]:
+def bets_to_records(columns: Dict[str, np.ndarray], bets: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+    """Converte as colunas de apostas no formato de dicts do results.json"""
+    match = bets['match']
+    is_p1 = bets['favorite'] == 1
+    favorite_name = np.where(is_p1, columns['m_p1_name'][match], columns['m_p2_name'][match])
+    opponent = np.where(is_p1, columns['m_p2_name'][match], columns['m_p1_name'][match])
+    
+    records = []
+    for i, m in enumerate(match.tolist()):
+        records.append({
+            'matchId': str(columns['m_id'][m]),
+            'date': str(columns['m_date'][m]),
+            'tournament': str(columns['m_tournament'][m]),
+            'surface': str(columns['m_surface'][m]),
+            'favorite': 'player1' if is_p1[i] else 'player2',
+            'favoriteName': str(favorite_name[i]),
+            'opponent': str(opponent[i]),
+            'odd': float(bets['odd'][i]),
+            'stake': float(bets['stake'][i]),
+            'result': 'WIN' if bets['won'][i] else 'LOSS',
+            'profit': round(float(bets['profit'][i]), 2),
+            'bankrollAfter': round(float(bets['bankroll'][i]), 2),
+        })
+    return records
+
+def _longest_run(flags: np.ndarray) -> int:
+    """Maior sequência de True consecutivos"""
+    if not flags.any():
+        return 0
+    padded = np.concatenate(([False], flags, [False])).astype(np.int8)
+    edges = np.flatnonzero(np.diff(padded))
+    return int((edges[1::2] - edges[::2]).max())
+
+def calculate_metrics(columns: Dict[str, np.ndarray], bets: Dict[str, np.ndarray]) -> Dict[str, Any]:
     """Calcula métricas do backtest"""
     print("\nCalculando métricas...")
     
-    if not bets:
+    total_bets = len(bets['won'])
+    if not total_bets:
         return {'error': 'Nenhuma aposta executada'}
     
-    total_bets = len(bets)
-    wins = sum(1 for b in bets if b['result'] == 'WIN')
+    won = bets['won']
+    wins = int(won.sum())
     losses = total_bets - wins
     win_rate = wins / total_bets if total_bets > 0 else 0
     
-    total_profit = sum(b['profit'] for b in bets)
+    # Lucro arredondado por aposta, somado em sequência (como no relatório por aposta)
+    profit = round2(bets['profit'])
+    
+    def sequential_sum(values: np.ndarray) -> float:
+        return float(np.cumsum(values)[-1]) if len(values) else 0
+    
+    total_profit = sequential_sum(profit)
     total_staked = total_bets * CONFIG['management']['stakeValue']
     roi = total_profit / total_staked if total_staked > 0 else 0
     
-    gross_profit = sum(b['profit'] for b in bets if b['profit'] > 0)
-    gross_loss = abs(sum(b['profit'] for b in bets if b['profit'] < 0))
+    gross_profit = sequential_sum(profit[profit > 0])
+    gross_loss = abs(sequential_sum(profit[profit < 0]))
     profit_factor = gross_profit / gross_loss if gross_loss > 0 else 0
     
-    # Calcular drawdown máximo
-    bankroll = CONFIG['management']['bankroll']
-    peak = bankroll
-    max_drawdown = 0
-    
-    for bet in bets:
-        bankroll += bet['profit']
-        if bankroll > peak:
-            peak = bankroll
-        drawdown = (peak - bankroll) / peak if peak > 0 else 0
-        if drawdown > max_drawdown:
-            max_drawdown = drawdown
+    # Drawdown máximo sobre a curva de banca
+    curve = np.cumsum(np.concatenate(([float(CONFIG['management']['bankroll'])], profit)))
+    peak = np.maximum.accumulate(curve)[1:]
+    curve = curve[1:]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        drawdown = np.where(peak > 0, (peak - curve) / peak, 0.0)
+    max_drawdown = max(0, float(drawdown.max()))
     
     # Sequências
-    longest_win_streak = 0
-    longest_loss_streak = 0
-    current_win = 0
-    current_loss = 0
-    
-    for bet in bets:
-        if bet['result'] == 'WIN':
-            current_win += 1
-            current_loss = 0
-            longest_win_streak = max(longest_win_streak, current_win)
-        else:
-            current_loss += 1
-            current_win = 0
-            longest_loss_streak = max(longest_loss_streak, current_loss)
+    longest_win_streak = _longest_run(won)
+    longest_loss_streak = _longest_run(~won)
     
     final_bankroll = CONFIG['management']['bankroll'] + total_profit
     
     metrics = {
-        'totalMatches': len(set(b['matchId'] for b in bets)),
+        'totalMatches': len(np.unique(columns['m_id'][bets['match']])),
         'totalBets': total_bets,
         'wins': wins,
         'losses': losses,
@@ -237,8 +339,15 @@ def print_metrics(metrics: Dict[str, Any]):
     print(f"Maior Sequência de Derrotas: {metrics.get('longestLossStreak', 0)}")
     print("="*60)
 
-def generate_recommendation(metrics: Dict[str, Any]) -> Dict[str, Any]:
-    """Gera recomendação baseada nas métricas"""
+def generate_recommendation(metrics: Dict[str, Any], bets: Optional[Dict[str, np.ndarray]] = None,
+                            seed: int = 42) -> Dict[str, Any]:
+    """
+    Gera recomendação baseada nas métricas.
+    
+    Com as apostas, roda o Monte Carlo de banca (monte-carlo.py) por
+    política de stake; risco de ruína acima de maxRiskOfRuin na stake fixa
+    rebaixa APPROVED para CONDITIONAL.
+    """
     print("\nGerando recomendação...")
     
     targets = CONFIG['validation']
@@ -279,6 +388,22 @@ def generate_recommendation(metrics: Dict[str, Any]) -> Dict[str, Any]:
         notes.append('Criterios nao atendidos')
         notes.append('Revisar logica ou coletar mais dados')
     
+    # Distribuição de resultados (Monte Carlo)
+    risk = None
+    if bets is not None and len(bets['won']):
+        wins = int(bets['won'].sum())
+        risk = monte_carlo.simulate_policies(bets['odd'], wins, len(bets['won']) - wins, CONFIG, seed=seed)
+        monte_carlo.print_simulation(risk)
+        flat = risk['flat']
+        if flat['riskOfRuin'] > CONFIG['risk']['maxRiskOfRuin']:
+            if status == 'APPROVED':
+                status = 'CONDITIONAL'
+                confidence = 'MEDIUM'
+                notes = ['Metricas do backtest atendidas']
+            notes.append(f"Risco de ruina {flat['riskOfRuin']*100:.2f}% acima do limite")
+        if flat['roi']['p5'] <= 0:
+            notes.append('ROI negativo no percentil 5 da simulacao')
+    
     # Próximos passos
     if status == 'APPROVED':
         next_steps = [
@@ -306,6 +431,8 @@ def generate_recommendation(metrics: Dict[str, Any]) -> Dict[str, Any]:
         'notes': notes,
         'nextSteps': next_steps,
     }
+    if risk is not None:
+        recommendation['riskSimulation'] = risk
     
     print(f"[OK] Recomendacao: {status} (Score: {score:.1f})")
     return recommendation
@@ -381,6 +508,21 @@ def generate_report(metrics: Dict[str, Any], recommendation: Dict[str, Any], out
     for i, step in enumerate(recommendation['nextSteps'], 1):
         report += f"{i}. {step}\n"
     
+    if 'riskSimulation' in recommendation:
+        report += """
+---
+
+## Simulacao Monte Carlo
+
+| Politica | ROI p5 | ROI p50 | ROI p95 | Max DD p95 | Risco de Ruina |
+|----------|--------|---------|---------|------------|----------------|
+"""
+        for policy, sim in recommendation['riskSimulation'].items():
+            report += (
+                f"| {policy} | {sim['roi']['p5']:.2f}% | {sim['roi']['p50']:.2f}% | {sim['roi']['p95']:.2f}% | "
+                f"{sim['maxDrawdown']['p95']:.2f}% | {sim['riskOfRuin']*100:.2f}% |\n"
+            )
+    
     report += f"""
 ---
 
@@ -407,38 +549,41 @@ Bankroll: {CONFIG['management']['bankroll']}
     print(f"[OK] Relatorio gerado: {output_path}")
     return output_path
 
-# Import random para simulação de odds
-import random
-
 if __name__ == '__main__':
-    print("\n" + "="*60)
-    print("BACKTEST: Tennis Favorite 30-0 Comeback")
-    print("="*60)
-    
     # Caminhos
     script_dir = os.path.dirname(os.path.abspath(__file__))
     backtest_dir = os.path.dirname(script_dir)
-    data_path = os.path.join(backtest_dir, 'data', 'matches.json')
-    output_dir = os.path.join(backtest_dir, 'output')
     
-    # 1. Carregar dados
-    matches = load_matches(data_path)
+    parser = argparse.ArgumentParser(description='Backtest: Tennis Favorite 30-0 Comeback')
+    parser.add_argument('--data', default=os.path.join(backtest_dir, 'data', 'matches.json'))
+    parser.add_argument('--output', default=os.path.join(backtest_dir, 'output'))
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    data_path = args.data
+    output_dir = args.output
+    
+    print("\n" + "="*60)
+    print("BACKTEST: Tennis Favorite 30-0 Comeback")
+    print("="*60)
+    
+    # 1. Carregar dados (colunas)
+    columns = load_columns(data_path)
     
     # 2. Detectar triggers
-    triggers = detect_triggers(matches)
+    triggers = detect_triggers(columns)
     
     # 3. Executar apostas
-    bets = execute_bets(triggers)
+    bets = execute_bets(columns, triggers, args.seed)
     
-    if not bets:
+    if not len(triggers):
         print("\n[ERRO] Nenhuma aposta executada. Verifique parâmetros.")
         sys.exit(1)
     
     # 4. Calcular métricas
-    metrics = calculate_metrics(bets)
+    metrics = calculate_metrics(columns, bets)
     
-    # 5. Gerar recomendação
-    recommendation = generate_recommendation(metrics)
+    # 5. Gerar recomendação (com Monte Carlo de banca)
+    recommendation = generate_recommendation(metrics, bets, args.seed)
     
     # 6. Gerar relatório
     report_path = generate_report(metrics, recommendation, output_dir)
@@ -450,7 +595,7 @@ if __name__ == '__main__':
             'metrics': metrics,
             'recommendation': recommendation,
             'config': CONFIG,
-            'bets': bets,
+            'bets': bets_to_records(columns, bets),
         }, f, indent=2, ensure_ascii=False)
     
     print(f"\n[OK] Resultados salvos: {results_path}")
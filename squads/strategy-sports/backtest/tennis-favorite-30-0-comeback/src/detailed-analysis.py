@@ -2,169 +2,251 @@
 """
 Análise Detalhada do Backtest
 Gera análises por superfície, torneio, odds range, etc.
+
+Uma única passada pelas apostas atualiza os acumuladores de todas as
+dimensões; o results.json é lido de forma incremental (apostas uma a uma).
+
+Uso:
+  python detailed-analysis.py                        # output/results.json
+  python detailed-analysis.py --results bets.jsonl
 """
 
+import argparse
 import json
 import sys
 import os
+from bisect import bisect_right
 from datetime import datetime
-from collections import defaultdict
+from typing import Any, Dict, Iterable, Iterator, List
 
 # Configurar encoding para Windows
 if sys.platform == 'win32':
     import io
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 
+ODDS_EDGES = (1.70, 1.80, 1.90, 2.00, 2.10)
+ODDS_RANGES = tuple(f"{low:.2f}-{high:.2f}" for low, high in zip(ODDS_EDGES, ODDS_EDGES[1:]))
+
+# Caracteres lidos por vez ao percorrer o results.json
+READ_CHUNK = 1 << 20
+
 def load_results(filepath: str):
     """Carrega resultados do backtest"""
     with open(filepath, 'r', encoding='utf-8') as f:
         return json.load(f)
 
+def iter_bets(filepath: str) -> Iterator[Dict[str, Any]]:
+    """
+    Percorre as apostas de um results.json sem carregar o arquivo inteiro:
+    as chaves de topo são decodificadas e descartadas, e a lista 'bets' é
+    decodificada uma aposta por vez. Um .jsonl (uma aposta por linha)
+    também é aceito.
+    """
+    if filepath.endswith('.jsonl'):
+        with open(filepath, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        return
+
+    decoder = json.JSONDecoder()
+    with open(filepath, 'r', encoding='utf-8') as f:
+        buffer, pos = '', 0
+
+        def next_char(skip: str = ' \t\r\n') -> str:
+            nonlocal buffer, pos
+            while True:
+                while pos < len(buffer) and buffer[pos] in skip:
+                    pos += 1
+                if pos < len(buffer):
+                    return buffer[pos]
+                chunk = f.read(READ_CHUNK)
+                if not chunk:
+                    raise ValueError(f"JSON incompleto: {filepath}")
+                buffer, pos = chunk, 0
+
+        def decode() -> Any:
+            nonlocal buffer, pos
+            next_char()
+            while True:
+                try:
+                    value, end = decoder.raw_decode(buffer, pos)
+                    if end < len(buffer):
+                        pos = end
+                        return value
+                except json.JSONDecodeError:
+                    pass
+                # Valor incompleto (ou número que pode continuar): ler mais
+                chunk = f.read(READ_CHUNK)
+                if not chunk:
+                    value, pos = decoder.raw_decode(buffer, pos)
+                    return value
+                buffer, pos = buffer[pos:] + chunk, 0
+
+        def expect(char: str):
+            nonlocal pos
+            if next_char() != char:
+                raise ValueError(f"Esperado '{char}' em {filepath}")
+            pos += 1
+
+        expect('{')
+        while next_char(' \t\r\n,') != '}':
+            key = decode()
+            expect(':')
+            if key != 'bets':
+                decode()
+                continue
+            expect('[')
+            while next_char(' \t\r\n,') != ']':
+                yield decode()
+            pos += 1
+
+def _group_metrics(data: List[float]) -> Dict[str, Any]:
+    """Métricas de um grupo a partir dos acumuladores [apostas, vitórias, lucro]"""
+    bets, wins, profit = data
+    return {
+        'bets': bets,
+        'wins': wins,
+        'losses': bets - wins,
+        'winRate': round(wins / bets * 100, 2) if bets > 0 else 0,
+        'profit': round(profit, 2),
+        'roi': round(profit / bets * 100, 2) if bets > 0 else 0,
+    }
+
+class StreamingAnalysis:
+    """
+    Agregação em uma passada: cada aposta atualiza ao mesmo tempo os
+    acumuladores de superfície, torneio, faixa de odds, mês e sequências.
+    A faixa de odds sai de uma busca binária nas bordas (bisect, como
+    searchsorted) em vez de testar todas as faixas. Pode ser alimentada
+    aos poucos (add/update) e consultada a qualquer momento (result).
+    """
+
+    def __init__(self, top_n: int = 10):
+        self.top_n = top_n
+        # Acumuladores por grupo: [apostas, vitórias, lucro]
+        self.surface: Dict[str, List[float]] = {}
+        self.tournament: Dict[str, List[float]] = {}
+        self.odds_range: List[List[float]] = [[0, 0, 0] for _ in ODDS_RANGES]
+        self.month: Dict[str, List[float]] = {}
+        self.total = 0
+        self.current_win = 0
+        self.current_loss = 0
+        self.max_win = 0
+        self.max_loss = 0
+        # Sequências encerradas: [quantidade, soma dos tamanhos]
+        self.win_streaks = [0, 0]
+        self.loss_streaks = [0, 0]
+
+    def add(self, bet: Dict[str, Any]):
+        """Atualiza todas as dimensões com uma aposta"""
+        self.update((bet,))
+
+    def update(self, bets: Iterable[Dict[str, Any]]) -> 'StreamingAnalysis':
+        """Consome um lote (ou um iterador) de apostas"""
+        surface, tournament, month_data = self.surface, self.tournament, self.month
+        odds_range, n_ranges = self.odds_range, len(ODDS_RANGES)
+        current_win, current_loss = self.current_win, self.current_loss
+        max_win, max_loss = self.max_win, self.max_loss
+        win_streaks, loss_streaks = self.win_streaks, self.loss_streaks
+        total = self.total
+
+        for bet in bets:
+            won = bet['result'] == 'WIN'
+            profit = bet['profit']
+            total += 1
+
+            for groups, key in ((surface, bet.get('surface', 'Unknown')),
+                                (tournament, bet.get('tournament', 'Unknown')),
+                                (month_data, bet.get('date', '')[:7])):  # YYYY-MM
+                if not key:
+                    continue
+                data = groups.get(key)
+                if data is None:
+                    groups[key] = [1, won, profit]
+                else:
+                    data[0] += 1
+                    data[1] += won
+                    data[2] += profit
+
+            index = bisect_right(ODDS_EDGES, bet.get('odd', 0)) - 1
+            if 0 <= index < n_ranges:
+                data = odds_range[index]
+                data[0] += 1
+                data[1] += won
+                data[2] += profit
+
+            if won:
+                if current_loss:
+                    loss_streaks[0] += 1
+                    loss_streaks[1] += current_loss
+                    current_loss = 0
+                current_win += 1
+                if current_win > max_win:
+                    max_win = current_win
+            else:
+                if current_win:
+                    win_streaks[0] += 1
+                    win_streaks[1] += current_win
+                    current_win = 0
+                current_loss += 1
+                if current_loss > max_loss:
+                    max_loss = current_loss
+
+        self.total = total
+        self.current_win, self.current_loss = current_win, current_loss
+        self.max_win, self.max_loss = max_win, max_loss
+        return self
+
+    def streaks(self) -> Dict[str, Any]:
+        """Sequências, contando a sequência em andamento"""
+        wins, win_total = self.win_streaks
+        losses, loss_total = self.loss_streaks
+        if self.current_win:
+            wins, win_total = wins + 1, win_total + self.current_win
+        if self.current_loss:
+            losses, loss_total = losses + 1, loss_total + self.current_loss
+        return {
+            'longestWinStreak': self.max_win,
+            'longestLossStreak': self.max_loss,
+            'avgWinStreak': round(win_total / wins, 2) if wins else 0,
+            'avgLossStreak': round(loss_total / losses, 2) if losses else 0,
+        }
+
+    def result(self) -> Dict[str, Any]:
+        """Análises no formato de generate_report()"""
+        top_tournaments = sorted(self.tournament.items(), key=lambda x: x[1][0], reverse=True)[:self.top_n]
+        return {
+            'surface': {key: _group_metrics(data) for key, data in self.surface.items()},
+            'tournament': {key: _group_metrics(data) for key, data in top_tournaments},
+            'oddsRange': {name: _group_metrics(data) for name, data in zip(ODDS_RANGES, self.odds_range)},
+            'month': {key: _group_metrics(data) for key, data in sorted(self.month.items())},
+            'streaks': self.streaks(),
+        }
+
+def analyze(bets: Iterable[Dict[str, Any]], top_n: int = 10) -> Dict[str, Any]:
+    """Todas as análises em uma única passada"""
+    return StreamingAnalysis(top_n).update(bets).result()
+
 def analyze_by_surface(bets: list) -> dict:
     """Análise por superfície"""
-    surface_data = defaultdict(lambda: {'bets': 0, 'wins': 0, 'profit': 0})
-    
-    for bet in bets:
-        surface = bet.get('surface', 'Unknown')
-        surface_data[surface]['bets'] += 1
-        if bet['result'] == 'WIN':
-            surface_data[surface]['wins'] += 1
-        surface_data[surface]['profit'] += bet['profit']
-    
-    # Calcular métricas
-    results = {}
-    for surface, data in surface_data.items():
-        results[surface] = {
-            'bets': data['bets'],
-            'wins': data['wins'],
-            'losses': data['bets'] - data['wins'],
-            'winRate': round(data['wins'] / data['bets'] * 100, 2) if data['bets'] > 0 else 0,
-            'profit': round(data['profit'], 2),
-            'roi': round(data['profit'] / data['bets'] * 100, 2) if data['bets'] > 0 else 0,
-        }
-    
-    return results
+    return analyze(bets)['surface']
 
 def analyze_by_tournament(bets: list, top_n: int = 10) -> dict:
     """Análise por torneio (top N)"""
-    tournament_data = defaultdict(lambda: {'bets': 0, 'wins': 0, 'profit': 0})
-    
-    for bet in bets:
-        tournament = bet.get('tournament', 'Unknown')
-        tournament_data[tournament]['bets'] += 1
-        if bet['result'] == 'WIN':
-            tournament_data[tournament]['wins'] += 1
-        tournament_data[tournament]['profit'] += bet['profit']
-    
-    # Ordenar por número de apostas e pegar top N
-    sorted_tournaments = sorted(
-        tournament_data.items(),
-        key=lambda x: x[1]['bets'],
-        reverse=True
-    )[:top_n]
-    
-    results = {}
-    for tournament, data in sorted_tournaments:
-        results[tournament] = {
-            'bets': data['bets'],
-            'wins': data['wins'],
-            'losses': data['bets'] - data['wins'],
-            'winRate': round(data['wins'] / data['bets'] * 100, 2) if data['bets'] > 0 else 0,
-            'profit': round(data['profit'], 2),
-            'roi': round(data['profit'] / data['bets'] * 100, 2) if data['bets'] > 0 else 0,
-        }
-    
-    return results
+    return analyze(bets, top_n)['tournament']
 
 def analyze_by_odds_range(bets: list) -> dict:
     """Análise por faixa de odds"""
-    ranges = {
-        '1.70-1.80': (1.70, 1.80),
-        '1.80-1.90': (1.80, 1.90),
-        '1.90-2.00': (1.90, 2.00),
-        '2.00-2.10': (2.00, 2.10),
-    }
-    
-    range_data = {name: {'bets': 0, 'wins': 0, 'profit': 0} for name in ranges}
-    
-    for bet in bets:
-        odd = bet.get('odd', 0)
-        for range_name, (min_odd, max_odd) in ranges.items():
-            if min_odd <= odd < max_odd:
-                range_data[range_name]['bets'] += 1
-                if bet['result'] == 'WIN':
-                    range_data[range_name]['wins'] += 1
-                range_data[range_name]['profit'] += bet['profit']
-                break
-    
-    # Calcular métricas
-    results = {}
-    for range_name, data in range_data.items():
-        results[range_name] = {
-            'bets': data['bets'],
-            'wins': data['wins'],
-            'losses': data['bets'] - data['wins'],
-            'winRate': round(data['wins'] / data['bets'] * 100, 2) if data['bets'] > 0 else 0,
-            'profit': round(data['profit'], 2),
-            'roi': round(data['profit'] / data['bets'] * 100, 2) if data['bets'] > 0 else 0,
-        }
-    
-    return results
+    return analyze(bets)['oddsRange']
 
 def analyze_by_month(bets: list) -> dict:
     """Análise por mês"""
-    month_data = defaultdict(lambda: {'bets': 0, 'wins': 0, 'profit': 0})
-    
-    for bet in bets:
-        date_str = bet.get('date', '')[:7]  # YYYY-MM
-        if date_str:
-            month_data[date_str]['bets'] += 1
-            if bet['result'] == 'WIN':
-                month_data[date_str]['wins'] += 1
-            month_data[date_str]['profit'] += bet['profit']
-    
-    # Calcular métricas
-    results = {}
-    for month, data in sorted(month_data.items()):
-        results[month] = {
-            'bets': data['bets'],
-            'wins': data['wins'],
-            'losses': data['bets'] - data['wins'],
-            'winRate': round(data['wins'] / data['bets'] * 100, 2) if data['bets'] > 0 else 0,
-            'profit': round(data['profit'], 2),
-            'roi': round(data['profit'] / data['bets'] * 100, 2) if data['bets'] > 0 else 0,
-        }
-    
-    return results
+    return analyze(bets)['month']
 
 def analyze_streaks(bets: list) -> dict:
     """Análise de sequências"""
-    current_win_streak = 0
-    current_loss_streak = 0
-    max_win_streak = 0
-    max_loss_streak = 0
-    
-    win_streaks = []
-    loss_streaks = []
-    
-    for bet in bets:
-        if bet['result'] == 'WIN':
-            current_win_streak += 1
-            current_loss_streak = 0
-            if current_win_streak > max_win_streak:
-                max_win_streak = current_win_streak
-        else:
-            current_loss_streak += 1
-            current_win_streak = 0
-            if current_loss_streak > max_loss_streak:
-                max_loss_streak = current_loss_streak
-    
-    return {
-        'longestWinStreak': max_win_streak,
-        'longestLossStreak': max_loss_streak,
-        'avgWinStreak': round(sum(win_streaks) / len(win_streaks), 2) if win_streaks else 0,
-        'avgLossStreak': round(sum(loss_streaks) / len(loss_streaks), 2) if loss_streaks else 0,
-    }
+    return analyze(bets)['streaks']
 
 def generate_report(analysis: dict, output_dir: str):
     """Gera relatório de análise detalhada"""
@@ -228,62 +310,43 @@ def generate_report(analysis: dict, output_dir: str):
     return output_path
 
 if __name__ == '__main__':
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    backtest_dir = os.path.dirname(script_dir)
+
+    parser = argparse.ArgumentParser(description='Análise detalhada do backtest (uma passada)')
+    parser.add_argument('--results', default=os.path.join(backtest_dir, 'output', 'results.json'),
+                        help='results.json do backtest ou .jsonl de apostas')
+    parser.add_argument('--top', type=int, default=10, help='Torneios no relatório')
+    args = parser.parse_args()
+
     print("\n" + "="*60)
     print("ANÁLISE DETALHADA DO BACKTEST")
     print("="*60)
-    
-    # Carregar resultados
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    backtest_dir = os.path.dirname(script_dir)
-    results_path = os.path.join(backtest_dir, 'output', 'results.json')
-    
-    print(f"\nCarregando resultados: {results_path}")
-    results = load_results(results_path)
-    bets = results.get('bets', [])
-    
-    print(f"[OK] {len(bets)} apostas carregadas")
-    
-    # Executar análises
-    print("\nExecutando análises...")
-    
-    print("  - Por superfície...")
-    surface_analysis = analyze_by_surface(bets)
-    
-    print("  - Por torneio...")
-    tournament_analysis = analyze_by_tournament(bets, top_n=10)
-    
-    print("  - Por faixa de odds...")
-    odds_range_analysis = analyze_by_odds_range(bets)
-    
-    print("  - Por mês...")
-    month_analysis = analyze_by_month(bets)
-    
-    print("  - Sequências...")
-    streaks_analysis = analyze_streaks(bets)
-    
+
+    print(f"\nLendo apostas: {args.results}")
+    print("Executando análises (superfície, torneio, odds, mês, sequências)...")
+    aggregator = StreamingAnalysis(top_n=args.top).update(iter_bets(args.results))
+    analysis = aggregator.result()
+
+    print(f"[OK] {aggregator.total} apostas processadas")
+
     # Gerar relatório
     output_dir = os.path.join(backtest_dir, 'output')
-    generate_report({
-        'surface': surface_analysis,
-        'tournament': tournament_analysis,
-        'oddsRange': odds_range_analysis,
-        'month': month_analysis,
-        'streaks': streaks_analysis,
-    }, output_dir)
-    
+    generate_report(analysis, output_dir)
+
     # Imprimir resumo
     print("\n" + "="*60)
     print("RESUMO DAS ANÁLISES")
     print("="*60)
-    
+
     print("\nPor Superfície:")
-    for surface, data in surface_analysis.items():
+    for surface, data in analysis['surface'].items():
         print(f"  {surface}: {data['bets']} apostas, {data['winRate']:.2f}% win rate, {data['profit']:.2f} lucro")
-    
+
     print("\nPor Faixa de Odds:")
-    for odds_range, data in odds_range_analysis.items():
+    for odds_range, data in analysis['oddsRange'].items():
         print(f"  {odds_range}: {data['bets']} apostas, {data['winRate']:.2f}% win rate, {data['profit']:.2f} lucro")
-    
+
     print("\n" + "="*60)
     print("ANÁLISE CONCLUÍDA")
     print("="*60)
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Simulação Monte Carlo de Banca: Tennis Favorite 30-0 Comeback
+Distribuição de ROI, drawdown e risco de ruína
+
+O backtest percorre um único caminho aleatório (uma seed). Aqui cada
+caminho sorteia:
+  - a probabilidade de vitória, de uma Beta(vitórias+1, derrotas+1) com os
+    resultados observados (incerteza da estimativa);
+  - a odd de cada aposta, reamostrando as odds observadas (bootstrap);
+  - o resultado de cada aposta com essa probabilidade.
+
+Os caminhos avançam juntos, aposta a aposta, como vetores NumPy. Pico,
+drawdown, stop-loss do dia e ruína são atualizados a cada passo, sem
+guardar as curvas inteiras. Os blocos de caminhos são pequenos o bastante
+para os vetores caberem no cache: medido aqui, é mais rápido que montar a
+matriz (caminhos x apostas) com somas acumuladas.
+
+Políticas de stake:
+  flat       stake fixa
+  kelly      fração de Kelly sobre a banca atual, com a win rate observada
+  stop-loss  stake fixa, parando o dia quando o prejuízo do dia passa de
+             stopLossDaily (dias de maxBetsPerDay apostas)
+
+Uso:
+  python monte-carlo.py                       # usa output/results.json
+  python monte-carlo.py --paths 1000000 --policy kelly
+"""
+
+import argparse
+import json
+import os
+import sys
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+# Configurar encoding para Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+POLICIES = ('flat', 'kelly', 'stop-loss')
+QUANTILES = (5, 25, 50, 75, 95)
+
+# Caminhos simulados por bloco
+CHUNK_PATHS = 16_384
+
+def _quantiles(values: np.ndarray) -> Dict[str, float]:
+    points = np.percentile(values, QUANTILES)
+    return {f'p{q}': round(float(v), 2) for q, v in zip(QUANTILES, points)}
+
+def _simulate_chunk(rng: np.random.Generator, n_paths: int, n_bets: int, odds_pool: np.ndarray,
+                    wins: int, losses: int, policy: str, stake: float, bankroll: float,
+                    kelly_fraction: float, stop_loss_daily: Optional[float], bets_per_day: int,
+                    ruin_level: float) -> Dict[str, np.ndarray]:
+    """Simula um bloco de caminhos; devolve os resultados finais por caminho"""
+    win_prob = rng.beta(wins + 1, losses + 1, size=n_paths)
+    observed_rate = wins / (wins + losses)
+
+    bank = np.full(n_paths, float(bankroll))
+    peak = bank.copy()
+    max_drawdown = np.zeros(n_paths)
+    staked = np.zeros(n_paths)
+    day_profit = np.zeros(n_paths)
+    ruined = np.zeros(n_paths, dtype=bool)
+
+    for step in range(n_bets):
+        if step % bets_per_day == 0:
+            day_profit[:] = 0
+
+        odds = odds_pool[rng.integers(0, len(odds_pool), size=n_paths)]
+        won = rng.random(n_paths) < win_prob
+
+        if policy == 'kelly':
+            b = odds - 1
+            bet = bank * kelly_fraction * np.clip((observed_rate * b - (1 - observed_rate)) / b, 0, 1)
+        else:
+            bet = np.full(n_paths, stake)
+
+        active = ~ruined & (bet <= bank)
+        if stop_loss_daily:
+            active &= day_profit > -stop_loss_daily
+        bet = np.where(active, bet, 0.0)
+
+        profit = np.where(won, bet * (odds - 1), -bet)
+        bank += profit
+        staked += bet
+        day_profit += profit
+
+        np.maximum(peak, bank, out=peak)
+        np.maximum(max_drawdown, (peak - bank) / peak, out=max_drawdown)
+        ruined |= bank <= ruin_level
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        roi = np.where(staked > 0, (bank - bankroll) / staked, 0.0)
+    return {'final': bank, 'roi': roi, 'max_drawdown': max_drawdown, 'ruined': ruined}
+
+def simulate(odds_pool: Sequence[float], wins: int, losses: int, policy: str = 'flat',
+             n_paths: int = 10_000, n_bets: Optional[int] = None, stake: float = 1.0,
+             bankroll: float = 1000.0, kelly_fraction: float = 0.25,
+             stop_loss_daily: Optional[float] = None, bets_per_day: int = 20,
+             ruin_fraction: float = 0.5, seed: int = 42) -> Dict[str, Any]:
+    """
+    Roda n_paths caminhos de n_bets apostas (padrão: tantas quanto no backtest).
+
+    Ruína = banca cair a ruin_fraction da inicial (ou abaixo da stake
+    mínima); o caminho para de apostar a partir daí. stop_loss_daily só vale
+    para stake fixa. ROI e drawdown saem em %, como em calculate_metrics.
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"Política desconhecida: {policy} (use {', '.join(POLICIES)})")
+    odds_pool = np.asarray(odds_pool, dtype=np.float64)
+    if not len(odds_pool) or wins + losses == 0:
+        raise ValueError('Sem apostas para simular')
+    if policy == 'stop-loss' and stop_loss_daily is None:
+        stop_loss_daily = 10.0
+    n_bets = len(odds_pool) if n_bets is None else n_bets
+    ruin_level = max(bankroll * ruin_fraction, stake if policy != 'kelly' else 0.0)
+
+    rng = np.random.default_rng(seed)
+    parts = []
+    for start in range(0, n_paths, CHUNK_PATHS):
+        size = min(CHUNK_PATHS, n_paths - start)
+        parts.append(_simulate_chunk(rng, size, n_bets, odds_pool, wins, losses, policy, stake,
+                                     bankroll, kelly_fraction, stop_loss_daily, bets_per_day,
+                                     ruin_level))
+    result = {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+
+    return {
+        'policy': policy,
+        'paths': n_paths,
+        'betsPerPath': n_bets,
+        'roi': _quantiles(result['roi'] * 100),
+        'maxDrawdown': _quantiles(result['max_drawdown'] * 100),
+        'finalBankroll': _quantiles(result['final']),
+        'probabilityOfLoss': round(float((result['final'] < bankroll).mean()), 4),
+        'riskOfRuin': round(float(result['ruined'].mean()), 4),
+    }
+
+def simulate_policies(odds_pool: Sequence[float], wins: int, losses: int, config: Dict[str, Any],
+                      policies: Sequence[str] = POLICIES, n_paths: Optional[int] = None,
+                      seed: int = 42) -> Dict[str, Dict[str, Any]]:
+    """Roda simulate() para cada política com a configuração do backtest (CONFIG)"""
+    management = config['management']
+    risk = config.get('risk', {})
+    return {
+        policy: simulate(
+            odds_pool, wins, losses, policy,
+            n_paths=n_paths or risk.get('paths', 10_000),
+            stake=management['stakeValue'],
+            bankroll=management['bankroll'],
+            kelly_fraction=risk.get('kellyFraction', 0.25),
+            stop_loss_daily=management.get('stopLossDaily') if policy == 'stop-loss' else None,
+            bets_per_day=management.get('maxBetsPerDay', 20),
+            ruin_fraction=risk.get('ruinFraction', 0.5),
+            seed=seed,
+        )
+        for policy in policies
+    }
+
+def print_simulation(simulations: Dict[str, Dict[str, Any]]):
+    """Imprime a distribuição por política"""
+    print("\n" + "="*60)
+    print("MONTE CARLO DE BANCA")
+    print("="*60)
+    for policy, sim in simulations.items():
+        print(f"{policy} ({sim['paths']} caminhos x {sim['betsPerPath']} apostas)")
+        print(f"  ROI p5/p50/p95: {sim['roi']['p5']:.2f}% / {sim['roi']['p50']:.2f}% / {sim['roi']['p95']:.2f}%")
+        print(f"  Max Drawdown p50/p95: {sim['maxDrawdown']['p50']:.2f}% / {sim['maxDrawdown']['p95']:.2f}%")
+        print(f"  Prob. prejuízo: {sim['probabilityOfLoss']*100:.2f}% | Risco de ruína: {sim['riskOfRuin']*100:.2f}%")
+    print("="*60)
+
+if __name__ == '__main__':
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    backtest_dir = os.path.dirname(script_dir)
+
+    parser = argparse.ArgumentParser(description='Monte Carlo de banca a partir do results.json do backtest')
+    parser.add_argument('--results', default=os.path.join(backtest_dir, 'output', 'results.json'))
+    parser.add_argument('--paths', type=int, default=10_000)
+    parser.add_argument('--policy', choices=POLICIES + ('all',), default='all')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    with open(args.results, 'r', encoding='utf-8') as f:
+        results = json.load(f)
+
+    odds = [bet['odd'] for bet in results['bets']]
+    wins = sum(1 for bet in results['bets'] if bet['result'] == 'WIN')
+    policies = POLICIES if args.policy == 'all' else (args.policy,)
+    print_simulation(simulate_policies(odds, wins, len(odds) - wins, results['config'],
+                                       policies, args.paths, args.seed))
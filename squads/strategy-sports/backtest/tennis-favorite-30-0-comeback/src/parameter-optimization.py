@@ -2,132 +2,286 @@
 """
 Otimização de Parâmetros
 Testa variações de odds mín/máx, stake, etc.
+
+Os triggers e as odds "cruas" (ranking + variação da seed) não dependem dos
+parâmetros, então são calculados uma vez com o motor colunar
+(backtest-engine.py). Cada conjunto de parâmetros vira uma linha de uma
+matriz (parâmetros x apostas) avaliada com broadcast NumPy, em blocos para
+limitar a memória. Suporta grid, busca aleatória, busca bayesiana (processo
+gaussiano + expected improvement) e validação walk-forward.
 """
 
+import argparse
+import importlib.util
 import json
+import math
 import sys
 import os
-import random
 from itertools import product
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
 
 # Configurar encoding para Windows
 if sys.platform == 'win32':
     import io
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 
-def load_matches(filepath: str):
-    """Carrega partidas"""
-    with open(filepath, 'r', encoding='utf-8') as f:
-        return json.load(f)
-
-def run_backtest_params(matches: list, min_odd: float, max_odd: float, stake: float) -> dict:
-    """Executa backtest com parâmetros específicos"""
-    random.seed(42)
-    
-    bankroll = 1000
-    total_bets = 0
-    wins = 0
-    total_profit = 0
-    
-    for match in matches:
-        favorite = match.get('favorite')
-        if not favorite:
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Células (parâmetros x apostas) por bloco de avaliação
+MAX_CELLS = 4_000_000
+
+def load_engine():
+    """Importa backtest-engine.py (nome com hífen, sem import direto)"""
+    spec = importlib.util.spec_from_file_location('backtest_engine', os.path.join(SCRIPT_DIR, 'backtest-engine.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+engine = load_engine()
+
+def prepare_dataset(columns: Dict[str, np.ndarray], seed: int = 42) -> Dict[str, np.ndarray]:
+    """Triggers, odds cruas e resultados: tudo que não depende dos parâmetros"""
+    triggers = engine.detect_triggers(columns)
+    match = columns['g_match'][triggers]
+    favorite = columns['m_favorite'][match]
+    raw_odds = engine.raw_live_odds(columns, triggers, seed)
+    return {
+        'raw_odds': raw_odds,
+        'raw_odds_rounded': engine.round2(raw_odds),
+        'won': columns['g_winner'][triggers] == favorite,
+        'date': columns['m_date'][match],
+    }
+
+def evaluate(dataset: Dict[str, np.ndarray], params: np.ndarray,
+             subset: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """
+    Avalia N conjuntos (min_odd, max_odd, stake) de uma vez.
+
+    Mesma conta que o loop original: odd = round(clamp(odd crua), 2) e
+    lucro somado em sequência (cumsum por linha), então os resultados são
+    idênticos aos do backtest aposta a aposta.
+    """
+    raw = dataset['raw_odds']
+    raw_rounded = dataset['raw_odds_rounded']
+    won = dataset['won']
+    if subset is not None:
+        raw, raw_rounded, won = raw[subset], raw_rounded[subset], won[subset]
+
+    params = np.asarray(params, dtype=np.float64).reshape(-1, 3)
+    total_profit = np.zeros(len(params))
+    max_drawdown = np.zeros(len(params))
+    n_bets = len(raw)
+    rows = max(1, MAX_CELLS // max(n_bets, 1))
+
+    for start in range(0, len(params), rows):
+        block = params[start:start + rows]
+        low, high, stake = block[:, 0:1], block[:, 1:2], block[:, 2:3]
+        # round(clamp(x)) == clamp com limites arredondados quando x sai da faixa
+        low_rounded = engine.round2(block[:, 0])[:, None]
+        high_rounded = engine.round2(block[:, 1])[:, None]
+        odds = np.where(raw < low, low_rounded, np.where(raw > high, high_rounded, raw_rounded))
+
+        profit = np.where(won, stake * (odds - 1), -stake)
+        curve = np.cumsum(profit, axis=1)
+        if n_bets:
+            total_profit[start:start + rows] = curve[:, -1]
+            bankroll = 1000 + curve
+            peak = np.maximum(np.maximum.accumulate(bankroll, axis=1), 1000)
+            max_drawdown[start:start + rows] = ((peak - bankroll) / peak).max(axis=1)
+
+    return {
+        'params': params,
+        'total_bets': np.full(len(params), n_bets),
+        'wins': np.full(len(params), int(won.sum())),
+        'total_profit': total_profit,
+        'max_drawdown': max_drawdown,
+    }
+
+def to_results(evaluation: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+    """Formata a avaliação no formato de resultado por combinação"""
+    results = []
+    for i, (min_odd, max_odd, stake) in enumerate(evaluation['params'].tolist()):
+        total_bets = int(evaluation['total_bets'][i])
+        wins = int(evaluation['wins'][i])
+        total_profit = float(evaluation['total_profit'][i])
+
+        win_rate = wins / total_bets * 100 if total_bets > 0 else 0
+        roi = total_profit / (total_bets * stake) * 100 if total_bets > 0 else 0
+
+        results.append({
+            'minOdd': min_odd,
+            'maxOdd': max_odd,
+            'stake': stake,
+            'totalBets': total_bets,
+            'wins': wins,
+            'winRate': round(win_rate, 2),
+            'totalProfit': round(total_profit, 2),
+            'roi': round(roi, 2),
+            'finalBankroll': round(1000 + total_profit, 2),
+            'maxDrawdown': round(float(evaluation['max_drawdown'][i]) * 100, 2),
+        })
+    return results
+
+def parse_values(spec: str) -> List[float]:
+    """'1.6,1.7' ou 'início:fim:passo' (fim inclusivo)"""
+    if ':' in spec:
+        start, stop, step = (float(part) for part in spec.split(':'))
+        count = int(round((stop - start) / step)) + 1
+        return [round(start + i * step, 4) for i in range(count)]
+    return [float(value) for value in spec.split(',')]
+
+def grid_params(min_odds: Sequence[float], max_odds: Sequence[float], stakes: Sequence[float]) -> np.ndarray:
+    """Grid completo, na mesma ordem de itertools.product"""
+    return np.array(list(product(min_odds, max_odds, stakes)), dtype=np.float64).reshape(-1, 3)
+
+def random_params(bounds: Dict[str, Tuple[float, float]], n: int, rng: np.random.Generator) -> np.ndarray:
+    """Amostras uniformes nos limites (odds e stake com 2 casas; min <= max)"""
+    columns = [rng.uniform(*bounds[name], size=n) for name in ('minOdd', 'maxOdd', 'stake')]
+    params = np.round(np.column_stack(columns), 2)
+    params[:, :2].sort(axis=1)
+    return params
+
+def _normal_cdf(z: np.ndarray) -> np.ndarray:
+    return 0.5 * (1 + np.vectorize(math.erf)(z / math.sqrt(2)))
+
+def _gp_posterior(x_train: np.ndarray, y_train: np.ndarray, x_test: np.ndarray,
+                  length_scale: float = 0.2, noise: float = 1e-6) -> Tuple[np.ndarray, np.ndarray]:
+    """Média e desvio do processo gaussiano (kernel RBF) nos pontos de teste"""
+    def kernel(a, b):
+        distance = ((a[:, None, :] - b[None, :, :]) ** 2).sum(axis=2)
+        return np.exp(-0.5 * distance / length_scale ** 2)
+
+    k_train = kernel(x_train, x_train) + noise * np.eye(len(x_train))
+    k_cross = kernel(x_test, x_train)
+    cholesky = np.linalg.cholesky(k_train)
+    alpha = np.linalg.solve(cholesky.T, np.linalg.solve(cholesky, y_train))
+    mean = k_cross @ alpha
+    v = np.linalg.solve(cholesky, k_cross.T)
+    variance = np.clip(1 - (v ** 2).sum(axis=0), 1e-12, None)
+    return mean, np.sqrt(variance)
+
+def bayesian_search(dataset: Dict[str, np.ndarray], bounds: Dict[str, Tuple[float, float]],
+                    n_iter: int = 60, n_init: int = 12, n_candidates: int = 2000,
+                    seed: int = 42, subset: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+    """
+    Otimização bayesiana do ROI: processo gaussiano sobre os parâmetros
+    normalizados e, a cada passo, o candidato com maior expected improvement.
+    """
+    rng = np.random.default_rng(seed)
+    low = np.array([bounds[name][0] for name in ('minOdd', 'maxOdd', 'stake')])
+    span = np.array([bounds[name][1] for name in ('minOdd', 'maxOdd', 'stake')]) - low
+    span[span == 0] = 1
+
+    def roi(params: np.ndarray) -> np.ndarray:
+        evaluation = evaluate(dataset, params, subset)
+        bets = np.maximum(evaluation['total_bets'], 1)
+        return evaluation['total_profit'] / (bets * params[:, 2])
+
+    params = random_params(bounds, n_init, rng)
+    scores = roi(params)
+    for _ in range(max(0, n_iter - n_init)):
+        x_train = (params - low) / span
+        y_mean, y_std = scores.mean(), scores.std() or 1.0
+        candidates = random_params(bounds, n_candidates, rng)
+        mean, std = _gp_posterior(x_train, (scores - y_mean) / y_std, (candidates - low) / span)
+        best = (scores.max() - y_mean) / y_std
+        z = (mean - best) / std
+        expected_improvement = (mean - best) * _normal_cdf(z) + std * np.exp(-0.5 * z ** 2) / math.sqrt(2 * math.pi)
+        chosen = candidates[np.argmax(expected_improvement)][None, :]
+        params = np.vstack([params, chosen])
+        scores = np.concatenate([scores, roi(chosen)])
+
+    return to_results(evaluate(dataset, params, subset))
+
+def walk_forward(dataset: Dict[str, np.ndarray], params: np.ndarray, folds: int = 4,
+                 metric: str = 'roi') -> Dict[str, Any]:
+    """
+    Walk-forward: apostas em ordem de data divididas em folds + 1 blocos;
+    a cada passo otimiza no histórico acumulado e mede o melhor conjunto no
+    bloco seguinte (fora da amostra).
+    """
+    order = np.argsort(dataset['date'], kind='stable')
+    blocks = np.array_split(order, folds + 1)
+    steps = []
+    oos_profit = oos_staked = 0.0
+
+    for k in range(1, folds + 1):
+        train = np.sort(np.concatenate(blocks[:k]))
+        test = np.sort(blocks[k])
+        if not len(train) or not len(test):
             continue
-        
-        for game in match.get('games', []):
-            # Verificar trigger 30-0
-            server = game.get('server')
-            if server != favorite:
-                continue
-            
-            points = game.get('points', {})
-            opp = 'player2' if favorite == 'player1' else 'player1'
-            
-            if points.get(favorite, 0) != 0 or points.get(opp, 0) != 30:
-                continue
-            
-            # Simular odd
-            p1_rank = match['player1'].get('ranking', 50)
-            p2_rank = match['player2'].get('ranking', 50)
-            
-            if favorite == 'player1':
-                base_odd = 1.5 + (p2_rank / p1_rank) * 0.3 if p1_rank > 0 else 1.8
-            else:
-                base_odd = 1.5 + (p1_rank / p2_rank) * 0.3 if p2_rank > 0 else 1.8
-            
-            live_odd = base_odd + random.uniform(-0.1, 0.3)
-            live_odd = round(min(max(live_odd, min_odd), max_odd), 2)
-            
-            if live_odd < min_odd or live_odd > max_odd:
-                continue
-            
-            # Resultado
-            favorite_name = match['player1']['name'] if favorite == 'player1' else match['player2']['name']
-            game_winner = game.get('winner', '')
-            won = game_winner == favorite_name
-            
-            # Calcular
-            total_bets += 1
-            if won:
-                wins += 1
-                profit = stake * (live_odd - 1)
-            else:
-                profit = -stake
-            
-            total_profit += profit
-            bankroll += profit
-    
-    win_rate = wins / total_bets * 100 if total_bets > 0 else 0
-    roi = total_profit / (total_bets * stake) * 100 if total_bets > 0 else 0
-    
+        in_sample = to_results(evaluate(dataset, params, train))
+        best = max(in_sample, key=lambda r: r[metric])
+        best_params = np.array([[best['minOdd'], best['maxOdd'], best['stake']]])
+        out_of_sample = to_results(evaluate(dataset, best_params, test))[0]
+        oos_profit += out_of_sample['totalProfit']
+        oos_staked += out_of_sample['totalBets'] * out_of_sample['stake']
+        steps.append({
+            'fold': k,
+            'trainFrom': str(dataset['date'][blocks[0][0]]),
+            'trainTo': str(dataset['date'][blocks[k - 1][-1]]),
+            'testFrom': str(dataset['date'][blocks[k][0]]),
+            'testTo': str(dataset['date'][blocks[k][-1]]),
+            'inSample': best,
+            'outOfSample': out_of_sample,
+        })
+
     return {
-        'minOdd': min_odd,
-        'maxOdd': max_odd,
-        'stake': stake,
-        'totalBets': total_bets,
-        'wins': wins,
-        'winRate': round(win_rate, 2),
-        'totalProfit': round(total_profit, 2),
-        'roi': round(roi, 2),
-        'finalBankroll': round(1000 + total_profit, 2),
+        'folds': steps,
+        'outOfSampleProfit': round(oos_profit, 2),
+        'outOfSampleRoi': round(oos_profit / oos_staked * 100, 2) if oos_staked else 0,
     }
 
-def optimize(matches: list):
+def print_top(results: List[Dict[str, Any]], title: str = "TOP 5 COMBINAÇÕES"):
+    print("\n" + "="*60)
+    print(title)
+    print("="*60)
+    print("\n| Rank | Min Odd | Max Odd | Stake | Bets | Win Rate | ROI | Lucro |")
+    print("|------|---------|---------|-------|------|----------|-----|-------|")
+
+    for i, r in enumerate(results[:5], 1):
+        print(f"| {i} | {r['minOdd']:.2f} | {r['maxOdd']:.2f} | {r['stake']:.1f} | {r['totalBets']} | {r['winRate']:.2f}% | {r['roi']:.2f}% | {r['totalProfit']:.2f} |")
+
+def optimize(columns: Dict[str, np.ndarray], mode: str = 'grid',
+             min_odds: Sequence[float] = (1.60, 1.70, 1.80),
+             max_odds: Sequence[float] = (2.00, 2.10, 2.20),
+             stakes: Sequence[float] = (0.5, 1.0, 2.0),
+             samples: int = 1000, folds: int = 4, seed: int = 42) -> Dict[str, Any]:
     """Testa múltiplas combinações de parâmetros"""
     print("\n" + "="*60)
     print("OTIMIZAÇÃO DE PARÂMETROS")
     print("="*60)
-    
-    # Parâmetros para testar
-    min_odds = [1.60, 1.70, 1.80]
-    max_odds = [2.00, 2.10, 2.20]
-    stakes = [0.5, 1.0, 2.0]
-    
-    results = []
-    total_combinations = len(min_odds) * len(max_odds) * len(stakes)
-    
-    print(f"\nTestando {total_combinations} combinações...\n")
-    
-    for i, (min_odd, max_odd, stake) in enumerate(product(min_odds, max_odds, stakes)):
-        result = run_backtest_params(matches, min_odd, max_odd, stake)
-        results.append(result)
-        
-        if (i + 1) % 3 == 0:
-            print(f"  Progresso: {i+1}/{total_combinations}")
-    
+
+    dataset = prepare_dataset(columns, seed=seed)
+    rng = np.random.default_rng(seed)
+    bounds = {
+        'minOdd': (min(min_odds), max(min_odds)),
+        'maxOdd': (min(max_odds), max(max_odds)),
+        'stake': (min(stakes), max(stakes)),
+    }
+
+    output: Dict[str, Any] = {}
+    if mode == 'bayes':
+        print(f"\nBusca bayesiana: {samples} avaliações...\n")
+        results = bayesian_search(dataset, bounds, n_iter=samples, seed=seed)
+    else:
+        if mode == 'random':
+            params = random_params(bounds, samples, rng)
+        else:
+            params = grid_params(min_odds, max_odds, stakes)
+        print(f"\nTestando {len(params)} combinações...\n")
+        results = to_results(evaluate(dataset, params))
+        if mode == 'walk-forward':
+            output['walkForward'] = walk_forward(dataset, params, folds)
+
     # Ordenar por ROI
     results.sort(key=lambda x: x['roi'], reverse=True)
-    
+
     # Imprimir top 5
-    print("\n" + "="*60)
-    print("TOP 5 COMBINAÇÕES")
-    print("="*60)
-    print("\n| Rank | Min Odd | Max Odd | Stake | Bets | Win Rate | ROI | Lucro |")
-    print("|------|---------|---------|-------|------|----------|-----|-------|")
-    
-    for i, r in enumerate(results[:5], 1):
-        print(f"| {i} | {r['minOdd']:.2f} | {r['maxOdd']:.2f} | {r['stake']:.1f} | {r['totalBets']} | {r['winRate']:.2f}% | {r['roi']:.2f}% | {r['totalProfit']:.2f} |")
-    
+    print_top(results)
+
     # Melhor resultado
     best = results[0]
     print("\n" + "="*60)
@@ -141,36 +295,61 @@ def optimize(matches: list):
     print(f"ROI: {best['roi']:.2f}%")
     print(f"Lucro: {best['totalProfit']:.2f}")
     print(f"Bankroll Final: {best['finalBankroll']:.2f}")
-    
+
+    if 'walkForward' in output:
+        wf = output['walkForward']
+        print("\n" + "="*60)
+        print("WALK-FORWARD (fora da amostra)")
+        print("="*60)
+        for step in wf['folds']:
+            oos = step['outOfSample']
+            print(f"Fold {step['fold']}: {oos['minOdd']:.2f}-{oos['maxOdd']:.2f} stake {oos['stake']} "
+                  f"-> {oos['totalBets']} bets, ROI {oos['roi']:.2f}%")
+        print(f"ROI fora da amostra: {wf['outOfSampleRoi']:.2f}%")
+
+    output.update({
+        'mode': mode,
+        'best': best,
+        'top5': results[:5],
+        'all': results,
+    })
+    return output
+
+if __name__ == '__main__':
+    backtest_dir = os.path.dirname(SCRIPT_DIR)
+
+    parser = argparse.ArgumentParser(description='Otimização de parâmetros')
+    parser.add_argument('--data', default=os.path.join(backtest_dir, 'data', 'matches.json'))
+    parser.add_argument('--mode', choices=['grid', 'random', 'bayes', 'walk-forward'], default='grid')
+    parser.add_argument('--min-odds', default='1.60,1.70,1.80', help="lista '1.6,1.7' ou faixa '1.5:1.9:0.01'")
+    parser.add_argument('--max-odds', default='2.00,2.10,2.20')
+    parser.add_argument('--stakes', default='0.5,1.0,2.0')
+    parser.add_argument('--samples', type=int, default=1000, help='avaliações (random/bayes)')
+    parser.add_argument('--folds', type=int, default=4, help='passos do walk-forward')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    # Carregar dados
+    print(f"\nCarregando dados: {args.data}")
+    columns = engine.load_columns(args.data)
+
+    # Otimizar
+    output = optimize(
+        columns, args.mode,
+        parse_values(args.min_odds), parse_values(args.max_odds), parse_values(args.stakes),
+        samples=args.samples, folds=args.folds, seed=args.seed,
+    )
+
     # Salvar resultados
-    output_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'output')
+    output_dir = os.path.join(backtest_dir, 'output')
     os.makedirs(output_dir, exist_ok=True)
-    
+
     output_path = os.path.join(output_dir, 'parameter-optimization.json')
     with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump({
-            'best': best,
-            'top5': results[:5],
-            'all': results,
-        }, f, indent=2)
-    
+        json.dump(output, f, indent=2)
+
     print(f"\n[OK] Resultados salvos: {output_path}")
-    
-    return results
 
-if __name__ == '__main__':
-    # Carregar dados
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    backtest_dir = os.path.dirname(script_dir)
-    data_path = os.path.join(backtest_dir, 'data', 'matches.json')
-    
-    print(f"\nCarregando dados: {data_path}")
-    matches = load_matches(data_path)
-    print(f"[OK] {len(matches)} partidas carregadas")
-    
-    # Otimizar
-    results = optimize(matches)
-    
     print("\n" + "="*60)
     print("OTIMIZAÇÃO CONCLUÍDA")
     print("="*60)
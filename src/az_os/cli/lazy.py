@@ -0,0 +1,114 @@
+"""
+Lazy subcommand loading for the az CLI.
+
+Subcommand groups are registered by import path and only imported when they
+are invoked (or when their own subcommands are completed), so `az --help`,
+shell completion and short commands do not pay for every command module and
+its dependencies.
+"""
+
+import importlib
+import os
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Type
+
+import typer
+from typer.core import TyperCommand, TyperGroup
+
+
+# name -> (module path, attribute, short help)
+LazySpec = Tuple[str, str, str]
+
+
+class _LazyPlaceholder(TyperCommand):
+    """Stands in for an unloaded subcommand in help output and completion"""
+
+    def __init__(self, name: str, help: str):
+        super().__init__(name, help=help, short_help=help, add_help_option=False)
+
+
+class LazyTyperGroup(TyperGroup):
+    """TyperGroup that imports registered subcommand modules on first use"""
+
+    lazy_commands: Dict[str, LazySpec] = {}
+    lazy_package: Optional[str] = None
+
+    def __init__(self, **attrs: Any):
+        super().__init__(**attrs)
+        for name, (_, _, help) in self.lazy_commands.items():
+            self.commands.setdefault(name, _LazyPlaceholder(name, help))
+
+    def list_commands(self, ctx: Any) -> List[str]:
+        return sorted(self.commands)
+
+    def load_command(self, name: str) -> Any:
+        """Import a lazy subcommand and replace its placeholder"""
+        command = self.commands.get(name)
+        if not isinstance(command, _LazyPlaceholder):
+            return command
+        module_path, attribute, help = self.lazy_commands[name]
+        module = importlib.import_module(module_path, self.lazy_package)
+        command = typer.main.get_command(getattr(module, attribute))
+        command.name = name
+        if not command.help:
+            command.help = help
+        self.commands[name] = command
+        return command
+
+    def resolve_command(self, ctx: Any, args: List[str]) -> Tuple[Optional[str], Any, List[str]]:
+        if args and args[0] in self.lazy_commands:
+            self.load_command(args[0])
+        return super().resolve_command(ctx, args)
+
+
+def lazy_group(commands: Dict[str, LazySpec], package: Optional[str] = None) -> Type[LazyTyperGroup]:
+    """Build a LazyTyperGroup class for typer.Typer(cls=...)"""
+    return type("LazyGroup", (LazyTyperGroup,), {"lazy_commands": commands, "lazy_package": package})
+
+
+def profile_startup(module: str, args: Sequence[str], top: int = 20) -> int:
+    """
+    Re-run the CLI under `python -X importtime` up to command resolution
+    (the resolved command only prints its --help) and report the slowest
+    imports. Returns the child's exit code.
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(p for p in sys.path if p)
+    bootstrap = f"import sys; sys.argv[0] = 'az'; from {module} import main; main()"
+    command = [sys.executable, "-X", "importtime", "-c", bootstrap, *args, "--help"]
+
+    started = time.perf_counter()
+    result = subprocess.run(command, env=env, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.PIPE, text=True)
+    wall_ms = (time.perf_counter() - started) * 1000
+
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        name = fields[2].rstrip()
+        # one space after "|", then two more per nesting level (top-level is 0)
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        imports.append((int(fields[0]), int(fields[1]), depth, name.strip()))
+
+    total_ms = sum(entry[0] for entry in imports) / 1000
+    print(f"az startup: {wall_ms:.0f} ms wall, {total_ms:.0f} ms importing "
+          f"{len(imports)} modules ({' '.join(args) or 'no command'})")
+
+    print("\nSlowest top-level imports (cumulative):")
+    roots = sorted((e for e in imports if e[2] == 0), key=lambda e: e[1], reverse=True)
+    for self_us, cumulative_us, _, name in roots[:top]:
+        print(f"  {cumulative_us / 1000:9.1f} ms  {name}")
+
+    print("\nSlowest modules (self):")
+    for self_us, cumulative_us, _, name in sorted(imports, key=lambda e: e[0], reverse=True)[:top]:
+        print(f"  {self_us / 1000:9.1f} ms  {name}")
+
+    if result.returncode:
+        print(f"\n(command exited with {result.returncode})")
+    return result.returncode
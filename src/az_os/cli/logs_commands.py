@@ -3,11 +3,13 @@ import os
 import shutil
 from pathlib import Path
 from typing import List
+import typer
 from rich.console import Console
 from rich.table import Table
 from rich.panel import Panel
 from rich.text import Text
 from ..utils.logger import TaskScopedLogger, SystemLogger
+from ..utils.log_reader import count_lines, tail_lines
 
 
 async def logs_show() -> None:
@@ -21,10 +23,8 @@ async def logs_show() -> None:
     if os.path.exists(system_log_path):
         console.print("[bold cyan]System Logs (Last 100 lines):[/bold cyan]")
         
-        with open(system_log_path, 'r', encoding='utf-8') as f:
-            lines = f.readlines()[-100:]
-            for line in lines:
-                console.print(line.strip())
+        for line in tail_lines(system_log_path, 100):
+            console.print(line.strip())
     else:
         console.print("[bright_yellow]System log file not found[/bright_yellow]")
     
@@ -48,8 +48,7 @@ async def logs_show() -> None:
                 modified = datetime.fromtimestamp(os.path.getmtime(log_path)).strftime("%Y-%m-%d %H:%M")
                 
                 # Count lines
-                with open(log_path, 'r', encoding='utf-8') as f:
-                    line_count = sum(1 for _ in f)
+                line_count = count_lines(log_path)
                 
                 table.add_row(log_file, f"{size} bytes", modified, str(line_count))
             
@@ -120,10 +119,6 @@ async def logs_rotate() -> None:
             log_path = os.path.join(task_logs_dir, log_file)
             if os.path.isfile(log_path):
                 try:
-                    # Read log to trigger rotation
-                    with open(log_path, 'r', encoding='utf-8') as f:
-                        lines = f.readlines()
-                    
                     # Check if rotation is needed
                     if os.path.getsize(log_path) >= 10 * 1024 * 1024:  # 10MB
                         # Force rotation by writing and truncating
@@ -188,9 +183,7 @@ async def logs_status() -> None:
     
     if os.path.exists(system_log_path):
         system_log_size = os.path.getsize(system_log_path)
-        system_log_lines = 0
-        with open(system_log_path, 'r', encoding='utf-8') as f:
-            system_log_lines = sum(1 for _ in f)
+        system_log_lines = count_lines(system_log_path)
         
         console.print(f"System Log: [bright_green]{system_log_size} bytes[/bright_green]")
         console.print(f"Lines: [bright_blue]{system_log_lines}[/bright_blue]")
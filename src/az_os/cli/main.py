@@ -1,23 +1,32 @@
 import typer
-from rich.console import Console
-from rich.panel import Panel
-from rich.text import Text
-from rich.theme import Theme
-from rich.logging import RichHandler
 import logging
+import os
 import sys
-from .metrics_commands import app as metrics_app
-from .config_commands import app as config_app
-from .logs_commands import app as logs_app
+from typing import Optional
+from .lazy import lazy_group, profile_startup
 
 
-# Custom theme for rich
-custom_theme = Theme({
-    "info": "dim cyan",
-    "warning": "dim yellow",
-    "danger": "bold red",
-    "success": "bold green",
-})
+# Subcommand groups, imported only when invoked (see `az --profile-startup`)
+LAZY_SUBCOMMANDS = {
+    "metrics": (".metrics_commands", "app", "Cost metrics and usage statistics"),
+    "config": (".config_commands", "app", "Configuration management"),
+    "logs": (".logs_commands", "app", "Task and system logs"),
+}
+
+
+def _console():
+    """Rich console with the AZ theme (rich is imported on first use)"""
+    from rich.console import Console
+    from rich.theme import Theme
+
+    # Custom theme for rich
+    custom_theme = Theme({
+        "info": "dim cyan",
+        "warning": "dim yellow",
+        "danger": "bold red",
+        "success": "bold green",
+    })
+    return Console(theme=custom_theme)
 
 
 # Main CLI app
@@ -25,6 +34,7 @@ app = typer.Typer(
     name="az",
     help="Agent Zero Operating System - CLI-first AI operating system",
     add_completion=True,
+    cls=lazy_group(LAZY_SUBCOMMANDS, __package__),
 )
 
 
@@ -35,8 +45,10 @@ def main_callback(
     config: Optional[str] = typer.Option(None, help="Path to config file"),
 ):
     """Agent Zero Operating System CLI"""
+    from rich.logging import RichHandler
+    
     # Setup logging
-    console = Console(theme=custom_theme)
+    console = _console()
     
     # Configure logging level
     log_level = logging.DEBUG if verbose else logging.INFO
@@ -54,7 +66,10 @@ def main_callback(
 @app.command()
 async def version() -> None:
     """Show AZ-OS version and info"""
-    console = Console(theme=custom_theme)
+    from rich.panel import Panel
+    from rich.text import Text
+    
+    console = _console()
     
     panel = Panel(
         Text("AZ-OS (Agent Zero Operating System)", style="bold cyan"),
@@ -76,7 +91,7 @@ async def version() -> None:
 @app.command()
 async def help() -> None:
     """Show help and usage information"""
-    console = Console(theme=custom_theme)
+    console = _console()
     
     console.print("[bold cyan]AZ-OS CLI[/bold cyan]")
     console.print("\n[bold]Core Commands:[/bold]")
@@ -85,6 +100,7 @@ async def help() -> None:
     console.print("\n[bold]Metrics Commands:[/bold]")
     console.print("  az metrics show     Show cost metrics")
     console.print("  az metrics export   Export metrics to CSV")
+    console.print("  az metrics prune    Delete old raw metric rows")
     console.print("  az metrics task     Show task cost details")
     console.print("  az metrics model    Show model cost details")
     console.print("  az metrics aggregate Show aggregated stats")
@@ -97,43 +113,38 @@ async def help() -> None:
     console.print("\n[bold]Logs Commands:[/bold]")
     console.print("  az logs show        Show recent logs")
     console.print("  az logs export      Export task logs")
+    console.print("\n[bold]Diagnostics:[/bold]")
+    console.print("  az --profile-startup [COMMAND]  Report import time up to COMMAND")
     console.print("\n[bold]Usage Examples:[/bold]")
     console.print("  az metrics show")
     console.print("  az config set model=claude")
     console.print("  az logs export task-123")
 
 
-# Add subcommands
-app.add_typer(metrics_app, name="metrics")
-app.add_typer(config_app, name="config")
-app.add_typer(logs_app, name="logs")
-
-
-if __name__ == "__main__":
-    app()
-
-
 # Error handling
-@app.exception()
 def handle_exception(exc: Exception) -> None:
     """Handle exceptions gracefully"""
-    console = Console(theme=custom_theme)
-    
-    if isinstance(exc, typer.Exit):
-        raise exc
-    
+    console = _console()
     console.print(f"[bold red]Error:[/bold red] {exc}", style="danger")
     console.print("[bright_black]Run 'az help' for usage information[/bright_black]")
-    raise typer.Exit(1)
+    sys.exit(1)
 
 
-# Graceful shutdown
-@app.callback()
-def shutdown_callback():
-    """Handle graceful shutdown"""
-    import atexit
+def main() -> None:
+    """Console entry point"""
+    args = sys.argv[1:]
+    if "--profile-startup" in args:
+        args.remove("--profile-startup")
+        module = __name__ if __name__ != "__main__" else "az_os.cli.main"
+        sys.exit(profile_startup(module, args))
     
-    @atexit.register
-    def cleanup():
-        # Cleanup resources if needed
-        pass
\ No newline at end of file
+    try:
+        app()
+    except (typer.Exit, SystemExit):
+        raise
+    except Exception as exc:
+        handle_exception(exc)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,8 @@
 import asyncio
-import csv
 import json
 from datetime import datetime
 from typing import List, Dict, Optional
+import typer
 from rich.console import Console
 from rich.table import Table
 from rich.panel import Panel
@@ -37,59 +37,42 @@ async def metrics_show() -> None:
         console.print(table)
         console.print()  # Add spacing
     
-    # Get total cost
-    async with tracker.db_path as db:
-        cursor = await db.execute("SELECT SUM(cost_usd) FROM metrics")
-        total_cost = await cursor.fetchone()
+    # Get total cost (all-time per-model rollup)
+    totals = await tracker.get_totals()
+    
+    if totals["total_cost"]:
+        console.print(f"[bold cyan]Total Project Cost:[/bold cyan] $[bright_green]{totals['total_cost']:.4f}[/bright_green]")
         
-        if total_cost and total_cost[0]:
-            total_cost_value = total_cost[0]
-            console.print(f"[bold cyan]Total Project Cost:[/bold cyan] $[bright_green]{total_cost_value:.4f}[/bright_green]")
-            
-            # Show cost by model
-            cursor = await db.execute(
-                """
-                SELECT model, SUM(cost_usd) as total_cost, COUNT(*) as request_count
-                FROM metrics 
-                GROUP BY model
-                ORDER BY total_cost DESC
-                """
-            )
-            model_costs = await cursor.fetchall()
-            
-            if model_costs:
-                console.print(f"\n[bold cyan]Cost by Model:[/bold cyan]")
-                for model, cost, count in model_costs:
-                    console.print(f"  [bright_white]{model}[/bright_white]: $[bright_green]{cost:.4f}[/bright_green] ({count} requests)")
-        else:
-            console.print("[bold yellow]No cost data available[/bold yellow]")
+        # Show cost by model
+        if totals["models"]:
+            console.print(f"\n[bold cyan]Cost by Model:[/bold cyan]")
+            for model in totals["models"]:
+                console.print(f"  [bright_white]{model['model']}[/bright_white]: $[bright_green]{model['total_cost']:.4f}[/bright_green] ({model['request_count']} requests)")
+    else:
+        console.print("[bold yellow]No cost data available[/bold yellow]")
 
 
-async def metrics_export() -> None:
-    """Export all metrics to CSV file"""
-    import csv
-    
+async def metrics_export(raw: bool = False) -> None:
+    """Export daily per-model metrics (or retained raw rows with --raw) to CSV"""
     output_path = "az_metrics_export.csv"
     tracker = CostTracker()
     
-    async with tracker.db_path as db:
-        cursor = await db.execute("SELECT * FROM metrics ORDER BY timestamp DESC")
-        rows = await cursor.fetchall()
-        
-        if not rows:
-            print("No metrics data available to export")
-            return
-        
-        # Write to CSV
-        with open(output_path, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            # Write header
-            writer.writerow([desc[0] for desc in cursor.description])
-            # Write data
-            writer.writerows(rows)
+    count = await tracker.export_csv(output_path, raw=raw)
+    if not count:
+        print("No metrics data available to export")
+        return
     
     print(f"Metrics exported successfully to {output_path}")
-    print(f"Total {len(rows)} records exported")
+    print(f"Total {count} records exported")
+
+
+async def metrics_prune(days: int = 90) -> None:
+    """Delete raw metric rows older than --days (hourly/daily rollups are kept)"""
+    from ..core.storage import get_database
+    db = await get_database()
+    
+    deleted = await db.prune_metrics(days)
+    print(f"Deleted {deleted} raw metric rows older than {days} days")
 
 
 async def metrics_task(task_id: str) -> None:
@@ -171,51 +154,30 @@ async def metrics_aggregate() -> None:
     console = Console()
     tracker = CostTracker()
     
-    async with tracker.db_path as db:
-        # Total cost
-        cursor = await db.execute("SELECT SUM(cost_usd) FROM metrics")
-        total_cost = await cursor.fetchone()
-        
-        # Total requests
-        cursor = await db.execute("SELECT COUNT(*) FROM metrics")
-        total_requests = await cursor.fetchone()
-        
-        # Average latency
-        cursor = await db.execute("SELECT AVG(latency_ms) FROM metrics")
-        avg_latency = await cursor.fetchone()
-        
-        # Cost by model
-        cursor = await db.execute(
-            """
-            SELECT model, SUM(cost_usd) as total_cost, COUNT(*) as request_count
-            FROM metrics 
-            GROUP BY model
-            ORDER BY total_cost DESC
-            """
-        )
-        model_costs = await cursor.fetchall()
-        
-        # Display aggregated stats
-        console.print("[bold cyan]Aggregated Statistics[/bold cyan]")
+    totals = await tracker.get_totals()
+    
+    # Display aggregated stats
+    console.print("[bold cyan]Aggregated Statistics[/bold cyan]")
+    
+    if totals["total_cost"]:
+        console.print(f"Total Cost: $[bright_green]{totals['total_cost']:.4f}[/bright_green]")
+        console.print(f"Total Requests: [bright_yellow]{totals['total_requests']}[/bright_yellow]")
+        console.print(f"Average Latency: [bright_blue]{totals['avg_latency']:.1f} ms[/bright_blue]")
+        console.print()
         
-        if total_cost and total_cost[0]:
-            console.print(f"Total Cost: $[bright_green]{total_cost[0]:.4f}[/bright_green]")
-            console.print(f"Total Requests: [bright_yellow]{total_requests[0]}[/bright_yellow]")
-            console.print(f"Average Latency: [bright_blue]{avg_latency[0]:.1f} ms[/bright_blue]")
-            console.print()
-            
-            # Model breakdown
-            console.print("[bold blue]Cost by Model[/bold blue]")
-            for model, cost, count in model_costs:
-                console.print(f"  [bright_white]{model}[/bright_white]: $[bright_green]{cost:.4f}[/bright_green] ({count} requests)")
-        else:
-            console.print("[bold yellow]No metrics data available[/bold yellow]")
+        # Model breakdown
+        console.print("[bold blue]Cost by Model[/bold blue]")
+        for model in totals["models"]:
+            console.print(f"  [bright_white]{model['model']}[/bright_white]: $[bright_green]{model['total_cost']:.4f}[/bright_green] ({model['request_count']} requests)")
+    else:
+        console.print("[bold yellow]No metrics data available[/bold yellow]")
 
 
 # Register CLI commands
 app = typer.Typer()
 app.command()(metrics_show)
 app.command()(metrics_export)
+app.command()(metrics_prune)
 app.command()(metrics_task)
 app.command()(metrics_model)
 app.command()(metrics_aggregate)
\ No newline at end of file
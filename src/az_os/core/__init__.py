@@ -1,4 +1,28 @@
-from .react_loop import ReActLoop, ReActTurn, ReActStep
-from .self_healer import SelfHealer, ErrorType, RecoveryStrategy, ErrorDetection, RecoveryAttempt
-from .scheduler import TaskScheduler, ScheduledTask, TaskExecution, TaskPriority, TaskStatus
-from .telemetry import Telemetry, Metric, HealthCheck, Alert, MetricType, AlertSeverity
\ No newline at end of file
+import importlib
+
+# Public names are resolved on first access so that importing one core module
+# (e.g. cost_tracker for `az metrics`) does not import the LLM, scheduler and
+# telemetry stacks and their dependencies.
+_EXPORTS = {
+    ".react_loop": ["ReActLoop", "ReActTurn", "ReActStep"],
+    ".self_healer": ["SelfHealer", "ErrorType", "RecoveryStrategy", "ErrorDetection", "RecoveryAttempt"],
+    ".scheduler": ["TaskScheduler", "ScheduledTask", "TaskExecution", "TaskPriority", "TaskStatus"],
+    ".telemetry": ["Telemetry", "Metric", "HealthCheck", "Alert", "MetricType", "AlertSeverity"],
+    ".storage": ["TaskState", "TaskResult"],
+}
+_LAZY = {name: module for module, names in _EXPORTS.items() for name in names}
+
+__all__ = list(_LAZY)
+
+
+def __getattr__(name):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
@@ -12,20 +12,28 @@ from datetime import datetime
 import git
 from git import Repo
 
+from .checkpoint_store import CheckpointStore
+
 
 class CheckpointManager:
     """Manages task checkpoints with Git integration for rollback support."""
     
-    def __init__(self, checkpoint_dir: str = ".az-os/checkpoints"):
+    def __init__(self, checkpoint_dir: str = ".az-os/checkpoints", auto_commit: bool = False,
+                 full_every: int = 20):
         self.checkpoint_dir = Path(checkpoint_dir)
         self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
         self.git_repo = self._get_git_repo()
+        # Committing every checkpoint is slow; the store keeps history itself
+        self.auto_commit = auto_commit
+        self.store = CheckpointStore(self.checkpoint_dir, full_every=full_every)
+        if not self.store.index_path.exists():
+            self._index_legacy_checkpoints()
     
     def _get_git_repo(self) -> Optional[Repo]:
         """Get the Git repository if available."""
         try:
             repo_path = Path(".").resolve()
-            while repo_path != repo_path.root:
+            while repo_path != repo_path.parent:
                 if (repo_path / ".git").exists():
                     return Repo(str(repo_path))
                 repo_path = repo_path.parent
@@ -33,65 +41,108 @@ class CheckpointManager:
         except Exception:
             return None
     
-    def _create_checkpoint_path(self, task_id: str, checkpoint_id: str) -> Path:
-        """Create checkpoint file path."""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        return self.checkpoint_dir / f"{task_id}_{checkpoint_id}_{timestamp}.json"
+    def _index_legacy_checkpoints(self) -> None:
+        """Index checkpoints written as one JSON file each (parsed once, on upgrade)."""
+        for checkpoint_file in sorted(self.checkpoint_dir.glob("*.json")):
+            try:
+                with open(checkpoint_file, "r", encoding="utf-8") as f:
+                    checkpoint_data = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                continue
+            self.store.add_legacy({
+                "task_id": checkpoint_data["task_id"],
+                "checkpoint_id": checkpoint_data["checkpoint_id"],
+                "checkpoint_type": checkpoint_data["checkpoint_type"],
+                "timestamp": checkpoint_data["timestamp"],
+                "description": checkpoint_data.get("description", ""),
+                "git_commit": checkpoint_data.get("git_commit"),
+                "state_size": len(checkpoint_data.get("state") or {}),
+                "file": str(checkpoint_file),
+            })
+        self.store.index_path.touch()
     
-    def create_checkpoint(self, task_id: str, state: Dict[str, Any], checkpoint_type: str = "auto") -> str:
-        """Create a new checkpoint for a task."""
-        checkpoint_id = f"{checkpoint_type}_{datetime.now().strftime("%Y%m%d_%H%M%S")}"
-        checkpoint_path = self._create_checkpoint_path(task_id, checkpoint_id)
+    def create_checkpoint(self, task_id: str, state: Dict[str, Any], checkpoint_type: str = "auto",
+                          description: str = "") -> str:
+        """Create a new checkpoint for a task; returns the path of its state object."""
+        now = datetime.now()
+        sequence = len(self.store.index.get(task_id, [])) + 1
+        checkpoint_id = f"{checkpoint_type}_{now.strftime('%Y%m%d_%H%M%S')}_{sequence}"
         
+        digest, info = self.store.put(task_id, state)
         checkpoint_data = {
             "task_id": task_id,
             "checkpoint_id": checkpoint_id,
             "checkpoint_type": checkpoint_type,
-            "timestamp": datetime.now().isoformat(),
-            "state": state,
-            "git_commit": self._get_current_commit() if self.git_repo else None
+            "timestamp": now.isoformat(),
+            "description": description,
+            "git_commit": self._get_current_commit() if self.git_repo else None,
+            "state_size": len(state),
+            "object": digest,
+            "delta": info["delta"],
+            "depth": info["depth"],
+            "stored_bytes": info["stored_bytes"],
         }
+        self.store.record(checkpoint_data)
         
-        with open(checkpoint_path, "w", encoding="utf-8") as f:
-            json.dump(checkpoint_data, f, indent=2)
-        
-        # Auto-commit if Git repo available
-        if self.git_repo and checkpoint_type == "auto":
-            self._auto_commit_checkpoint(checkpoint_data)
+        # Auto-commit if enabled and Git repo available
+        if self.auto_commit and self.git_repo and checkpoint_type == "auto":
+            commit = self._auto_commit_checkpoint(checkpoint_data)
+            if commit:
+                # Lets rollback tell its own commits from the user's
+                self.store.update(checkpoint_id, auto_commit=commit)
         
-        return str(checkpoint_path)
+        return str(self.store.object_path(digest))
     
     def _get_current_commit(self) -> Optional[str]:
         """Get current Git commit hash."""
-        if self.git_repo and self.git_repo.head.is_detached or self.git_repo.head.commit:
-            return str(self.git_repo.head.commit.hexsha)
-        return None
+        try:
+            return str(self.git_repo.head.commit.hexsha) if self.git_repo else None
+        except ValueError:
+            # Repository without commits
+            return None
     
-    def _auto_commit_checkpoint(self, checkpoint_data: Dict) -> bool:
-        """Auto-commit checkpoint to Git."""
+    def _auto_commit_checkpoint(self, checkpoint_data: Dict) -> Optional[str]:
+        """Auto-commit checkpoint to Git; returns the new commit hash."""
         try:
             if not self.git_repo:
-                return False
+                return None
             
-            # Add checkpoint file to Git
-            checkpoint_path = self.checkpoint_dir / checkpoint_data["checkpoint_id"].replace(":", "_")
-            self.git_repo.index.add([str(checkpoint_path)])
+            # Add the new state object and the index to Git
+            paths = [str(self.store.index_path)]
+            if checkpoint_data["stored_bytes"]:
+                paths.append(str(self.store.object_path(checkpoint_data["object"])))
+            self.git_repo.index.add(paths)
             
             # Commit with message
-            commit_message = f"[AUTO] Checkpoint for task {checkpoint_data["task_id"]}"
-            self.git_repo.index.commit(commit_message)
-            
-            return True
+            commit_message = f"[AUTO] Checkpoint for task {checkpoint_data['task_id']}"
+            return str(self.git_repo.index.commit(commit_message).hexsha)
         except Exception as e:
             print(f"Warning: Failed to auto-commit checkpoint: {e}")
-            return False
+            return None
     
-    def restore_checkpoint(self, checkpoint_path: str) -> Dict[str, Any]:
-        """Restore task state from a checkpoint."""
-        checkpoint_path = Path(checkpoint_path)
+    def _find_entry(self, checkpoint: str) -> Optional[Dict[str, Any]]:
+        """Look up an index entry by checkpoint id, object path or legacy file."""
+        entry = self.store.find(checkpoint)
+        if entry is not None:
+            return entry
+        name = Path(checkpoint).name
+        for candidate in self.store.entries():
+            if candidate.get("object") == name or candidate.get("file") == checkpoint:
+                return candidate
+        return None
+    
+    def restore_checkpoint(self, checkpoint: str) -> Dict[str, Any]:
+        """Restore task state from a checkpoint id or path."""
+        entry = self._find_entry(checkpoint)
+        if entry is not None and entry.get("object"):
+            return self.store.get(entry["object"])
         
+        checkpoint_path = Path(entry["file"] if entry else checkpoint)
         if not checkpoint_path.exists():
-            raise FileNotFoundError(f"Checkpoint not found: {checkpoint_path}")
+            raise FileNotFoundError(f"Checkpoint not found: {checkpoint}")
+        
+        if checkpoint_path.parent.parent == self.store.objects_dir:
+            return self.store.get(checkpoint_path.name)
         
         with open(checkpoint_path, "r", encoding="utf-8") as f:
             checkpoint_data = json.load(f)
@@ -99,49 +150,58 @@ class CheckpointManager:
         return checkpoint_data["state"]
     
     def list_checkpoints(self, task_id: Optional[str] = None) -> List[Dict]:
-        """List all checkpoints, optionally filtered by task_id."""
+        """List all checkpoints, optionally filtered by task_id (read from the index)."""
         checkpoints = []
         
-        for checkpoint_file in self.checkpoint_dir.glob("*.json"):
-            with open(checkpoint_file, "r", encoding="utf-8") as f:
-                checkpoint_data = json.load(f)
-                
-                if task_id is None or checkpoint_data["task_id"] == task_id:
-                    checkpoints.append({
-                        "task_id": checkpoint_data["task_id"],
-                        "checkpoint_id": checkpoint_data["checkpoint_id"],
-                        "checkpoint_type": checkpoint_data["checkpoint_type"],
-                        "timestamp": checkpoint_data["timestamp"],
-                        "file": str(checkpoint_file),
-                        "git_commit": checkpoint_data.get("git_commit")
-                    })
+        for entry in self.store.entries(task_id):
+            checkpoints.append({
+                "task_id": entry["task_id"],
+                "checkpoint_id": entry["checkpoint_id"],
+                "checkpoint_type": entry["checkpoint_type"],
+                "timestamp": entry["timestamp"],
+                "description": entry.get("description", ""),
+                "file": entry.get("file") or str(self.store.object_path(entry["object"])),
+                "git_commit": entry.get("git_commit"),
+                "state_size": entry.get("state_size", 0),
+                "delta": entry.get("delta", False)
+            })
         
         return sorted(checkpoints, key=lambda x: x["timestamp"], reverse=True)
     
     def rollback(self, task_id: str) -> bool:
-        """Rollback task to previous checkpoint by reverting Git commits."""
+        """
+        Rollback task to its previous checkpoint.
+        
+        When both checkpoints were auto-committed and HEAD is still the latest
+        one's commit, the working tree is reset to the previous commit.
+        Otherwise the Git tree is left alone and the previous state is
+        restored from the store as a new "rollback" checkpoint.
+        """
         try:
-            if not self.git_repo:
-                return False
-            
-            # Get checkpoints for this task
-            checkpoints = self.list_checkpoints(task_id)
+            # Get checkpoints for this task (oldest first)
+            checkpoints = self.store.entries(task_id)
             
             if len(checkpoints) < 2:
                 print(f"No previous checkpoint to rollback for task {task_id}")
                 return False
             
-            # Get the previous checkpoint's git commit
-            previous_checkpoint = checkpoints[1]  # Second most recent
+            current_checkpoint, previous_checkpoint = checkpoints[-1], checkpoints[-2]
             
-            if not previous_checkpoint["git_commit"]:
-                print(f"Previous checkpoint for task {task_id} has no git commit")
-                return False
-            
-            # Reset to previous commit
-            self.git_repo.git.reset("--hard", previous_checkpoint["git_commit"])
+            if (self.git_repo and previous_checkpoint.get("auto_commit")
+                    and current_checkpoint.get("auto_commit") == self._get_current_commit()):
+                # Reset to the commit created for the previous checkpoint; the
+                # index file in it ends at that checkpoint
+                self.git_repo.git.reset("--hard", previous_checkpoint["auto_commit"])
+                self.store = CheckpointStore(self.checkpoint_dir, full_every=self.store.full_every)
+                # That index predates its own commit hash being recorded
+                self.store.update(previous_checkpoint["checkpoint_id"],
+                                  auto_commit=previous_checkpoint["auto_commit"])
+            else:
+                state = self.restore_checkpoint(previous_checkpoint["checkpoint_id"])
+                self.create_checkpoint(task_id, state, "rollback",
+                                       description=f"Rollback to {previous_checkpoint['checkpoint_id']}")
             
-            print(f"Rolled back task {task_id} to checkpoint: {previous_checkpoint["checkpoint_id"]}")
+            print(f"Rolled back task {task_id} to checkpoint: {previous_checkpoint['checkpoint_id']}")
             return True
             
         except Exception as e:
@@ -150,21 +210,13 @@ class CheckpointManager:
     
     def clear_checkpoints(self, task_id: Optional[str] = None) -> int:
         """Clear checkpoints, optionally for a specific task."""
-        deleted_count = 0
+        removed = self.store.remove_task(task_id)
         
-        for checkpoint_file in self.checkpoint_dir.glob("*.json"):
-            if task_id is None:
-                checkpoint_file.unlink()
-                deleted_count += 1
-            else:
-                with open(checkpoint_file, "r", encoding="utf-8") as f:
-                    checkpoint_data = json.load(f)
-                    
-                    if checkpoint_data["task_id"] == task_id:
-                        checkpoint_file.unlink()
-                        deleted_count += 1
+        for entry in removed:
+            if entry.get("file"):
+                Path(entry["file"]).unlink(missing_ok=True)
         
-        return deleted_count
+        return len(removed)
     
     def get_checkpoint_stats(self) -> Dict:
         """Get statistics about checkpoints."""
@@ -173,7 +225,8 @@ class CheckpointManager:
         return {
             "total_checkpoints": len(checkpoints),
             "tasks_with_checkpoints": len(set(cp["task_id"] for cp in checkpoints)),
-            "latest_checkpoint": checkpoints[0]["timestamp"] if checkpoints else None
+            "latest_checkpoint": checkpoints[0]["timestamp"] if checkpoints else None,
+            **self.store.stats()
         }
 
 
@@ -0,0 +1,299 @@
+"""
+Content-addressed checkpoint store with delta encoding.
+
+Layout under the store directory:
+
+    objects/ab/abcdef...   zlib-compressed JSON, named by the SHA-256 of the
+                           canonical JSON of the state it reconstructs
+    index.jsonl            append-only index, one line per checkpoint
+
+An object holds either the full state ({"full": state}) or a delta against
+the previous checkpoint's state ({"base": hash, "ops": [...]}). Identical
+states hash to the same object and are written once. Delta chains are cut
+with a full snapshot every `full_every` checkpoints (or when the delta is
+not much smaller than the state), so a restore reads a bounded number of
+objects. The index is loaded once; listing never opens object files.
+"""
+
+import copy
+import hashlib
+import json
+import os
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+INDEX_FILE = "index.jsonl"
+OBJECTS_DIR = "objects"
+
+
+def canonical_json(state: Any) -> bytes:
+    """Deterministic JSON encoding used for hashing and storage"""
+    return json.dumps(state, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def state_hash(state: Any) -> str:
+    return hashlib.sha256(canonical_json(state)).hexdigest()
+
+
+def diff_states(old: Any, new: Any, path: Tuple = ()) -> List[list]:
+    """
+    Delta ops turning `old` into `new`:
+      ["set", path, value]     replace the value at path
+      ["del", path]            remove a dict key
+      ["append", path, items]  extend a list that grew at the end
+    """
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops: List[list] = []
+        for key in old:
+            if key not in new:
+                ops.append(["del", list(path + (key,))])
+        for key, value in new.items():
+            if key not in old:
+                ops.append(["set", list(path + (key,)), value])
+            elif old[key] != value:
+                ops.extend(diff_states(old[key], value, path + (key,)))
+        return ops
+    if isinstance(old, list) and isinstance(new, list) and len(new) > len(old) and new[:len(old)] == old:
+        return [["append", list(path), new[len(old):]]]
+    return [["set", list(path), new]]
+
+
+def apply_delta(state: Any, ops: Iterable[list]) -> Any:
+    """Apply diff_states ops to a copy of `state`"""
+    state = copy.deepcopy(state)
+    for op in ops:
+        kind, path = op[0], op[1]
+        if not path:
+            if kind == "set":
+                state = copy.deepcopy(op[2])
+            elif kind == "append":
+                state.extend(copy.deepcopy(op[2]))
+            continue
+        parent = state
+        for key in path[:-1]:
+            parent = parent[key]
+        if kind == "set":
+            parent[path[-1]] = copy.deepcopy(op[2])
+        elif kind == "del":
+            parent.pop(path[-1], None)
+        elif kind == "append":
+            parent[path[-1]].extend(copy.deepcopy(op[2]))
+    return state
+
+
+class CheckpointStore:
+    """Deduplicated, delta-encoded checkpoint objects plus a task index"""
+
+    def __init__(self, root: Path, full_every: int = 20, delta_ratio: float = 0.5,
+                 cache_size: int = 32):
+        self.root = Path(root)
+        self.objects_dir = self.root / OBJECTS_DIR
+        self.index_path = self.root / INDEX_FILE
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.full_every = full_every
+        self.delta_ratio = delta_ratio
+        self.cache_size = cache_size
+        # task_id -> checkpoint entries, oldest first
+        self.index: Dict[str, List[Dict[str, Any]]] = {}
+        # object hash -> chain length back to a full snapshot
+        self._depth: Dict[str, int] = {}
+        # task_id -> (hash, state) of the latest checkpoint, for diffing
+        self._latest: Dict[str, Tuple[str, Any]] = {}
+        self._states: "OrderedDict[str, Any]" = OrderedDict()
+        self._load_index()
+
+    # ------------------------------------------------------------ index
+
+    def _load_index(self) -> None:
+        if not self.index_path.exists():
+            return
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn final line after a crash
+                self.index.setdefault(entry["task_id"], []).append(entry)
+                if entry.get("object"):
+                    self._depth[entry["object"]] = entry.get("depth", 0)
+
+    def record(self, entry: Dict[str, Any]) -> None:
+        """Append a checkpoint entry to the index"""
+        with open(self.index_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        self.index.setdefault(entry["task_id"], []).append(entry)
+
+    def _rewrite_index(self) -> None:
+        tmp_path = self.index_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for entries in self.index.values():
+                for entry in entries:
+                    f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        os.replace(tmp_path, self.index_path)
+
+    def update(self, checkpoint_id: str, **fields: Any) -> None:
+        """Set fields on an indexed checkpoint (rewrites the index)"""
+        entry = self.find(checkpoint_id)
+        if entry is None:
+            raise KeyError(checkpoint_id)
+        entry.update(fields)
+        self._rewrite_index()
+
+    def entries(self, task_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        if task_id is not None:
+            return list(self.index.get(task_id, []))
+        return [entry for entries in self.index.values() for entry in entries]
+
+    def find(self, checkpoint_id: str) -> Optional[Dict[str, Any]]:
+        for entries in self.index.values():
+            for entry in entries:
+                if entry["checkpoint_id"] == checkpoint_id:
+                    return entry
+        return None
+
+    def add_legacy(self, entry: Dict[str, Any]) -> None:
+        """Index a checkpoint stored as a standalone JSON file"""
+        self.record(entry)
+
+    # ------------------------------------------------------------ objects
+
+    def object_path(self, digest: str) -> Path:
+        return self.objects_dir / digest[:2] / digest
+
+    def _write_object(self, digest: str, payload: Dict[str, Any]) -> int:
+        path = self.object_path(digest)
+        path.parent.mkdir(exist_ok=True)
+        data = zlib.compress(canonical_json(payload), 6)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return len(data)
+
+    def _read_object(self, digest: str) -> Dict[str, Any]:
+        with open(self.object_path(digest), "rb") as f:
+            return json.loads(zlib.decompress(f.read()))
+
+    def put(self, task_id: str, state: Any) -> Tuple[str, Dict[str, Any]]:
+        """
+        Store a state for a task; returns (hash, storage info). Writes nothing
+        when an identical state is already stored.
+        """
+        digest = state_hash(state)
+        path = self.object_path(digest)
+        if path.exists():
+            self._remember(task_id, digest, state)
+            return digest, {"deduplicated": True, "delta": False,
+                            "depth": self._depth.get(digest, 0), "stored_bytes": 0}
+
+        base = self._latest_state(task_id)
+        payload: Dict[str, Any] = {"full": state}
+        depth = 0
+        if base is not None:
+            base_digest, base_state = base
+            base_depth = self._depth.get(base_digest, 0)
+            if base_depth + 1 < self.full_every:
+                ops = diff_states(base_state, state)
+                full_size = len(canonical_json(state))
+                if len(canonical_json(ops)) < full_size * self.delta_ratio:
+                    payload = {"base": base_digest, "ops": ops}
+                    depth = base_depth + 1
+
+        stored_bytes = self._write_object(digest, payload)
+        self._depth[digest] = depth
+        self._remember(task_id, digest, state)
+        return digest, {"deduplicated": False, "delta": "base" in payload,
+                        "depth": depth, "stored_bytes": stored_bytes}
+
+    def _remember(self, task_id: str, digest: str, state: Any) -> None:
+        snapshot = json.loads(canonical_json(state))
+        self._latest[task_id] = (digest, snapshot)
+        self._cache_state(digest, snapshot)
+
+    def _latest_state(self, task_id: str) -> Optional[Tuple[str, Any]]:
+        if task_id in self._latest:
+            return self._latest[task_id]
+        for entry in reversed(self.index.get(task_id, [])):
+            if entry.get("object") and self.object_path(entry["object"]).exists():
+                self._latest[task_id] = (entry["object"], self.get(entry["object"]))
+                return self._latest[task_id]
+        return None
+
+    def _cache_state(self, digest: str, state: Any) -> None:
+        self._states[digest] = state
+        self._states.move_to_end(digest)
+        while len(self._states) > self.cache_size:
+            self._states.popitem(last=False)
+
+    def get(self, digest: str) -> Any:
+        """Reconstruct the state stored under `digest`"""
+        if digest in self._states:
+            self._states.move_to_end(digest)
+            return copy.deepcopy(self._states[digest])
+
+        # Walk back to the nearest full snapshot (or cached state), then replay
+        chain: List[List[list]] = []
+        current = digest
+        while True:
+            if current in self._states:
+                state = self._states[current]
+                break
+            payload = self._read_object(current)
+            if "full" in payload:
+                state = payload["full"]
+                break
+            chain.append(payload["ops"])
+            current = payload["base"]
+        for ops in reversed(chain):
+            state = apply_delta(state, ops)
+
+        self._cache_state(digest, state)
+        return copy.deepcopy(state)
+
+    # ------------------------------------------------------------ cleanup
+
+    def remove_task(self, task_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Drop index entries (all, or one task's) and unreferenced objects"""
+        if task_id is None:
+            removed = self.entries()
+            self.index = {}
+        else:
+            removed = self.index.pop(task_id, [])
+        for entry in removed:
+            self._latest.pop(entry["task_id"], None)
+        self._rewrite_index()
+        self.collect_garbage()
+        return removed
+
+    def collect_garbage(self) -> int:
+        """Delete objects not reachable from any indexed checkpoint"""
+        live = set()
+        for entry in self.entries():
+            current = entry.get("object")
+            while current and current not in live and self.object_path(current).exists():
+                live.add(current)
+                payload = self._read_object(current)
+                current = payload.get("base")
+
+        deleted = 0
+        for path in self.objects_dir.glob("*/*"):
+            if path.name not in live:
+                path.unlink()
+                self._depth.pop(path.name, None)
+                self._states.pop(path.name, None)
+                deleted += 1
+        return deleted
+
+    def stats(self) -> Dict[str, Any]:
+        objects = list(self.objects_dir.glob("*/*"))
+        return {
+            "objects": len(objects),
+            "object_bytes": sum(path.stat().st_size for path in objects),
+            "index_bytes": self.index_path.stat().st_size if self.index_path.exists() else 0,
+        }
@@ -1,9 +1,13 @@
+import csv
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 import sqlite3
-from aiosqlite import connect
+import typer
 from pydantic import BaseModel, Field
 from ..storage import get_db_path
+from .storage_engine import get_storage_engine
+from .metrics_rollup import rollup_row
 
 
 class CostModel(BaseModel):
@@ -31,6 +35,20 @@ class CostTracker:
             "deepseek": CostModel(name="deepseek", input_cost=0.0, output_cost=0.0),
         }
         self.db_path = get_db_path()
+        self._schema_ready = False
+
+    @asynccontextmanager
+    async def _reader(self) -> AsyncIterator[Any]:
+        """Pooled reader that sees every queued metric"""
+        if not self._schema_ready:
+            # Rollup tables are created (and backfilled) by Database.initialize
+            from .storage import get_database
+            await get_database()
+            self._schema_ready = True
+        engine = await get_storage_engine(self.db_path)
+        await engine.flush()
+        async with engine.reader() as db:
+            yield db
 
     async def track_cost(
         self,
@@ -40,8 +58,9 @@ class CostTracker:
         output_tokens: int,
         latency_ms: int,
         retry_count: int = 0,
+        wait: bool = True,
     ) -> None:
-        """Track cost for a single API call"""
+        """Track cost for a single API call (wait=False joins the next group commit)"""
         if model not in self.models:
             raise ValueError(f"Unknown model: {model}")
 
@@ -60,41 +79,46 @@ class CostTracker:
             retry_count=retry_count,
         )
 
-        async with connect(self.db_path) as db:
-            await db.execute(
-                """
-                INSERT INTO metrics (
-                    task_id, model, input_tokens, output_tokens, 
-                    cost_usd, latency_ms, timestamp, retry_count
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    entry.task_id,
-                    entry.model,
-                    entry.input_tokens,
-                    entry.output_tokens,
-                    entry.cost_usd,
-                    entry.latency_ms,
-                    entry.timestamp,
-                    entry.retry_count,
-                ),
-            )
-            await db.commit()
+        engine = await get_storage_engine(self.db_path)
+        write = engine.write if wait else engine.write_nowait
+        await write(
+            """
+            INSERT INTO metrics (
+                task_id, model, input_tokens, output_tokens, 
+                cost_usd, latency_ms, timestamp, retry_count
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                entry.task_id,
+                entry.model,
+                entry.input_tokens,
+                entry.output_tokens,
+                entry.cost_usd,
+                entry.latency_ms,
+                entry.timestamp,
+                entry.retry_count,
+            ),
+        )
+
+        # Feed live latency/cost into the adaptive router: one outcome per
+        # logical call, however many retries it took to succeed
+        from .model_router import get_model_router
+        get_model_router().record_call(model, latency_ms, input_tokens, output_tokens, cost_usd)
 
     async def get_daily_cost(self, days: int = 7) -> List[Dict]:
         """Get cost aggregation for the last N days"""
-        async with connect(self.db_path) as db:
+        async with self._reader() as db:
             cursor = await db.execute(
                 """
                 SELECT 
-                    DATE(timestamp) as date,
+                    day as date,
                     SUM(cost_usd) as total_cost,
-                    COUNT(*) as request_count,
-                    AVG(latency_ms) as avg_latency
-                FROM metrics 
-                WHERE timestamp >= datetime('now', ?)
-                GROUP BY DATE(timestamp)
-                ORDER BY date DESC
+                    SUM(request_count) as request_count,
+                    SUM(latency_ms_sum) * 1.0 / SUM(request_count) as avg_latency
+                FROM metrics_daily 
+                WHERE day >= date('now', ?)
+                GROUP BY day
+                ORDER BY day DESC
                 LIMIT ?
                 """,
                 (f"-{days} days", days),
@@ -109,50 +133,32 @@ class CostTracker:
 
     async def get_task_cost(self, task_id: str) -> Optional[Dict]:
         """Get cost details for a specific task"""
-        async with connect(self.db_path) as db:
+        async with self._reader() as db:
             cursor = await db.execute(
                 """
-                SELECT 
-                    model, 
-                    SUM(cost_usd) as total_cost,
-                    SUM(input_tokens) as total_input,
-                    SUM(output_tokens) as total_output,
-                    COUNT(*) as request_count,
-                    AVG(latency_ms) as avg_latency
-                FROM metrics 
+                SELECT model, cost_usd, request_count, input_tokens, output_tokens, latency_ms_sum
+                FROM metrics_task 
                 WHERE task_id = ?
-                GROUP BY model
                 """,
                 (task_id,),
             )
             rows = await cursor.fetchall()
             if not rows:
                 return None
+            models = [{"model": row[0], **rollup_row(row, 1)} for row in rows]
             return {
                 "task_id": task_id,
-                "models": [{
-                    "model": row[0],
-                    "total_cost": row[1],
-                    "total_input": row[2],
-                    "total_output": row[3],
-                    "request_count": row[4],
-                    "avg_latency": row[5],
-                } for row in rows],
-                "total_cost": sum(row[1] for row in rows),
+                "models": models,
+                "total_cost": sum(m["total_cost"] for m in models),
             }
 
     async def get_model_cost(self, model: str) -> Optional[Dict]:
         """Get cost details for a specific model"""
-        async with connect(self.db_path) as db:
+        async with self._reader() as db:
             cursor = await db.execute(
                 """
-                SELECT 
-                    SUM(cost_usd) as total_cost,
-                    SUM(input_tokens) as total_input,
-                    SUM(output_tokens) as total_output,
-                    COUNT(*) as request_count,
-                    AVG(latency_ms) as avg_latency
-                FROM metrics 
+                SELECT cost_usd, request_count, input_tokens, output_tokens, latency_ms_sum
+                FROM metrics_model 
                 WHERE model = ?
                 """,
                 (model,),
@@ -160,14 +166,52 @@ class CostTracker:
             row = await cursor.fetchone()
             if not row:
                 return None
-            return {
-                "model": model,
-                "total_cost": row[0],
-                "total_input": row[1],
-                "total_output": row[2],
-                "request_count": row[3],
-                "avg_latency": row[4],
-            }
+            return {"model": model, **rollup_row(row)}
+
+    async def get_totals(self) -> Dict:
+        """All-time totals with a per-model breakdown"""
+        async with self._reader() as db:
+            cursor = await db.execute(
+                """
+                SELECT model, cost_usd, request_count, input_tokens, output_tokens, latency_ms_sum
+                FROM metrics_model 
+                ORDER BY cost_usd DESC
+                """
+            )
+            rows = await cursor.fetchall()
+        models = [{"model": row[0], **rollup_row(row, 1)} for row in rows]
+        total_requests = sum(row[2] for row in rows)
+        return {
+            "total_cost": sum(m["total_cost"] for m in models),
+            "total_requests": total_requests,
+            "avg_latency": sum(row[5] for row in rows) / total_requests if total_requests else 0.0,
+            "models": models,
+        }
+
+    async def export_csv(self, output_path: str, raw: bool = False) -> int:
+        """
+        Write metrics to CSV and return the row count. By default this exports
+        the daily per-model rollup; raw=True streams the retained raw rows.
+        """
+        query = (
+            "SELECT * FROM metrics ORDER BY timestamp DESC" if raw else
+            "SELECT day, model, cost_usd, request_count, input_tokens, output_tokens, "
+            "latency_ms_sum * 1.0 / request_count AS avg_latency_ms, retry_count "
+            "FROM metrics_daily ORDER BY day DESC, model"
+        )
+        count = 0
+        async with self._reader() as db:
+            cursor = await db.execute(query)
+            with open(output_path, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow([desc[0] for desc in cursor.description])
+                while True:
+                    rows = await cursor.fetchmany(1000)
+                    if not rows:
+                        break
+                    writer.writerows(rows)
+                    count += len(rows)
+        return count
 
 
 # CLI Commands
@@ -199,31 +243,16 @@ async def metrics_show() -> None:
         console.print(table)
     
     # Total cost
-    async with connect(tracker.db_path) as db:
-        cursor = await db.execute("SELECT SUM(cost_usd) FROM metrics")
-        total_cost = await cursor.fetchone()
-        if total_cost and total_cost[0]:
-            console.print(f"\nTotal Project Cost: ${total_cost[0]:.4f}")
+    totals = await tracker.get_totals()
+    if totals["total_cost"]:
+        console.print(f"\nTotal Project Cost: ${totals['total_cost']:.4f}")
 
 
 async def metrics_export() -> None:
     """Export metrics to CSV"""
-    from az_os.cli import app
-    import csv
-    import os
-    
     output_path = "metrics_export.csv"
     tracker = CostTracker()
-    
-    async with connect(tracker.db_path) as db:
-        cursor = await db.execute("SELECT * FROM metrics ORDER BY timestamp DESC")
-        rows = await cursor.fetchall()
-        
-        with open(output_path, "w", newline="") as f:
-            writer = csv.writer(f)
-            writer.writerow([desc[0] for desc in cursor.description])
-            writer.writerows(rows)
-    
+    await tracker.export_csv(output_path)
     print(f"Metrics exported to {output_path}")
 
 
@@ -2,16 +2,19 @@ import openai
 import os
 import time
 from typing import List, Dict, Any, Optional
-from cache import LLMCache, CacheInvalidationStrategy
+from .cache import LLMCache, CacheInvalidationStrategy
 
 
 class LLMClient:
-    def __init__(self, cache_enabled: bool = True, max_cache_size: int = 1000, cache_ttl: int = 3600):
+    def __init__(self, cache_enabled: bool = True, max_cache_size: int = 1000, cache_ttl: int = 3600,
+                 router=None):
         self.api_key = self._get_api_key()
         self.client = openai.OpenAI(api_key=self.api_key)
         self.cache_enabled = cache_enabled
         self._request_count = 0
         self._hit_count = 0
+        # Optional ModelRouter fed with per-call latency, tokens and errors
+        self.router = router
         
         if cache_enabled:
             self.cache = LLMCache(max_size=max_cache_size, ttl=cache_ttl)
@@ -48,6 +51,7 @@ class LLMClient:
     
     async def _api_call(self, prompt: str, model: str, **kwargs) -> str:
         """Internal API call method"""
+        started = time.perf_counter()
         try:
             response = self.client.chat.completions.create(
                 model=model,
@@ -57,9 +61,19 @@ class LLMClient:
                 **kwargs
             )
             
+            if self.router is not None:
+                usage = getattr(response, "usage", None)
+                self.router.record_call(
+                    model,
+                    (time.perf_counter() - started) * 1000,
+                    getattr(usage, "prompt_tokens", 0) or 0,
+                    getattr(usage, "completion_tokens", 0) or 0,
+                )
             return response.choices[0].message.content
             
         except Exception as e:
+            if self.router is not None:
+                self.router.record_call(model, (time.perf_counter() - started) * 1000, success=False)
             raise RuntimeError(f"Chat failed: {e}")
     
     async def embeddings(self, text: str, model: str = "text-embedding-3-small") -> List[float]:
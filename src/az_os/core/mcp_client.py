@@ -1,8 +1,11 @@
-from typing import Dict, Any, Optional, AsyncIterator, List
+from typing import Dict, Any, Optional, AsyncIterator, List, Tuple, Set, Callable, Awaitable
+from collections import OrderedDict
 from datetime import datetime
 import asyncio
 import httpx
+import itertools
 import logging
+import posixpath
 from pydantic import BaseModel, Field
 from aiosqlite import Connection
 from pathlib import Path
@@ -22,7 +25,42 @@ class MCPResponse(BaseModel):
     error: Optional[Dict[str, Any]] = Field(default=None, description="Error information")
 
 
+class MCPError(Exception):
+    """Error object returned by the MCP server for one call"""
+
+    def __init__(self, error: Dict[str, Any]):
+        super().__init__(f"MCP error: {error}")
+        self.error = error
+
+
+class _BatchUnsupported(Exception):
+    """Server answered a batch payload with something other than a list"""
+
+
+# JSON-RPC "method not found"
+_METHOD_NOT_FOUND = -32601
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 multiplexing in httpx)
+    _HTTP2 = True
+except ImportError:
+    _HTTP2 = False
+
+
 class MCPClient:
+    """
+    Async MCP client over HTTP.
+
+    - One pooled httpx client keeps connections alive between calls (HTTP/2
+      multiplexed when `h2` is installed).
+    - With batching on, calls issued concurrently (e.g. via asyncio.gather or
+      call_many) are coalesced into one JSON-RPC batch payload, so a burst of
+      tool calls costs one round-trip instead of one per call.
+    - read_file/list_directory results are cached and revalidated with a
+      cheap `filesystem.stat` (mtime/size); writes through this client
+      invalidate affected entries.
+    """
+
     def __init__(
         self,
         base_url: str = "http://localhost:8080",
@@ -30,13 +68,40 @@ class MCPClient:
         max_retries: int = 3,
         retry_delay: float = 1.0,
         db_conn: Optional[Connection] = None,
+        max_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        batching: bool = True,
+        batch_window: float = 0.0,
+        max_batch_size: int = 32,
+        cache_size: int = 256,
     ):
         self.base_url = base_url
         self.timeout = timeout
         self.max_retries = max_retries
         self.retry_delay = retry_delay
         self.db_conn = db_conn
-        self.client = httpx.AsyncClient(timeout=timeout)
+        self.batching = batching
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self.cache_size = cache_size
+        self.client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            http2=_HTTP2,
+        )
+        self.stats = {"calls": 0, "round_trips": 0, "batches": 0, "cache_hits": 0, "cache_misses": 0}
+        self._ids = itertools.count(1)
+        self._pending: List[Tuple[MCPRequest, asyncio.Future]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self._dispatches: Set[asyncio.Task] = set()
+        self._batch_supported = True
+        self._stat_supported = True
+        # (method, path) -> (stat signature, result), least recently used first
+        self._cache: "OrderedDict[Tuple[str, str], Tuple[Tuple, Any]]" = OrderedDict()
 
     async def __aenter__(self):
         return self
@@ -45,21 +110,105 @@ class MCPClient:
         await self.close()
 
     async def close(self):
+        await self.flush()
         await self.client.aclose()
 
+    @property
+    def url(self) -> str:
+        return f"{self.base_url}/2026-05-01/tool"
+
     async def call(self, method: str, params: Dict[str, Any] = None) -> Any:
-        """Make an MCP call with retry logic"""
+        """Make an MCP call with retry logic (batched with concurrent calls)"""
         if params is None:
             params = {}
-        
-        request_id = str(datetime.now().timestamp())
-        request = MCPRequest(id=request_id, method=method, params=params)
-        
+
+        request = MCPRequest(id=str(next(self._ids)), method=method, params=params)
+        self.stats["calls"] += 1
+        if not self.batching:
+            return await self._with_retries(request.method, lambda: self._make_request(request))
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((request, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._start_dispatch(self._take_pending())
+        elif self._flush_task is None:
+            self._flush_task = loop.create_task(self._flush_later())
+        return await future
+
+    async def flush(self) -> None:
+        """Send queued calls now and wait for all in-flight batches"""
+        if self._pending:
+            self._start_dispatch(self._take_pending())
+        while self._dispatches:
+            await asyncio.gather(*list(self._dispatches), return_exceptions=True)
+
+    def _take_pending(self) -> List[Tuple[MCPRequest, asyncio.Future]]:
+        batch, self._pending = self._pending, []
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        return batch
+
+    def _start_dispatch(self, batch: List[Tuple[MCPRequest, asyncio.Future]]) -> None:
+        task = asyncio.get_running_loop().create_task(self._dispatch(batch))
+        self._dispatches.add(task)
+        task.add_done_callback(self._dispatches.discard)
+
+    async def _flush_later(self) -> None:
+        # Yield at least once so every call started in this loop iteration joins
+        await asyncio.sleep(self.batch_window)
+        self._flush_task = None
+        batch, self._pending = self._pending, []
+        if batch:
+            self._start_dispatch(batch)
+
+    async def _dispatch(self, batch: List[Tuple[MCPRequest, asyncio.Future]]) -> None:
+        if len(batch) > 1 and self._batch_supported:
+            requests = [request for request, _ in batch]
+            try:
+                responses = await self._with_retries("batch", lambda: self._make_batch_request(requests))
+            except _BatchUnsupported:
+                logger.info("MCP server does not support batch requests; sending calls individually")
+                self._batch_supported = False
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            else:
+                for request, future in batch:
+                    if future.done():
+                        continue
+                    response = responses.get(request.id)
+                    if response is None:
+                        future.set_exception(Exception(f"MCP batch response missing id {request.id}"))
+                    elif response.error:
+                        future.set_exception(MCPError(response.error))
+                    else:
+                        future.set_result(response.result)
+                return
+
+        async def single(request: MCPRequest, future: asyncio.Future) -> None:
+            try:
+                result = await self._with_retries(request.method, lambda: self._make_request(request))
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(result)
+
+        await asyncio.gather(*(single(request, future) for request, future in batch))
+
+    async def _with_retries(self, method: str, send: Callable[[], Awaitable[Any]]) -> Any:
         for attempt in range(self.max_retries):
             try:
-                response = await self._make_request(request)
+                response = await send()
                 logger.info(f"MCP call {method} succeeded on attempt {attempt + 1}")
                 return response
+            except _BatchUnsupported:
+                raise
             except Exception as e:
                 logger.warning(f"MCP call {method} failed on attempt {attempt + 1}: {e}")
                 if attempt < self.max_retries - 1:
@@ -68,49 +217,140 @@ class MCPClient:
                     logger.error(f"MCP call {method} failed after {self.max_retries} attempts")
                     raise
 
+    @staticmethod
+    def _payload(request: MCPRequest) -> Dict[str, Any]:
+        return {"jsonrpc": "2.0", **request.model_dump()}
+
+    async def _post(self, payload: Any) -> Any:
+        self.stats["round_trips"] += 1
+        response = await self.client.post(self.url, json=payload, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
     async def _make_request(self, request: MCPRequest) -> Any:
         """Make a single MCP request"""
-        url = f"{self.base_url}/2026-05-01/tool"
-        
-        logger.debug(f"Sending MCP request: {request.json()}")
-        
-        response = await self.client.post(
-            url,
-            json=request.json(),
-            timeout=self.timeout
-        )
-        
-        response.raise_for_status()
-        
-        data = response.json()
+        logger.debug(f"Sending MCP request: {request.model_dump_json()}")
+
+        data = await self._post(self._payload(request))
         mcp_response = MCPResponse(**data)
-        
+
         if mcp_response.error:
             logger.error(f"MCP error: {mcp_response.error}")
-            raise Exception(f"MCP error: {mcp_response.error}")
-        
+            raise MCPError(mcp_response.error)
+
         logger.debug(f"Received MCP response: {mcp_response.result}")
         return mcp_response.result
 
+    async def _make_batch_request(self, requests: List[MCPRequest]) -> Dict[str, MCPResponse]:
+        """Send several requests as one JSON-RPC batch; responses keyed by id"""
+        logger.debug(f"Sending MCP batch of {len(requests)} requests")
+
+        data = await self._post([self._payload(request) for request in requests])
+        if not isinstance(data, list):
+            raise _BatchUnsupported()
+        self.stats["batches"] += 1
+        responses = (MCPResponse(**item) for item in data)
+        return {response.id: response for response in responses}
+
+    async def call_many(
+        self,
+        calls: List[Tuple[str, Dict[str, Any]]],
+        max_concurrency: int = 4,
+    ) -> List[Any]:
+        """
+        Run independent calls concurrently, at most `max_concurrency` in flight.
+        Results keep the order of `calls`; a failed call yields its exception
+        instead of cancelling the others.
+        """
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+        async def bounded(method: str, params: Dict[str, Any]) -> Any:
+            async with semaphore:
+                return await self.call(method, params)
+
+        return await asyncio.gather(
+            *(bounded(method, params) for method, params in calls),
+            return_exceptions=True,
+        )
+
+    # Read-through cache for filesystem reads
+    async def _stat(self, path: str) -> Optional[Tuple]:
+        """Cheap change signature for a path, or None when unavailable"""
+        if not self._stat_supported:
+            return None
+        try:
+            stat = await self.call("filesystem.stat", {"path": path})
+        except MCPError as e:
+            if e.error.get("code") == _METHOD_NOT_FOUND:
+                logger.info("MCP server has no filesystem.stat; read cache disabled")
+                self._stat_supported = False
+            return None
+        except Exception:
+            return None
+        if not isinstance(stat, dict):
+            return None
+        signature = tuple(stat.get(key) for key in ("mtime_ns", "mtime", "size"))
+        return signature if any(value is not None for value in signature) else None
+
+    async def _cached_read(self, method: str, path: str) -> Any:
+        if not self.cache_size:
+            return await self.call(method, {"path": path})
+
+        key = (method, path)
+        entry = self._cache.get(key)
+        if entry is not None:
+            signature = await self._stat(path)
+            if signature is not None and signature == entry[0]:
+                self._cache.move_to_end(key)
+                self.stats["cache_hits"] += 1
+                return entry[1]
+            self._cache.pop(key, None)
+            value = await self.call(method, {"path": path})
+        else:
+            # Stat before the read (same batch): a change in between only
+            # makes the cached signature older, never the content staler
+            signature, value = await asyncio.gather(
+                self._stat(path), self.call(method, {"path": path})
+            )
+
+        self.stats["cache_misses"] += 1
+        if signature is not None:
+            self._cache[key] = (signature, value)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return value
+
+    def invalidate(self, path: str) -> None:
+        """Drop cached reads of `path` and listings of its parent directory"""
+        target = posixpath.normpath(path)
+        parent = posixpath.dirname(target.rstrip("/")) or "."
+        for method, cached_path in list(self._cache):
+            normalized = posixpath.normpath(cached_path)
+            if normalized == target or (method == "filesystem.list" and normalized == parent):
+                del self._cache[(method, cached_path)]
+
     # Filesystem tools
     async def read_file(self, path: str) -> str:
         """Read file contents"""
-        return await self.call("filesystem.read", {"path": path})
+        return await self._cached_read("filesystem.read", path)
 
     async def write_file(self, path: str, content: str) -> bool:
         """Write file contents"""
+        self.invalidate(path)
         return await self.call("filesystem.write", {"path": path, "content": content})
 
     async def list_directory(self, path: str) -> List[Dict[str, Any]]:
         """List directory contents"""
-        return await self.call("filesystem.list", {"path": path})
+        return await self._cached_read("filesystem.list", path)
 
     async def create_directory(self, path: str) -> bool:
         """Create directory"""
+        self.invalidate(path)
         return await self.call("filesystem.create_directory", {"path": path})
 
     async def delete_file(self, path: str) -> bool:
         """Delete file"""
+        self.invalidate(path)
         return await self.call("filesystem.delete", {"path": path})
 
     # Shell execution tools
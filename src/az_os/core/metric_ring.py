@@ -0,0 +1,157 @@
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+
+
+class MetricRing:
+    """
+    Fixed-size ring buffer of (timestamp, value) samples backed by NumPy.
+
+    Appends are O(1) and memory is bounded by `capacity`; windowed
+    aggregates run vectorized over the samples newer than the window.
+    """
+    
+    AGGREGATIONS = ("mean", "p50", "p95", "p99", "max", "min", "sum", "count", "rate", "last")
+    
+    def __init__(self, capacity: int = 4096):
+        self.capacity = capacity
+        self._timestamps = np.zeros(capacity, dtype=np.float64)
+        self._values = np.zeros(capacity, dtype=np.float64)
+        self._next = 0
+        self._size = 0
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return self._size
+    
+    def append(self, value: float, timestamp: Optional[float] = None) -> None:
+        with self._lock:
+            self._timestamps[self._next] = time.time() if timestamp is None else timestamp
+            self._values[self._next] = value
+            self._next = (self._next + 1) % self.capacity
+            self._size = min(self._size + 1, self.capacity)
+    
+    def last(self) -> Optional[float]:
+        with self._lock:
+            if not self._size:
+                return None
+            return float(self._values[self._next - 1])
+    
+    def window(self, seconds: float, now: Optional[float] = None) -> np.ndarray:
+        """Values sampled within the last `seconds` (oldest first)"""
+        now = time.time() if now is None else now
+        with self._lock:
+            if self._size < self.capacity:
+                timestamps = self._timestamps[:self._size]
+                values = self._values[:self._size]
+            else:
+                timestamps = np.roll(self._timestamps, -self._next)
+                values = np.roll(self._values, -self._next)
+            return values[timestamps >= now - seconds].copy()
+    
+    def aggregate(self, seconds: float, how: str = "mean", now: Optional[float] = None) -> Optional[float]:
+        """Aggregate over the window; None when the window has no samples"""
+        if how == "last":
+            return self.last()
+        values = self.window(seconds, now)
+        if how == "count":
+            return float(values.size)
+        if how == "rate":
+            return float(values.size) / seconds if seconds > 0 else 0.0
+        if not values.size:
+            return None
+        if how == "mean":
+            return float(values.mean())
+        if how == "sum":
+            return float(values.sum())
+        if how == "max":
+            return float(values.max())
+        if how == "min":
+            return float(values.min())
+        if how in ("p50", "p95", "p99"):
+            return float(np.percentile(values, int(how[1:])))
+        raise ValueError(f"Unknown aggregation: {how}")
+
+
+class BucketRing:
+    """
+    Ring of fixed-width time buckets holding count/sum/min/max per bucket.
+
+    Memory is bounded by `span / resolution` buckets regardless of the
+    sample rate, so long windows (hourly cost, error rate) see every
+    sample. Windows are resolved to whole buckets; percentiles need the
+    raw samples of a MetricRing.
+    """
+    
+    AGGREGATIONS = ("mean", "max", "min", "sum", "count", "rate", "last")
+    
+    def __init__(self, span: float = 3600.0, resolution: float = 1.0):
+        self.span = span
+        self.resolution = resolution
+        self.capacity = max(1, int(np.ceil(span / resolution)))
+        self._ids = np.full(self.capacity, -1, dtype=np.int64)
+        self._counts = np.zeros(self.capacity, dtype=np.int64)
+        self._sums = np.zeros(self.capacity, dtype=np.float64)
+        self._mins = np.zeros(self.capacity, dtype=np.float64)
+        self._maxs = np.zeros(self.capacity, dtype=np.float64)
+        self._last: Optional[float] = None
+        self._size = 0
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        """Samples held by the live buckets"""
+        return self._size
+    
+    def append(self, value: float, timestamp: Optional[float] = None) -> None:
+        bucket = int((time.time() if timestamp is None else timestamp) // self.resolution)
+        slot = bucket % self.capacity
+        with self._lock:
+            if self._ids[slot] != bucket:
+                if self._ids[slot] > bucket:
+                    return  # older than anything the ring still holds
+                self._size -= int(self._counts[slot])
+                self._ids[slot] = bucket
+                self._counts[slot] = 0
+                self._sums[slot] = 0.0
+                self._mins[slot] = value
+                self._maxs[slot] = value
+            self._counts[slot] += 1
+            self._sums[slot] += value
+            self._mins[slot] = min(self._mins[slot], value)
+            self._maxs[slot] = max(self._maxs[slot], value)
+            self._last = value
+            self._size += 1
+    
+    def last(self) -> Optional[float]:
+        with self._lock:
+            return self._last
+    
+    def aggregate(self, seconds: float, how: str = "mean", now: Optional[float] = None) -> Optional[float]:
+        """Aggregate over the buckets overlapping the window; None when they are empty"""
+        if how == "last":
+            return self.last()
+        now = time.time() if now is None else now
+        first = int((now - seconds) // self.resolution)
+        with self._lock:
+            live = (self._ids >= first) & (self._ids >= 0)
+            count = int(self._counts[live].sum())
+            total = float(self._sums[live].sum())
+            mins = self._mins[live]
+            maxs = self._maxs[live]
+        if how == "count":
+            return float(count)
+        if how == "rate":
+            return float(count) / seconds if seconds > 0 else 0.0
+        if not count:
+            return None
+        if how == "mean":
+            return total / count
+        if how == "sum":
+            return total
+        if how == "max":
+            return float(maxs.max())
+        if how == "min":
+            return float(mins.min())
+        raise ValueError(f"Unsupported aggregation for bucketed history: {how}")
@@ -0,0 +1,124 @@
+"""
+Pre-aggregated rollups for the metrics table.
+
+Every insert into ``metrics`` is folded by an AFTER INSERT trigger into four
+small tables keyed by their primary key:
+
+- ``metrics_hourly``  (bucket, model)   - hour buckets, pruned with raw rows
+- ``metrics_daily``   (day, model)      - kept indefinitely
+- ``metrics_task``    (task_id, model)  - kept indefinitely
+- ``metrics_model``   (model)           - all-time totals
+
+Reports read the rollups instead of scanning raw rows, so their cost depends
+on the number of days/models requested, not on how many API calls were
+logged. Raw rows can then be pruned after ``retention_days`` without losing
+history. Rollups are not decremented when raw rows are deleted (retention or
+task cascade): they record spend that actually happened.
+"""
+
+from typing import Any, Dict, List, Optional
+
+
+_COUNTERS = """
+    cost_usd REAL NOT NULL DEFAULT 0,
+    request_count INTEGER NOT NULL DEFAULT 0,
+    input_tokens INTEGER NOT NULL DEFAULT 0,
+    output_tokens INTEGER NOT NULL DEFAULT 0,
+    latency_ms_sum INTEGER NOT NULL DEFAULT 0,
+    retry_count INTEGER NOT NULL DEFAULT 0
+"""
+
+ROLLUP_TABLES = {
+    "metrics_hourly": ("bucket TEXT NOT NULL, model TEXT NOT NULL", "bucket, model",
+                       "strftime('%Y-%m-%d %H:00:00', {ts}), {model}"),
+    "metrics_daily": ("day TEXT NOT NULL, model TEXT NOT NULL", "day, model",
+                      "date({ts}), {model}"),
+    "metrics_task": ("task_id TEXT NOT NULL, model TEXT NOT NULL", "task_id, model",
+                     "{task_id}, {model}"),
+    "metrics_model": ("model TEXT NOT NULL", "model", "{model}"),
+}
+
+_UPSERT = """
+    INSERT INTO {table} ({keys}, cost_usd, request_count, input_tokens,
+                         output_tokens, latency_ms_sum, retry_count)
+    {source}
+    ON CONFLICT({keys}) DO UPDATE SET
+        cost_usd = cost_usd + excluded.cost_usd,
+        request_count = request_count + excluded.request_count,
+        input_tokens = input_tokens + excluded.input_tokens,
+        output_tokens = output_tokens + excluded.output_tokens,
+        latency_ms_sum = latency_ms_sum + excluded.latency_ms_sum,
+        retry_count = retry_count + excluded.retry_count;
+"""
+
+
+def _trigger_sql() -> str:
+    statements = []
+    for table, (_, keys, key_expr) in ROLLUP_TABLES.items():
+        values = key_expr.format(ts="COALESCE(NEW.timestamp, CURRENT_TIMESTAMP)",
+                                 model="NEW.model", task_id="NEW.task_id")
+        source = (f"VALUES ({values}, COALESCE(NEW.cost_usd, 0), 1, "
+                  "COALESCE(NEW.input_tokens, 0), COALESCE(NEW.output_tokens, 0), "
+                  "COALESCE(NEW.latency_ms, 0), COALESCE(NEW.retry_count, 0))")
+        statements.append(_UPSERT.format(table=table, keys=keys, source=source))
+    return ("CREATE TRIGGER IF NOT EXISTS trg_metrics_rollup AFTER INSERT ON metrics BEGIN"
+            + "".join(statements) + "END")
+
+
+def _backfill_sql(table: str) -> str:
+    _, keys, key_expr = ROLLUP_TABLES[table]
+    group = key_expr.format(ts="timestamp", model="model", task_id="task_id")
+    # "WHERE true" disambiguates INSERT ... SELECT ... ON CONFLICT for the parser
+    source = (f"SELECT {group}, SUM(cost_usd), COUNT(*), SUM(input_tokens), "
+              f"SUM(output_tokens), SUM(latency_ms), SUM(COALESCE(retry_count, 0)) "
+              f"FROM metrics WHERE true GROUP BY {group}")
+    return _UPSERT.format(table=table, keys=keys, source=source)
+
+
+async def ensure_rollups(db: Any) -> None:
+    """
+    Create rollup tables and the insert trigger on an open connection.
+    The first time rollups are created on a database that already has raw
+    metrics, they are backfilled from those rows.
+    """
+    cursor = await db.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'trg_metrics_rollup'"
+    )
+    exists = await cursor.fetchone() is not None
+
+    for table, (key_columns, keys, _) in ROLLUP_TABLES.items():
+        await db.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ({key_columns}, {_COUNTERS}, PRIMARY KEY ({keys}))"
+        )
+    if exists:
+        return
+
+    for table in ROLLUP_TABLES:
+        await db.execute(_backfill_sql(table))
+    await db.execute(_trigger_sql())
+
+
+async def prune_raw_metrics(db: Any, retention_days: int, hourly_retention_days: Optional[int] = None) -> int:
+    """Delete raw metrics (and hourly buckets) older than the retention window"""
+    cursor = await db.execute(
+        "DELETE FROM metrics WHERE timestamp < datetime('now', ?)",
+        (f"-{int(retention_days)} days",),
+    )
+    deleted = cursor.rowcount
+    await db.execute(
+        "DELETE FROM metrics_hourly WHERE bucket < strftime('%Y-%m-%d %H:00:00', 'now', ?)",
+        (f"-{int(hourly_retention_days or retention_days)} days",),
+    )
+    return deleted
+
+
+def rollup_row(row: List[Any], offset: int = 0) -> Dict[str, Any]:
+    """Decode (cost, requests, input, output, latency_sum) starting at offset"""
+    cost, requests, input_tokens, output_tokens, latency_sum = row[offset:offset + 5]
+    return {
+        "total_cost": cost or 0.0,
+        "request_count": requests or 0,
+        "total_input": input_tokens or 0,
+        "total_output": output_tokens or 0,
+        "avg_latency": (latency_sum / requests) if requests else 0.0,
+    }
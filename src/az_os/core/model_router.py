@@ -1,8 +1,11 @@
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple, Union
 from datetime import datetime, timedelta
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
 import random
+import threading
+import time
+from .metric_ring import MetricRing
 
 
 class TaskComplexity(Enum):
@@ -35,8 +38,74 @@ class Task:
     urgency: bool = False
 
 
+class CircuitState(Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+@dataclass
+class CircuitBreaker:
+    state: CircuitState = CircuitState.CLOSED
+    opened_at: float = 0.0
+    closed_since: float = 0.0  # only samples after this count toward tripping
+    probe_in_flight: bool = False
+    probe_started_at: float = 0.0
+    reason: str = ""
+
+
+class CallStats:
+    """Recent per-call measurements for one model (optionally one task type)"""
+    
+    def __init__(self, capacity: int = 512):
+        self.latency_ms = MetricRing(capacity)
+        self.cost_usd = MetricRing(capacity)
+        self.tokens = MetricRing(capacity)
+        self.errors = MetricRing(capacity)
+    
+    def record(self, latency_ms: float, cost_usd: float, tokens: int, success: bool, now: float) -> None:
+        self.errors.append(0.0 if success else 1.0, now)
+        if success:
+            self.latency_ms.append(latency_ms, now)
+            self.cost_usd.append(cost_usd, now)
+            self.tokens.append(tokens, now)
+
+
+@dataclass
+class RouteDecision:
+    model_type: ModelType
+    expected_cost: float
+    p95_latency_ms: float
+    success_rate: float
+    measured: bool
+    reason: str = ""
+
+
+# Provider/tracker model names mapped onto router model types
+MODEL_ALIASES: Dict[str, ModelType] = {
+    "claude": ModelType.CLAUDE,
+    "claude-3-5-sonnet": ModelType.CLAUDE,
+    "gpt-4": ModelType.GPT4,
+    "gpt-4-turbo": ModelType.GPT4,
+    "gpt4": ModelType.GPT4,
+    "gpt-3.5-turbo": ModelType.GPT35,
+    "gpt35": ModelType.GPT35,
+    "fast": ModelType.FAST,
+}
+
+# Minimum quality score per complexity (same cut-offs select_model uses)
+MIN_QUALITY = {
+    TaskComplexity.SIMPLE: 7.0,
+    TaskComplexity.MEDIUM: 8.0,
+    TaskComplexity.COMPLEX: 9.0,
+}
+
+
 class ModelRouter:
-    def __init__(self):
+    def __init__(self, latency_slo_ms: Optional[float] = None, stats_window_s: float = 900.0,
+                 breaker_window_s: float = 300.0, breaker_min_samples: int = 5,
+                 breaker_p95_factor: float = 2.0, breaker_error_rate: float = 0.5,
+                 breaker_cooldown_s: float = 60.0, breaker_probe_timeout_s: float = 120.0):
         self.models: Dict[ModelType, ModelInfo] = {
             ModelType.CLAUDE: ModelInfo(
                 name="Claude-3-5-Sonnet",
@@ -69,37 +138,230 @@ class ModelRouter:
         }
         self.learning_enabled = True
         self.success_threshold = 0.7
+        
+        # Live measurements: (model, task_type or "*") -> recent calls
+        self.latency_slo_ms = latency_slo_ms
+        self.stats_window_s = stats_window_s
+        self.breaker_window_s = breaker_window_s
+        self.breaker_min_samples = breaker_min_samples
+        self.breaker_p95_factor = breaker_p95_factor
+        self.breaker_error_rate = breaker_error_rate
+        self.breaker_cooldown_s = breaker_cooldown_s
+        self.breaker_probe_timeout_s = breaker_probe_timeout_s
+        self.stats: Dict[Tuple[str, str], CallStats] = {}
+        self.breakers: Dict[ModelType, CircuitBreaker] = {m: CircuitBreaker() for m in self.models}
+        self._lock = threading.Lock()
+    
+    # ------------------------------------------------------------ measurements
+    
+    @staticmethod
+    def resolve_model(model: Union[ModelType, str]) -> Optional[ModelType]:
+        """Map a ModelType, its value or a provider model name to a ModelType"""
+        if isinstance(model, ModelType):
+            return model
+        key = model.lower()
+        try:
+            return ModelType(key)
+        except ValueError:
+            return MODEL_ALIASES.get(key)
+    
+    def record_call(self, model: Union[ModelType, str], latency_ms: float, input_tokens: int = 0,
+                    output_tokens: int = 0, cost_usd: Optional[float] = None, success: bool = True,
+                    task_type: Optional[str] = None) -> None:
+        """Record one real call (fed by CostTracker.track_cost and LLMClient)"""
+        model_type = self.resolve_model(model)
+        key = model_type.value if model_type else str(model)
+        if cost_usd is None and model_type:
+            cost_usd = self.models[model_type].cost_per_token * (input_tokens + output_tokens) / 1000
+        now = time.time()
+        with self._lock:
+            for scope in {"*", task_type or "*"}:
+                stats = self.stats.get((key, scope))
+                if stats is None:
+                    stats = self.stats[(key, scope)] = CallStats()
+                stats.record(latency_ms, cost_usd or 0.0, input_tokens + output_tokens, success, now)
+            if model_type:
+                self._update_breaker(model_type, latency_ms, success, now)
+    
+    def _stats(self, model_type: ModelType, task_type: Optional[str]) -> Optional[CallStats]:
+        """Task-type stats when they have samples, else the model-wide stats"""
+        for scope in (task_type, "*"):
+            stats = self.stats.get((model_type.value, scope)) if scope else None
+            if stats is not None and len(stats.errors):
+                return stats
+        return None
+    
+    def estimate(self, model_type: ModelType, task: Task) -> Dict[str, float]:
+        """
+        Live estimates for a model on a task: p95 latency, cost per call and
+        success rate. Falls back to the configured constants without samples.
+        """
+        model = self.models[model_type]
+        prior_cost = model.cost_per_token * max(task.prompt_length, 1) / 1000
+        prior_success = model.success_rate.get(task.task_type, 0.9)
+        stats = self._stats(model_type, task.task_type)
+        if stats is None:
+            return {"p95_latency_ms": float(model.avg_latency_ms), "cost": prior_cost,
+                    "success_rate": prior_success, "measured": 0.0}
+        
+        window = self.stats_window_s
+        p95 = stats.latency_ms.aggregate(window, "p95")
+        cost = stats.cost_usd.aggregate(window, "mean")
+        error_rate = stats.errors.aggregate(window, "mean")
+        return {
+            "p95_latency_ms": float(model.avg_latency_ms) if p95 is None else p95,
+            "cost": prior_cost if cost is None else cost,
+            "success_rate": prior_success if error_rate is None else 1.0 - error_rate,
+            "measured": 1.0,
+        }
+    
+    # ------------------------------------------------------------ circuit breaking
+    
+    def _update_breaker(self, model_type: ModelType, latency_ms: float, success: bool, now: float) -> None:
+        breaker = self.breakers[model_type]
+        
+        if breaker.state == CircuitState.HALF_OPEN:
+            healthy = success and (self.latency_slo_ms is None or latency_ms <= self.latency_slo_ms)
+            if healthy:
+                breaker.state = CircuitState.CLOSED
+                breaker.closed_since = now
+                breaker.reason = ""
+            else:
+                breaker.state = CircuitState.OPEN
+                breaker.opened_at = now
+            breaker.probe_in_flight = False
+            return
+        if breaker.state == CircuitState.OPEN:
+            return
+        
+        stats = self.stats.get((model_type.value, "*"))
+        window = min(self.breaker_window_s, now - breaker.closed_since)
+        if stats is None or stats.errors.aggregate(window, "count", now) < self.breaker_min_samples:
+            return
+        
+        error_rate = stats.errors.aggregate(window, "mean", now) or 0.0
+        recent_p95 = stats.latency_ms.aggregate(window, "p95", now)
+        baseline_p95 = stats.latency_ms.aggregate(self.stats_window_s, "p95", now)
+        limit = None
+        if baseline_p95 is not None:
+            limit = self.breaker_p95_factor * max(baseline_p95, self.models[model_type].avg_latency_ms)
+        if self.latency_slo_ms is not None:
+            slo_limit = self.breaker_p95_factor * self.latency_slo_ms
+            limit = slo_limit if limit is None else min(limit, slo_limit)
+        
+        reason = ""
+        if error_rate > self.breaker_error_rate:
+            reason = f"error rate {error_rate:.0%}"
+        elif recent_p95 is not None and limit is not None and recent_p95 > limit:
+            reason = f"p95 {recent_p95:.0f}ms > {limit:.0f}ms"
+        if reason:
+            breaker.state = CircuitState.OPEN
+            breaker.opened_at = now
+            breaker.reason = reason
+    
+    def is_available(self, model_type: ModelType, claim_probe: bool = False) -> bool:
+        """
+        False while the model's circuit is open (one probe allowed after
+        cooldown). A probe whose result is never recorded releases its claim
+        after breaker_probe_timeout_s, so the model can be probed again.
+        """
+        breaker = self.breakers[model_type]
+        with self._lock:
+            if breaker.state == CircuitState.CLOSED:
+                return True
+            now = time.time()
+            if breaker.state == CircuitState.OPEN:
+                if now - breaker.opened_at < self.breaker_cooldown_s:
+                    return False
+                breaker.state = CircuitState.HALF_OPEN
+            if breaker.probe_in_flight and now - breaker.probe_started_at < self.breaker_probe_timeout_s:
+                return False
+            breaker.probe_in_flight = False
+            if claim_probe:
+                breaker.probe_in_flight = True
+                breaker.probe_started_at = now
+            return True
+    
+    # ------------------------------------------------------------ routing
+    
+    def route(self, task: Task, latency_slo_ms: Optional[float] = None) -> RouteDecision:
+        """
+        Pick the model with the lowest expected cost (cost per call divided by
+        success rate, i.e. including retries) whose p95 latency meets the SLO,
+        among models that meet the task's quality floor and whose circuit is
+        not open. Without a model inside the SLO, the fastest eligible one wins.
+        """
+        slo = latency_slo_ms if latency_slo_ms is not None else self.latency_slo_ms
+        min_quality = MIN_QUALITY[task.complexity]
+        
+        candidates = []
+        for model_type, model in self.models.items():
+            if not self.is_available(model_type):
+                continue
+            estimate = self.estimate(model_type, task)
+            success = max(estimate["success_rate"], 0.05)
+            candidates.append(RouteDecision(
+                model_type=model_type,
+                expected_cost=estimate["cost"] / success,
+                p95_latency_ms=estimate["p95_latency_ms"],
+                success_rate=estimate["success_rate"],
+                measured=bool(estimate["measured"]),
+            ))
+        if not candidates:
+            # Every circuit is open: fall back to the best-quality model
+            model_type = max(self.models, key=lambda m: self.models[m].quality_score)
+            estimate = self.estimate(model_type, task)
+            return RouteDecision(model_type, estimate["cost"], estimate["p95_latency_ms"],
+                                 estimate["success_rate"], bool(estimate["measured"]), "all circuits open")
+        
+        qualified = [c for c in candidates if self.models[c.model_type].quality_score >= min_quality] or candidates
+        within_slo = [c for c in qualified if slo is None or c.p95_latency_ms <= slo]
+        if within_slo:
+            decision = min(within_slo, key=lambda c: (c.expected_cost, c.p95_latency_ms))
+            decision.reason = "cheapest within SLO" if slo is not None else "cheapest"
+        else:
+            decision = min(qualified, key=lambda c: (c.p95_latency_ms, c.expected_cost))
+            decision.reason = "no model within SLO; fastest"
+        self.is_available(decision.model_type, claim_probe=True)
+        return decision
 
     def select_model(self, task: Task) -> Tuple[ModelType, float]:
         """Select best model based on task complexity and requirements"""
         # Rank models by heuristic
         ranked = self.rank_models(task)
         
-        # Select based on complexity
+        # Select based on complexity: fast/cheap models for simple tasks,
+        # balanced for medium ones, high quality for complex ones
         if task.complexity == TaskComplexity.SIMPLE:
-            # Prefer fast/cheap models for simple tasks
-            for model_type, score in ranked:
-                if score >= 7.0:
-                    return model_type, score
+            min_score = 7.0
         elif task.complexity == TaskComplexity.MEDIUM:
-            # Balance quality and cost
-            for model_type, score in ranked:
-                if score >= 8.0:
-                    return model_type, score
+            min_score = 8.0
         else:  # COMPLEX
-            # Prefer high quality models
-            for model_type, score in ranked:
-                if score >= 9.0:
-                    return model_type, score
+            min_score = 9.0
         
         # Fallback to best available
-        return ranked[0][0], ranked[0][1]
+        model_type, score = next(((m, s) for m, s in ranked if s >= min_score), ranked[0])
+        
+        # Claim the half-open probe if the choice is being probed, as route() does
+        self.is_available(model_type, claim_probe=True)
+        return model_type, score
 
     def rank_models(self, task: Task) -> List[Tuple[ModelType, float]]:
         """Rank models based on quality, cost, latency"""
         rankings = []
         
         for model_type, model in self.models.items():
+            # Skip models whose circuit is open (keep them if nothing else is left)
+            if not self.is_available(model_type) and any(self.is_available(m) for m in self.models):
+                continue
+            
+            # Live p95 latency / cost per call when measured, constants otherwise
+            estimate = self.estimate(model_type, task)
+            avg_latency_ms = estimate["p95_latency_ms"]
+            cost_per_token = model.cost_per_token
+            if estimate["measured"]:
+                cost_per_token = estimate["cost"] * 1000 / max(task.prompt_length, 1)
+            
             # Calculate weighted score
             quality_weight = 0.5
             cost_weight = 0.3
@@ -116,8 +378,8 @@ class ModelRouter:
             # Calculate composite score
             score = (
                 quality_weight * model.quality_score +
-                cost_weight * (1.0 / (model.cost_per_token + 0.001)) +
-                latency_weight * (1.0 / (model.avg_latency_ms + 1)) +
+                cost_weight * (1.0 / (cost_per_token + 0.001)) +
+                latency_weight * (1.0 / (avg_latency_ms + 1)) +
                 2.0 * success_rate  # Learning bonus
             )
             
@@ -127,10 +389,16 @@ class ModelRouter:
         rankings.sort(key=lambda x: x[1], reverse=True)
         return rankings
 
-    def learn_from_result(self, task: Task, model_type: ModelType, success: bool):
-        """Update success rates based on task outcome"""
+    def learn_from_result(self, task: Task, model_type: ModelType, success: bool,
+                          latency_ms: Optional[float] = None, input_tokens: int = 0,
+                          output_tokens: int = 0, cost_usd: Optional[float] = None):
+        """Update success rates (and live measurements when given) from a task outcome"""
         if not self.learning_enabled:
             return
+        
+        if latency_ms is not None:
+            self.record_call(model_type, latency_ms, input_tokens, output_tokens,
+                             cost_usd, success, task_type=task.task_type)
             
         model = self.models[model_type]
         current_rate = model.success_rate.get(task.task_type, 0.5)
@@ -146,6 +414,36 @@ class ModelRouter:
     def get_all_models(self) -> Dict[ModelType, ModelInfo]:
         """Get all available models"""
         return self.models
+    
+    def get_live_stats(self) -> Dict[str, Dict]:
+        """Per-model live measurements and circuit state"""
+        result = {}
+        for model_type in self.models:
+            stats = self.stats.get((model_type.value, "*"))
+            window = self.stats_window_s
+            breaker = self.breakers[model_type]
+            result[model_type.value] = {
+                "calls": int(stats.errors.aggregate(window, "count")) if stats else 0,
+                "p50_latency_ms": stats.latency_ms.aggregate(window, "p50") if stats else None,
+                "p95_latency_ms": stats.latency_ms.aggregate(window, "p95") if stats else None,
+                "error_rate": stats.errors.aggregate(window, "mean") if stats else None,
+                "avg_cost_usd": stats.cost_usd.aggregate(window, "mean") if stats else None,
+                "circuit": breaker.state.value,
+                "circuit_reason": breaker.reason,
+            }
+        return result
+
+
+# Global router instance, fed by CostTracker and LLMClient measurements
+_router_instance: Optional[ModelRouter] = None
+
+
+def get_model_router() -> ModelRouter:
+    """Get global model router instance"""
+    global _router_instance
+    if _router_instance is None:
+        _router_instance = ModelRouter()
+    return _router_instance
 
 
 # CLI Command
@@ -189,9 +487,11 @@ if __name__ == "__main__":
     
     elif args.command == "stats":
         print("Model Statistics:")
+        live = router.get_live_stats()
         for model_type, model in router.get_all_models().items():
             print(f"  {model.name}:")
             print(f"    Quality: {model.quality_score}/10")
             print(f"    Cost: ${model.cost_per_token:.4f}/token")
             print(f"    Latency: {model.avg_latency_ms}ms")
-            print(f"    Success rates: {model.success_rate}")
\ No newline at end of file
+            print(f"    Success rates: {model.success_rate}")
+            print(f"    Live: {live[model_type.value]}")
\ No newline at end of file
@@ -1,6 +1,10 @@
 from typing import Any, Dict, List, Optional, Tuple
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
+import ast
+import asyncio
+import inspect
+import re
 import time
 from .llm_client import LLMClient
 from .mcp_client import MCPClient
@@ -14,12 +18,32 @@ class ReActTurn(Enum):
     REFLECTION = "reflection"
 
 
+@dataclass
+class ToolCallResult:
+    name: str
+    params: Dict[str, Any]
+    output: Any
+    error: Optional[str] = None
+    duration_ms: float = 0.0
+
+
 @dataclass
 class ReActStep:
     turn: ReActTurn
     input: str
     output: str
     timestamp: float
+    duration_ms: float = 0.0
+    tool_calls: List[ToolCallResult] = field(default_factory=list)
+    merged: bool = False  # observation and reflection answered in one LLM call
+
+
+# Markers the model may emit in its action/observation output
+SKIP_OBSERVATION = "SKIP_OBSERVATION"  # action result speaks for itself
+MERGE_REFLECTION = "MERGE_REFLECTION"  # observe and reflect in a single call
+SKIP_REFLECTION = "SKIP_REFLECTION"    # go straight back to reasoning
+
+_TOOL_CALL_RE = re.compile(r"call tool\s+['\"]([^'\"]+)['\"]", re.IGNORECASE)
 
 
 class ReActLoop:
@@ -28,15 +52,22 @@ class ReActLoop:
         llm_client: LLMClient,
         mcp_client: MCPClient,
         max_turns: int = 5,
-        reasoning_model: str = "trinity"
+        reasoning_model: str = "trinity",
+        max_parallel_tools: int = 4,
+        allow_turn_merging: bool = True
     ):
         self.llm_client = llm_client
         self.mcp_client = mcp_client
         self.max_turns = max_turns
         self.reasoning_model = reasoning_model
+        self.max_parallel_tools = max_parallel_tools
+        self.allow_turn_merging = allow_turn_merging
         self.history: List[ReActStep] = []
         self.current_task: Optional[TaskState] = None
         self.current_turn = 0
+        # MCPClient is async; keep one private loop so its HTTP pool stays bound to it
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending_tool_calls: List[ToolCallResult] = []
 
     def run_react_cycle(
         self,
@@ -62,29 +93,45 @@ class ReActLoop:
                 self.current_turn += 1
                 
                 # Reasoning turn
+                started = time.perf_counter()
                 reasoning_output = self._reasoning_turn(task)
-                self._record_step(ReActTurn.REASONING, task.description, reasoning_output)
+                self._record_step(ReActTurn.REASONING, task.description, reasoning_output, started)
                 
                 if self._should_stop(reasoning_output):
                     break
                 
-                # Action turn
+                # Action turn (independent tool calls run concurrently)
+                started = time.perf_counter()
                 action_output = self._action_turn(reasoning_output)
-                self._record_step(ReActTurn.ACTION, reasoning_output, action_output)
+                self._record_step(ReActTurn.ACTION, reasoning_output, action_output, started)
                 
                 if self._should_stop(action_output):
                     break
                 
-                # Observation turn
-                observation_output = self._observation_turn(action_output)
-                self._record_step(ReActTurn.OBSERVATION, action_output, observation_output)
-                
-                if self._should_stop(observation_output):
-                    break
+                # Observation turn (skipped or merged into reflection on request)
+                observation_output = action_output
+                merge = self._signals(action_output, MERGE_REFLECTION)
+                if not self._signals(action_output, SKIP_OBSERVATION) and not merge:
+                    started = time.perf_counter()
+                    observation_output = self._observation_turn(action_output)
+                    self._record_step(ReActTurn.OBSERVATION, action_output, observation_output, started)
+                    
+                    if self._should_stop(observation_output):
+                        break
+                    merge = self._signals(observation_output, MERGE_REFLECTION)
                 
-                # Reflection turn
-                reflection_output = self._reflection_turn(observation_output)
-                self._record_step(ReActTurn.REFLECTION, observation_output, reflection_output)
+                # Reflection turn (skipped on request: the observation feeds
+                # the next reasoning turn directly)
+                if self._signals(observation_output, SKIP_REFLECTION):
+                    reflection_output = observation_output
+                else:
+                    started = time.perf_counter()
+                    if merge:
+                        reflection_output = self._observe_and_reflect_turn(observation_output)
+                    else:
+                        reflection_output = self._reflection_turn(observation_output)
+                    self._record_step(ReActTurn.REFLECTION, observation_output, reflection_output,
+                                      started, merged=merge)
                 
                 if self._should_stop(reflection_output):
                     break
@@ -98,10 +145,12 @@ class ReActLoop:
             result.metrics = {
                 "turns_executed": self.current_turn,
                 "total_duration": time.time() - task.created_at,
-                "final_status": result.status
+                "final_status": result.status,
+                **self.timing_summary()
             }
             
         except Exception as e:
+            self._pending_tool_calls = []
             result.status = "error"
             result.error = str(e)
             result.metrics = {
@@ -120,28 +169,36 @@ class ReActLoop:
         self.current_turn += 1
         
         # Determine next turn based on history
+        started = time.perf_counter()
         if not self.history:
             # First turn: reasoning
             output = self._reasoning_turn(self.current_task)
-            self._record_step(ReActTurn.REASONING, self.current_task.description, output)
+            self._record_step(ReActTurn.REASONING, self.current_task.description, output, started)
             return output
         
         last_turn = self.history[-1].turn
+        last_output = self.history[-1].output
         
         if last_turn == ReActTurn.REASONING:
-            output = self._action_turn(self.history[-1].output)
-            self._record_step(ReActTurn.ACTION, self.history[-1].output, output)
+            output = self._action_turn(last_output)
+            self._record_step(ReActTurn.ACTION, last_output, output, started)
+        elif last_turn == ReActTurn.ACTION and self._signals(last_output, SKIP_OBSERVATION, MERGE_REFLECTION):
+            merge = self._signals(last_output, MERGE_REFLECTION)
+            output = (self._observe_and_reflect_turn(last_output) if merge
+                      else self._reflection_turn(last_output))
+            self._record_step(ReActTurn.REFLECTION, last_output, output, started, merged=merge)
+            self.current_task.description = output
         elif last_turn == ReActTurn.ACTION:
-            output = self._observation_turn(self.history[-1].output)
-            self._record_step(ReActTurn.OBSERVATION, self.history[-1].output, output)
+            output = self._observation_turn(last_output)
+            self._record_step(ReActTurn.OBSERVATION, last_output, output, started)
         elif last_turn == ReActTurn.OBSERVATION:
-            output = self._reflection_turn(self.history[-1].output)
-            self._record_step(ReActTurn.REFLECTION, self.history[-1].output, output)
+            output = self._reflection_turn(last_output)
+            self._record_step(ReActTurn.REFLECTION, last_output, output, started)
             # Update task description for next reasoning
             self.current_task.description = output
         elif last_turn == ReActTurn.REFLECTION:
             output = self._reasoning_turn(self.current_task)
-            self._record_step(ReActTurn.REASONING, self.current_task.description, output)
+            self._record_step(ReActTurn.REASONING, self.current_task.description, output, started)
         
         return output
 
@@ -179,17 +236,65 @@ Reasoning (do not execute actions yet):"""
 
 Reasoning: {reasoning}
 
-ACTION: What specific action should be executed? If tools are needed, specify which MCP tools to use and with what parameters."""
+ACTION: What specific action should be executed? If tools are needed, specify which MCP tools to use and with what parameters. Independent tool calls (e.g. reading several files) can be listed together, one per line: call tool 'name' with params {{...}}"""
+        if self.allow_turn_merging:
+            prompt += f"""
+If the tool results need no interpretation, add {SKIP_OBSERVATION}; to observe and reflect in one step, add {MERGE_REFLECTION}."""
         
         response = self.llm_client.generate(prompt, model=self.reasoning_model)
         
-        # Execute action via MCP if specified
-        if "use tool" in response.lower():
-            tool_call = self._parse_tool_call(response)
-            if tool_call:
-                return self.mcp_client.call_tool(tool_call[0], tool_call[1])
+        # Execute all requested tool calls via MCP, concurrently
+        tool_calls = self._parse_tool_calls(response)
+        if not tool_calls:
+            return response
         
-        return response
+        results = self._execute_tool_calls(tool_calls)
+        self._pending_tool_calls = results
+        if len(results) == 1 and results[0].error is None and not self._signals(
+                response, SKIP_OBSERVATION, MERGE_REFLECTION):
+            return results[0].output
+        
+        output = "\n\n".join(
+            f"[{r.name}] " + (f"ERROR: {r.error}" if r.error else str(r.output)) for r in results
+        )
+        # Keep the model's merge/skip markers with the combined tool output
+        markers = [m for m in (SKIP_OBSERVATION, MERGE_REFLECTION) if self._signals(response, m)]
+        return "\n".join([output, *markers])
+    
+    def _execute_tool_calls(self, tool_calls: List[Tuple[str, Dict]]) -> List[ToolCallResult]:
+        """
+        Run tool calls concurrently on the private event loop. Only for
+        synchronous callers: async code awaits _execute_tool_calls_async()
+        (or runs the whole cycle with asyncio.to_thread).
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            raise RuntimeError("ReActLoop tool calls cannot block a running event loop; "
+                               "await _execute_tool_calls_async() instead")
+        if self._loop is None or self._loop.is_closed():
+            self._loop = asyncio.new_event_loop()
+        return self._loop.run_until_complete(self._execute_tool_calls_async(tool_calls))
+    
+    async def _execute_tool_calls_async(self, tool_calls: List[Tuple[str, Dict]]) -> List[ToolCallResult]:
+        """Run tool calls concurrently (at most max_parallel_tools in flight)"""
+        async def timed(name: str, params: Dict, semaphore: asyncio.Semaphore) -> ToolCallResult:
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    output = self.mcp_client.call(name, params)
+                    if inspect.isawaitable(output):
+                        output = await output
+                    error = None
+                except Exception as e:
+                    output, error = None, str(e)
+                return ToolCallResult(name, params, output, error,
+                                      (time.perf_counter() - started) * 1000)
+        
+        semaphore = asyncio.Semaphore(max(1, self.max_parallel_tools))
+        return list(await asyncio.gather(*(timed(n, p, semaphore) for n, p in tool_calls)))
 
     def _observation_turn(self, action_result: str) -> str:
         """Observe the results of the action."""
@@ -213,34 +318,98 @@ REFLECTION: What did we learn? Should we continue, adjust approach, or stop? Pro
         response = self.llm_client.generate(prompt, model=self.reasoning_model)
         return response
 
-    def _record_step(self, turn: ReActTurn, input: str, output: str):
+    def _observe_and_reflect_turn(self, action_result: str) -> str:
+        """Observe the action results and reflect on them in one LLM call."""
+        prompt = f"""Observe the results of the action taken and reflect on them. 
+
+ACTION RESULT: {action_result}
+
+OBSERVATION AND REFLECTION: What happened, and what did we learn? Should we continue, adjust approach, or stop? Provide updated task description for next iteration."""
+        
+        response = self.llm_client.generate(prompt, model=self.reasoning_model)
+        return response
+
+    def _record_step(self, turn: ReActTurn, input: str, output: str,
+                     started: Optional[float] = None, merged: bool = False):
         """Record a step in the ReAct history."""
+        tool_calls, self._pending_tool_calls = self._pending_tool_calls, []
         self.history.append(ReActStep(
             turn=turn,
             input=input,
             output=output,
-            timestamp=time.time()
+            timestamp=time.time(),
+            duration_ms=(time.perf_counter() - started) * 1000 if started is not None else 0.0,
+            tool_calls=tool_calls,
+            merged=merged
         ))
 
-    def _parse_tool_call(self, response: str) -> Optional[Tuple[str, Dict]]:
-        """Parse tool call from LLM response."""
-        # Simple parser for tool calls like "call tool 'search' with params {'query': 'test'}"""
-        if "call tool" in response.lower():
-            try:
-                parts = response.split("call tool")
-                if len(parts) > 1:
-                    tool_part = parts[1].strip()
-                    tool_name = tool_part.split("'")[1]
-                    params_part = tool_part.split("with params")
-                    if len(params_part) > 1:
-                        params_str = params_part[1].strip().strip("'")
-                        # Simple eval for params (in production, use safer parsing)
-                        params = eval(params_str)
-                        return tool_name, params
-            except:
-                pass
+    def timing_summary(self) -> Dict[str, Any]:
+        """Per-turn-type durations and tool call counts for the current history."""
+        per_turn: Dict[str, float] = {}
+        for step in self.history:
+            per_turn[step.turn.value] = per_turn.get(step.turn.value, 0.0) + step.duration_ms
+        tool_calls = [call for step in self.history for call in step.tool_calls]
+        return {
+            "turn_durations_ms": per_turn,
+            "tool_calls": len(tool_calls),
+            "tool_errors": sum(1 for call in tool_calls if call.error),
+            "tool_time_ms": sum(call.duration_ms for call in tool_calls),
+            "merged_turns": sum(1 for step in self.history if step.merged),
+        }
+
+    def _signals(self, output: Any, *markers: str) -> bool:
+        """True when merging is enabled and the model emitted one of the markers."""
+        return self.allow_turn_merging and isinstance(output, str) and any(m in output for m in markers)
+
+    def _parse_tool_calls(self, response: str) -> List[Tuple[str, Dict]]:
+        """Parse every tool call like "call tool 'search' with params {'query': 'test'}"."""
+        calls = []
+        for match in _TOOL_CALL_RE.finditer(response):
+            rest = response[match.end():]
+            params: Dict = {}
+            with_params = re.match(r"\s*with params\s*", rest, re.IGNORECASE)
+            if with_params:
+                literal = self._braced(rest[with_params.end():])
+                try:
+                    params = ast.literal_eval(literal) if literal else None
+                except (ValueError, SyntaxError):
+                    params = None
+                if not isinstance(params, dict):
+                    continue
+            calls.append((match.group(1), params))
+        return calls
+
+    @staticmethod
+    def _braced(text: str) -> Optional[str]:
+        """Return the balanced {...} literal at the start of text."""
+        if not text.startswith("{"):
+            return None
+        depth = 0
+        quote = None
+        for i, char in enumerate(text):
+            if quote:
+                if char == quote and text[i - 1] != "\\":
+                    quote = None
+            elif char in "'\"":
+                quote = char
+            elif char == "{":
+                depth += 1
+            elif char == "}":
+                depth -= 1
+                if depth == 0:
+                    return text[:i + 1]
         return None
 
+    def _parse_tool_call(self, response: str) -> Optional[Tuple[str, Dict]]:
+        """Parse the first tool call from LLM response."""
+        calls = self._parse_tool_calls(response)
+        return calls[0] if calls else None
+
+    def close(self):
+        """Close the private event loop used for tool calls."""
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.close()
+
     def _should_stop(self, output: str) -> bool:
         """Determine if loop should stop based on output."""
         stop_keywords = ["done", "complete", "finished", "stop", "exit"]
@@ -1,26 +1,72 @@
+import json
 import sqlite3
 import asyncio
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import List, Optional, Dict, Any
+from typing import AsyncIterator, List, Optional, Dict, Any
+from dataclasses import dataclass, field
 from datetime import datetime
-from aiosqlite import connect, Connection
 from ..storage import get_db_path
+from .storage_engine import StorageEngine, StorageConfig, get_storage_engine, close_storage_engines
+from .metrics_rollup import ensure_rollups, prune_raw_metrics
+
+
+@dataclass
+class TaskState:
+    """In-flight task handed to the ReAct loop and the self-healer"""
+    task_id: str
+    task_type: str
+    description: str
+    created_at: float
+    priority: str = "medium"
+
+
+@dataclass
+class TaskResult:
+    """Outcome of running a task"""
+    task_id: str
+    status: str
+    output: Any = ""
+    error: Optional[str] = None
+    metrics: Dict[str, Any] = field(default_factory=dict)
 
 
 class Database:
-    def __init__(self):
+    """
+    SQLite-backed task/log/metric storage. Raw metric rows are kept until
+    pruned explicitly (prune_metrics / `az metrics metrics-prune`), unless
+    metrics_retention_days opts in to pruning on initialize.
+    """
+
+    def __init__(self, config: Optional[StorageConfig] = None,
+                 metrics_retention_days: Optional[int] = None,
+                 hourly_retention_days: int = 30):
         self.db_path = get_db_path()
+        self.config = config
+        self.metrics_retention_days = metrics_retention_days
+        self.hourly_retention_days = hourly_retention_days
         self._initialized = False
+
+    async def _engine(self) -> StorageEngine:
+        """Shared pooled engine (writer + readers + group commit) for this loop"""
+        return await get_storage_engine(self.db_path, self.config)
+
+    @asynccontextmanager
+    async def _reader(self) -> AsyncIterator[Any]:
+        """Pooled reader that sees every write queued before it"""
+        engine = await self._engine()
+        await engine.flush()
+        async with engine.reader() as db:
+            yield db
     
     async def initialize(self) -> None:
         """Initialize database schema"""
         if self._initialized:
             return
             
-        async with connect(self.db_path) as db:
-            # Enable WAL mode for better concurrency
-            await db.execute("PRAGMA journal_mode=WAL")
-            await db.execute("PRAGMA foreign_keys=ON")
+        engine = await self._engine()
+        async with engine.transaction() as db:
+            # WAL mode and pragmas are applied per connection by the engine
             
             # Create tables
             await db.execute("""
@@ -105,79 +151,85 @@ class Database:
                 CREATE INDEX IF NOT EXISTS idx_metrics_model ON metrics(model)
             """)
             
-            await db.commit()
+            # Hourly/daily/task/model rollups maintained by an insert trigger
+            await ensure_rollups(db)
         
         self._initialized = True
+        if self.metrics_retention_days is not None:
+            await self.prune_metrics(self.metrics_retention_days)
+    
+    async def prune_metrics(self, retention_days: int) -> int:
+        """Delete raw metrics older than retention_days (rollups are kept)"""
+        engine = await self._engine()
+        async with engine.transaction() as db:
+            return await prune_raw_metrics(
+                db, retention_days, min(self.hourly_retention_days, retention_days)
+            )
     
     async def create_task(self, task_id: str, command: str, model: Optional[str] = None) -> None:
         """Create a new task"""
-        async with connect(self.db_path) as db:
-            await db.execute(
-                """
-                INSERT INTO tasks (id, command, status, model) 
-                VALUES (?, ?, 'created', ?)
-                """,
-                (task_id, command, model)
-            )
-            await db.commit()
+        engine = await self._engine()
+        await engine.write(
+            """
+            INSERT INTO tasks (id, command, status, model) 
+            VALUES (?, ?, 'created', ?)
+            """,
+            (task_id, command, model)
+        )
     
     async def update_task_status(self, task_id: str, status: str, 
                                 error_message: Optional[str] = None) -> None:
         """Update task status"""
-        async with connect(self.db_path) as db:
-            await db.execute(
-                """
-                UPDATE tasks 
-                SET status = ?, error_message = ?, updated_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-                """,
-                (status, error_message, task_id)
-            )
-            await db.commit()
+        engine = await self._engine()
+        await engine.write(
+            """
+            UPDATE tasks 
+            SET status = ?, error_message = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+            """,
+            (status, error_message, task_id)
+        )
     
     async def start_task(self, task_id: str) -> None:
         """Mark task as started"""
-        async with connect(self.db_path) as db:
-            await db.execute(
-                """
-                UPDATE tasks 
-                SET status = 'running', started_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-                """,
-                (task_id,)
-            )
-            await db.commit()
+        engine = await self._engine()
+        await engine.write(
+            """
+            UPDATE tasks 
+            SET status = 'running', started_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+            """,
+            (task_id,)
+        )
     
     async def complete_task(self, task_id: str, cost_usd: float = 0.0) -> None:
         """Mark task as completed"""
-        async with connect(self.db_path) as db:
-            await db.execute(
-                """
-                UPDATE tasks 
-                SET status = 'completed', completed_at = CURRENT_TIMESTAMP, 
-                    updated_at = CURRENT_TIMESTAMP, cost_usd = ?
-                WHERE id = ?
-                """,
-                (cost_usd, task_id)
-            )
-            await db.commit()
+        engine = await self._engine()
+        await engine.write(
+            """
+            UPDATE tasks 
+            SET status = 'completed', completed_at = CURRENT_TIMESTAMP, 
+                updated_at = CURRENT_TIMESTAMP, cost_usd = ?
+            WHERE id = ?
+            """,
+            (cost_usd, task_id)
+        )
     
     async def fail_task(self, task_id: str, error_message: str) -> None:
         """Mark task as failed"""
-        async with connect(self.db_path) as db:
-            await db.execute(
-                """
-                UPDATE tasks 
-                SET status = 'failed', error_message = ?, updated_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-                """,
-                (error_message, task_id)
-            )
-            await db.commit()
+        engine = await self._engine()
+        await engine.write(
+            """
+            UPDATE tasks 
+            SET status = 'failed', error_message = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+            """,
+            (error_message, task_id)
+        )
     
     async def get_task(self, task_id: str) -> Optional[Dict]:
         """Get task details"""
-        async with connect(self.db_path) as db:
+        async with self._reader() as db:
             cursor = await db.execute(
                 """
                 SELECT id, command, status, created_at, updated_at, started_at, 
@@ -208,7 +260,7 @@ class Database:
     async def get_tasks(self, limit: int = 50, offset: int = 0, 
                        status: Optional[str] = None) -> List[Dict]:
         """Get list of tasks"""
-        async with connect(self.db_path) as db:
+        async with self._reader() as db:
             query = """
                 SELECT id, command, status, created_at, updated_at, started_at, 
                        completed_at, error_message, model, cost_usd
@@ -241,7 +293,7 @@ class Database:
     
     async def get_task_count(self, status: Optional[str] = None) -> int:
         """Get count of tasks"""
-        async with connect(self.db_path) as db:
+        async with self._reader() as db:
             query = "SELECT COUNT(*) FROM tasks"
             params = []
             
@@ -254,22 +306,22 @@ class Database:
             return row[0] if row else 0
     
     async def add_log(self, task_id: str, level: str, message: str, 
-                     metadata: Optional[Dict] = None) -> None:
-        """Add log entry"""
-        async with connect(self.db_path) as db:
-            await db.execute(
-                """
-                INSERT INTO logs (task_id, level, message, metadata)
-                VALUES (?, ?, ?, ?)
-                """,
-                (task_id, level, message, json.dumps(metadata) if metadata else None)
-            )
-            await db.commit()
+                     metadata: Optional[Dict] = None, wait: bool = True) -> None:
+        """Add log entry (wait=False queues it for the next group commit)"""
+        engine = await self._engine()
+        write = engine.write if wait else engine.write_nowait
+        await write(
+            """
+            INSERT INTO logs (task_id, level, message, metadata)
+            VALUES (?, ?, ?, ?)
+            """,
+            (task_id, level, message, json.dumps(metadata) if metadata else None)
+        )
     
     async def get_logs(self, task_id: str, limit: int = 100, 
                       offset: int = 0) -> List[Dict]:
         """Get logs for a task"""
-        async with connect(self.db_path) as db:
+        async with self._reader() as db:
             cursor = await db.execute(
                 """
                 SELECT id, level, message, timestamp, metadata
@@ -292,7 +344,7 @@ class Database:
     
     async def get_log_count(self, task_id: str) -> int:
         """Get count of logs for a task"""
-        async with connect(self.db_path) as db:
+        async with self._reader() as db:
             cursor = await db.execute(
                 "SELECT COUNT(*) FROM logs WHERE task_id = ?",
                 (task_id,)
@@ -301,21 +353,21 @@ class Database:
             return row[0] if row else 0
     
     async def add_state_snapshot(self, task_id: str, state_type: str, 
-                                state_data: Dict) -> None:
-        """Add state snapshot"""
-        async with connect(self.db_path) as db:
-            await db.execute(
-                """
-                INSERT INTO state_snapshots (task_id, state_type, state_data)
-                VALUES (?, ?, ?)
-                """,
-                (task_id, state_type, json.dumps(state_data))
-            )
-            await db.commit()
+                                state_data: Dict, wait: bool = True) -> None:
+        """Add state snapshot (wait=False queues it for the next group commit)"""
+        engine = await self._engine()
+        write = engine.write if wait else engine.write_nowait
+        await write(
+            """
+            INSERT INTO state_snapshots (task_id, state_type, state_data)
+            VALUES (?, ?, ?)
+            """,
+            (task_id, state_type, json.dumps(state_data))
+        )
     
     async def get_state_snapshots(self, task_id: str) -> List[Dict]:
         """Get state snapshots for a task"""
-        async with connect(self.db_path) as db:
+        async with self._reader() as db:
             cursor = await db.execute(
                 """
                 SELECT id, state_type, state_data, created_at
@@ -335,9 +387,9 @@ class Database:
             } for row in rows]
     
     async def get_metrics(self, task_id: str = None, 
-                         model: Optional[str] = None) -> List[Dict]:
-        """Get metrics"""
-        async with connect(self.db_path) as db:
+                         model: Optional[str] = None, limit: int = 1000) -> List[Dict]:
+        """Get the most recent raw metrics (use the summary methods for totals)"""
+        async with self._reader() as db:
             query = """
                 SELECT id, task_id, model, input_tokens, output_tokens, 
                        cost_usd, latency_ms, timestamp, retry_count
@@ -356,7 +408,8 @@ class Database:
             if conditions:
                 query += " WHERE " + " AND ".join(conditions)
             
-            query += " ORDER BY timestamp DESC"
+            query += " ORDER BY timestamp DESC LIMIT ?"
+            params.append(limit)
             
             cursor = await db.execute(query, tuple(params))
             rows = await cursor.fetchall()
@@ -374,37 +427,30 @@ class Database:
             } for row in rows]
     
     async def get_metrics_summary(self, days: int = 7) -> Dict:
-        """Get metrics summary"""
-        async with connect(self.db_path) as db:
-            # Total cost
-            cursor = await db.execute(
-                """
-                SELECT SUM(cost_usd) as total_cost, COUNT(*) as total_requests,
-                       AVG(latency_ms) as avg_latency
-                FROM metrics 
-                WHERE timestamp >= datetime('now', ?)
-                """,
-                (f"-{days} days",)
-            )
-            total_row = await cursor.fetchone()
-            
-            # Cost by model
+        """Get metrics summary (from hourly rollups, daily beyond their retention)"""
+        if days <= self.hourly_retention_days:
+            table, key, start = "metrics_hourly", "bucket", "strftime('%Y-%m-%d %H:00:00', 'now', ?)"
+        else:
+            table, key, start = "metrics_daily", "day", "date('now', ?)"
+        async with self._reader() as db:
             cursor = await db.execute(
-                """
-                SELECT model, SUM(cost_usd) as total_cost, COUNT(*) as request_count
-                FROM metrics 
-                WHERE timestamp >= datetime('now', ?)
+                f"""
+                SELECT model, SUM(cost_usd), SUM(request_count), SUM(latency_ms_sum)
+                FROM {table} 
+                WHERE {key} >= {start}
                 GROUP BY model
-                ORDER BY total_cost DESC
+                ORDER BY SUM(cost_usd) DESC
                 """,
                 (f"-{days} days",)
             )
             model_costs = await cursor.fetchall()
             
+            total_requests = sum(row[2] for row in model_costs)
+            latency_sum = sum(row[3] for row in model_costs)
             return {
-                "total_cost": total_row[0] if total_row[0] else 0.0,
-                "total_requests": total_row[1] if total_row[1] else 0,
-                "avg_latency": total_row[2] if total_row[2] else 0,
+                "total_cost": sum(row[1] for row in model_costs),
+                "total_requests": total_requests,
+                "avg_latency": latency_sum / total_requests if total_requests else 0,
                 "model_breakdown": [{
                     "model": row[0],
                     "total_cost": row[1],
@@ -413,19 +459,19 @@ class Database:
             }
     
     async def get_daily_metrics(self, days: int = 7) -> List[Dict]:
-        """Get daily metrics"""
-        async with connect(self.db_path) as db:
+        """Get daily metrics (from daily rollups)"""
+        async with self._reader() as db:
             cursor = await db.execute(
                 """
                 SELECT 
-                    DATE(timestamp) as date,
+                    day,
                     SUM(cost_usd) as total_cost,
-                    COUNT(*) as request_count,
-                    AVG(latency_ms) as avg_latency
-                FROM metrics 
-                WHERE timestamp >= datetime('now', ?)
-                GROUP BY DATE(timestamp)
-                ORDER BY date DESC
+                    SUM(request_count) as request_count,
+                    SUM(latency_ms_sum) * 1.0 / SUM(request_count) as avg_latency
+                FROM metrics_daily 
+                WHERE day >= date('now', ?)
+                GROUP BY day
+                ORDER BY day DESC
                 LIMIT ?
                 """,
                 (f"-{days} days", days)
@@ -454,8 +500,8 @@ async def get_database() -> Database:
 
 
 async def close_database() -> None:
-    """Close database connection"""
+    """Flush pending writes and close the pooled connections"""
     global _db_instance
     if _db_instance:
-        # No explicit close needed for aiosqlite
+        await close_storage_engines()
         _db_instance = None
\ No newline at end of file
@@ -0,0 +1,251 @@
+import asyncio
+import logging
+import weakref
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from aiosqlite import connect, Connection
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StorageConfig:
+    """Connection pool and group-commit settings"""
+    readers: int = 4
+    commit_window_ms: float = 2.0
+    max_batch_size: int = 500
+    busy_timeout_ms: int = 5000
+    cache_size_kb: int = 16384
+    mmap_size: int = 256 * 1024 * 1024
+    cached_statements: int = 256
+    synchronous: str = "NORMAL"
+
+
+@dataclass
+class _WriteRequest:
+    sql: str
+    params: Tuple[Any, ...]
+    future: Optional[asyncio.Future] = None
+
+
+class StorageEngine:
+    """
+    Long-lived SQLite connections for az_os.
+
+    One writer connection owns every write; N reader connections serve
+    queries concurrently (WAL lets readers proceed during writes). Writes
+    are queued and a background task commits whatever has accumulated in a
+    short window as a single transaction, so bursts of log/metric/snapshot
+    inserts share one commit instead of paying connect + commit each.
+    Statements are reused through sqlite3's per-connection statement cache.
+    """
+
+    def __init__(self, db_path: str, config: Optional[StorageConfig] = None):
+        self.db_path = db_path
+        self.config = config or StorageConfig()
+        self._writer: Optional[Connection] = None
+        self._readers: "asyncio.Queue[Connection]" = asyncio.Queue()
+        self._reader_connections: List[Connection] = []
+        self._write_queue: "asyncio.Queue[_WriteRequest]" = asyncio.Queue()
+        self._writer_task: Optional[asyncio.Task] = None
+        self._started = False
+        self._closed = False
+        self._start_lock = asyncio.Lock()
+        self._exclusive = asyncio.Lock()
+        self.stats = {"transactions": 0, "statements": 0, "failed_statements": 0}
+
+    async def _open(self, read_only: bool = False) -> Connection:
+        db = await connect(self.db_path, cached_statements=self.config.cached_statements)
+        await db.execute(f"PRAGMA busy_timeout={int(self.config.busy_timeout_ms)}")
+        await db.execute("PRAGMA journal_mode=WAL")
+        await db.execute(f"PRAGMA synchronous={self.config.synchronous}")
+        await db.execute("PRAGMA foreign_keys=ON")
+        await db.execute("PRAGMA temp_store=MEMORY")
+        await db.execute(f"PRAGMA cache_size=-{int(self.config.cache_size_kb)}")
+        await db.execute(f"PRAGMA mmap_size={int(self.config.mmap_size)}")
+        if read_only:
+            await db.execute("PRAGMA query_only=ON")
+        return db
+
+    async def start(self) -> None:
+        """Open the writer and reader connections and start the commit loop"""
+        async with self._start_lock:
+            if self._started:
+                return
+            self._writer = await self._open()
+            for _ in range(max(1, self.config.readers)):
+                reader = await self._open(read_only=True)
+                self._reader_connections.append(reader)
+                self._readers.put_nowait(reader)
+            self._writer_task = asyncio.create_task(self._commit_loop())
+            self._started = True
+
+    async def close(self) -> None:
+        """Commit pending writes and close all connections"""
+        if not self._started or self._closed:
+            return
+        self._closed = True
+        await self.flush()
+        if self._writer_task:
+            self._writer_task.cancel()
+            await asyncio.gather(self._writer_task, return_exceptions=True)
+        for reader in self._reader_connections:
+            await reader.close()
+        await self._writer.close()
+
+    # ------------------------------------------------------------------ reads
+
+    @asynccontextmanager
+    async def reader(self) -> AsyncIterator[Connection]:
+        """Borrow a reader connection"""
+        await self.start()
+        db = await self._readers.get()
+        try:
+            yield db
+        finally:
+            self._readers.put_nowait(db)
+
+    async def fetchall(self, sql: str, params: Sequence[Any] = ()) -> List[Tuple]:
+        async with self.reader() as db:
+            cursor = await db.execute(sql, tuple(params))
+            return await cursor.fetchall()
+
+    async def fetchone(self, sql: str, params: Sequence[Any] = ()) -> Optional[Tuple]:
+        async with self.reader() as db:
+            cursor = await db.execute(sql, tuple(params))
+            return await cursor.fetchone()
+
+    # ----------------------------------------------------------------- writes
+
+    async def write(self, sql: str, params: Sequence[Any] = ()) -> None:
+        """Queue a write and wait until its transaction is committed"""
+        await self.start()
+        future = asyncio.get_running_loop().create_future()
+        self._write_queue.put_nowait(_WriteRequest(sql, tuple(params), future))
+        await future
+
+    async def write_nowait(self, sql: str, params: Sequence[Any] = ()) -> None:
+        """Queue a write without waiting for the commit (errors are logged)"""
+        await self.start()
+        self._write_queue.put_nowait(_WriteRequest(sql, tuple(params)))
+
+    async def flush(self) -> None:
+        """Wait until every write queued so far is committed"""
+        if not self._started:
+            return
+        await self._write_queue.join()
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[Connection]:
+        """
+        Exclusive use of the writer connection (schema changes, multi-statement
+        work). Pending queued writes are committed first.
+        """
+        await self.start()
+        await self.flush()
+        async with self._exclusive:
+            try:
+                yield self._writer
+                await self._writer.commit()
+            except BaseException:
+                await self._writer.rollback()
+                raise
+
+    async def _commit_loop(self) -> None:
+        window = self.config.commit_window_ms / 1000.0
+        while True:
+            first = await self._write_queue.get()
+            batch = [first]
+            if window > 0:
+                await asyncio.sleep(window)
+            while len(batch) < self.config.max_batch_size and not self._write_queue.empty():
+                batch.append(self._write_queue.get_nowait())
+
+            try:
+                async with self._exclusive:
+                    await self._commit_batch(batch)
+            except Exception as e:
+                # e.g. the rollback itself failed: settle every waiter rather
+                # than letting the loop die with writes and flush() hanging
+                logger.error(f"Commit loop error: {e}")
+                for request in batch:
+                    if request.future is None or not request.future.done():
+                        self._fail(request, e)
+            finally:
+                for _ in batch:
+                    self._write_queue.task_done()
+
+    async def _commit_batch(self, batch: List[_WriteRequest]) -> None:
+        try:
+            await self._execute_grouped(batch)
+            await self._writer.commit()
+            self.stats["transactions"] += 1
+            self.stats["statements"] += len(batch)
+            for request in batch:
+                if request.future is not None and not request.future.done():
+                    request.future.set_result(None)
+            return
+        except Exception as e:
+            await self._writer.rollback()
+            if len(batch) == 1:
+                self._fail(batch[0], e)
+                return
+
+        # Isolate the failing statement(s): retry one transaction per request
+        for request in batch:
+            try:
+                await self._writer.execute(request.sql, request.params)
+                await self._writer.commit()
+                self.stats["transactions"] += 1
+                self.stats["statements"] += 1
+                if request.future is not None and not request.future.done():
+                    request.future.set_result(None)
+            except Exception as e:
+                await self._writer.rollback()
+                self._fail(request, e)
+
+    async def _execute_grouped(self, batch: List[_WriteRequest]) -> None:
+        """Execute in order, using executemany for runs of the same statement"""
+        i = 0
+        while i < len(batch):
+            j = i + 1
+            while j < len(batch) and batch[j].sql == batch[i].sql:
+                j += 1
+            if j - i > 1:
+                await self._writer.executemany(batch[i].sql, [r.params for r in batch[i:j]])
+            else:
+                await self._writer.execute(batch[i].sql, batch[i].params)
+            i = j
+
+    def _fail(self, request: _WriteRequest, error: Exception) -> None:
+        self.stats["failed_statements"] += 1
+        if request.future is not None and not request.future.done():
+            request.future.set_exception(error)
+        else:
+            logger.error(f"Queued write failed: {error}")
+
+
+# One engine per (event loop, database path): aiosqlite connections are
+# bound to the loop that opened them, and CLI commands run their own loops.
+_engines: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, StorageEngine]]" = weakref.WeakKeyDictionary()
+
+
+async def get_storage_engine(db_path: str, config: Optional[StorageConfig] = None) -> StorageEngine:
+    """Get (and start) the shared engine for a database in the running loop"""
+    loop = asyncio.get_running_loop()
+    engines = _engines.setdefault(loop, {})
+    engine = engines.get(db_path)
+    if engine is None or engine._closed:
+        engine = engines[db_path] = StorageEngine(db_path, config)
+    await engine.start()
+    return engine
+
+
+async def close_storage_engines() -> None:
+    """Flush and close every engine opened in the running loop"""
+    engines = _engines.pop(asyncio.get_running_loop(), {})
+    for engine in engines.values():
+        await engine.close()
@@ -5,12 +5,14 @@ and alerting with configurable thresholds.
 """
 
 import psutil
+import threading
 import time
 import logging
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
 from dataclasses import dataclass
 from enum import Enum
+from .metric_ring import BucketRing, MetricRing
 
 
 class AlertLevel(Enum):
@@ -48,22 +50,138 @@ class Alert:
     condition: str
     level: AlertLevel
     message: str
-    duration: int = 60  # seconds
+    duration: int = 60  # seconds: evaluation window and re-trigger cooldown
+    aggregation: Optional[str] = None  # mean, p95, max, min, sum, rate, last
 
 
 class Telemetry:
     """Telemetry and monitoring system for AZ-OS"""
     
-    def __init__(self):
+    # name -> (unit, ring it is derived from, aggregation over the window)
+    METRICS = {
+        "cpu_percent": ("%", "cpu_percent", "mean"),
+        "memory_percent": ("%", "memory_percent", "mean"),
+        "disk_percent": ("%", "disk_percent", "mean"),
+        "request_rate": ("req/s", "errors", "rate"),
+        "error_rate": ("%", "errors", "mean"),
+        "p95_latency": ("ms", "latency_ms", "p95"),
+        "cost": ("$", "cost", "sum"),
+    }
+    
+    def __init__(self, sample_interval: float = 5.0, history_size: int = 4096,
+                 metrics_window: float = 60.0, request_history_span: float = 3600.0):
         self.logger = logging.getLogger(__name__)
         self.alerts: List[Alert] = []
         self.metrics: List[Metric] = []
         self.health_checks: List[HealthCheckResult] = []
         self.alert_history: List[Dict[str, Any]] = []
         
+        # Sampled history, one bounded ring per raw series. Request-driven
+        # counters are bucketed per second so hourly windows see every
+        # request; latency keeps raw samples for percentiles.
+        self.sample_interval = sample_interval
+        self.metrics_window = metrics_window
+        self.history: Dict[str, Any] = {
+            name: MetricRing(history_size)
+            for name in ("cpu_percent", "memory_percent", "disk_percent", "latency_ms")
+        }
+        self.history["errors"] = BucketRing(request_history_span)
+        self.history["cost"] = BucketRing(request_history_span)
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._last_sample: Optional[float] = None
+        self._active_alerts: List[Alert] = []
+        self._sampler: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        # Guards alert/health/metric state shared with the sampler thread
+        self._lock = threading.RLock()
+        
+        # Prime psutil's CPU counters so later non-blocking reads are meaningful
+        psutil.cpu_percent(interval=None)
+        
         # Default alerts
         self._setup_default_alerts()
     
+    # ------------------------------------------------------------ sampling
+    
+    def sample(self) -> None:
+        """Take one system sample (non-blocking CPU reading since the last sample)"""
+        now = time.time()
+        self.history["cpu_percent"].append(psutil.cpu_percent(interval=None), now)
+        self.history["memory_percent"].append(psutil.virtual_memory().percent, now)
+        self.history["disk_percent"].append(psutil.disk_usage('/').percent, now)
+        self._last_sample = now
+    
+    def record_request(self, latency_ms: float, error: bool = False, cost: float = 0.0) -> None:
+        """Record one application request (feeds request/error rate, latency and cost)"""
+        now = time.time()
+        self.history["latency_ms"].append(latency_ms, now)
+        self.history["errors"].append(1.0 if error else 0.0, now)
+        if cost:
+            self.history["cost"].append(cost, now)
+    
+    def start_sampler(self, interval: Optional[float] = None) -> None:
+        """Start the background sampler thread"""
+        if self._sampler and self._sampler.is_alive():
+            return
+        if interval is not None:
+            self.sample_interval = interval
+        self._stop.clear()
+        self._sampler = threading.Thread(target=self._sample_loop, name="az-telemetry", daemon=True)
+        self._sampler.start()
+    
+    def stop_sampler(self, timeout: float = 5.0) -> None:
+        """Stop the background sampler thread"""
+        self._stop.set()
+        if self._sampler:
+            self._sampler.join(timeout)
+            self._sampler = None
+    
+    def _sample_loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                self.logger.error(f"Telemetry sampling failed: {e}")
+            self._stop.wait(self.sample_interval)
+    
+    def refresh(self) -> Dict[str, Any]:
+        """Sample, evaluate alerts and publish a new dashboard snapshot"""
+        with self._lock:
+            self.sample()
+            self._run_health_checks()
+            self._collect_metrics()
+            self._active_alerts = self._evaluate_alerts()
+            self._snapshot = self._build_dashboard_data()
+            return self._snapshot
+    
+    def _sample_is_fresh(self) -> bool:
+        """True while a running sampler keeps the newest sample within sample_interval"""
+        if self._last_sample is None or not (self._sampler and self._sampler.is_alive()):
+            return False
+        return time.time() - self._last_sample <= self.sample_interval
+    
+    def _ensure_fresh(self) -> None:
+        """Sample inline unless the background sampler has a recent sample"""
+        if not self._sample_is_fresh():
+            self.sample()
+    
+    def metric_value(self, name: str, window: Optional[float] = None,
+                     aggregation: Optional[str] = None) -> Optional[float]:
+        """Windowed value of a named metric (see METRICS) or raw ring"""
+        unit, ring, default_aggregation = self.METRICS.get(name, ("", name, "mean"))
+        if ring not in self.history:
+            return None
+        return self.history[ring].aggregate(
+            self.metrics_window if window is None else window,
+            aggregation or default_aggregation,
+        )
+    
+    def _latest(self, ring: str) -> Optional[float]:
+        """Latest sampled value, sampling once if nothing has been recorded yet"""
+        if not len(self.history[ring]):
+            self.sample()
+        return self.history[ring].last()
+    
     def _setup_default_alerts(self) -> None:
         """Setup default alerting rules"""
         self.alerts = [
@@ -89,7 +207,8 @@ class Telemetry:
                 threshold=100.0,
                 condition=">",
                 level=AlertLevel.WARNING,
-                message="Cost exceeded $100 in last hour"
+                message="Cost exceeded $100 in last hour",
+                duration=3600
             ),
             Alert(
                 name="High CPU Usage",
@@ -111,6 +230,11 @@ class Telemetry:
     
     def check_health(self) -> List[HealthCheckResult]:
         """Perform comprehensive system health checks"""
+        with self._lock:
+            self._ensure_fresh()
+            return self._run_health_checks()
+    
+    def _run_health_checks(self) -> List[HealthCheckResult]:
         self.health_checks = []
         
         # System health checks
@@ -129,8 +253,7 @@ class Telemetry:
         start_time = time.time()
         
         try:
-            cpu_percent = psutil.cpu_percent(interval=1)
-            load_avg = psutil.getloadavg()
+            cpu_percent = self._latest("cpu_percent")
             
             if cpu_percent > 80:
                 status = "WARNING"
@@ -162,8 +285,7 @@ class Telemetry:
         start_time = time.time()
         
         try:
-            disk_usage = psutil.disk_usage('/')
-            free_percent = disk_usage.percent
+            free_percent = self._latest("disk_percent")
             
             if free_percent > 90:
                 status = "CRITICAL"
@@ -198,8 +320,7 @@ class Telemetry:
         start_time = time.time()
         
         try:
-            memory = psutil.virtual_memory()
-            memory_percent = memory.percent
+            memory_percent = self._latest("memory_percent")
             
             if memory_percent > 90:
                 status = "CRITICAL"
@@ -286,100 +407,56 @@ class Telemetry:
             )
     
     def get_metrics(self) -> List[Metric]:
-        """Collect performance metrics"""
-        self.metrics = []
-        
-        # System metrics
-        self.metrics.append(self._get_cpu_metrics())
-        self.metrics.append(self._get_memory_metrics())
-        self.metrics.append(self._get_disk_metrics())
-        
-        # Application metrics
-        self.metrics.append(self._get_request_metrics())
-        self.metrics.append(self._get_error_metrics())
-        
-        return self.metrics
-    
-    def _get_cpu_metrics(self) -> Metric:
-        """Get CPU-related metrics"""
-        cpu_percent = psutil.cpu_percent()
-        return Metric(
-            name="cpu_percent",
-            value=cpu_percent,
-            unit="%",
-            timestamp=datetime.utcnow()
-        )
-    
-    def _get_memory_metrics(self) -> Metric:
-        """Get memory-related metrics"""
-        memory = psutil.virtual_memory()
-        return Metric(
-            name="memory_percent",
-            value=memory.percent,
-            unit="%",
-            timestamp=datetime.utcnow()
-        )
-    
-    def _get_disk_metrics(self) -> Metric:
-        """Get disk-related metrics"""
-        disk = psutil.disk_usage('/')
-        return Metric(
-            name="disk_percent",
-            value=disk.percent,
-            unit="%",
-            timestamp=datetime.utcnow()
-        )
+        """Current metrics from the sampled history (windowed for request metrics)"""
+        with self._lock:
+            self._ensure_fresh()
+            return self._collect_metrics()
     
-    def _get_request_metrics(self) -> Metric:
-        """Get request-related metrics"""
-        # In production, track actual request metrics
-        # For now, simulate
-        return Metric(
-            name="request_rate",
-            value=10.0,  # requests per second
-            unit="req/s",
-            timestamp=datetime.utcnow()
-        )
+    def _collect_metrics(self) -> List[Metric]:
+        timestamp = datetime.utcnow()
+        metrics = []
+        for name, (unit, ring, _) in self.METRICS.items():
+            if ring in ("cpu_percent", "memory_percent", "disk_percent"):
+                # Gauges report their latest sample; alerts use windowed means
+                value = self._latest(ring)
+            else:
+                value = self.metric_value(name)
+            metrics.append(Metric(name=name, value=value or 0.0, unit=unit, timestamp=timestamp))
+        self.metrics = metrics
+        return self.metrics
     
-    def _get_error_metrics(self) -> Metric:
-        """Get error-related metrics"""
-        # In production, track actual error metrics
-        # For now, simulate
-        return Metric(
-            name="error_rate",
-            value=0.01,  # 1% error rate
-            unit="%",
-            timestamp=datetime.utcnow()
-        )
+    def _evaluate_condition(self, alert: Alert, value: float) -> bool:
+        """Compare a value against the alert threshold"""
+        if alert.condition == ">":
+            return value > alert.threshold
+        if alert.condition == "<":
+            return value < alert.threshold
+        if alert.condition == ">=":
+            return value >= alert.threshold
+        if alert.condition == "<=":
+            return value <= alert.threshold
+        if alert.condition == "==":
+            return value == alert.threshold
+        return False
     
     def should_alert(self) -> List[Alert]:
-        """Check if any alerts should be triggered"""
+        """Check alert rules against aggregates over each rule's duration window"""
+        with self._lock:
+            self._ensure_fresh()
+            return self._evaluate_alerts()
+    
+    def _evaluate_alerts(self) -> List[Alert]:
         triggered_alerts = []
         
-        # Get current metrics
-        metrics = self.get_metrics()
-        
         # Check each alert condition
         for alert in self.alerts:
-            # Find the metric for this alert
-            metric = next((m for m in metrics if m.name == alert.metric), None)
-            
-            if metric:
-                # Check condition
-                if alert.condition == ">" and metric.value > alert.threshold:
-                    triggered_alerts.append(alert)
-                elif alert.condition == "<" and metric.value < alert.threshold:
-                    triggered_alerts.append(alert)
-                elif alert.condition == ">=" and metric.value >= alert.threshold:
-                    triggered_alerts.append(alert)
-                elif alert.condition == "<=" and metric.value <= alert.threshold:
-                    triggered_alerts.append(alert)
-                elif alert.condition == "==" and metric.value == alert.threshold:
-                    triggered_alerts.append(alert)
+            value = self.metric_value(alert.metric, window=alert.duration, aggregation=alert.aggregation)
+            if value is not None and self._evaluate_condition(alert, value):
+                triggered_alerts.append((alert, value))
         
         # Check if alerts should be triggered based on duration
         current_time = datetime.utcnow()
-        for alert in triggered_alerts:
+        for alert, value in triggered_alerts:
             # Check if this alert was already triggered recently
             recent_triggers = [
                 a for a in self.alert_history 
@@ -389,11 +466,11 @@ class Telemetry:
             
             if not recent_triggers:
                 # Trigger the alert
-                self._trigger_alert(alert)
+                self._trigger_alert(alert, value)
         
-        return triggered_alerts
+        return [alert for alert, _ in triggered_alerts]
     
-    def _trigger_alert(self, alert: Alert) -> None:
+    def _trigger_alert(self, alert: Alert, value: Optional[float] = None) -> None:
         """Trigger an alert"""
         alert_event = {
             'name': alert.name,
@@ -401,10 +478,12 @@ class Telemetry:
             'message': alert.message,
             'timestamp': datetime.utcnow(),
             'metric': alert.metric,
-            'value': self._get_current_metric_value(alert.metric)
+            'value': self._get_current_metric_value(alert.metric) if value is None else value
         }
         
         self.alert_history.append(alert_event)
+        # Bounded like the metric history
+        del self.alert_history[:-1000]
         self.logger.warning(f"ALERT: {alert.message} (Level: {alert.level.value})")
         
         # In production, send to alerting system
@@ -412,9 +491,7 @@ class Telemetry:
     
     def _get_current_metric_value(self, metric_name: str) -> float:
         """Get current value for a metric"""
-        metrics = self.get_metrics()
-        metric = next((m for m in metrics if m.name == metric_name), None)
-        return metric.value if metric else 0.0
+        return self.metric_value(metric_name) or 0.0
     
     def suggest_actions(self, alert: Alert) -> List[str]:
         """Suggest actions based on alert type"""
@@ -459,10 +536,20 @@ class Telemetry:
         return actions
     
     def get_health_dashboard_data(self) -> Dict[str, Any]:
-        """Get data for health dashboard"""
-        health_checks = self.check_health()
-        metrics = self.get_metrics()
-        alerts = self.should_alert()
+        """
+        Get data for health dashboard. Returns the sampler's latest snapshot
+        without touching psutil; without a running sampler (or if its newest
+        sample is older than sample_interval) it refreshes inline.
+        """
+        snapshot = self._snapshot
+        if snapshot is None or not self._sample_is_fresh():
+            return self.refresh()
+        return snapshot
+    
+    def _build_dashboard_data(self) -> Dict[str, Any]:
+        health_checks = self.health_checks
+        metrics = {m.name: m.value for m in self.metrics}
+        alerts = self._active_alerts
         
         return {
             'timestamp': datetime.utcnow().isoformat(),
@@ -474,11 +561,12 @@ class Telemetry:
                 'error': len([hc for hc in health_checks if hc.status == 'ERROR'])
             },
             'metrics': {
-                'cpu_percent': next((m.value for m in metrics if m.name == 'cpu_percent'), 0),
-                'memory_percent': next((m.value for m in metrics if m.name == 'memory_percent'), 0),
-                'disk_percent': next((m.value for m in metrics if m.name == 'disk_percent'), 0),
-                'request_rate': next((m.value for m in metrics if m.name == 'request_rate'), 0),
-                'error_rate': next((m.value for m in metrics if m.name == 'error_rate'), 0)
+                'cpu_percent': metrics.get('cpu_percent', 0),
+                'memory_percent': metrics.get('memory_percent', 0),
+                'disk_percent': metrics.get('disk_percent', 0),
+                'request_rate': metrics.get('request_rate', 0),
+                'error_rate': metrics.get('error_rate', 0),
+                'p95_latency': metrics.get('p95_latency', 0),
             },
             'alerts': {
                 'total': len(alerts),
@@ -1,4 +1,7 @@
+import hashlib
 import re
+import time
+from collections import OrderedDict
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
 import random
@@ -11,14 +14,151 @@ class OptimizationResult:
     reduction_percent: float
     cache_hit: bool
     cache_key: Optional[str]
+    segments_cached: int = 0
+
+
+# Rough BPE approximation when tiktoken (or its encoding files) is unavailable:
+# words split into <=4-character pieces, every punctuation mark its own token
+_APPROX_TOKEN_RE = re.compile(r"[^\W_]{1,4}|_+|[^\w\s]")
+
+
+class TokenCounter:
+    """
+    Count tokens with tiktoken (the encoding the OpenAI models bill with),
+    memoizing counts of recently seen texts (LRU). Falls back to a regex
+    approximation when tiktoken or the encoding cannot be loaded.
+    """
+    
+    def __init__(self, model: Optional[str] = None, encoding: str = "cl100k_base", memo_size: int = 4096):
+        self.memo_size = memo_size
+        self._memo: "OrderedDict[str, int]" = OrderedDict()
+        self._encoding = None
+        try:
+            import tiktoken
+            try:
+                self._encoding = tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding(encoding)
+            except KeyError:
+                self._encoding = tiktoken.get_encoding(encoding)
+        except Exception:
+            # Not installed, or the encoding file could not be fetched (offline)
+            self._encoding = None
+    
+    @property
+    def exact(self) -> bool:
+        return self._encoding is not None
+    
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        cached = self._memo.get(text)
+        if cached is not None:
+            self._memo.move_to_end(text)
+            return cached
+        
+        if self._encoding is not None:
+            tokens = len(self._encoding.encode(text, disallowed_special=()))
+        else:
+            tokens = sum(1 for _ in _APPROX_TOKEN_RE.finditer(text))
+        
+        self._memo[text] = tokens
+        if len(self._memo) > self.memo_size:
+            self._memo.popitem(last=False)
+        return tokens
+
+
+_default_counter: Optional[TokenCounter] = None
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens with the shared default counter"""
+    global _default_counter
+    if _default_counter is None:
+        _default_counter = TokenCounter()
+    return _default_counter.count(text)
+
+
+# Phrase rewrites (matched case-insensitively); removals also eat the following spaces
+COMPRESSION_PATTERNS = [
+    ('Please do not', 'Do not'),
+    ('In order to', 'To'),
+    ('Due to the fact that', 'Because'),
+    ('At this point in time', 'Now'),
+    ('In the event that', 'If'),
+    ('With regards to', 'About'),
+    ('Please make sure to', 'Ensure'),
+    ('It is important to note that', ''),  # Remove entirely
+    ('The following', ''),  # Remove entirely
+]
+
+# Instructions kept only on their first occurrence
+REDUNDANT_INSTRUCTIONS = [
+    "be concise",
+    "be brief",
+    "be clear",
+    "be detailed",
+    "provide examples",
+    "explain step by step"
+]
+
+_REPLACEMENTS = {phrase.lower(): replacement for phrase, replacement in COMPRESSION_PATTERNS}
+
+_SPACE_PATTERN = r"(?:\s*(?:^|\n)[ \t]*(?:#|//)[^\n]*)+\s*|\s+"  # comment lines + whitespace runs
+_INSTRUCTION_PATTERN = "|".join(re.escape(i) for i in REDUNDANT_INSTRUCTIONS)
+_PHRASE_PATTERN = "|".join(
+    re.escape(phrase) + (r"\s*" if not replacement else "")
+    for phrase, replacement in COMPRESSION_PATTERNS
+)
+
+# One alternation for every rewrite so a prompt is scanned once
+_COMPRESS_RE = re.compile(
+    f"(?P<space>{_SPACE_PATTERN})"
+    f"|(?P<instruction>(?:{_INSTRUCTION_PATTERN})[^.]*\\.?[ \\t]*)"
+    f"|(?P<phrase>{_PHRASE_PATTERN})",
+    re.IGNORECASE
+)
+# The individual steps, for callers that only need one of them
+_COMMENT_OR_SPACE_RE = re.compile(_SPACE_PATTERN)
+_PHRASE_RE = re.compile(_PHRASE_PATTERN, re.IGNORECASE)
+_INSTRUCTION_RE = re.compile(_INSTRUCTION_PATTERN, re.IGNORECASE)
+_REDUNDANT_RE = re.compile(f"(?:{_INSTRUCTION_PATTERN})[^.]*\\.?", re.IGNORECASE)
+_KEY_TERMS_RE = re.compile(r"important|critical|must|should|because|therefore", re.IGNORECASE)
+_SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
+
+
+def compress_text(text: str) -> str:
+    """
+    Drop comment lines, collapse whitespace, rewrite verbose phrases and
+    drop repeated instructions in a single regex pass.
+    """
+    seen = set()
+    
+    def replace(match: "re.Match") -> str:
+        if match.lastgroup == "space":
+            return " "
+        if match.lastgroup == "phrase":
+            return _REPLACEMENTS[match.group().rstrip().lower()]
+        instruction = match.group()
+        key = _INSTRUCTION_RE.match(instruction).group().lower()
+        if key in seen:
+            return ""
+        seen.add(key)
+        # Compress the rest of a kept instruction's sentence too
+        head = len(key)
+        return instruction[:head] + _COMPRESS_RE.sub(replace, instruction[head:])
+    
+    return _COMPRESS_RE.sub(replace, text).strip()
 
 
 class TokenOptimizer:
-    def __init__(self):
-        self.cache: Dict[str, str] = {}
+    def __init__(self, max_cache_size: int = 1024, cache_ttl: int = 3600,
+                 counter: Optional[TokenCounter] = None):
+        # key -> (expires_at, optimized text), least recently used first
+        self.cache: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
         self.cache_hits = 0
         self.cache_misses = 0
-        self.cache_ttl = 3600  # 1 hour
+        self.max_cache_size = max_cache_size
+        self.cache_ttl = cache_ttl  # 1 hour
+        self.counter = counter or TokenCounter()
         
     def optimize_prompt(self, prompt: str, task_type: str = "generic") -> Tuple[str, OptimizationResult]:
         """Optimize prompt by compressing and summarizing"""
@@ -28,7 +168,7 @@ class TokenOptimizer:
         cache_key = self._generate_cache_key(prompt, task_type)
         cached_result = self._get_from_cache(cache_key)
         
-        if cached_result:
+        if cached_result is not None:
             return cached_result, OptimizationResult(
                 original_tokens=original_tokens,
                 optimized_tokens=self._count_tokens(cached_result),
@@ -37,18 +177,7 @@ class TokenOptimizer:
                 cache_key=cache_key
             )
         
-        # Step 2: Remove unnecessary whitespace and comments
-        optimized = self._remove_whitespace_and_comments(prompt)
-        
-        # Step 3: Summarize context if too long
-        if original_tokens > 1000:
-            optimized = self._summarize_context(optimized)
-        
-        # Step 4: Compress common patterns
-        optimized = self._compress_patterns(optimized)
-        
-        # Step 5: Remove redundant instructions
-        optimized = self._remove_redundant_instructions(optimized)
+        optimized = self._optimize_text(prompt, original_tokens)
         
         # Store in cache
         self._set_cache(cache_key, optimized)
@@ -64,6 +193,49 @@ class TokenOptimizer:
             cache_key=cache_key
         )
 
+    def optimize_segments(self, segments: Dict[str, str], task_type: str = "generic",
+                          separator: str = "\n\n") -> Tuple[str, OptimizationResult]:
+        """
+        Optimize a prompt given as named segments (e.g. system prompt, tool
+        schema, context), caching each segment separately so the static
+        ones are reused while only the changing ones are recompressed.
+        Repeated-instruction removal applies within each segment.
+        """
+        parts = []
+        original_tokens = optimized_tokens = cached = 0
+        for name, text in segments.items():
+            tokens = self._count_tokens(text)
+            cache_key = self._generate_cache_key(text, f"{task_type}:{name}")
+            optimized = self._get_from_cache(cache_key)
+            if optimized is None:
+                optimized = self._optimize_text(text, tokens)
+                self._set_cache(cache_key, optimized)
+            else:
+                cached += 1
+            original_tokens += tokens
+            optimized_tokens += self._count_tokens(optimized)
+            if optimized:
+                parts.append(optimized)
+        
+        reduction_percent = ((original_tokens - optimized_tokens) / original_tokens) * 100 if original_tokens > 0 else 0
+        return separator.join(parts), OptimizationResult(
+            original_tokens=original_tokens,
+            optimized_tokens=optimized_tokens,
+            reduction_percent=reduction_percent,
+            cache_hit=bool(segments) and cached == len(segments),
+            cache_key=None,
+            segments_cached=cached
+        )
+
+    def _optimize_text(self, text: str, tokens: int) -> str:
+        # Single pass: comments/whitespace, patterns, redundant instructions
+        optimized = compress_text(text)
+        
+        # Summarize context if too long
+        if tokens > 1000:
+            optimized = self.summarize_context(optimized)
+        return optimized
+
     def summarize_context(self, context: str) -> str:
         """Summarize long context to reduce tokens"""
         sentences = self._split_into_sentences(context)
@@ -75,9 +247,8 @@ class TokenOptimizer:
         important_sentences = [sentences[0]]  # First sentence
         
         # Add sentences with key terms
-        key_terms = ["important", "critical", "must", "should", "because", "therefore"]
         for sentence in sentences[1:-1]:  # Skip first and last
-            if any(term.lower() in sentence.lower() for term in key_terms):
+            if _KEY_TERMS_RE.search(sentence):
                 important_sentences.append(sentence)
         
         important_sentences.append(sentences[-1])  # Last sentence
@@ -90,91 +261,61 @@ class TokenOptimizer:
         return (self.cache_hits / total * 100) if total > 0 else 0
 
     def _count_tokens(self, text: str) -> int:
-        """Simple token counting (whitespace-separated)"""
-        return len(text.split())
+        """Token count from the tokenizer-backed counter (memoized)"""
+        return self.counter.count(text)
 
     def _generate_cache_key(self, prompt: str, task_type: str) -> str:
         """Generate cache key based on prompt content and task type"""
         # Use hash of prompt content for semantic deduplication
-        import hashlib
-        hash_object = hashlib.md5(prompt.encode())
-        return f"{task_type}:{hash_object.hexdigest()[:16]}"
+        hash_object = hashlib.blake2b(prompt.encode(), digest_size=16)
+        return f"{task_type}:{hash_object.hexdigest()}"
 
     def _get_from_cache(self, key: str) -> Optional[str]:
         """Get item from cache if not expired"""
-        if key in self.cache:
-            # Check TTL (simplified - in production use actual timestamps)
-            self.cache_hits += 1
-            return self.cache[key]
+        entry = self.cache.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self.cache.move_to_end(key)
+                self.cache_hits += 1
+                return value
+            del self.cache[key]
         
         self.cache_misses += 1
         return None
 
     def _set_cache(self, key: str, value: str):
-        """Set item in cache"""
-        self.cache[key] = value
+        """Set item in cache (evicting the least recently used beyond max_cache_size)"""
+        self.cache[key] = (time.monotonic() + self.cache_ttl, value)
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.max_cache_size:
+            self.cache.popitem(last=False)
 
     def _remove_whitespace_and_comments(self, text: str) -> str:
         """Remove unnecessary whitespace and comments"""
-        # Remove comments (lines starting with # or //)
-        lines = text.split('\n')
-        cleaned_lines = []
-        
-        for line in lines:
-            line = line.strip()
-            if line and not line.startswith('#') and not line.startswith('//'):
-                cleaned_lines.append(line)
-        
-        # Join with single spaces
-        return ' '.join(cleaned_lines)
+        return _COMMENT_OR_SPACE_RE.sub(" ", text).strip()
 
     def _compress_patterns(self, text: str) -> str:
         """Compress common patterns and redundant phrases"""
-        patterns = [
-            (r'Please do not', 'Do not'),
-            (r'In order to', 'To'),
-            (r'Due to the fact that', 'Because'),
-            (r'At this point in time', 'Now'),
-            (r'In the event that', 'If'),
-            (r'With regards to', 'About'),
-            (r'Please make sure to', 'Ensure'),
-            (r'It is important to note that', ''),  # Remove entirely
-            (r'The following', ''),  # Remove entirely
-        ]
-        
-        for pattern, replacement in patterns:
-            text = re.sub(pattern, replacement, text, flags=re.IGNORECASE)
-        
-        return text
+        return _PHRASE_RE.sub(lambda m: _REPLACEMENTS[m.group().rstrip().lower()], text)
 
     def _remove_redundant_instructions(self, text: str) -> str:
         """Remove redundant instructions and clarifications"""
-        # Remove duplicate instructions
-        instructions = [
-            "be concise",
-            "be brief",
-            "be clear",
-            "be detailed",
-            "provide examples",
-            "explain step by step"
-        ]
-        
-        for instruction in instructions:
-            # Remove duplicate occurrences
-            pattern = re.compile(rf'({instruction})[^.]*\.?', re.IGNORECASE)
-            matches = list(pattern.finditer(text))
-            
-            if len(matches) > 1:
-                # Keep first occurrence, remove others
-                for match in matches[1:]:
-                    text = text[:match.start()] + text[match.end():]
-        
-        return text
+        seen = set()
+        
+        def replace(match: "re.Match") -> str:
+            key = _INSTRUCTION_RE.match(match.group()).group().lower()
+            if key in seen:
+                return ""
+            seen.add(key)
+            return match.group()
+        
+        return _REDUNDANT_RE.sub(replace, text)
 
     def _split_into_sentences(self, text: str) -> List[str]:
         """Split text into sentences"""
         # Simple sentence splitter (can be improved with NLP)
-        sentences = re.split(r'(?<=[.!?])\s+', text)
+        sentences = _SENTENCE_SPLIT_RE.split(text)
         return [s.strip() for s in sentences if s.strip()]
 
 
@@ -0,0 +1,260 @@
+"""
+Tail and follow append-only log files without rescanning them.
+
+- tail_lines(path, n) seeks backwards from the end in fixed-size blocks until
+  it has n lines, so its cost depends on n, not on the file size.
+- count_lines(path) counts newlines in raw blocks without decoding.
+- LogFollower remembers the byte offset it has consumed and only reads what
+  was appended since. It detects rotation (the path now points to another
+  inode) and truncation (size below the offset). On Linux it sleeps on
+  inotify events for the log directory; elsewhere wait() falls back to
+  polling with a short interval.
+
+Stdlib only, so standalone scripts can import it by adding src/ to sys.path.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+from typing import Iterator, List, Optional
+
+
+DEFAULT_BLOCK_SIZE = 64 * 1024
+
+
+def tail_lines(path: str, lines: int, encoding: str = "utf-8", errors: str = "replace",
+               block_size: int = DEFAULT_BLOCK_SIZE) -> List[str]:
+    """Return the last `lines` lines of a file (without trailing newlines)"""
+    if lines <= 0:
+        return []
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        chunks: List[bytes] = []
+        newlines = 0
+        # One extra newline is needed when the file ends with "\n"
+        while position > 0 and newlines <= lines:
+            step = min(block_size, position)
+            position -= step
+            f.seek(position)
+            chunk = f.read(step)
+            chunks.append(chunk)
+            newlines += chunk.count(b"\n")
+    data = b"".join(reversed(chunks))
+    result = data.splitlines()[-lines:]
+    return [line.decode(encoding, errors) for line in result]
+
+
+def count_lines(path: str, block_size: int = 1024 * 1024) -> int:
+    """Count newline-terminated lines by scanning raw blocks (no decoding)"""
+    count = 0
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                return count
+            count += block.count(b"\n")
+
+
+class _Inotify:
+    """Minimal ctypes inotify watcher on a directory (Linux only)"""
+
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+    def __init__(self, directory: str):
+        libc_name = ctypes.util.find_library("c")
+        if not libc_name:
+            raise OSError("libc not found")
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify not available")
+        self.fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), self.MASK) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), "inotify_add_watch failed")
+
+    def wait(self, timeout: Optional[float], name: bytes) -> bool:
+        """Wait for an event on `name` in the watched directory"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            readable, _, _ = select.select([self.fd], [], [], remaining)
+            if not readable:
+                return False
+            if self._drain(name):
+                return True
+
+    def _drain(self, name: bytes) -> bool:
+        matched = False
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return False
+        offset = 0
+        while offset + 16 <= len(data):
+            _, _, _, length = struct.unpack_from("iIII", data, offset)
+            event_name = data[offset + 16:offset + 16 + length].rstrip(b"\0")
+            matched = matched or event_name == name
+            offset += 16 + length
+        return matched
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class LogFollower:
+    """
+    Incrementally read lines appended to a log file.
+
+    read_new_lines() returns complete lines appended since the last call
+    (a trailing partial line is kept until its newline arrives). Start at
+    the end of the file (from_end=True, the default) to only see new lines,
+    or pass offset= to resume from a remembered position.
+    """
+
+    def __init__(self, path: str, from_end: bool = True, offset: Optional[int] = None,
+                 encoding: str = "utf-8", errors: str = "replace",
+                 poll_interval: float = 0.5, use_inotify: bool = True):
+        self.path = os.path.abspath(path)
+        self.encoding = encoding
+        self.errors = errors
+        self.poll_interval = poll_interval
+        self.rotations = 0
+        self._file = None
+        self._identity = None
+        self._pending = b""
+        self._offset = 0
+        self._watcher: Optional[_Inotify] = None
+        if use_inotify:
+            try:
+                self._watcher = _Inotify(os.path.dirname(self.path) or ".")
+            except (OSError, AttributeError):
+                self._watcher = None
+
+        if self._open():
+            if offset is not None:
+                self._offset = offset
+            elif from_end:
+                self._offset = os.fstat(self._file.fileno()).st_size
+
+    @property
+    def offset(self) -> int:
+        """Byte offset of the first unread line (persist this to resume)"""
+        return self._offset - len(self._pending)
+
+    def _open(self) -> bool:
+        try:
+            self._file = open(self.path, "rb")
+        except FileNotFoundError:
+            self._file = None
+            return False
+        stat = os.fstat(self._file.fileno())
+        self._identity = (stat.st_dev, stat.st_ino)
+        self._offset = 0
+        self._pending = b""
+        return True
+
+    def _read_available(self) -> bytes:
+        self._file.seek(self._offset)
+        data = self._file.read()
+        self._offset += len(data)
+        return data
+
+    def read_new_lines(self) -> List[str]:
+        """Return complete lines appended since the last call"""
+        if self._file is None and not self._open():
+            return []
+
+        data = b""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            stat = None
+
+        if stat is not None and (stat.st_dev, stat.st_ino) != self._identity:
+            # Rotated: finish the old file, then continue at the start of the new one
+            data = self._pending + self._read_available()
+            if data and not data.endswith(b"\n"):
+                data += b"\n"
+            self._file.close()
+            self.rotations += 1
+            self._open()
+        elif stat is not None and stat.st_size < self._offset:
+            # Truncated in place (copytruncate)
+            self._offset = 0
+            self._pending = b""
+
+        if self._file is not None:
+            data += self._pending + self._read_available()
+            self._pending = b""
+
+        if not data:
+            return []
+        lines = data.split(b"\n")
+        self._pending = lines.pop()
+        return [line.rstrip(b"\r").decode(self.encoding, self.errors) for line in lines]
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until the file may have new data (or `timeout` elapses).
+        Returns True when woken by a change notification.
+        """
+        if self._changed():
+            # Appended between the last read and this call
+            return True
+        if self._watcher is not None:
+            return self._watcher.wait(timeout, os.fsencode(os.path.basename(self.path)))
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while deadline is None or time.monotonic() < deadline:
+            if self._changed():
+                return True
+            remaining = self.poll_interval if deadline is None else min(
+                self.poll_interval, max(0.0, deadline - time.monotonic()))
+            time.sleep(remaining)
+        return self._changed()
+
+    def _changed(self) -> bool:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        if self._file is None:
+            return True
+        return (stat.st_dev, stat.st_ino) != self._identity or stat.st_size != self._offset
+
+    def follow(self, timeout: Optional[float] = None) -> Iterator[str]:
+        """Yield lines as they are appended (stops after `timeout` idle seconds)"""
+        while True:
+            lines = self.read_new_lines()
+            yield from lines
+            if not lines and not self.wait(timeout) and timeout is not None:
+                yield from self.read_new_lines()
+                return
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._watcher is not None:
+            self._watcher.close()
+            self._watcher = None
+
+    def __enter__(self) -> "LogFollower":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
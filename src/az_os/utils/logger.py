@@ -6,9 +6,11 @@ import json
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, Optional, Union
+import typer
 from rich.console import Console
 from rich.theme import Theme
 from rich.logging import RichHandler
+from .log_reader import LogFollower, tail_lines
 
 
 class StructuredMessage:
@@ -106,11 +108,14 @@ class TaskScopedLogger:
     def get_logs(self, lines: int = 100) -> str:
         """Get last N lines from log file"""
         try:
-            with open(self.log_file, 'r', encoding='utf-8') as f:
-                lines_list = f.readlines()
-            return ''.join(lines_list[-lines:])
+            lines_list = tail_lines(self.log_file, lines)
         except FileNotFoundError:
             return "Log file not found"
+        return ''.join(line + '\n' for line in lines_list)
+    
+    def follow(self, from_end: bool = True, offset: Optional[int] = None) -> LogFollower:
+        """Follow lines appended to the task log (handles rotation)"""
+        return LogFollower(self.log_file, from_end=from_end, offset=offset)
 
 
 class SystemLogger:
@@ -211,10 +216,8 @@ async def logs_show() -> None:
     system_logs = system_logger.logger.handlers[0].baseFilename
     
     console.print("[bold cyan]System Logs:[/bold cyan]")
-    with open(system_logs, 'r', encoding='utf-8') as f:
-        lines = f.readlines()[-100:]
-        for line in lines:
-            console.print(line.strip())
+    for line in tail_lines(system_logs, 100):
+        console.print(line.strip())
     
     # Show task logs
     task_logs_dir = os.path.expanduser("~/.az-os/logs/tasks")
@@ -5,17 +5,44 @@ Reduces friction from 75/100 to target 25/100 through intelligent streaming
 import asyncio
 import json
 import logging
-from typing import Dict, List, Any, Optional, Callable, Awaitable
+from typing import Dict, List, Any, Optional, Callable, Awaitable, Deque, Iterable
 from datetime import datetime, timedelta
 from dataclasses import dataclass, field
+from collections import deque
 import aiofiles
 import os
 
 from ..value_objects.llb_protocol import LLBProtocol, MemoryType
 from ...infrastructure.database.connection import DatabaseConnection
+from .segment_sink import SegmentSink, SegmentSinkConfig
 
 logger = logging.getLogger(__name__)
 
+# Back-pressure policies applied when a stream buffer is full
+BACKPRESSURE_BLOCK = "block"              # wait for the flusher to free space
+BACKPRESSURE_DROP_OLDEST = "drop_oldest"  # evict the oldest buffered entries
+BACKPRESSURE_REJECT = "reject"            # raise BackpressureError (HTTP 429)
+BACKPRESSURE_POLICIES = (BACKPRESSURE_BLOCK, BACKPRESSURE_DROP_OLDEST, BACKPRESSURE_REJECT)
+
+
+class BackpressureError(Exception):
+    """Raised when a stream buffer is full and its policy is 'reject'"""
+
+    def __init__(self, stream_id: str, buffered: int, capacity: int):
+        self.stream_id = stream_id
+        self.buffered = buffered
+        self.capacity = capacity
+        super().__init__(f"Stream {stream_id} buffer full ({buffered}/{capacity})")
+
+
+class StreamClosedError(Exception):
+    """Raised when ingesting into an optimizer that is shutting down"""
+
+    def __init__(self, stream_id: str):
+        self.stream_id = stream_id
+        super().__init__(f"Stream {stream_id} is closed (optimizer shutting down)")
+
+
 @dataclass
 class DataStream:
     """Represents a data stream for optimized ingestion"""
@@ -24,9 +51,11 @@ class DataStream:
     data_type: str
     priority: int = 5
     batch_size: int = 100
-    buffer: List[Dict[str, Any]] = field(default_factory=list)
+    buffer: Deque[Dict[str, Any]] = field(default_factory=deque)
     last_processed: datetime = field(default_factory=datetime.utcnow)
     friction_score: float = 75.0  # Starting friction
+    max_buffer_size: int = 10000
+    backpressure_policy: str = BACKPRESSURE_BLOCK
 
 @dataclass
 class IngestionMetrics:
@@ -37,6 +66,8 @@ class IngestionMetrics:
     error_rate: float = 0.0
     throughput_per_second: float = 0.0
     current_friction_score: float = 75.0
+    records_dropped: int = 0
+    records_rejected: int = 0
 
 class DataIngestionOptimizer:
     """
@@ -44,40 +75,76 @@ class DataIngestionOptimizer:
     Optimizes the highest friction node (75/100) in the pipeline
     """
 
-    def __init__(self, storage_path: str = "data_streams"):
+    def __init__(self, storage_path: str = "data_streams", sink_config: Optional[SegmentSinkConfig] = None):
         self.storage_path = storage_path
         self.active_streams: Dict[str, DataStream] = {}
         self.metrics = IngestionMetrics()
         self.db_connection = DatabaseConnection()
         self.compression_enabled = True
         self.streaming_enabled = True
+        self.default_max_buffer_size = 10000
+        self.default_backpressure_policy = BACKPRESSURE_BLOCK
+
+        # Per-stream background flushers; ingestion only appends to the buffer
+        self._flushers: Dict[str, asyncio.Task] = {}
+        self._flush_events: Dict[str, asyncio.Event] = {}
+        self._flush_locks: Dict[str, asyncio.Lock] = {}
+        self._space_available: Dict[str, asyncio.Condition] = {}
+        # Entries taken out of a buffer by a flush still in progress; they
+        # count against capacity because a failed flush puts them back
+        self._in_flight: Dict[str, int] = {}
+        self._closed = False
 
         os.makedirs(storage_path, exist_ok=True)
+        self.sink = SegmentSink(
+            os.path.join(storage_path, "segments"),
+            sink_config or SegmentSinkConfig(compress=self.compression_enabled)
+        )
         logger.info("Data Ingestion Optimizer initialized with streaming capabilities")
 
     async def initialize_optimizer(self):
         """Initialize the optimizer with database connection"""
         await self.db_connection.initialize_pool()
         await self._load_active_streams()
+        for stream in self.active_streams.values():
+            self._ensure_flusher(stream)
         logger.info("Data Ingestion Optimizer fully initialized")
 
     async def create_optimized_stream(self,
                                     stream_id: str,
                                     source: str,
                                     data_type: str,
-                                    priority: int = 5) -> DataStream:
+                                    priority: int = 5,
+                                    max_buffer_size: Optional[int] = None,
+                                    backpressure_policy: Optional[str] = None) -> DataStream:
         """
-        Create a new optimized data stream with intelligent buffering
+        Create a new optimized data stream with intelligent buffering.
+        Raises ValueError for an unknown policy or a max_buffer_size smaller
+        than the stream's batch size.
         """
+        policy = backpressure_policy or self.default_backpressure_policy
+        if policy not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"Unknown backpressure policy: {policy}")
+
+        batch_size = self._calculate_optimal_batch_size(priority)
+        max_buffer_size = max_buffer_size or self.default_max_buffer_size
+        if max_buffer_size < batch_size:
+            raise ValueError(
+                f"max_buffer_size {max_buffer_size} is smaller than the batch size "
+                f"{batch_size} for priority {priority}"
+            )
         stream = DataStream(
             id=stream_id,
             source=source,
             data_type=data_type,
             priority=priority,
-            batch_size=self._calculate_optimal_batch_size(priority)
+            batch_size=batch_size,
+            max_buffer_size=max_buffer_size,
+            backpressure_policy=policy
         )
 
         self.active_streams[stream_id] = stream
+        self._ensure_flusher(stream)
         await self._persist_stream_metadata(stream)
 
         self.metrics.streams_active += 1
@@ -99,51 +166,188 @@ class DataIngestionOptimizer:
                                   data: Dict[str, Any],
                                   immediate_process: bool = False) -> bool:
         """
-        Ingest data with intelligent streaming and buffering
-        Reduces friction through async processing and smart batching
+        Ingest data with intelligent streaming and buffering.
+        The entry is only buffered; the stream's background flusher persists
+        batches by size and age, so callers never pay the flush latency unless
+        they ask for immediate_process. Raises BackpressureError when the
+        buffer is full under the 'reject' policy.
         """
         if stream_id not in self.active_streams:
             logger.error(f"Stream {stream_id} not found")
             return False
 
+        await self.ingest_bulk(stream_id, [data])
+
+        if immediate_process:
+            return await self._flush_stream(self.active_streams[stream_id])
+        return True
+
+    async def ingest_bulk(self,
+                          stream_id: str,
+                          items: Iterable[Dict[str, Any]],
+                          immediate_process: bool = False) -> int:
+        """
+        Ingest many entries at once. Returns the number of entries buffered
+        (0 if the stream does not exist).
+        """
+        if stream_id not in self.active_streams:
+            logger.error(f"Stream {stream_id} not found")
+            return 0
+
         stream = self.active_streams[stream_id]
+        if self._closed:
+            raise StreamClosedError(stream_id)
+        self._ensure_flusher(stream)
+
+        timestamp = datetime.utcnow().isoformat()
+        entries = [
+            {
+                "data": data,
+                "timestamp": timestamp,
+                "stream_id": stream_id,
+                "priority": stream.priority
+            }
+            for data in items
+        ]
 
-        # Add to buffer with timestamp
-        data_entry = {
-            "data": data,
-            "timestamp": datetime.utcnow().isoformat(),
-            "stream_id": stream_id,
-            "priority": stream.priority
-        }
+        await self._enqueue(stream, entries)
 
-        stream.buffer.append(data_entry)
+        if immediate_process:
+            # Failed flushes stay buffered for the background flusher to retry
+            await self._flush_stream(stream)
+        elif len(stream.buffer) >= stream.batch_size:
+            self._flush_events[stream_id].set()
 
-        # Check if we should process the batch
-        should_process = (
-            len(stream.buffer) >= stream.batch_size or
-            immediate_process or
-            self._should_process_based_on_priority(stream)
-        )
+        return len(entries)
+
+    async def _enqueue(self, stream: DataStream, entries: List[Dict[str, Any]]) -> None:
+        """
+        Append entries to a stream buffer applying its back-pressure policy.
+        Raises StreamClosedError once shutdown has started (including for
+        producers blocked waiting for space).
+        """
+        capacity = stream.max_buffer_size
+        if self._closed:
+            raise StreamClosedError(stream.id)
+
+        if stream.backpressure_policy == BACKPRESSURE_REJECT:
+            if self._occupancy(stream) + len(entries) > capacity:
+                self.metrics.records_rejected += len(entries)
+                self._flush_events[stream.id].set()
+                raise BackpressureError(stream.id, self._occupancy(stream), capacity)
+            stream.buffer.extend(entries)
+
+        elif stream.backpressure_policy == BACKPRESSURE_DROP_OLDEST:
+            stream.buffer.extend(entries)
+            overflow = len(stream.buffer) - capacity
+            for _ in range(max(0, overflow)):
+                stream.buffer.popleft()
+            if overflow > 0:
+                self.metrics.records_dropped += overflow
+                self._flush_events[stream.id].set()
 
-        if should_process:
+        else:
+            space = self._space_available[stream.id]
+            for entry in entries:
+                if self._occupancy(stream) >= capacity:
+                    async with space:
+                        self._flush_events[stream.id].set()
+                        await space.wait_for(lambda: self._closed or self._occupancy(stream) < capacity)
+                    if self._closed:
+                        raise StreamClosedError(stream.id)
+                stream.buffer.append(entry)
+
+    def _occupancy(self, stream: DataStream) -> int:
+        """Buffered entries plus those of a flush that may still be re-queued"""
+        return len(stream.buffer) + self._in_flight.get(stream.id, 0)
+
+    def _requeue(self, stream: DataStream, batch: List[Dict[str, Any]]) -> None:
+        """
+        Put a failed batch back ahead of newer entries. Only drop_oldest admits
+        entries while a batch is out, so only it can overflow here; the overflow
+        is dropped from the oldest end, as that policy does on ingest.
+        """
+        stream.buffer.extendleft(reversed(batch))
+        overflow = len(stream.buffer) - stream.max_buffer_size
+        if overflow > 0:
+            for _ in range(overflow):
+                stream.buffer.popleft()
+            self.metrics.records_dropped += overflow
+            logger.warning(f"Dropped {overflow} oldest entries re-queuing a failed batch for stream {stream.id}")
+
+    def _ensure_flusher(self, stream: DataStream) -> None:
+        """Start the background flusher for a stream if it is not running"""
+        if stream.id not in self._flush_events:
+            self._flush_events[stream.id] = asyncio.Event()
+            self._flush_locks[stream.id] = asyncio.Lock()
+            self._space_available[stream.id] = asyncio.Condition()
+
+        flusher = self._flushers.get(stream.id)
+        if flusher is None or flusher.done():
+            self._flushers[stream.id] = asyncio.create_task(self._flusher_loop(stream))
+
+    async def _flusher_loop(self, stream: DataStream) -> None:
+        """Flush a stream when its batch fills up or its oldest data gets too old"""
+        event = self._flush_events[stream.id]
+        max_age = self._max_batch_age_seconds(stream)
+
+        while True:
+            elapsed = (datetime.utcnow() - stream.last_processed).total_seconds()
+            # asyncio.wait rather than wait_for: wait_for can swallow a shutdown
+            # cancel when the event fires at the same moment
+            waiter = asyncio.ensure_future(event.wait())
+            try:
+                await asyncio.wait({waiter}, timeout=max(0.05, max_age - elapsed))
+            finally:
+                waiter.cancel()
+            event.clear()
+
+            if not stream.buffer:
+                # Nothing buffered: restart the age window from now
+                stream.last_processed = datetime.utcnow()
+                continue
+
+            full = len(stream.buffer) >= stream.batch_size
+            if full or self._should_process_based_on_priority(stream) or self._has_blocked_writers(stream):
+                try:
+                    success = await self._flush_stream(stream)
+                except Exception as e:
+                    logger.error(f"Background flush failed for stream {stream.id}: {e}")
+                    success = False
+                if not success:
+                    # Back off before retrying the re-queued batch
+                    await asyncio.sleep(1.0)
+
+    def _has_blocked_writers(self, stream: DataStream) -> bool:
+        return self._occupancy(stream) >= stream.max_buffer_size
+
+    async def _flush_stream(self, stream: DataStream) -> bool:
+        """Process the current buffer of a stream (one flush at a time per stream)"""
+        async with self._flush_locks[stream.id]:
             success = await self._process_batch_optimized(stream)
-            if success:
-                stream.friction_score = max(25.0, stream.friction_score - 5.0)  # Reduce friction
-                self._update_overall_friction_score()
-            return success
 
-        return True
+        if success:
+            stream.friction_score = max(25.0, stream.friction_score - 5.0)  # Reduce friction
+            self._update_overall_friction_score()
 
-    def _should_process_based_on_priority(self, stream: DataStream) -> bool:
-        """Determine if batch should be processed based on priority and time"""
-        time_since_last = datetime.utcnow() - stream.last_processed
+        space = self._space_available[stream.id]
+        async with space:
+            space.notify_all()
+        return success
 
+    def _max_batch_age_seconds(self, stream: DataStream) -> float:
+        """Maximum time buffered data may wait before a flush, by priority"""
         if stream.priority >= 8:
-            return time_since_last.total_seconds() > 30  # Process every 30s for high priority
+            return 30  # Process every 30s for high priority
         elif stream.priority >= 5:
-            return time_since_last.total_seconds() > 120  # Process every 2min for medium
+            return 120  # Process every 2min for medium
         else:
-            return time_since_last.total_seconds() > 600  # Process every 10min for low
+            return 600  # Process every 10min for low
+
+    def _should_process_based_on_priority(self, stream: DataStream) -> bool:
+        """Determine if batch should be processed based on priority and time"""
+        time_since_last = datetime.utcnow() - stream.last_processed
+        return time_since_last.total_seconds() >= self._max_batch_age_seconds(stream)
 
     async def _process_batch_optimized(self, stream: DataStream) -> bool:
         """
@@ -153,8 +357,9 @@ class DataIngestionOptimizer:
             return True
 
         start_time = datetime.utcnow()
-        batch_data = stream.buffer.copy()
+        batch_data = list(stream.buffer)
         stream.buffer.clear()
+        self._in_flight[stream.id] = len(batch_data)
 
         try:
             # Parallel processing for different data types
@@ -177,17 +382,20 @@ class DataIngestionOptimizer:
                 logger.info(f"Successfully processed batch of {len(batch_data)} items for stream {stream.id}")
                 return True
             else:
-                # Re-queue failed batch with backoff
-                stream.buffer.extend(batch_data)
+                # Re-queue failed batch ahead of newer entries; flusher retries with backoff
+                self._requeue(stream, batch_data)
                 logger.error(f"Failed to process batch for stream {stream.id}")
                 return False
 
         except Exception as e:
             logger.error(f"Error processing batch for stream {stream.id}: {e}")
             # Re-queue on error
-            stream.buffer.extend(batch_data)
+            self._requeue(stream, batch_data)
             return False
 
+        finally:
+            self._in_flight[stream.id] = 0
+
     async def _process_metrics_batch(self, batch_data: List[Dict[str, Any]]) -> bool:
         """Optimized processing for metrics data"""
         if not hasattr(self.db_connection, 'client') or self.db_connection.client is None:
@@ -241,21 +449,35 @@ class DataIngestionOptimizer:
         return await self._persist_to_file(batch_data, data_type)
 
     async def _persist_to_file(self, data: List[Dict[str, Any]], data_type: str) -> bool:
-        """Persist data to compressed file as fallback"""
-        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-        filename = f"{self.storage_path}/{data_type}_{timestamp}.json"
-
-        if self.compression_enabled:
-            filename += ".compressed"
+        """
+        Persist batch to the append-only segment sink, partitioned by data type and stream.
+        A batch comes from a single stream, so it is one block in one partition; the
+        append is all-or-nothing (the sink rolls back a failed append) and a retry
+        of the re-queued batch cannot duplicate records.
+        """
+        if not data:
+            return True
 
+        partition = f"{data_type}/{data[0].get('stream_id', 'default')}"
         try:
-            async with aiofiles.open(filename, 'w', encoding='utf-8') as f:
-                await f.write(json.dumps(data, indent=2, ensure_ascii=False))
+            await asyncio.to_thread(self.sink.append, partition, data)
             return True
         except Exception as e:
-            logger.error(f"Failed to persist to file {filename}: {e}")
+            logger.error(f"Failed to persist batch to segment sink ({partition}): {e}")
             return False
 
+    async def read_stream(self,
+                          stream_id: str,
+                          start: Optional[datetime] = None,
+                          end: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Read persisted entries of a stream within [start, end] from the segment sink"""
+        stream = self.active_streams.get(stream_id)
+        if stream is None:
+            raise ValueError(f"Stream {stream_id} not found")
+
+        partition = f"{stream.data_type}/{stream_id}"
+        return await asyncio.to_thread(lambda: list(self.sink.scan(partition, start, end)))
+
     def _update_processing_metrics(self, batch_size: int, processing_time: float):
         """Update overall processing metrics"""
         self.metrics.total_processed += batch_size
@@ -289,6 +511,7 @@ class DataIngestionOptimizer:
                 async with aiofiles.open(metadata_file, 'r', encoding='utf-8') as f:
                     metadata = json.loads(await f.read())
                     for stream_data in metadata.get("streams", []):
+                        stream_data["last_processed"] = datetime.fromisoformat(stream_data["last_processed"])
                         stream = DataStream(**stream_data)
                         self.active_streams[stream.id] = stream
                         self.metrics.streams_active += 1
@@ -306,7 +529,9 @@ class DataIngestionOptimizer:
                     "priority": s.priority,
                     "batch_size": s.batch_size,
                     "last_processed": s.last_processed.isoformat(),
-                    "friction_score": s.friction_score
+                    "friction_score": s.friction_score,
+                    "max_buffer_size": s.max_buffer_size,
+                    "backpressure_policy": s.backpressure_policy
                 }
                 for s in self.active_streams.values()
             ]
@@ -327,16 +552,21 @@ class DataIngestionOptimizer:
             "total_processed": self.metrics.total_processed,
             "avg_processing_time": round(self.metrics.avg_processing_time, 3),
             "throughput_per_second": round(self.metrics.throughput_per_second, 2),
+            "records_dropped": self.metrics.records_dropped,
+            "records_rejected": self.metrics.records_rejected,
             "streams_details": [
                 {
                     "id": s.id,
                     "source": s.source,
                     "friction_score": s.friction_score,
                     "buffer_size": len(s.buffer),
+                    "max_buffer_size": s.max_buffer_size,
+                    "backpressure_policy": s.backpressure_policy,
                     "last_processed": s.last_processed.isoformat() if hasattr(s.last_processed, 'isoformat') else str(s.last_processed)
                 }
                 for s in self.active_streams.values()
             ],
+            "storage": self.sink.get_stats(),
             "optimization_achievements": {
                 "streaming_enabled": self.streaming_enabled,
                 "compression_enabled": self.compression_enabled,
@@ -350,13 +580,29 @@ class DataIngestionOptimizer:
         """Gracefully shutdown the optimizer"""
         logger.info("Shutting down Data Ingestion Optimizer...")
 
-        # Process any remaining buffers
+        # Refuse new entries and wake producers blocked on a full buffer
+        self._closed = True
+        for space in self._space_available.values():
+            async with space:
+                space.notify_all()
+
+        # Drain remaining buffers while the flushers still hold their locks
         for stream in self.active_streams.values():
-            if stream.buffer:
+            if stream.buffer and stream.id in self._flush_locks:
+                if not await self._flush_stream(stream):
+                    logger.error(f"Stream {stream.id} shut down with {len(stream.buffer)} unpersisted entries")
+            elif stream.buffer:
                 await self._process_batch_optimized(stream)
 
+        # Stop background flushers
+        for flusher in self._flushers.values():
+            flusher.cancel()
+        await asyncio.gather(*self._flushers.values(), return_exceptions=True)
+        self._flushers.clear()
+
         # Persist final state
         await self._persist_stream_metadata(next(iter(self.active_streams.values())) if self.active_streams else None)
+        await asyncio.to_thread(self.sink.close)
 
         # Close database connection (Supabase client doesn't need explicit close)
         logger.info("Data Ingestion Optimizer shutdown complete")
\ No newline at end of file
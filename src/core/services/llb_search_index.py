@@ -0,0 +1,425 @@
+"""
+L.L.B. Search Index - Ranked inverted index with snapshot + write-ahead log
+BM25 relevance blended with recency, top-k selection over sorted posting arrays
+"""
+import base64
+import heapq
+import json
+import logging
+import math
+import os
+import re
+import time
+import unicodedata
+from array import array
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+STOPWORDS = frozenset({
+    # pt
+    "a", "o", "as", "os", "de", "da", "do", "das", "dos", "e", "em", "no", "na",
+    "nos", "nas", "um", "uma", "para", "por", "com", "que", "se", "ao",
+    # en
+    "an", "the", "of", "and", "or", "in", "on", "to", "for", "with", "is", "at", "by",
+})
+
+
+def normalize_token(token: str) -> str:
+    """Lowercase and strip accents so 'Análise' and 'analise' match"""
+    decomposed = unicodedata.normalize("NFKD", token.lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into normalized tokens (duplicates kept for term frequency)"""
+    tokens = []
+    for match in TOKEN_PATTERN.findall(text):
+        token = normalize_token(match)
+        if len(token) > 1 and token not in STOPWORDS:
+            tokens.append(token)
+    return tokens
+
+
+def _encode_postings(doc_numbers: array) -> str:
+    """Delta + varint encode a sorted posting array"""
+    out = bytearray()
+    previous = 0
+    for number in doc_numbers:
+        delta = number - previous
+        previous = number
+        while delta >= 0x80:
+            out.append((delta & 0x7F) | 0x80)
+            delta >>= 7
+        out.append(delta)
+    return base64.b64encode(bytes(out)).decode("ascii")
+
+
+def _decode_postings(encoded: str) -> array:
+    doc_numbers = array("I")
+    value = shift = previous = 0
+    for byte in base64.b64decode(encoded):
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        previous += value
+        doc_numbers.append(previous)
+        value = shift = 0
+    return doc_numbers
+
+
+class LLBSearchIndex:
+    """
+    Inverted index over L.L.B. memories.
+
+    Each term maps to a sorted array of document numbers plus a parallel
+    array of term frequencies. Documents are numbered in insertion order,
+    so postings stay sorted by appending. Removals are tombstoned and purged
+    when a snapshot is written. Every mutation is appended to a write-ahead
+    log before it is applied; load = snapshot + WAL replay.
+
+    A snapshot is taken in two steps so async callers can keep the file
+    write off the event loop: prepare_snapshot() captures the index and
+    rotates the WAL to a ".prev" file, write_snapshot() writes and fsyncs
+    the captured data and drops the rotated WAL.
+    """
+
+    def __init__(self,
+                 index_path: str,
+                 snapshot_every: int = 1000,
+                 k1: float = 1.2,
+                 b: float = 0.75,
+                 recency_weight: float = 0.3,
+                 recency_half_life_days: float = 7.0,
+                 fsync_wal: bool = False):
+        self.index_path = index_path
+        self.snapshot_path = os.path.join(index_path, "search_index.snapshot.json")
+        self.wal_path = os.path.join(index_path, "search_index.wal")
+        self.prev_wal_path = self.wal_path + ".prev"
+        self.snapshot_every = snapshot_every
+        self.k1 = k1
+        self.b = b
+        self.recency_weight = recency_weight
+        self.recency_half_life = recency_half_life_days * 86400
+        self.fsync_wal = fsync_wal
+
+        self.postings: Dict[str, Tuple[array, array]] = {}   # term -> (doc numbers, tfs)
+        self.doc_ids: List[Optional[str]] = []               # doc number -> memory id (None = removed)
+        self.doc_numbers: Dict[str, int] = {}                # memory id -> doc number
+        self.doc_lengths = array("I")
+        self.doc_timestamps = array("d")
+        self.metadata: Dict[str, Dict[str, Any]] = {}        # memory id -> metadata
+        self._total_length = 0
+        self._ops_since_snapshot = 0
+        self._snapshot_pending = False
+        self._wal = None
+
+        os.makedirs(index_path, exist_ok=True)
+
+    # ------------------------------------------------------------ persistence
+
+    def load(self):
+        """Load the latest snapshot and replay the write-ahead log"""
+        if os.path.exists(self.snapshot_path):
+            try:
+                with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                    self._restore_snapshot(json.load(f))
+            except Exception as e:
+                logger.error(f"Failed to load search index snapshot, replaying WAL only: {e}")
+                self._reset()
+
+        # A ".prev" WAL means the last snapshot write did not finish; its
+        # entries replay before the current WAL (re-applying is idempotent)
+        replayed = 0
+        for wal_path in (self.prev_wal_path, self.wal_path):
+            if not os.path.exists(wal_path):
+                continue
+            with open(wal_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Torn final line from an interrupted write
+                        continue
+                    self._apply(entry)
+                    replayed += 1
+
+        self._ops_since_snapshot = replayed
+        self._wal = open(self.wal_path, "a", encoding="utf-8")
+        logger.info(f"Loaded search index: {len(self.doc_numbers)} documents, {len(self.postings)} terms, {replayed} WAL entries")
+
+    def _reset(self):
+        self.postings = {}
+        self.doc_ids = []
+        self.doc_numbers = {}
+        self.doc_lengths = array("I")
+        self.doc_timestamps = array("d")
+        self.metadata = {}
+        self._total_length = 0
+
+    def _restore_snapshot(self, data: Dict[str, Any]):
+        self._reset()
+        for memory_id, length, timestamp, meta in data["documents"]:
+            self.doc_numbers[memory_id] = len(self.doc_ids)
+            self.doc_ids.append(memory_id)
+            self.doc_lengths.append(length)
+            self.doc_timestamps.append(timestamp)
+            self.metadata[memory_id] = meta
+            self._total_length += length
+        for term, (encoded_docs, tfs) in data["postings"].items():
+            self.postings[term] = (_decode_postings(encoded_docs), array("I", tfs))
+
+    @property
+    def snapshot_due(self) -> bool:
+        """True once snapshot_every operations were logged since the last snapshot"""
+        return not self._snapshot_pending and self._ops_since_snapshot >= self.snapshot_every
+
+    def snapshot(self):
+        """Write a compacted snapshot atomically and truncate the WAL"""
+        self.write_snapshot(self.prepare_snapshot())
+
+    def prepare_snapshot(self) -> Dict[str, Any]:
+        """
+        Capture the compacted index for write_snapshot() and start a new WAL.
+        Operations logged from here on are not part of the captured data.
+        """
+        self._purge_removed()
+        data = {
+            "version": 1,
+            "documents": [
+                [memory_id, self.doc_lengths[n], self.doc_timestamps[n], self.metadata.get(memory_id, {})]
+                for n, memory_id in enumerate(self.doc_ids)
+            ],
+            "postings": {
+                term: [_encode_postings(docs), tfs.tolist()]
+                for term, (docs, tfs) in self.postings.items()
+            }
+        }
+
+        # Keep the WAL until the snapshot is durable; an unfinished earlier
+        # snapshot still owns ".prev", so append to it rather than replace it
+        if self._wal is not None:
+            self._wal.close()
+        if os.path.exists(self.wal_path):
+            if os.path.exists(self.prev_wal_path):
+                with open(self.wal_path, "r", encoding="utf-8") as src, \
+                        open(self.prev_wal_path, "a", encoding="utf-8") as dst:
+                    dst.write(src.read())
+                os.remove(self.wal_path)
+            else:
+                os.replace(self.wal_path, self.prev_wal_path)
+        self._wal = open(self.wal_path, "w", encoding="utf-8")
+        self._ops_since_snapshot = 0
+        self._snapshot_pending = True
+        return data
+
+    def write_snapshot(self, data: Dict[str, Any]):
+        """Write data from prepare_snapshot() atomically; safe to run in a worker thread"""
+        try:
+            tmp_path = self.snapshot_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+
+            # Snapshot is durable - the rotated WAL is no longer needed
+            if os.path.exists(self.prev_wal_path):
+                os.remove(self.prev_wal_path)
+        finally:
+            self._snapshot_pending = False
+
+    def close(self):
+        self.snapshot()
+        self._wal.close()
+        self._wal = None
+
+    def _log(self, entry: Dict[str, Any]):
+        if self._wal is None:
+            self._wal = open(self.wal_path, "a", encoding="utf-8")
+        self._wal.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self._wal.flush()
+        if self.fsync_wal:
+            os.fsync(self._wal.fileno())
+
+        self._ops_since_snapshot += 1
+
+    # ---------------------------------------------------------------- updates
+
+    def add(self, memory_id: str, tokens: Iterable[str], timestamp: float, metadata: Optional[Dict[str, Any]] = None):
+        """Index a memory (re-adding replaces the previous version)"""
+        entry = {
+            "op": "add",
+            "id": memory_id,
+            "tf": dict(Counter(tokens)),
+            "ts": timestamp,
+            "meta": metadata or {}
+        }
+        self._log(entry)
+        self._apply(entry)
+
+    def remove(self, memory_id: str):
+        if memory_id not in self.doc_numbers:
+            return
+        entry = {"op": "del", "id": memory_id}
+        self._log(entry)
+        self._apply(entry)
+
+    def _apply(self, entry: Dict[str, Any]):
+        if entry["op"] == "del":
+            self._tombstone(entry["id"])
+            return
+
+        memory_id = entry["id"]
+        self._tombstone(memory_id)
+
+        number = len(self.doc_ids)
+        self.doc_ids.append(memory_id)
+        self.doc_numbers[memory_id] = number
+        length = sum(entry["tf"].values())
+        self.doc_lengths.append(length)
+        self.doc_timestamps.append(entry["ts"])
+        self.metadata[memory_id] = entry["meta"]
+        self._total_length += length
+
+        for term, tf in entry["tf"].items():
+            posting = self.postings.get(term)
+            if posting is None:
+                posting = self.postings[term] = (array("I"), array("I"))
+            posting[0].append(number)
+            posting[1].append(tf)
+
+    def _tombstone(self, memory_id: str):
+        number = self.doc_numbers.pop(memory_id, None)
+        if number is None:
+            return
+        self.doc_ids[number] = None
+        self._total_length -= self.doc_lengths[number]
+        self.metadata.pop(memory_id, None)
+
+    def _purge_removed(self):
+        """Drop tombstoned documents and renumber postings"""
+        if len(self.doc_numbers) == len(self.doc_ids):
+            return
+
+        remap = array("i", [-1]) * len(self.doc_ids)
+        doc_ids: List[Optional[str]] = []
+        doc_lengths = array("I")
+        doc_timestamps = array("d")
+        for old, memory_id in enumerate(self.doc_ids):
+            if memory_id is None:
+                continue
+            remap[old] = len(doc_ids)
+            doc_ids.append(memory_id)
+            doc_lengths.append(self.doc_lengths[old])
+            doc_timestamps.append(self.doc_timestamps[old])
+
+        postings = {}
+        for term, (docs, tfs) in self.postings.items():
+            new_docs, new_tfs = array("I"), array("I")
+            for doc, tf in zip(docs, tfs):
+                if remap[doc] >= 0:
+                    new_docs.append(remap[doc])
+                    new_tfs.append(tf)
+            if new_docs:
+                postings[term] = (new_docs, new_tfs)
+
+        self.doc_ids = doc_ids
+        self.doc_lengths = doc_lengths
+        self.doc_timestamps = doc_timestamps
+        self.doc_numbers = {memory_id: n for n, memory_id in enumerate(doc_ids)}
+        self.postings = postings
+
+    # ---------------------------------------------------------------- queries
+
+    def __len__(self) -> int:
+        return len(self.doc_numbers)
+
+    @property
+    def term_count(self) -> int:
+        return len(self.postings)
+
+    def _live_docs(self, term: str) -> array:
+        posting = self.postings.get(term)
+        if posting is None:
+            return array("I")
+        return array("I", (d for d in posting[0] if self.doc_ids[d] is not None))
+
+    @staticmethod
+    def _intersect(a: array, b: array) -> array:
+        """Merge-intersect two sorted arrays"""
+        out = array("I")
+        i = j = 0
+        while i < len(a) and j < len(b):
+            if a[i] == b[j]:
+                out.append(a[i])
+                i += 1
+                j += 1
+            elif a[i] < b[j]:
+                i += 1
+            else:
+                j += 1
+        return out
+
+    def search(self,
+               required_terms: Iterable[str] = (),
+               query_terms: Iterable[str] = (),
+               limit: int = 50,
+               now: Optional[float] = None) -> List[Tuple[str, float]]:
+        """
+        Return up to `limit` (memory_id, score) pairs, best first.
+
+        Documents must contain every required term; a required term with no
+        postings matches nothing. Scores blend normalized BM25 over query_terms
+        with an exponential recency decay; with no query terms the ranking is
+        by recency alone. Selection is top-k with a heap, not a full sort.
+        """
+        now = now if now is not None else time.time()
+        required = set(required_terms)
+        if any(t not in self.postings for t in required):
+            return []
+        query = [t for t in set(query_terms) if t in self.postings]
+
+        # Candidate set: intersection of required postings, smallest first
+        candidates: Optional[array] = None
+        for term in sorted(required, key=lambda t: len(self.postings[t][0])):
+            docs = self._live_docs(term)
+            candidates = docs if candidates is None else self._intersect(candidates, docs)
+            if not candidates:
+                return []
+
+        if candidates is None and not query:
+            candidates = array("I", (n for n, memory_id in enumerate(self.doc_ids) if memory_id is not None))
+
+        relevance: Dict[int, float] = {}
+        if query:
+            candidate_set = set(candidates) if candidates is not None else None
+            n_docs = max(len(self.doc_numbers), 1)
+            avg_length = self._total_length / n_docs if n_docs else 1.0
+            for term in query:
+                docs, tfs = self.postings[term]
+                df = len(docs)
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                for doc, tf in zip(docs, tfs):
+                    if self.doc_ids[doc] is None or (candidate_set is not None and doc not in candidate_set):
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc] / max(avg_length, 1e-9))
+                    relevance[doc] = relevance.get(doc, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+            if candidates is None:
+                candidates = array("I", relevance.keys())
+
+        max_relevance = max(relevance.values(), default=0.0) or 1.0
+        decay = math.log(2) / self.recency_half_life if self.recency_half_life > 0 else 0.0
+        recency_weight = self.recency_weight if relevance else 1.0
+
+        def score(doc: int) -> float:
+            recency = math.exp(-decay * max(0.0, now - self.doc_timestamps[doc]))
+            return (1 - recency_weight) * relevance.get(doc, 0.0) / max_relevance + recency_weight * recency
+
+        # Ties broken by doc number (newer first)
+        top = heapq.nlargest(limit, candidates, key=lambda doc: (score(doc), doc))
+        return [(self.doc_ids[doc], score(doc)) for doc in top]
@@ -0,0 +1,449 @@
+"""
+L.L.B. Segment Store - Packed, dictionary-compressed record storage
+Appends memories to large segment files with an offset index for random access
+"""
+import json
+import logging
+import os
+import struct
+import threading
+import zlib
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Optional zstd with trained dictionaries - falls back to zlib preset dictionaries
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SUFFIX = ".llbs"
+
+# payload_len, codec, dict_id, key_len
+RECORD_HEADER = struct.Struct("<IBIH")
+
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+
+NO_DICTIONARY = 0
+
+
+@dataclass
+class RecordLocation:
+    """Where a record lives inside the segment files"""
+    segment: int
+    offset: int      # offset of the payload (after header and key)
+    length: int      # compressed payload length
+    codec: int
+    dict_id: int
+    raw_size: int = 0
+
+    def to_list(self) -> List[int]:
+        return [self.segment, self.offset, self.length, self.codec, self.dict_id, self.raw_size]
+
+    @classmethod
+    def from_list(cls, values: List[int]) -> 'RecordLocation':
+        return cls(*values)
+
+
+class LLBSegmentStore:
+    """
+    Append-only segment store for L.L.B. memory records.
+
+    Records are compressed one at a time (so any record can be read with a
+    single pread) against a dictionary trained on earlier records, which
+    recovers most of the ratio lost by compressing small JSON documents
+    individually. The key -> location index is kept in memory and made
+    durable by an append-only index log; compaction rewrites segments whose
+    live ratio dropped below a threshold and rewrites the log.
+    """
+
+    def __init__(self,
+                 root_path: str,
+                 max_segment_bytes: int = 64 * 1024 * 1024,
+                 compression_level: int = 6,
+                 dictionary_size: int = 32 * 1024,
+                 dictionary_training_samples: int = 500,
+                 compaction_threshold: float = 0.5):
+        self.root_path = root_path
+        self.segments_path = os.path.join(root_path, "segments")
+        self.dicts_path = os.path.join(root_path, "dicts")
+        self.index_log_path = os.path.join(root_path, "segment_index.log")
+
+        self.max_segment_bytes = max_segment_bytes
+        self.compression_level = compression_level
+        self.dictionary_size = dictionary_size
+        self.dictionary_training_samples = dictionary_training_samples
+        self.compaction_threshold = compaction_threshold
+        self.codec = CODEC_ZSTD if ZSTD_AVAILABLE else CODEC_ZLIB
+
+        self.index: Dict[str, RecordLocation] = {}
+        self._segment_live_bytes: Dict[int, int] = {}
+        self._segment_sizes: Dict[int, int] = {}
+        self._dictionaries: Dict[int, bytes] = {}
+        self._current_dict_id = NO_DICTIONARY
+        self._training_samples: List[bytes] = []
+        self._read_fds: Dict[int, int] = {}
+        self._active_segment: Optional[int] = None
+        self._active_file = None
+        self._index_log = None
+        self._lock = threading.RLock()
+
+        os.makedirs(self.segments_path, exist_ok=True)
+        os.makedirs(self.dicts_path, exist_ok=True)
+        self._load()
+
+    # ---------------------------------------------------------------- loading
+
+    def _segment_file(self, segment: int) -> str:
+        return os.path.join(self.segments_path, f"seg-{segment:06d}{SEGMENT_SUFFIX}")
+
+    def _list_segments(self) -> List[int]:
+        return sorted(
+            int(name[4:-len(SEGMENT_SUFFIX)])
+            for name in os.listdir(self.segments_path)
+            if name.startswith("seg-") and name.endswith(SEGMENT_SUFFIX)
+        )
+
+    def _load(self):
+        for name in os.listdir(self.dicts_path):
+            if name.startswith("dict-") and name.endswith(".bin"):
+                dict_id = int(name[5:-4])
+                with open(os.path.join(self.dicts_path, name), "rb") as f:
+                    self._dictionaries[dict_id] = f.read()
+        if self._dictionaries:
+            self._current_dict_id = max(self._dictionaries)
+
+        segments = self._list_segments()
+        for segment in segments:
+            self._segment_sizes[segment] = os.path.getsize(self._segment_file(segment))
+
+        if os.path.exists(self.index_log_path):
+            self._replay_index_log()
+        elif segments:
+            logger.warning("Segment index log missing - rebuilding from segments")
+            self._rebuild_index_from_segments(segments)
+            self._rewrite_index_log()
+
+        for key, location in self.index.items():
+            self._segment_live_bytes[location.segment] = (
+                self._segment_live_bytes.get(location.segment, 0) + self._footprint(key, location)
+            )
+
+        self._index_log = open(self.index_log_path, "a", encoding="utf-8")
+        self._open_active_segment(segments[-1] if segments else 0)
+
+    def _replay_index_log(self):
+        with open(self.index_log_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Torn final line from an interrupted write
+                    continue
+                if entry.get("op") == "put":
+                    self.index[entry["key"]] = RecordLocation.from_list(entry["loc"])
+                elif entry.get("op") == "del":
+                    self.index.pop(entry["key"], None)
+
+    def _rebuild_index_from_segments(self, segments: List[int]):
+        for segment in segments:
+            for key, location in self._scan_segment(segment):
+                self.index[key] = location
+
+    def _scan_segment(self, segment: int) -> Iterator[Tuple[str, RecordLocation]]:
+        with open(self._segment_file(segment), "rb") as f:
+            position = 0
+            while True:
+                header = f.read(RECORD_HEADER.size)
+                if len(header) < RECORD_HEADER.size:
+                    return
+                length, codec, dict_id, key_len = RECORD_HEADER.unpack(header)
+                key = f.read(key_len).decode("utf-8")
+                offset = position + RECORD_HEADER.size + key_len
+                f.seek(length, os.SEEK_CUR)
+                position = offset + length
+                if position > self._segment_sizes.get(segment, position):
+                    return
+                yield key, RecordLocation(segment, offset, length, codec, dict_id)
+
+    def _open_active_segment(self, segment: int):
+        if self._active_file is not None:
+            self._active_file.flush()
+            os.fsync(self._active_file.fileno())
+            self._active_file.close()
+        self._active_segment = segment
+        self._active_file = open(self._segment_file(segment), "ab")
+        self._segment_sizes[segment] = self._active_file.tell()
+
+    # ------------------------------------------------------------ compression
+
+    def _compress(self, raw: bytes) -> Tuple[bytes, int, int]:
+        dict_id = self._current_dict_id
+        dictionary = self._dictionaries.get(dict_id)
+        if self.codec == CODEC_ZSTD:
+            zdict = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+            compressor = zstandard.ZstdCompressor(level=self.compression_level, dict_data=zdict)
+            return compressor.compress(raw), CODEC_ZSTD, dict_id
+        compressor = (zlib.compressobj(self.compression_level, zdict=dictionary)
+                      if dictionary else zlib.compressobj(self.compression_level))
+        return compressor.compress(raw) + compressor.flush(), CODEC_ZLIB, dict_id
+
+    def _decompress(self, payload: bytes, codec: int, dict_id: int) -> bytes:
+        dictionary = self._dictionaries.get(dict_id) if dict_id != NO_DICTIONARY else None
+        if dict_id != NO_DICTIONARY and dictionary is None:
+            raise ValueError(f"Missing compression dictionary {dict_id}")
+        if codec == CODEC_ZSTD:
+            if not ZSTD_AVAILABLE:
+                raise RuntimeError("Record is zstd-compressed but zstandard is not installed")
+            zdict = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+            return zstandard.ZstdDecompressor(dict_data=zdict).decompress(payload)
+        decompressor = zlib.decompressobj(zdict=dictionary) if dictionary else zlib.decompressobj()
+        return decompressor.decompress(payload) + decompressor.flush()
+
+    def _maybe_train_dictionary(self, raw: bytes):
+        # Train once automatically; later retraining is explicit (train_dictionary)
+        if self._current_dict_id != NO_DICTIONARY:
+            return
+        self._training_samples.append(raw)
+        if len(self._training_samples) >= self.dictionary_training_samples:
+            self.train_dictionary()
+
+    def train_dictionary(self, samples: Optional[List[bytes]] = None) -> int:
+        """Train a new shared dictionary from sample records; returns its id"""
+        with self._lock:
+            samples = samples or self._training_samples
+            if not samples:
+                return self._current_dict_id
+
+            if self.codec == CODEC_ZSTD:
+                try:
+                    dictionary = zstandard.train_dictionary(self.dictionary_size, samples).as_bytes()
+                except zstandard.ZstdError as e:
+                    logger.warning(f"Dictionary training failed, keeping current dictionary: {e}")
+                    return self._current_dict_id
+            else:
+                # zlib preset dictionary: most recent samples, newest last
+                # (zlib favours strings near the end of the dictionary)
+                dictionary = b"".join(samples)[-self.dictionary_size:]
+
+            dict_id = max(self._dictionaries, default=NO_DICTIONARY) + 1
+            path = os.path.join(self.dicts_path, f"dict-{dict_id}.bin")
+            with open(path + ".tmp", "wb") as f:
+                f.write(dictionary)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(path + ".tmp", path)
+
+            self._dictionaries[dict_id] = dictionary
+            self._current_dict_id = dict_id
+            self._training_samples = []
+            logger.info(f"Trained L.L.B. compression dictionary {dict_id} ({len(dictionary)} bytes)")
+            return dict_id
+
+    # ---------------------------------------------------------------- writing
+
+    def _log(self, entry: Dict):
+        self._index_log.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        self._index_log.flush()
+
+    def put(self, key: str, raw: bytes) -> int:
+        """Append a record (replacing any previous version); returns stored size"""
+        with self._lock:
+            self._maybe_train_dictionary(raw)
+            payload, codec, dict_id = self._compress(raw)
+            key_bytes = key.encode("utf-8")
+
+            if self._segment_sizes[self._active_segment] >= self.max_segment_bytes:
+                self._open_active_segment(self._active_segment + 1)
+
+            segment = self._active_segment
+            start = self._segment_sizes[segment]
+            self._active_file.write(RECORD_HEADER.pack(len(payload), codec, dict_id, len(key_bytes)))
+            self._active_file.write(key_bytes)
+            self._active_file.write(payload)
+            self._active_file.flush()
+
+            location = RecordLocation(
+                segment=segment,
+                offset=start + RECORD_HEADER.size + len(key_bytes),
+                length=len(payload),
+                codec=codec,
+                dict_id=dict_id,
+                raw_size=len(raw)
+            )
+            self._segment_sizes[segment] = location.offset + location.length
+
+            self._drop_live(key)
+            self.index[key] = location
+            self._segment_live_bytes[segment] = self._segment_live_bytes.get(segment, 0) + self._footprint(key, location)
+            self._log({"op": "put", "key": key, "loc": location.to_list()})
+            return len(payload)
+
+    def delete(self, key: str) -> int:
+        """Remove a record from the index; returns the bytes freed at compaction"""
+        with self._lock:
+            if key not in self.index:
+                return 0
+            freed = self._footprint(key, self.index[key])
+            self._drop_live(key)
+            del self.index[key]
+            self._log({"op": "del", "key": key})
+            return freed
+
+    def _drop_live(self, key: str):
+        previous = self.index.get(key)
+        if previous is not None:
+            self._segment_live_bytes[previous.segment] -= self._footprint(key, previous)
+
+    @staticmethod
+    def _footprint(key: str, location: RecordLocation) -> int:
+        """Bytes a record occupies in its segment, header and key included"""
+        return RECORD_HEADER.size + len(key.encode("utf-8")) + location.length
+
+    # ---------------------------------------------------------------- reading
+
+    def _fd(self, segment: int) -> int:
+        fd = self._read_fds.get(segment)
+        if fd is None:
+            fd = os.open(self._segment_file(segment), os.O_RDONLY | getattr(os, "O_BINARY", 0))
+            self._read_fds[segment] = fd
+        return fd
+
+    def _read(self, location: RecordLocation) -> bytes:
+        fd = self._fd(location.segment)
+        if hasattr(os, "pread"):
+            payload = os.pread(fd, location.length, location.offset)
+        else:
+            os.lseek(fd, location.offset, os.SEEK_SET)
+            payload = os.read(fd, location.length)
+        return self._decompress(payload, location.codec, location.dict_id)
+
+    def contains(self, key: str) -> bool:
+        return key in self.index
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Read one record"""
+        with self._lock:
+            location = self.index.get(key)
+            if location is None:
+                return None
+            return self._read(location)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, bytes]:
+        """Read several records, ordered by file position to keep reads sequential"""
+        with self._lock:
+            located = [(key, self.index[key]) for key in keys if key in self.index]
+            located.sort(key=lambda item: (item[1].segment, item[1].offset))
+            return {key: self._read(location) for key, location in located}
+
+    def keys(self) -> List[str]:
+        return list(self.index.keys())
+
+    # ------------------------------------------------------------- compaction
+
+    def compact(self, force: bool = False) -> Dict[str, int]:
+        """
+        Rewrite segments whose live ratio is below the threshold (the active
+        segment is sealed first when it qualifies).
+        Live records are re-appended to the active segment (with the current
+        dictionary) and the old segment files are removed.
+        """
+        with self._lock:
+            reclaimed = 0
+            rewritten = 0
+
+            # Seal the active segment if it is itself worth compacting
+            active_size = self._segment_sizes.get(self._active_segment, 0)
+            active_live = self._segment_live_bytes.get(self._active_segment, 0)
+            if active_size and active_live < active_size and (force or active_live / active_size < self.compaction_threshold):
+                self._open_active_segment(max(self._segment_sizes) + 1)
+
+            candidates = [
+                segment for segment, size in self._segment_sizes.items()
+                if segment != self._active_segment and size > 0 and
+                (force or self._segment_live_bytes.get(segment, 0) / size < self.compaction_threshold)
+            ]
+
+            for segment in sorted(candidates):
+                live = [(k, loc) for k, loc in self.index.items() if loc.segment == segment]
+                for key, location in live:
+                    self.put(key, self._read(location))
+                    rewritten += 1
+
+            if not candidates:
+                return {"segments_compacted": 0, "records_rewritten": 0, "bytes_reclaimed": 0}
+
+            # The copies and an index log pointing at them must be durable
+            # before the old segments go, or a crash here loses records
+            self._active_file.flush()
+            os.fsync(self._active_file.fileno())
+            self._rewrite_index_log()
+
+            for segment in candidates:
+                fd = self._read_fds.pop(segment, None)
+                if fd is not None:
+                    os.close(fd)
+                reclaimed += self._segment_sizes.pop(segment, 0)
+                self._segment_live_bytes.pop(segment, None)
+                os.remove(self._segment_file(segment))
+
+            return {"segments_compacted": len(candidates), "records_rewritten": rewritten, "bytes_reclaimed": reclaimed}
+
+    def _rewrite_index_log(self):
+        tmp_path = self.index_log_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for key, location in self.index.items():
+                f.write(json.dumps({"op": "put", "key": key, "loc": location.to_list()}, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        if self._index_log is not None:
+            self._index_log.close()
+        os.replace(tmp_path, self.index_log_path)
+        if hasattr(os, "O_DIRECTORY"):
+            # Make the rename itself durable
+            dir_fd = os.open(self.root_path, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+        self._index_log = open(self.index_log_path, "a", encoding="utf-8")
+
+    # ------------------------------------------------------------------ misc
+
+    def flush(self):
+        """Flush and fsync the active segment and the index log"""
+        with self._lock:
+            self._active_file.flush()
+            os.fsync(self._active_file.fileno())
+            self._index_log.flush()
+            os.fsync(self._index_log.fileno())
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            self._active_file.close()
+            self._index_log.close()
+            for fd in self._read_fds.values():
+                os.close(fd)
+            self._read_fds.clear()
+
+    def get_stats(self) -> Dict[str, float]:
+        with self._lock:
+            total_bytes = sum(self._segment_sizes.values())
+            live_bytes = sum(self._segment_live_bytes.values())
+            raw_bytes = sum(loc.raw_size for loc in self.index.values())
+            return {
+                "records": len(self.index),
+                "segments": len(self._segment_sizes),
+                "total_bytes": total_bytes,
+                "live_bytes": live_bytes,
+                "dead_bytes": total_bytes - live_bytes,
+                "raw_bytes": raw_bytes,
+                "compression_ratio": raw_bytes / live_bytes if live_bytes else 1.0,
+                "codec": "zstd" if self.codec == CODEC_ZSTD else "zlib",
+                "dictionary_id": self._current_dict_id
+            }
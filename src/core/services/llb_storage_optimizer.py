@@ -6,7 +6,6 @@ import asyncio
 import json
 import logging
 import gzip
-import pickle
 from typing import Dict, List, Any, Optional, Set
 from datetime import datetime, timedelta
 from collections import defaultdict
@@ -14,6 +13,8 @@ import os
 
 from ..value_objects.llb_protocol import LLBProtocol, MemoryType, MemoryPriority
 from ...infrastructure.database.connection import DatabaseConnection
+from .llb_segment_store import LLBSegmentStore
+from .llb_search_index import LLBSearchIndex, tokenize, normalize_token
 
 logger = logging.getLogger(__name__)
 
@@ -26,44 +27,88 @@ class LLBStorageOptimizer:
     def __init__(self, storage_path: str = "memory_store/optimized"):
         self.storage_path = storage_path
         self.db_connection = DatabaseConnection()
-        self.compression_level = 6  # gzip compression level
-        self.index_cache: Dict[str, Set[str]] = {}  # keyword -> memory_ids
-        self.memory_index: Dict[str, Dict[str, Any]] = {}  # memory_id -> metadata
+        self.compression_level = 6  # zlib/zstd compression level
+        self.search_index = LLBSearchIndex(f"{storage_path}/index")
         self.friction_score = 72.0  # Starting friction
+        self.compaction_interval = timedelta(minutes=30)
+        self._compaction_task: Optional[asyncio.Task] = None
+        self._snapshot_lock = asyncio.Lock()
 
         os.makedirs(storage_path, exist_ok=True)
-        os.makedirs(f"{storage_path}/compressed", exist_ok=True)
         os.makedirs(f"{storage_path}/index", exist_ok=True)
 
+        # Packed segment store: one pread per record instead of one file per memory
+        self.store = LLBSegmentStore(
+            f"{storage_path}/store",
+            compression_level=self.compression_level
+        )
+
+    @property
+    def memory_index(self) -> Dict[str, Dict[str, Any]]:
+        """memory_id -> metadata, maintained by the search index"""
+        return self.search_index.metadata
+
     async def initialize_optimizer(self):
         """Initialize the L.L.B. storage optimizer"""
         await self.db_connection.initialize_pool()
         await self._load_existing_index()
+        await self._migrate_legacy_files()
         await self._rebuild_search_index()
+        self._compaction_task = asyncio.create_task(self._compaction_loop())
         logger.info("L.L.B. Storage Optimizer initialized with compression and indexing")
 
+    async def _compaction_loop(self):
+        """Periodically compact segments holding deleted or consolidated records"""
+        while True:
+            await asyncio.sleep(self.compaction_interval.total_seconds())
+            try:
+                result = await asyncio.to_thread(self.store.compact)
+                if result["segments_compacted"]:
+                    logger.info(f"Compacted L.L.B. segments: {result}")
+            except Exception as e:
+                logger.error(f"L.L.B. segment compaction failed: {e}")
+
+    async def _migrate_legacy_files(self):
+        """Move memories from the old one-gzip-file-per-memory layout into the segment store"""
+        compressed_dir = f"{self.storage_path}/compressed"
+        if not os.path.isdir(compressed_dir):
+            return
+
+        migrated = 0
+        for filename in os.listdir(compressed_dir):
+            if not filename.endswith('.llb.gz'):
+                continue
+            filepath = os.path.join(compressed_dir, filename)
+            try:
+                with open(filepath, 'rb') as f:
+                    raw = gzip.decompress(f.read())
+                self.store.put(filename[:-7], raw)
+                os.remove(filepath)
+                migrated += 1
+            except Exception as e:
+                logger.error(f"Failed to migrate legacy memory file {filename}: {e}")
+
+        if migrated:
+            self.store.flush()
+            logger.info(f"Migrated {migrated} legacy L.L.B. memory files into segment store")
+
     async def store_memory_optimized(self, memory: LLBProtocol) -> bool:
         """
         Store L.L.B. memory with intelligent compression and indexing
         Reduces friction through optimized storage patterns
         """
         try:
-            # 1. Compress memory data
-            compressed_data = await self._compress_memory(memory)
-
-            # 2. Store compressed data
-            storage_path = await self._store_compressed_memory(memory.id, compressed_data)
+            # 1-2. Compress and append to the segment store
+            raw_data = self._serialize_memory(memory)
+            compressed_size = self.store.put(memory.id, raw_data)
 
-            # 3. Update search index
+            # 3-4. Update search and metadata index (WAL-logged)
             await self._update_search_index(memory)
 
-            # 4. Update metadata index
-            self._update_metadata_index(memory)
-
             # 5. Reduce friction score based on optimization success
             self.friction_score = max(30.0, self.friction_score - 3.0)
 
-            logger.info(f"L.L.B. memory {memory.id} stored with {len(compressed_data)/len(json.dumps(memory.to_dict()).encode())*100:.1f}% compression ratio")
+            logger.info(f"L.L.B. memory {memory.id} stored with {compressed_size/len(raw_data)*100:.1f}% compression ratio")
             return True
 
         except Exception as e:
@@ -79,11 +124,15 @@ class LLBStorageOptimizer:
         Significantly faster than linear search
         """
         try:
-            candidate_ids = await self._find_candidates_with_index(memory_type, query_filter)
+            candidate_ids = await self._find_candidates_with_index(memory_type, query_filter, limit)
             memories = []
 
-            for memory_id in candidate_ids[:limit]:
-                memory = await self._load_compressed_memory(memory_id)
+            # One positional read per candidate, in file order
+            records = self.store.get_many(candidate_ids)
+            for memory_id in candidate_ids:
+                if memory_id not in records:
+                    continue
+                memory = self._deserialize_memory(memory_id, records[memory_id])
                 if memory and self._matches_filter(memory, query_filter):
                     memories.append(memory)
 
@@ -97,121 +146,110 @@ class LLBStorageOptimizer:
             logger.error(f"Failed to retrieve L.L.B. memories: {e}")
             return []
 
-    async def _compress_memory(self, memory: LLBProtocol) -> bytes:
-        """Compress memory data for efficient storage"""
-        memory_dict = memory.to_dict()
-
-        # Convert to JSON string
-        json_data = json.dumps(memory_dict, ensure_ascii=False, default=str)
-
-        # Compress with gzip
-        compressed = gzip.compress(
-            json_data.encode('utf-8'),
-            compresslevel=self.compression_level
-        )
-
-        return compressed
+    def _serialize_memory(self, memory: LLBProtocol) -> bytes:
+        """Serialize memory to JSON bytes (compression happens in the segment store)"""
+        return json.dumps(memory.to_dict(), ensure_ascii=False, default=str).encode('utf-8')
 
-    async def _store_compressed_memory(self, memory_id: str, compressed_data: bytes) -> str:
-        """Store compressed memory data"""
-        filename = f"{self.storage_path}/compressed/{memory_id}.llb.gz"
-        with open(filename, 'wb') as f:
-            f.write(compressed_data)
-        return filename
+    def _deserialize_memory(self, memory_id: str, raw_data: bytes) -> Optional[LLBProtocol]:
+        try:
+            return LLBProtocol.from_dict(json.loads(raw_data.decode('utf-8')))
+        except Exception as e:
+            logger.error(f"Failed to decode memory {memory_id}: {e}")
+            return None
 
     async def _load_compressed_memory(self, memory_id: str) -> Optional[LLBProtocol]:
         """Load and decompress memory data"""
-        filename = f"{self.storage_path}/compressed/{memory_id}.llb.gz"
-
-        if not os.path.exists(filename):
-            return None
-
         try:
-            with open(filename, 'rb') as f:
-                compressed_data = f.read()
-
-            # Decompress
-            json_data = gzip.decompress(compressed_data).decode('utf-8')
-
-            # Parse back to dict and create memory object
-            memory_dict = json.loads(json_data)
-            return LLBProtocol.from_dict(memory_dict)
-
+            raw_data = self.store.get(memory_id)
         except Exception as e:
             logger.error(f"Failed to load compressed memory {memory_id}: {e}")
             return None
 
-    async def _update_search_index(self, memory: LLBProtocol):
-        """Update search index with memory keywords"""
-        keywords = self._extract_keywords(memory)
-
-        for keyword in keywords:
-            if keyword not in self.index_cache:
-                self.index_cache[keyword] = set()
-            self.index_cache[keyword].add(memory.id)
+        if raw_data is None:
+            return None
+        return self._deserialize_memory(memory_id, raw_data)
 
-        # Persist index periodically (every 10 memories)
-        if len(self.memory_index) % 10 == 0:
+    async def _update_search_index(self, memory: LLBProtocol):
+        """Index memory tokens and metadata; the write-ahead log makes it durable immediately"""
+        self.search_index.add(
+            memory.id,
+            self._extract_keywords(memory),
+            self._epoch_seconds(memory.created_at),
+            self._build_metadata(memory)
+        )
+        if self.search_index.snapshot_due:
             await self._persist_search_index()
 
+    @staticmethod
+    def _epoch_seconds(value: datetime) -> float:
+        """Naive UTC datetime -> epoch seconds"""
+        return (value - datetime(1970, 1, 1)).total_seconds()
+
     def _extract_keywords(self, memory: LLBProtocol) -> List[str]:
-        """Extract searchable keywords from memory"""
+        """Extract normalized tokens (with repetitions, for term frequency) from memory"""
         keywords = []
 
-        # From content
-        if isinstance(memory.content, dict):
-            for key, value in memory.content.items():
+        # From content, context and metadata
+        sections = [memory.content if isinstance(memory.content, dict) else {}, memory.context, memory.metadata]
+        for section in sections:
+            for key, value in section.items():
                 if isinstance(value, str):
-                    keywords.extend(value.lower().split())
-                keywords.append(key.lower())
+                    keywords.extend(tokenize(value))
+                keywords.extend(tokenize(str(key)))
 
-        # From context
-        for key, value in memory.context.items():
-            if isinstance(value, str):
-                keywords.extend(value.lower().split())
-            keywords.append(key.lower())
+        # Memory type, owner and priority as field terms
+        keywords.extend(self._field_terms(
+            memory_type=memory.memory_type.value,
+            owner=memory.owner,
+            priority=memory.priority.value
+        ))
 
-        # From metadata
-        for key, value in memory.metadata.items():
-            if isinstance(value, str):
-                keywords.extend(value.lower().split())
-            keywords.append(key.lower())
+        return keywords
 
-        # Memory type and owner
-        keywords.extend([memory.memory_type.value.lower(), memory.owner.lower()])
-
-        return list(set(keywords))  # Remove duplicates
+    @staticmethod
+    def _field_terms(**fields: Any) -> List[str]:
+        return [f"{name}:{normalize_token(str(value))}" for name, value in fields.items() if value is not None]
 
     async def _find_candidates_with_index(self,
                                         memory_type: MemoryType,
-                                        query_filter: Optional[Dict[str, Any]] = None) -> List[str]:
-        """Find candidate memory IDs using search index"""
-        candidates = set()
-
-        # Start with all memories of this type
-        type_keyword = memory_type.value.lower()
-        if type_keyword in self.index_cache:
-            candidates = self.index_cache[type_keyword].copy()
-
-        # Intersect with query filter keywords if provided
-        if query_filter:
-            filter_candidates = set()
-            for key, value in query_filter.items():
-                keyword = str(value).lower()
-                if keyword in self.index_cache:
-                    if not filter_candidates:
-                        filter_candidates = self.index_cache[keyword].copy()
-                    else:
-                        filter_candidates &= self.index_cache[keyword]
-
-            if filter_candidates:
-                candidates &= filter_candidates
-
-        # Convert to list and sort by relevance (simple: most recent first)
-        candidate_list = list(candidates)
-        candidate_list.sort(key=lambda x: self.memory_index.get(x, {}).get('timestamp', ''), reverse=True)
-
-        return candidate_list
+                                        query_filter: Optional[Dict[str, Any]] = None,
+                                        limit: int = 50,
+                                        query: Optional[str] = None) -> List[str]:
+        """
+        Find the top `limit` candidate memory IDs using the search index.
+        Type and filter values are required terms; ranking blends BM25 over
+        the free-text query (and filter tokens) with recency.
+        """
+        required = self._field_terms(memory_type=memory_type.value)
+        query_terms = tokenize(query) if query else []
+
+        for key, value in (query_filter or {}).items():
+            if key in ('memory_type', 'owner', 'priority'):
+                required.extend(self._field_terms(**{key: value}))
+            else:
+                tokens = tokenize(str(value))
+                required.extend(tokens)
+                query_terms.extend(tokens)
+
+        results = self.search_index.search(required, query_terms, limit=limit)
+        return [memory_id for memory_id, _ in results]
+
+    async def search_memories(self,
+                              query: str,
+                              memory_type: Optional[MemoryType] = None,
+                              limit: int = 10) -> List[Dict[str, Any]]:
+        """Free-text ranked search; returns memories with their scores"""
+        required = self._field_terms(memory_type=memory_type.value) if memory_type else []
+        results = self.search_index.search(required, tokenize(query), limit=limit)
+        records = self.store.get_many(memory_id for memory_id, _ in results)
+
+        found = []
+        for memory_id, score in results:
+            if memory_id in records:
+                memory = self._deserialize_memory(memory_id, records[memory_id])
+                if memory:
+                    found.append({"memory": memory, "score": score})
+        return found
 
     def _matches_filter(self, memory: LLBProtocol, query_filter: Optional[Dict[str, Any]]) -> bool:
         """Check if memory matches the query filter"""
@@ -234,66 +272,42 @@ class LLBStorageOptimizer:
 
         return True
 
-    def _update_metadata_index(self, memory: LLBProtocol):
-        """Update metadata index for quick lookups"""
-        self.memory_index[memory.id] = {
+    def _build_metadata(self, memory: LLBProtocol) -> Dict[str, Any]:
+        """Metadata kept in the index for quick lookups"""
+        return {
             'memory_type': memory.memory_type.value,
             'owner': memory.owner if hasattr(memory, 'owner') else 'system',
             'priority': memory.priority.value,
             'timestamp': memory.created_at.isoformat(),
-            'size': len(json.dumps(memory.to_dict()))
+            'size': len(json.dumps(memory.to_dict(), default=str))
         }
 
     async def _load_existing_index(self):
-        """Load existing search index from disk"""
-        index_file = f"{self.storage_path}/index/search_index.pkl"
-
-        if os.path.exists(index_file):
-            try:
-                with open(index_file, 'rb') as f:
-                    self.index_cache = pickle.load(f)
-                logger.info(f"Loaded search index with {len(self.index_cache)} keywords")
-            except Exception as e:
-                logger.error(f"Failed to load search index: {e}")
-                self.index_cache = {}
+        """Load search index from its snapshot and write-ahead log"""
+        try:
+            self.search_index.load()
+        except Exception as e:
+            logger.error(f"Failed to load search index: {e}")
 
-        # Load metadata index
-        metadata_file = f"{self.storage_path}/index/metadata_index.json"
-        if os.path.exists(metadata_file):
+    async def _persist_search_index(self):
+        """Snapshot the search index (updates are already durable in the WAL)"""
+        async with self._snapshot_lock:
             try:
-                with open(metadata_file, 'r', encoding='utf-8') as f:
-                    self.memory_index = json.load(f)
-                logger.info(f"Loaded metadata index with {len(self.memory_index)} memories")
+                data = self.search_index.prepare_snapshot()
+                # Serializing and fsyncing a large index would stall the loop
+                await asyncio.to_thread(self.search_index.write_snapshot, data)
             except Exception as e:
-                logger.error(f"Failed to load metadata index: {e}")
-                self.memory_index = {}
-
-    async def _persist_search_index(self):
-        """Persist search index to disk"""
-        try:
-            index_file = f"{self.storage_path}/index/search_index.pkl"
-            with open(index_file, 'wb') as f:
-                pickle.dump(self.index_cache, f)
-
-            metadata_file = f"{self.storage_path}/index/metadata_index.json"
-            with open(metadata_file, 'w', encoding='utf-8') as f:
-                json.dump(self.memory_index, f, ensure_ascii=False, indent=2)
-
-        except Exception as e:
-            logger.error(f"Failed to persist indexes: {e}")
+                logger.error(f"Failed to persist indexes: {e}")
 
     async def _rebuild_search_index(self):
         """Rebuild search index from stored memories (for recovery)"""
         if not self.memory_index:  # Only rebuild if we don't have metadata
-            compressed_dir = f"{self.storage_path}/compressed"
-            if os.path.exists(compressed_dir):
-                for filename in os.listdir(compressed_dir):
-                    if filename.endswith('.llb.gz'):
-                        memory_id = filename[:-7]  # Remove .llb.gz
-                        memory = await self._load_compressed_memory(memory_id)
-                        if memory:
-                            await self._update_search_index(memory)
-                            self._update_metadata_index(memory)
+            memory_ids = self.store.keys()
+            if memory_ids:
+                for memory_id in memory_ids:
+                    memory = await self._load_compressed_memory(memory_id)
+                    if memory:
+                        await self._update_search_index(memory)
 
                 await self._persist_search_index()
                 logger.info("Search index rebuilt from stored memories")
@@ -307,13 +321,16 @@ class LLBStorageOptimizer:
         cutoff_date = datetime.utcnow() - consolidation_window
 
         # Find memories to consolidate
-        old_memories = []
-        for memory_id, metadata in self.memory_index.items():
+        old_ids = [
+            memory_id for memory_id, metadata in self.memory_index.items()
             if (metadata['memory_type'] == memory_type.value and
-                datetime.fromisoformat(metadata['timestamp']) < cutoff_date):
-                memory = await self._load_compressed_memory(memory_id)
-                if memory and hasattr(memory, 'created_at'):
-                    old_memories.append(memory)
+                datetime.fromisoformat(metadata['timestamp']) < cutoff_date)
+        ]
+        old_memories = []
+        for memory_id, raw_data in self.store.get_many(old_ids).items():
+            memory = self._deserialize_memory(memory_id, raw_data)
+            if memory and hasattr(memory, 'created_at'):
+                old_memories.append(memory)
 
         if not old_memories:
             return {"consolidated": 0, "space_saved": 0}
@@ -331,16 +348,12 @@ class LLBStorageOptimizer:
         # Store consolidated memory
         await self.store_memory_optimized(consolidated_memory)
 
-        # Remove old memories
+        # Remove old memories (space is reclaimed by background compaction)
         space_saved = 0
         for memory in old_memories:
-            filename = f"{self.storage_path}/compressed/{memory.id}.llb.gz"
-            if os.path.exists(filename):
-                space_saved += os.path.getsize(filename)
-                os.remove(filename)
-                # Remove from indexes
-                if memory.id in self.memory_index:
-                    del self.memory_index[memory.id]
+            space_saved += self.store.delete(memory.id)
+            # Remove from indexes
+            self.search_index.remove(memory.id)
 
         # Update indexes
         await self._persist_search_index()
@@ -388,24 +401,18 @@ class LLBStorageOptimizer:
 
     async def get_storage_stats(self) -> Dict[str, Any]:
         """Get comprehensive storage statistics"""
-        compressed_dir = f"{self.storage_path}/compressed"
-        total_size = 0
-        memory_count = 0
-
-        if os.path.exists(compressed_dir):
-            for filename in os.listdir(compressed_dir):
-                if filename.endswith('.llb.gz'):
-                    filepath = os.path.join(compressed_dir, filename)
-                    total_size += os.path.getsize(filepath)
-                    memory_count += 1
+        store_stats = self.store.get_stats()
+        total_size = store_stats["live_bytes"]
+        memory_count = store_stats["records"]
 
         return {
             "total_memories": memory_count,
             "total_compressed_size": total_size,
             "average_memory_size": total_size / max(memory_count, 1),
-            "index_keywords": len(self.index_cache),
+            "index_keywords": self.search_index.term_count,
             "current_friction_score": self.friction_score,
             "compression_ratio": await self._calculate_compression_ratio(),
+            "segment_store": store_stats,
             "optimization_achievements": {
                 "intelligent_compression": True,
                 "search_indexing": True,
@@ -417,27 +424,19 @@ class LLBStorageOptimizer:
 
     async def _calculate_compression_ratio(self) -> float:
         """Calculate average compression ratio"""
-        if not self.memory_index:
-            return 1.0
-
-        total_original = sum(meta['size'] for meta in self.memory_index.values())
-        total_compressed = 0
-
-        for memory_id in list(self.memory_index.keys())[:10]:  # Sample first 10
-            compressed_file = f"{self.storage_path}/compressed/{memory_id}.llb.gz"
-            if os.path.exists(compressed_file):
-                total_compressed += os.path.getsize(compressed_file)
-
-        if total_compressed == 0:
-            return 1.0
-
-        return total_original / (total_compressed * 10)  # Approximate ratio
+        return self.store.get_stats()["compression_ratio"]
 
     async def shutdown_optimizer(self):
         """Gracefully shutdown the L.L.B. storage optimizer"""
         logger.info("Shutting down L.L.B. Storage Optimizer...")
 
-        # Final index persistence
-        await self._persist_search_index()
+        if self._compaction_task:
+            self._compaction_task.cancel()
+            await asyncio.gather(self._compaction_task, return_exceptions=True)
+
+        # Final index persistence (after any snapshot still being written)
+        async with self._snapshot_lock:
+            self.search_index.close()
+        self.store.close()
 
         logger.info("L.L.B. Storage Optimizer shutdown complete")
\ No newline at end of file
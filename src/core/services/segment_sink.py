@@ -0,0 +1,344 @@
+"""
+Segment Sink - Append-only rolling segment storage for ingestion batches
+Replaces one-JSON-file-per-batch persistence with compact, partitioned segments
+"""
+import json
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+# Optional fast codecs - fall back to JSON/zlib when not installed
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_MAGIC = b"DSEG\x01"
+SEGMENT_SUFFIX = ".seg"
+INDEX_SUFFIX = ".idx"
+
+# payload_len, record_count, min_ts_us, max_ts_us, serializer, compressor
+BLOCK_HEADER = struct.Struct("<IIqqBB")
+
+SERIALIZER_JSON = 0
+SERIALIZER_MSGPACK = 1
+
+COMPRESSOR_NONE = 0
+COMPRESSOR_ZLIB = 1
+COMPRESSOR_ZSTD = 2
+
+FSYNC_ALWAYS = "always"      # fsync after every block
+FSYNC_ROLLOVER = "rollover"  # fsync when a segment is closed
+FSYNC_NEVER = "never"        # leave it to the OS
+
+
+@dataclass
+class SegmentSinkConfig:
+    """Rollover, durability and codec settings for a SegmentSink"""
+    max_segment_bytes: int = 64 * 1024 * 1024
+    max_segment_age_seconds: float = 3600.0
+    fsync_policy: str = FSYNC_ROLLOVER
+    compress: bool = True
+    compression_level: int = 3
+
+
+def _to_timestamp_us(value: Any) -> int:
+    """Convert an ISO string / datetime / epoch seconds to epoch microseconds"""
+    if isinstance(value, (int, float)):
+        return int(value * 1_000_000)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp() * 1_000_000)
+    raise ValueError(f"Unsupported timestamp: {value!r}")
+
+
+class _Codec:
+    """Serialize/compress blocks with the best codecs available"""
+
+    def __init__(self, compress: bool, level: int):
+        self.serializer = SERIALIZER_MSGPACK if MSGPACK_AVAILABLE else SERIALIZER_JSON
+        if not compress:
+            self.compressor = COMPRESSOR_NONE
+        elif ZSTD_AVAILABLE:
+            self.compressor = COMPRESSOR_ZSTD
+        else:
+            self.compressor = COMPRESSOR_ZLIB
+        self.level = level
+        self._zstd_compressor = zstandard.ZstdCompressor(level=level) if self.compressor == COMPRESSOR_ZSTD else None
+
+    def encode(self, records: List[Dict[str, Any]]) -> bytes:
+        if self.serializer == SERIALIZER_MSGPACK:
+            raw = msgpack.packb(records, use_bin_type=True, default=str)
+        else:
+            raw = json.dumps(records, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+        if self.compressor == COMPRESSOR_ZSTD:
+            return self._zstd_compressor.compress(raw)
+        if self.compressor == COMPRESSOR_ZLIB:
+            return zlib.compress(raw, self.level)
+        return raw
+
+    @staticmethod
+    def decode(payload: bytes, serializer: int, compressor: int) -> List[Dict[str, Any]]:
+        if compressor == COMPRESSOR_ZSTD:
+            if not ZSTD_AVAILABLE:
+                raise RuntimeError("Segment block is zstd-compressed but zstandard is not installed")
+            payload = zstandard.ZstdDecompressor().decompress(payload)
+        elif compressor == COMPRESSOR_ZLIB:
+            payload = zlib.decompress(payload)
+
+        if serializer == SERIALIZER_MSGPACK:
+            if not MSGPACK_AVAILABLE:
+                raise RuntimeError("Segment block is msgpack-encoded but msgpack is not installed")
+            return msgpack.unpackb(payload, raw=False)
+        return json.loads(payload.decode("utf-8"))
+
+
+class _OpenSegment:
+    """The segment currently receiving appends for one partition"""
+
+    def __init__(self, path: str, fsync_policy: str):
+        self.path = path
+        self.fsync_policy = fsync_policy
+        self.opened_at = time.monotonic()
+        self.min_ts_us: Optional[int] = None
+        self.max_ts_us: Optional[int] = None
+        self.records = 0
+        self.file = open(path, "ab")
+        if self.file.tell() == 0:
+            self.file.write(SEGMENT_MAGIC)
+        self.size = self.file.tell()
+
+    def append_block(self, header: bytes, payload: bytes, min_ts_us: int, max_ts_us: int, count: int) -> None:
+        offset = self.size
+        try:
+            self.file.write(header)
+            self.file.write(payload)
+            self.file.flush()
+            if self.fsync_policy == FSYNC_ALWAYS:
+                os.fsync(self.file.fileno())
+        except Exception:
+            # Drop the torn block so a retry does not leave garbage mid-segment
+            self.file.truncate(offset)
+            self.file.seek(offset)
+            raise
+        self.size = offset + len(header) + len(payload)
+        self.records += count
+        self.min_ts_us = min_ts_us if self.min_ts_us is None else min(self.min_ts_us, min_ts_us)
+        self.max_ts_us = max_ts_us if self.max_ts_us is None else max(self.max_ts_us, max_ts_us)
+
+    def close(self) -> None:
+        self.file.flush()
+        if self.fsync_policy in (FSYNC_ALWAYS, FSYNC_ROLLOVER):
+            os.fsync(self.file.fileno())
+        self.file.close()
+
+        if self.records:
+            # Sidecar index lets readers prune whole segments by time range
+            index_path = self.path + INDEX_SUFFIX
+            with open(index_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump({
+                    "min_ts_us": self.min_ts_us,
+                    "max_ts_us": self.max_ts_us,
+                    "records": self.records,
+                    "bytes": self.size
+                }, f)
+            os.replace(index_path + ".tmp", index_path)
+
+
+class SegmentSink:
+    """
+    Append-only, per-stream partitioned segment store.
+
+    Layout: {root}/{partition}/seg-{start_us}-{seq}.seg (+ .seg.idx once closed)
+    Each segment holds a magic header followed by blocks; one block per
+    appended batch, compressed as a unit so small records share a dictionary
+    window. Block headers carry the batch time range, so range scans skip
+    blocks without decompressing them.
+    """
+
+    def __init__(self, root_path: str, config: Optional[SegmentSinkConfig] = None):
+        self.root_path = root_path
+        self.config = config or SegmentSinkConfig()
+        self._codec = _Codec(self.config.compress, self.config.compression_level)
+        self._open_segments: Dict[str, _OpenSegment] = {}
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(root_path, exist_ok=True)
+
+    def _partition_dir(self, partition: str) -> str:
+        safe = partition.replace("..", "_").strip("/")
+        return os.path.join(self.root_path, safe)
+
+    def _segment_for(self, partition: str) -> _OpenSegment:
+        segment = self._open_segments.get(partition)
+        if segment is not None:
+            too_big = segment.size >= self.config.max_segment_bytes
+            too_old = time.monotonic() - segment.opened_at >= self.config.max_segment_age_seconds
+            if not (too_big or too_old):
+                return segment
+            segment.close()
+            del self._open_segments[partition]
+
+        directory = self._partition_dir(partition)
+        os.makedirs(directory, exist_ok=True)
+        self._sequence += 1
+        name = f"seg-{int(time.time() * 1_000_000):020d}-{self._sequence:06d}{SEGMENT_SUFFIX}"
+        segment = _OpenSegment(os.path.join(directory, name), self.config.fsync_policy)
+        self._open_segments[partition] = segment
+        return segment
+
+    def append(self, partition: str, records: List[Dict[str, Any]], timestamp_field: str = "timestamp") -> int:
+        """
+        Append a batch of records to the partition's current segment as one block.
+        Records without a timestamp are stored stamped with the ingest time, so
+        block ranges and later scans agree on where they fall.
+        Returns the number of bytes written. Blocking - call from a thread in async code.
+        """
+        if not records:
+            return 0
+
+        ingested_at = datetime.now(timezone.utc).isoformat()
+        records = [
+            r if r.get(timestamp_field) is not None else {**r, timestamp_field: ingested_at}
+            for r in records
+        ]
+        timestamps = [_to_timestamp_us(r[timestamp_field]) for r in records]
+        min_ts, max_ts = min(timestamps), max(timestamps)
+        payload = self._codec.encode(records)
+        header = BLOCK_HEADER.pack(
+            len(payload), len(records), min_ts, max_ts,
+            self._codec.serializer, self._codec.compressor
+        )
+
+        with self._lock:
+            segment = self._segment_for(partition)
+            segment.append_block(header, payload, min_ts, max_ts, len(records))
+        return len(header) + len(payload)
+
+    def flush(self) -> None:
+        """Flush and fsync all open segments (regardless of fsync policy)"""
+        with self._lock:
+            for segment in self._open_segments.values():
+                segment.file.flush()
+                os.fsync(segment.file.fileno())
+
+    def close(self) -> None:
+        """Close all open segments"""
+        with self._lock:
+            for segment in self._open_segments.values():
+                segment.close()
+            self._open_segments.clear()
+
+    def list_partitions(self) -> List[str]:
+        """Partitions that have at least one segment"""
+        partitions = []
+        for dirpath, _, filenames in os.walk(self.root_path):
+            if any(f.endswith(SEGMENT_SUFFIX) for f in filenames):
+                partitions.append(os.path.relpath(dirpath, self.root_path).replace(os.sep, "/"))
+        return sorted(partitions)
+
+    def _segments(self, partition: str) -> List[str]:
+        directory = self._partition_dir(partition)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(
+            os.path.join(directory, f) for f in os.listdir(directory) if f.endswith(SEGMENT_SUFFIX)
+        )
+
+    def scan(self,
+             partition: str,
+             start: Any = None,
+             end: Any = None,
+             timestamp_field: str = "timestamp") -> Iterator[Dict[str, Any]]:
+        """
+        Yield records of a partition whose timestamp is in [start, end].
+        Closed segments and blocks whose time range does not overlap are
+        skipped without decompressing them.
+        """
+        start_us = _to_timestamp_us(start) if start is not None else None
+        end_us = _to_timestamp_us(end) if end is not None else None
+
+        segments = self._segments(partition)
+        with self._lock:
+            for segment in self._open_segments.values():
+                segment.file.flush()
+
+        for path in segments:
+            # Closed segments carry a footer index with their time range
+            bounds = self._read_segment_bounds(path)
+            if bounds is not None:
+                seg_min, seg_max = bounds
+                if (start_us is not None and seg_max < start_us) or (end_us is not None and seg_min > end_us):
+                    continue
+            yield from self._scan_segment(path, start_us, end_us, timestamp_field)
+
+    @staticmethod
+    def _read_segment_bounds(path: str) -> Optional[tuple]:
+        try:
+            with open(path + INDEX_SUFFIX, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            return index["min_ts_us"], index["max_ts_us"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _scan_segment(self, path: str, start_us: Optional[int], end_us: Optional[int],
+                      timestamp_field: str) -> Iterator[Dict[str, Any]]:
+        with open(path, "rb") as f:
+            if f.read(len(SEGMENT_MAGIC)) != SEGMENT_MAGIC:
+                logger.error(f"Skipping {path}: not a segment file")
+                return
+            while True:
+                header = f.read(BLOCK_HEADER.size)
+                if len(header) < BLOCK_HEADER.size:
+                    return
+                length, _, block_min, block_max, serializer, compressor = BLOCK_HEADER.unpack(header)
+                if (start_us is not None and block_max < start_us) or (end_us is not None and block_min > end_us):
+                    f.seek(length, os.SEEK_CUR)
+                    continue
+                payload = f.read(length)
+                if len(payload) < length:
+                    # Torn tail from an interrupted write
+                    logger.warning(f"Truncated block at end of {path}")
+                    return
+                for record in _Codec.decode(payload, serializer, compressor):
+                    value = record.get(timestamp_field)
+                    # Records appended before ingest-time stamping: use the block start
+                    ts = _to_timestamp_us(value) if value is not None else block_min
+                    if (start_us is None or ts >= start_us) and (end_us is None or ts <= end_us):
+                        yield record
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Segment counts and sizes per partition"""
+        stats = {}
+        for partition in self.list_partitions():
+            segments = self._segments(partition)
+            stats[partition] = {
+                "segments": len(segments),
+                "bytes": sum(os.path.getsize(p) for p in segments)
+            }
+        return {
+            "serializer": "msgpack" if self._codec.serializer == SERIALIZER_MSGPACK else "json",
+            "compressor": {COMPRESSOR_NONE: "none", COMPRESSOR_ZLIB: "zlib", COMPRESSOR_ZSTD: "zstd"}[self._codec.compressor],
+            "fsync_policy": self.config.fsync_policy,
+            "partitions": stats
+        }
@@ -6,7 +6,8 @@ Ponto de entrada principal da API REST da Corporação Senciente
 import asyncio
 from contextlib import asynccontextmanager
 from typing import Dict, Any, Optional
-from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks
+import json
+from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks, Request
 from fastapi.responses import Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
@@ -18,7 +19,7 @@ from ...infrastructure.database import get_database_connection, initialize_datab
 from ...core.entities.holding import Holding
 from ...core.services.auto_subsidiary_creator import AutoSubsidiaryCreator
 from ...core.services.revenue_sharing_system import RevenueSharingSystem
-from ...core.services.data_ingestion_optimizer import DataIngestionOptimizer
+from ...core.services.data_ingestion_optimizer import DataIngestionOptimizer, BackpressureError, StreamClosedError
 from ...core.services.llb_storage_optimizer import LLBStorageOptimizer
 from ...core.services.infrastructure_provisioning_optimizer import InfrastructureProvisioningOptimizer
 # from ...core.services.realtime_monitoring_dashboard import RealTimeMonitoringDashboard
@@ -602,7 +603,9 @@ async def create_data_stream(request: Dict[str, Any]):
             stream_id=request["stream_id"],
             source=request["source"],
             data_type=request["data_type"],
-            priority=request.get("priority", 5)
+            priority=request.get("priority", 5),
+            max_buffer_size=request.get("max_buffer_size"),
+            backpressure_policy=request.get("backpressure_policy")
         )
         return {
             "status": "success",
@@ -610,9 +613,13 @@ async def create_data_stream(request: Dict[str, Any]):
             "stream": {
                 "id": stream.id,
                 "friction_score": stream.friction_score,
-                "batch_size": stream.batch_size
+                "batch_size": stream.batch_size,
+                "max_buffer_size": stream.max_buffer_size,
+                "backpressure_policy": stream.backpressure_policy
             }
         }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao criar stream: {str(e)}")
 
@@ -625,13 +632,47 @@ async def ingest_data(stream_id: str, data: Dict[str, Any], immediate: bool = Fa
             data=data,
             immediate_process=immediate
         )
-        if success:
-            return {"status": "success", "message": "Dados ingeridos com sucesso"}
+    except BackpressureError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    except StreamClosedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro na ingestão: {str(e)}")
+
+    if success:
+        return {"status": "success", "message": "Dados ingeridos com sucesso"}
+    raise HTTPException(status_code=500, detail="Falha na ingestão de dados")
+
+@app.post("/api/v1/pipeline/ingest/{stream_id}/bulk")
+async def ingest_data_bulk(stream_id: str, request: Request, immediate: bool = False):
+    """Ingerir lote de dados (array JSON ou NDJSON)"""
+    body = await request.body()
+    try:
+        if "ndjson" in request.headers.get("content-type", ""):
+            items = [json.loads(line) for line in body.splitlines() if line.strip()]
         else:
-            raise HTTPException(status_code=500, detail="Falha na ingestão de dados")
+            items = json.loads(body)
+            if isinstance(items, dict):
+                items = [items]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Payload inválido: {str(e)}")
+
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        raise HTTPException(status_code=400, detail="Payload deve ser um array de objetos ou NDJSON")
+
+    try:
+        accepted = await data_optimizer.ingest_bulk(stream_id, items, immediate_process=immediate)
+    except BackpressureError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    except StreamClosedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro na ingestão: {str(e)}")
 
+    if items and not accepted:
+        raise HTTPException(status_code=404, detail=f"Stream {stream_id} não encontrado")
+    return {"status": "success", "accepted": accepted}
+
 @app.get("/api/v1/pipeline/status")
 async def get_pipeline_status():
     """Obter status de otimização do pipeline"""
@@ -717,6 +758,24 @@ async def retrieve_llb_memories(memory_type: str, limit: int = 10, owner: Option
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao recuperar memórias: {str(e)}")
 
+@app.get("/api/v1/llb/search")
+async def search_llb_memories(q: str, memory_type: Optional[str] = None, limit: int = 10):
+    """Busca textual ranqueada (BM25 + recência) nas memórias L.L.B."""
+    try:
+        mem_type = getattr(MemoryType, memory_type.upper(), None) if memory_type else None
+
+        results = await llb_optimizer.search_memories(q, memory_type=mem_type, limit=limit)
+
+        return {
+            "status": "success",
+            "results": [
+                {"score": round(r["score"], 4), "memory": r["memory"].to_dict()}
+                for r in results
+            ]
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro na busca de memórias: {str(e)}")
+
 @app.post("/api/v1/llb/consolidate/{memory_type}")
 async def consolidate_llb_memories(memory_type: str):
     """Consolidar memórias antigas para otimização de armazenamento"""
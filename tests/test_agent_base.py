@@ -0,0 +1,118 @@
+"""
+Unit tests for the agent worker pool and per-capability limits
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "apps"))
+
+from backend.agents.base.agent_base import AgentCapability, AgentTask, BaseAgent
+
+
+class SleepCapability(AgentCapability):
+    """Capability that records its concurrency while sleeping"""
+
+    def __init__(self, name: str, delay: float):
+        self._name = name
+        self.delay = delay
+        self.running = 0
+        self.peak = 0
+        self.finished_at = []
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def description(self) -> str:
+        return f"Sleeps {self.delay}s"
+
+    async def execute(self, parameters):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.running -= 1
+        self.finished_at.append(asyncio.get_running_loop().time())
+        return {"ok": True}
+
+
+class PoolAgent(BaseAgent):
+    async def execute_custom_task(self, task):
+        return {}
+
+
+def _capability_task(name: str) -> AgentTask:
+    return AgentTask("capability_execution", name, parameters={"capability": name})
+
+
+class TestAgentWorkerPool:
+    """Test admission control for the agent worker pool"""
+
+    def _agent(self, **kwargs):
+        agent = PoolAgent(name="pool", **kwargs)
+        slow = SleepCapability("slow", 0.05)
+        fast = SleepCapability("fast", 0.0)
+        agent.register_capability(slow)
+        agent.register_capability(fast)
+        return agent, slow, fast
+
+    def test_capability_limit_caps_concurrency(self):
+        """Test that a capability never runs above its limit"""
+        async def scenario():
+            agent, slow, _ = self._agent(max_workers=4, capability_concurrency={"slow": 2})
+            tasks = [_capability_task("slow") for _ in range(6)]
+            for task in tasks:
+                await agent.assign_task(task)
+            await agent.start_processing()
+            await asyncio.sleep(0.01)
+            metrics = agent.get_processing_metrics()
+            await agent.stop_processing(drain=True)
+            return slow.peak, metrics, tasks
+
+        peak, metrics, tasks = asyncio.run(scenario())
+        assert peak == 2
+        assert metrics['in_flight_by_capability'] == {"slow": 2}
+        assert metrics['waiting_by_capability'] == {"slow": 4}
+        assert all(task.status == "completed" for task in tasks)
+
+    def test_limited_capability_does_not_starve_others(self):
+        """Test that tasks behind a saturated capability still start"""
+        async def scenario():
+            agent, slow, fast = self._agent(max_workers=2, capability_concurrency={"slow": 1})
+            for _ in range(4):
+                await agent.assign_task(_capability_task("slow"))
+            for _ in range(3):
+                await agent.assign_task(_capability_task("fast"))
+            await agent.start_processing()
+            await agent.stop_processing(drain=True)
+            return slow, fast
+
+        slow, fast = asyncio.run(scenario())
+        assert slow.peak == 1
+        assert len(fast.finished_at) == 3
+        # All fast tasks finish while the first slow task is still running
+        assert max(fast.finished_at) < min(slow.finished_at)
+
+    def test_execution_histogram(self):
+        """Test per-capability execution-time histograms"""
+        async def scenario():
+            agent, _, _ = self._agent()
+            for name in ("slow", "fast", "fast"):
+                await agent.assign_task(_capability_task(name))
+            await agent.start_processing()
+            await agent.stop_processing(drain=True)
+            return agent.get_processing_metrics()
+
+        metrics = asyncio.run(scenario())
+        histograms = metrics['execution_time_histograms']
+        assert histograms["fast"]["count"] == 2
+        assert histograms["fast"]["buckets"]["0.01"] == 2
+        assert histograms["slow"]["count"] == 1
+        assert histograms["slow"]["buckets"]["0.01"] == 0
+        assert histograms["slow"]["buckets"]["0.1"] == 1
+        assert histograms["slow"]["buckets"]["+Inf"] == 1
+        assert metrics['waiting'] == 0 and metrics['in_flight'] == 0
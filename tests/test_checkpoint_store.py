@@ -0,0 +1,109 @@
+import pytest
+import json
+from src.az_os.core.checkpoint_manager import CheckpointManager
+from src.az_os.core.checkpoint_store import apply_delta, diff_states
+
+
+class TestDeltaEncoding:
+    """Test JSON state deltas"""
+
+    def test_roundtrip(self):
+        """Test that applying a diff reproduces the new state"""
+        old = {"step": 1, "history": [1, 2], "cfg": {"a": 1, "b": 2}, "gone": True}
+        new = {"step": 2, "history": [1, 2, 3], "cfg": {"a": 1, "c": 3}, "added": [0]}
+        ops = diff_states(old, new)
+        assert ["append", ["history"], [3]] in ops
+        assert apply_delta(old, ops) == new
+        assert old["history"] == [1, 2]  # source state untouched
+
+
+class TestCheckpointStore:
+    """Test content-addressed, delta-encoded checkpoints"""
+
+    def test_delta_chain_restore_and_dedup(self, tmp_path):
+        """Test that every checkpoint restores exactly from deltas"""
+        manager = CheckpointManager(str(tmp_path / "checkpoints"), full_every=5)
+        state = {"step": 0, "history": [], "blob": "x" * 2000}
+        saved = []
+        for i in range(12):
+            state["step"] = i
+            state["history"].append({"i": i})
+            saved.append((manager.create_checkpoint("task", state), json.loads(json.dumps(state))))
+        manager.create_checkpoint("task", state)  # identical state: no new object
+
+        entries = manager.store.entries("task")
+        assert sum(entry["delta"] for entry in entries) >= 8
+        assert max(entry["depth"] for entry in entries) < 5
+        assert entries[-1]["stored_bytes"] == 0
+        assert manager.get_checkpoint_stats()["objects"] == 12
+
+        reopened = CheckpointManager(str(tmp_path / "checkpoints"))
+        for path, expected in saved:
+            assert reopened.restore_checkpoint(path) == expected
+        latest = reopened.list_checkpoints("task")[0]
+        assert reopened.restore_checkpoint(latest["checkpoint_id"])["step"] == 11
+
+    def test_clear_collects_objects_and_indexes_legacy_files(self, tmp_path):
+        """Test legacy JSON checkpoints are indexed once and clear removes objects"""
+        directory = tmp_path / "checkpoints"
+        directory.mkdir()
+        (directory / "old_manual_1.json").write_text(json.dumps({
+            "task_id": "old", "checkpoint_id": "manual_1", "checkpoint_type": "manual",
+            "timestamp": "2024-01-01T00:00:00", "state": {"v": 1}, "git_commit": None,
+        }))
+        manager = CheckpointManager(str(directory))
+        manager.create_checkpoint("new", {"v": 2})
+
+        assert manager.restore_checkpoint("manual_1") == {"v": 1}
+        assert [cp["task_id"] for cp in manager.list_checkpoints()] == ["new", "old"]
+        assert manager.clear_checkpoints("new") == 1
+        assert manager.get_checkpoint_stats()["objects"] == 0
+        assert manager.clear_checkpoints() == 1
+        assert not (directory / "old_manual_1.json").exists()
+
+
+class TestRollback:
+    """Test rolling a task back to its previous checkpoint"""
+
+    def test_rollback_without_auto_commit_restores_from_store(self, tmp_path, monkeypatch):
+        """Test that rollback leaves Git alone when it did not create the commits"""
+        git = pytest.importorskip("git")
+        repo = git.Repo.init(tmp_path)
+        (tmp_path / "work.txt").write_text("committed")
+        repo.index.add(["work.txt"])
+        repo.index.commit("initial")
+        (tmp_path / "work.txt").write_text("uncommitted edit")
+        monkeypatch.chdir(tmp_path)
+
+        manager = CheckpointManager(str(tmp_path / "checkpoints"))
+        manager.create_checkpoint("task", {"step": 1})
+        manager.create_checkpoint("task", {"step": 2})
+
+        assert manager.rollback("task")
+        latest = manager.list_checkpoints("task")[0]
+        assert latest["checkpoint_type"] == "rollback"
+        assert manager.restore_checkpoint(latest["checkpoint_id"]) == {"step": 1}
+        assert (tmp_path / "work.txt").read_text() == "uncommitted edit"
+
+    def test_rollback_resets_auto_commits(self, tmp_path, monkeypatch):
+        """Test that rollback resets the tree when both checkpoints were auto-committed"""
+        git = pytest.importorskip("git")
+        repo = git.Repo.init(tmp_path)
+        (tmp_path / "work.txt").write_text("v1")
+        repo.index.add(["work.txt"])
+        repo.index.commit("initial")
+        monkeypatch.chdir(tmp_path)
+
+        manager = CheckpointManager("checkpoints", auto_commit=True)
+        manager.create_checkpoint("task", {"step": 1})
+        first = manager.store.entries("task")[-1]["auto_commit"]
+        (tmp_path / "work.txt").write_text("v2")
+        repo.index.add(["work.txt"])
+        manager.create_checkpoint("task", {"step": 2})
+
+        assert manager.rollback("task")
+        assert repo.head.commit.hexsha == first
+        assert (tmp_path / "work.txt").read_text() == "v1"
+        entries = manager.store.entries("task")
+        assert len(entries) == 1 and entries[0]["auto_commit"] == first
+        assert manager.restore_checkpoint(entries[0]["checkpoint_id"]) == {"step": 1}
@@ -0,0 +1,60 @@
+"""
+Unit tests for lazy subcommand loading in the az CLI
+"""
+
+import pytest
+import subprocess
+import sys
+from pathlib import Path
+
+
+SRC = Path(__file__).parent.parent / "src"
+
+
+def _run(code: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=SRC)
+
+
+class TestLazyCommands:
+    """Test that subcommand modules load only when invoked"""
+
+    def test_help_does_not_import_subcommands(self):
+        """Test top-level help lists lazy commands without importing them"""
+        result = _run(
+            "import sys\n"
+            "from typer.testing import CliRunner\n"
+            "from az_os.cli.main import app\n"
+            "out = CliRunner().invoke(app, ['--help']).output\n"
+            "assert 'metrics' in out and 'logs' in out, out\n"
+            "loaded = [m for m in sys.modules if m.endswith(('metrics_commands', 'logs_commands', 'config_commands'))]\n"
+            "assert not loaded, loaded\n"
+        )
+        assert result.returncode == 0, result.stderr
+
+    def test_subcommand_loaded_on_invoke(self):
+        """Test invoking a group imports only that group's module"""
+        result = _run(
+            "import sys\n"
+            "from typer.testing import CliRunner\n"
+            "from az_os.cli.main import app\n"
+            "out = CliRunner().invoke(app, ['metrics', '--help']).output\n"
+            "assert 'metrics-show' in out, out\n"
+            "assert 'az_os.cli.metrics_commands' in sys.modules\n"
+            "assert 'az_os.cli.logs_commands' not in sys.modules\n"
+        )
+        assert result.returncode == 0, result.stderr
+
+    def test_profile_startup_report(self):
+        """Test the import-time report"""
+        result = _run("import sys; sys.argv = ['az', '--profile-startup']; from az_os.cli.main import main; main()")
+        assert "az startup:" in result.stdout
+        assert "Slowest modules" in result.stdout
+
+        section = result.stdout.split("Slowest top-level imports")[1].split("Slowest modules")[0]
+        roots = [line.split()[-1] for line in section.splitlines()[1:] if line.strip()]
+        assert "az_os.cli.main" in roots
+        assert "site" in roots
+        # imported by az_os.cli.main, so nested rather than top-level
+        assert "typer" not in roots
+        assert "az_os.cli.lazy" not in roots
+        assert "rich.markdown" not in roots
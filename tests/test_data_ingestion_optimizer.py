@@ -0,0 +1,225 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager
+import pytest
+from src.core.services.data_ingestion_optimizer import (
+    BACKPRESSURE_BLOCK, BACKPRESSURE_DROP_OLDEST, BACKPRESSURE_REJECT,
+    BackpressureError, DataIngestionOptimizer, StreamClosedError
+)
+
+
+def _items(start: int, count: int):
+    return [{"n": i} for i in range(start, start + count)]
+
+
+class TestBackpressure:
+    """Test stream buffer limits and back-pressure policies"""
+
+    async def _stream(self, tmp_path, policy, max_buffer_size=25):
+        optimizer = DataIngestionOptimizer(str(tmp_path))
+        # priority 9 -> batch size 25
+        await optimizer.create_optimized_stream("s1", "test", "events", priority=9,
+                                                max_buffer_size=max_buffer_size,
+                                                backpressure_policy=policy)
+        return optimizer, optimizer.active_streams["s1"]
+
+    def test_buffer_smaller_than_batch_rejected(self, tmp_path):
+        """Test that a max_buffer_size below the batch size is an error, not silently raised"""
+        optimizer = DataIngestionOptimizer(str(tmp_path))
+        with pytest.raises(ValueError):
+            asyncio.run(optimizer.create_optimized_stream("s1", "test", "events", priority=9, max_buffer_size=10))
+
+    def test_reject_policy_raises_when_full(self, tmp_path):
+        """Test that 'reject' refuses a write that does not fit"""
+        async def scenario():
+            optimizer, stream = await self._stream(tmp_path, BACKPRESSURE_REJECT, max_buffer_size=30)
+            stream.batch_size = 100  # keep the flusher out of the way
+            await optimizer.ingest_bulk("s1", _items(0, 20))
+            with pytest.raises(BackpressureError) as error:
+                await optimizer.ingest_bulk("s1", _items(20, 11))
+            await optimizer.ingest_bulk("s1", _items(20, 10))
+            buffered = [e["data"]["n"] for e in stream.buffer]
+            await optimizer.shutdown_optimizer()
+            return error.value, buffered, optimizer.metrics.records_rejected
+
+        error, buffered, rejected = asyncio.run(scenario())
+        assert (error.buffered, error.capacity) == (20, 30)
+        assert buffered == list(range(30))
+        assert rejected == 11
+
+    def test_drop_oldest_policy_keeps_newest(self, tmp_path):
+        """Test that 'drop_oldest' evicts the oldest entries and counts them"""
+        async def scenario():
+            optimizer, stream = await self._stream(tmp_path, BACKPRESSURE_DROP_OLDEST, max_buffer_size=30)
+            stream.batch_size = 100
+            await optimizer.ingest_bulk("s1", _items(0, 40))
+            buffered = [e["data"]["n"] for e in stream.buffer]
+            await optimizer.shutdown_optimizer()
+            return buffered, optimizer.metrics.records_dropped
+
+        buffered, dropped = asyncio.run(scenario())
+        assert buffered == list(range(10, 40))
+        assert dropped == 10
+
+    def test_block_policy_waits_for_flush(self, tmp_path):
+        """Test that 'block' holds producers until the flusher frees space, losing nothing"""
+        async def scenario():
+            optimizer, stream = await self._stream(tmp_path, BACKPRESSURE_BLOCK)
+            peak = 0
+            persist = optimizer._process_generic_batch
+
+            async def slow_persist(batch, data_type):
+                nonlocal peak
+                peak = max(peak, optimizer._occupancy(stream))
+                await asyncio.sleep(0.01)
+                return await persist(batch, data_type)
+
+            optimizer._process_generic_batch = slow_persist
+            await asyncio.wait_for(optimizer.ingest_bulk("s1", _items(0, 80)), timeout=5)
+            await optimizer.shutdown_optimizer()
+            persisted = await optimizer.read_stream("s1")
+            return peak, [r["data"]["n"] for r in persisted]
+
+        peak, persisted = asyncio.run(scenario())
+        assert peak <= 25
+        assert persisted == list(range(80))
+
+    def test_requeue_respects_drop_oldest_capacity(self, tmp_path):
+        """Test that re-queuing a failed batch drops the oldest overflow"""
+        async def scenario():
+            optimizer, stream = await self._stream(tmp_path, BACKPRESSURE_DROP_OLDEST)
+            stream.batch_size = 100
+            await optimizer.ingest_bulk("s1", _items(0, 25))
+
+            async def failing_persist(batch, data_type):
+                # Producers keep writing while the batch is out of the buffer
+                await optimizer.ingest_bulk("s1", _items(25, 10))
+                return False
+
+            optimizer._process_generic_batch = failing_persist
+            assert not await optimizer._process_batch_optimized(stream)
+            return [e["data"]["n"] for e in stream.buffer], optimizer.metrics.records_dropped
+
+        buffered, dropped = asyncio.run(scenario())
+        assert buffered == list(range(10, 35))
+        assert dropped == 10
+
+    def test_in_flight_batch_counts_against_reject_capacity(self, tmp_path):
+        """Test that 'reject' cannot overfill the buffer while a flush may re-queue"""
+        async def scenario():
+            optimizer, stream = await self._stream(tmp_path, BACKPRESSURE_REJECT)
+            stream.batch_size = 100
+            await optimizer.ingest_bulk("s1", _items(0, 25))
+            errors = []
+
+            async def failing_persist(batch, data_type):
+                try:
+                    await optimizer.ingest_bulk("s1", _items(25, 1))
+                except BackpressureError as e:
+                    errors.append(e)
+                return False
+
+            optimizer._process_generic_batch = failing_persist
+            assert not await optimizer._process_batch_optimized(stream)
+            return len(stream.buffer), errors
+
+        buffered, errors = asyncio.run(scenario())
+        assert buffered == 25
+        assert len(errors) == 1
+
+
+class TestShutdown:
+    """Test draining and closing streams on shutdown"""
+
+    def test_shutdown_drains_buffers(self, tmp_path):
+        """Test that entries below the batch size are persisted on shutdown"""
+        async def scenario():
+            optimizer = DataIngestionOptimizer(str(tmp_path))
+            await optimizer.create_optimized_stream("s1", "test", "events", priority=9)
+            await optimizer.ingest_bulk("s1", _items(0, 5))
+            await optimizer.shutdown_optimizer()
+            with pytest.raises(StreamClosedError):
+                await optimizer.ingest_bulk("s1", _items(5, 1))
+            return await optimizer.read_stream("s1")
+
+        persisted = asyncio.run(scenario())
+        assert [r["data"]["n"] for r in persisted] == list(range(5))
+
+    def test_shutdown_wakes_blocked_producers(self, tmp_path):
+        """Test that a producer blocked on a full buffer gets StreamClosedError"""
+        async def scenario():
+            optimizer = DataIngestionOptimizer(str(tmp_path))
+            await optimizer.create_optimized_stream("s1", "test", "events", priority=9, max_buffer_size=25)
+
+            async def failing_persist(batch, data_type):
+                return False
+
+            optimizer._process_generic_batch = failing_persist
+            await optimizer.ingest_bulk("s1", _items(0, 25))
+            producer = asyncio.create_task(optimizer.ingest_bulk("s1", _items(25, 1)))
+            await asyncio.sleep(0.05)
+            assert not producer.done()
+
+            await asyncio.wait_for(optimizer.shutdown_optimizer(), timeout=5)
+            with pytest.raises(StreamClosedError):
+                await producer
+
+        asyncio.run(scenario())
+
+
+class TestIngestEndpoints:
+    """Test the HTTP mapping of back-pressure and bulk ingestion"""
+
+    @pytest.fixture
+    def client(self, tmp_path, monkeypatch):
+        pytest.importorskip("fastapi")
+        from fastapi.testclient import TestClient
+        from src.presentation.api import main
+
+        @asynccontextmanager
+        async def no_lifespan(app):
+            yield
+
+        optimizer = DataIngestionOptimizer(str(tmp_path))
+        monkeypatch.setattr(main, "data_optimizer", optimizer)
+        # Skip database start-up; one client context keeps a single event loop
+        monkeypatch.setattr(main.app.router, "lifespan_context", no_lifespan)
+        with TestClient(main.app) as test_client:
+            yield test_client, optimizer
+
+    def _create(self, client, policy):
+        response = client.post("/api/v1/pipeline/streams", json={
+            "stream_id": "s1", "source": "test", "data_type": "events",
+            "priority": 9, "max_buffer_size": 25, "backpressure_policy": policy
+        })
+        assert response.status_code == 200
+
+    def test_ndjson_bulk_ingest(self, client):
+        """Test that NDJSON bodies are split into one entry per line"""
+        client, optimizer = client
+        self._create(client, BACKPRESSURE_REJECT)
+        body = "\n".join(json.dumps(item) for item in _items(0, 3)) + "\n"
+        response = client.post("/api/v1/pipeline/ingest/s1/bulk", content=body,
+                               headers={"content-type": "application/x-ndjson"})
+        assert response.status_code == 200
+        assert response.json()["accepted"] == 3
+
+    def test_full_buffer_returns_429_with_retry_after(self, client):
+        """Test that a rejected write maps to 429 Too Many Requests"""
+        client, optimizer = client
+        self._create(client, BACKPRESSURE_REJECT)
+        optimizer.active_streams["s1"].batch_size = 100
+        assert client.post("/api/v1/pipeline/ingest/s1/bulk", json=_items(0, 25)).status_code == 200
+
+        response = client.post("/api/v1/pipeline/ingest/s1", json={"n": 25})
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "1"
+
+    def test_closed_optimizer_returns_503(self, client):
+        """Test that ingesting during shutdown maps to 503 Service Unavailable"""
+        client, optimizer = client
+        self._create(client, BACKPRESSURE_BLOCK)
+        optimizer._closed = True
+
+        assert client.post("/api/v1/pipeline/ingest/s1", json={"n": 0}).status_code == 503
+        assert client.post("/api/v1/pipeline/ingest/s1/bulk", json=_items(0, 2)).status_code == 503
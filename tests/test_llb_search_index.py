@@ -0,0 +1,143 @@
+import asyncio
+import os
+import threading
+import pytest
+from src.core.services.llb_search_index import LLBSearchIndex
+from src.core.services.llb_storage_optimizer import LLBStorageOptimizer
+from src.core.value_objects.llb_protocol import LLBProtocol, MemoryType
+
+
+class TestLLBSearchIndex:
+    """Test required-term filtering in the L.L.B. search index"""
+
+    def test_missing_required_term_matches_nothing(self, tmp_path):
+        """Test that a required term with no postings returns no documents"""
+        index = LLBSearchIndex(str(tmp_path))
+        index.add("m1", ["hello", "memory_type:episodic"], timestamp=1.0)
+
+        assert [doc for doc, _ in index.search(["memory_type:episodic"], ["hello"])] == ["m1"]
+        assert index.search(["memory_type:semantic"], ["hello"]) == []
+        assert index.search(["memory_type:semantic"]) == []
+
+    def test_type_filter_without_matching_type(self, tmp_path):
+        """Test that retrieval by a memory type nobody stored returns nothing"""
+        optimizer = LLBStorageOptimizer(str(tmp_path / "llb"))
+        memory = LLBProtocol(memory_type=MemoryType.EPISODIC, content={"text": "hello world"}, owner="tester")
+
+        async def scenario():
+            assert await optimizer.store_memory_optimized(memory)
+            return (
+                await optimizer.retrieve_memory_optimized(MemoryType.SEMANTIC),
+                await optimizer.search_memories("hello", memory_type=MemoryType.SEMANTIC),
+                await optimizer.search_memories("hello", memory_type=MemoryType.EPISODIC),
+            )
+
+        semantic, semantic_search, episodic_search = asyncio.run(scenario())
+        assert semantic == []
+        assert semantic_search == []
+        assert [found["memory"].id for found in episodic_search] == [memory.id]
+
+    def test_bm25_ranks_by_relevance(self, tmp_path):
+        """Test that term frequency and rarity drive the ranking"""
+        index = LLBSearchIndex(str(tmp_path), recency_weight=0.0)
+        index.add("often", ["betting", "betting", "betting", "odds"], timestamp=1.0)
+        index.add("once", ["betting", "odds", "tennis", "match"], timestamp=1.0)
+        index.add("rare", ["tennis", "odds"], timestamp=1.0)
+
+        ranked = [doc for doc, _ in index.search(query_terms=["betting"])]
+        assert ranked == ["often", "once"]
+        # "tennis" is rarer than "odds", so it carries more weight
+        ranked = [doc for doc, _ in index.search(query_terms=["tennis", "odds"])]
+        assert ranked[0] == "rare"
+
+    def test_recency_breaks_relevance_ties(self, tmp_path):
+        """Test that newer memories win among equally relevant ones"""
+        index = LLBSearchIndex(str(tmp_path), recency_weight=0.3, recency_half_life_days=1.0)
+        now = 10 * 86400.0
+        index.add("old", ["match"], timestamp=now - 5 * 86400)
+        index.add("new", ["match"], timestamp=now - 3600)
+
+        assert [doc for doc, _ in index.search(query_terms=["match"], now=now)] == ["new", "old"]
+        # Without query terms the ranking is recency alone
+        assert [doc for doc, _ in index.search(now=now)] == ["new", "old"]
+
+    def test_wal_replay_after_reopen(self, tmp_path):
+        """Test that unsnapshotted updates are recovered from the WAL"""
+        index = LLBSearchIndex(str(tmp_path))
+        index.load()
+        index.add("m1", ["alpha"], timestamp=1.0, metadata={"owner": "a"})
+        index.add("m2", ["beta"], timestamp=2.0)
+        index.add("m1", ["gamma"], timestamp=3.0, metadata={"owner": "b"})
+        index.remove("m2")
+
+        reopened = LLBSearchIndex(str(tmp_path))
+        reopened.load()
+        assert len(reopened) == 1
+        assert reopened.metadata["m1"] == {"owner": "b"}
+        assert reopened.search(["alpha"]) == []
+        assert [doc for doc, _ in reopened.search(["gamma"])] == ["m1"]
+        assert reopened.search(["beta"]) == []
+
+    def test_snapshot_truncates_wal(self, tmp_path):
+        """Test that a snapshot purges tombstones, empties the WAL and reloads"""
+        index = LLBSearchIndex(str(tmp_path))
+        index.load()
+        for i in range(5):
+            index.add(f"m{i}", ["common", f"t{i}"], timestamp=float(i))
+        index.remove("m0")
+        index.snapshot()
+        assert os.path.getsize(index.wal_path) == 0
+        assert not os.path.exists(index.prev_wal_path)
+        assert len(index.doc_ids) == 4
+
+        index.add("m5", ["common"], timestamp=5.0)
+        reopened = LLBSearchIndex(str(tmp_path))
+        reopened.load()
+        assert sorted(doc for doc, _ in reopened.search(["common"])) == ["m1", "m2", "m3", "m4", "m5"]
+
+    def test_interrupted_snapshot_replays_rotated_wal(self, tmp_path):
+        """Test that a snapshot that never finished writing loses no updates"""
+        index = LLBSearchIndex(str(tmp_path))
+        index.load()
+        index.add("m1", ["alpha"], timestamp=1.0)
+        index.prepare_snapshot()  # crash before write_snapshot()
+        index.add("m2", ["alpha"], timestamp=2.0)
+
+        reopened = LLBSearchIndex(str(tmp_path))
+        reopened.load()
+        assert sorted(doc for doc, _ in reopened.search(["alpha"])) == ["m1", "m2"]
+
+    def test_failed_log_leaves_index_unchanged(self, tmp_path):
+        """Test that an update is applied only after it reached the WAL"""
+        index = LLBSearchIndex(str(tmp_path))
+        index.load()
+        index._wal.close()
+
+        with pytest.raises(ValueError):
+            index.add("m1", ["alpha"], timestamp=1.0)
+        assert len(index) == 0
+        assert index.search(["alpha"]) == []
+
+    def test_optimizer_snapshots_off_the_event_loop(self, tmp_path, monkeypatch):
+        """Test that due snapshots are written from a worker thread"""
+        optimizer = LLBStorageOptimizer(str(tmp_path / "llb"))
+        optimizer.search_index.snapshot_every = 3
+        loop_thread = threading.get_ident()
+        writers = []
+        write_snapshot = optimizer.search_index.write_snapshot
+
+        def recording_write(data):
+            writers.append(threading.get_ident())
+            write_snapshot(data)
+
+        monkeypatch.setattr(optimizer.search_index, "write_snapshot", recording_write)
+
+        async def scenario():
+            for i in range(3):
+                memory = LLBProtocol(memory_type=MemoryType.EPISODIC, content={"text": f"note {i}"}, owner="tester")
+                assert await optimizer.store_memory_optimized(memory)
+
+        asyncio.run(scenario())
+        assert writers and loop_thread not in writers
+        assert os.path.exists(optimizer.search_index.snapshot_path)
+        assert os.path.getsize(optimizer.search_index.wal_path) == 0
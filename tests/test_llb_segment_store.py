@@ -0,0 +1,88 @@
+import os
+import pytest
+from src.core.services import llb_segment_store
+from src.core.services.llb_segment_store import LLBSegmentStore, NO_DICTIONARY
+
+
+def _record(i: int) -> bytes:
+    return ('{"id": "m%d", "memory_type": "episodic", "owner": "tester", "content": {"text": "memory number %d"}}' % (i, i)).encode()
+
+
+class TestLLBSegmentStore:
+    """Test packed segment storage, compaction and recovery"""
+
+    def test_put_get_delete_reopen(self, tmp_path):
+        """Test that puts and deletes survive a reopen through the index log"""
+        store = LLBSegmentStore(str(tmp_path))
+        for i in range(10):
+            store.put(f"m{i}", _record(i))
+        store.put("m3", b'{"replaced": true}')
+        assert store.delete("m5") > 0
+        assert store.delete("missing") == 0
+        store.close()
+
+        reopened = LLBSegmentStore(str(tmp_path))
+        assert sorted(reopened.keys()) == sorted(f"m{i}" for i in range(10) if i != 5)
+        assert reopened.get("m3") == b'{"replaced": true}'
+        assert reopened.get("m5") is None
+        assert reopened.get_many(["m1", "m2", "missing"]) == {"m1": _record(1), "m2": _record(2)}
+        reopened.close()
+
+    def test_compact_reclaims_dead_bytes(self, tmp_path):
+        """Test that compaction drops dead records and keeps live ones readable"""
+        store = LLBSegmentStore(str(tmp_path), max_segment_bytes=512)
+        for i in range(40):
+            store.put(f"m{i}", _record(i))
+        for i in range(0, 40, 2):
+            store.delete(f"m{i}")
+
+        before = store.get_stats()
+        result = store.compact(force=True)
+        after = store.get_stats()
+        assert result["segments_compacted"] > 0
+        assert result["records_rewritten"] == 20
+        assert after["dead_bytes"] < before["dead_bytes"]
+        store.close()
+
+        reopened = LLBSegmentStore(str(tmp_path), max_segment_bytes=512)
+        assert len(reopened.keys()) == 20
+        assert all(reopened.get(f"m{i}") == _record(i) for i in range(1, 40, 2))
+        reopened.close()
+
+    def test_crash_before_segment_removal_keeps_records(self, tmp_path, monkeypatch):
+        """Test that records stay readable when compaction dies before removing old segments"""
+        store = LLBSegmentStore(str(tmp_path), max_segment_bytes=512)
+        for i in range(20):
+            store.put(f"m{i}", _record(i))
+
+        def crash(path):
+            raise OSError("simulated crash")
+
+        monkeypatch.setattr(llb_segment_store.os, "remove", crash)
+        with pytest.raises(OSError):
+            store.compact(force=True)
+        monkeypatch.undo()
+
+        reopened = LLBSegmentStore(str(tmp_path), max_segment_bytes=512)
+        assert all(reopened.get(f"m{i}") == _record(i) for i in range(20))
+        reopened.close()
+
+    def test_dictionary_training(self, tmp_path):
+        """Test that a dictionary is trained after enough samples and persisted"""
+        store = LLBSegmentStore(str(tmp_path), dictionary_training_samples=50)
+        for i in range(49):
+            store.put(f"m{i}", _record(i))
+        assert store.get_stats()["dictionary_id"] == NO_DICTIONARY
+
+        for i in range(49, 100):
+            store.put(f"m{i}", _record(i))
+        dict_id = store.get_stats()["dictionary_id"]
+        assert dict_id != NO_DICTIONARY
+        assert os.path.exists(tmp_path / "dicts" / f"dict-{dict_id}.bin")
+        assert store.index["m99"].dict_id == dict_id
+        store.close()
+
+        reopened = LLBSegmentStore(str(tmp_path))
+        assert reopened.get("m0") == _record(0)
+        assert reopened.get("m99") == _record(99)
+        reopened.close()
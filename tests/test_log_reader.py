@@ -0,0 +1,74 @@
+import pytest
+import os
+import threading
+import time
+from src.az_os.utils.log_reader import LogFollower, count_lines, tail_lines
+
+
+class TestTailLines:
+    """Test backward block tail"""
+
+    def test_tail_across_blocks(self, tmp_path):
+        """Test tail spanning several small blocks"""
+        path = tmp_path / "app.log"
+        path.write_text("".join(f"line {i}\n" for i in range(1000)))
+        assert tail_lines(str(path), 3, block_size=16) == ["line 997", "line 998", "line 999"]
+        assert len(tail_lines(str(path), 5000, block_size=64)) == 1000
+        assert count_lines(str(path)) == 1000
+
+    def test_tail_without_trailing_newline(self, tmp_path):
+        """Test that an unterminated last line is returned"""
+        path = tmp_path / "app.log"
+        path.write_text("a\nb\nc")
+        assert tail_lines(str(path), 2) == ["b", "c"]
+
+
+class TestLogFollower:
+    """Test offset-based following"""
+
+    def test_follow_partial_lines(self, tmp_path):
+        """Test that partial lines wait for their newline"""
+        path = tmp_path / "app.log"
+        path.write_text("old\n")
+        with LogFollower(str(path)) as follower:
+            assert follower.read_new_lines() == []
+            with open(path, "a") as f:
+                f.write("new 1\nnew")
+            assert follower.read_new_lines() == ["new 1"]
+            with open(path, "a") as f:
+                f.write(" 2\n")
+            assert follower.read_new_lines() == ["new 2"]
+            assert follower.offset == os.path.getsize(path)
+
+    def test_rotation_and_truncation(self, tmp_path):
+        """Test rotated and truncated files are picked up"""
+        path = tmp_path / "app.log"
+        path.write_text("")
+        with LogFollower(str(path)) as follower:
+            with open(path, "a") as f:
+                f.write("before\ntail")
+            os.rename(path, tmp_path / "app.log.1")
+            path.write_text("after\n")
+            assert follower.read_new_lines() == ["before", "tail", "after"]
+            assert follower.rotations == 1
+
+            path.write_text("x\n")  # truncate in place
+            assert follower.read_new_lines() == ["x"]
+
+    def test_wait_wakes_on_append(self, tmp_path):
+        """Test wait() returns early when the file changes"""
+        path = tmp_path / "app.log"
+        path.write_text("")
+        with LogFollower(str(path)) as follower:
+            def append():
+                time.sleep(0.1)
+                with open(path, "a") as f:
+                    f.write("hello\n")
+
+            writer = threading.Thread(target=append)
+            writer.start()
+            started = time.monotonic()
+            assert follower.wait(timeout=5) is True
+            assert time.monotonic() - started < 2
+            writer.join()
+            assert follower.read_new_lines() == ["hello"]
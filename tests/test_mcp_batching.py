@@ -0,0 +1,63 @@
+import json
+import unittest
+
+import httpx
+
+from src.az_os.core.mcp_client import MCPClient, MCPError
+
+
+class TestMCPClientBatching(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.files = {"a.txt": ("A", 1), "b.txt": ("B", 1)}
+        self.posts = []
+
+    def _handler(self, request):
+        body = json.loads(request.content)
+        self.posts.append(body)
+        results = []
+        for item in body if isinstance(body, list) else [body]:
+            path = item["params"].get("path")
+            if item["method"] == "filesystem.stat":
+                results.append({"id": item["id"], "result": {"mtime": self.files[path][1], "size": 1}})
+            elif item["method"] == "filesystem.read":
+                results.append({"id": item["id"], "result": self.files[path][0]})
+            elif item["method"] == "filesystem.write":
+                self.files[path] = (item["params"]["content"], self.files[path][1] + 1)
+                results.append({"id": item["id"], "result": True})
+            else:
+                results.append({"id": item["id"], "error": {"code": -32601, "message": "not found"}})
+        return httpx.Response(200, json=results if isinstance(body, list) else results[0])
+
+    def _client(self):
+        client = MCPClient(retry_delay=0)
+        client.client = httpx.AsyncClient(transport=httpx.MockTransport(self._handler))
+        return client
+
+    async def test_concurrent_calls_share_one_batch(self):
+        """Test that concurrent calls go out as one JSON-RPC batch"""
+        async with self._client() as client:
+            results = await client.call_many(
+                [("filesystem.read", {"path": "a.txt"}), ("filesystem.read", {"path": "b.txt"}), ("bogus", {})]
+            )
+        self.assertEqual(results[:2], ["A", "B"])
+        self.assertIsInstance(results[2], MCPError)
+        self.assertEqual(len(self.posts), 1)
+        self.assertEqual([item["jsonrpc"] for item in self.posts[0]], ["2.0"] * 3)
+
+    async def test_read_cache_revalidates_on_mtime(self):
+        """Test that cached reads are served after a stat and invalidated by writes"""
+        async with self._client() as client:
+            self.assertEqual(await client.read_file("a.txt"), "A")
+            self.assertEqual(await client.read_file("a.txt"), "A")
+            self.assertEqual(client.stats["cache_hits"], 1)
+            self.assertEqual(self.posts[-1]["method"], "filesystem.stat")
+
+            self.files["a.txt"] = ("A changed", 2)  # changed behind our back
+            self.assertEqual(await client.read_file("a.txt"), "A changed")
+
+            await client.write_file("a.txt", "A3")
+            self.assertEqual(await client.read_file("a.txt"), "A3")
+
+
+if __name__ == '__main__':
+    unittest.main()
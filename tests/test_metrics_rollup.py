@@ -0,0 +1,94 @@
+import pytest
+import asyncio
+from src.az_os.core.storage_engine import StorageEngine
+from src.az_os.core.metrics_rollup import ensure_rollups, prune_raw_metrics, rollup_row
+
+
+METRICS_DDL = """
+    CREATE TABLE metrics (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        task_id TEXT NOT NULL,
+        model TEXT NOT NULL,
+        input_tokens INTEGER NOT NULL,
+        output_tokens INTEGER NOT NULL,
+        cost_usd REAL NOT NULL,
+        latency_ms INTEGER NOT NULL,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        retry_count INTEGER DEFAULT 0
+    )
+"""
+
+INSERT = """
+    INSERT INTO metrics (task_id, model, input_tokens, output_tokens, cost_usd, latency_ms, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?, datetime('now', ?))
+"""
+
+
+def _run(coro):
+    return asyncio.new_event_loop().run_until_complete(coro)
+
+
+class TestMetricsRollup:
+    """Test trigger-maintained metrics rollups"""
+
+    def test_backfill_trigger_and_retention(self, tmp_path):
+        """Test that rollups survive pruning of raw rows"""
+        async def scenario():
+            engine = StorageEngine(str(tmp_path / "az.db"))
+            async with engine.transaction() as db:
+                await db.execute(METRICS_DDL)
+                await db.execute(INSERT, ("t0", "claude", 10, 10, 1.0, 100, "-200 days"))
+                await ensure_rollups(db)  # backfills the existing row
+
+            for i in range(10):
+                await engine.write(INSERT, ("t1", "gemini", 100, 50, 0.1, 20 + i, "-0 days"))
+
+            async with engine.transaction() as db:
+                deleted = await prune_raw_metrics(db, retention_days=90)
+
+            raw = await engine.fetchone("SELECT COUNT(*) FROM metrics")
+            models = await engine.fetchall(
+                "SELECT model, cost_usd, request_count, input_tokens, output_tokens, latency_ms_sum "
+                "FROM metrics_model ORDER BY model"
+            )
+            task = await engine.fetchone(
+                "SELECT cost_usd, request_count, input_tokens, output_tokens, latency_ms_sum "
+                "FROM metrics_task WHERE task_id = 't1'"
+            )
+            days = await engine.fetchone("SELECT COUNT(*) FROM metrics_daily")
+            await engine.close()
+            return deleted, raw[0], models, task, days[0]
+
+        deleted, raw, models, task, days = _run(scenario())
+        assert deleted == 1
+        assert raw == 10
+        assert [m[0] for m in models] == ["claude", "gemini"]
+        assert models[0][2] == 1
+        assert rollup_row(task)["request_count"] == 10
+        assert rollup_row(task)["total_cost"] == pytest.approx(1.0)
+        assert rollup_row(task)["avg_latency"] == pytest.approx(24.5)
+        assert days == 2
+
+    def test_initialize_does_not_prune_by_default(self, tmp_path, monkeypatch):
+        """Test that raw metrics are only pruned when asked to"""
+        from src.az_os.core import storage
+
+        monkeypatch.setattr(storage, "get_db_path", lambda: str(tmp_path / "az.db"))
+
+        async def scenario():
+            db = storage.Database()
+            await db.initialize()
+            engine = await db._engine()
+            try:
+                await db.create_task("t0", "run")
+                await engine.write(INSERT, ("t0", "claude", 10, 10, 1.0, 100, "-200 days"))
+
+                await storage.Database().initialize()
+                kept = await engine.fetchone("SELECT COUNT(*) FROM metrics")
+                deleted = await db.prune_metrics(90)
+                left = await engine.fetchone("SELECT COUNT(*) FROM metrics")
+            finally:
+                await engine.close()
+            return kept[0], deleted, left[0]
+
+        assert _run(scenario()) == (1, 1, 0)
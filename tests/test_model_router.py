@@ -476,4 +476,77 @@ class TestModelRouter:
             
             # Should handle empty ranking gracefully
             with pytest.raises(IndexError):
-                model_router.select_model(task)
\ No newline at end of file
+                model_router.select_model(task)
+
+class TestAdaptiveRouting:
+    """Test latency/cost-aware routing on live measurements"""
+    
+    def _task(self, complexity=TaskComplexity.SIMPLE):
+        return Task(task_type="qa", complexity=complexity, prompt_length=100)
+    
+    def test_routes_to_cheapest_within_slo(self):
+        """Test that measured cost and p95 latency drive the choice"""
+        router = ModelRouter()
+        for _ in range(20):
+            router.record_call(ModelType.FAST, 3000, 50, 50, cost_usd=0.0001, task_type="qa")
+            router.record_call("gpt-3.5-turbo", 400, 50, 50, cost_usd=0.0002, task_type="qa")
+        
+        decision = router.route(self._task(), latency_slo_ms=1000)
+        assert decision.model_type == ModelType.GPT35
+        assert decision.measured
+        assert decision.p95_latency_ms == pytest.approx(400)
+        
+        # Without an SLO the cheaper, slower model wins
+        assert router.route(self._task()).model_type == ModelType.FAST
+    
+    def test_breaker_opens_on_errors_and_probes(self):
+        """Test that a failing model is skipped until a half-open probe succeeds"""
+        router = ModelRouter(breaker_cooldown_s=0.0)
+        for _ in range(6):
+            router.record_call(ModelType.GPT35, 500, success=False)
+        assert router.breakers[ModelType.GPT35].state.value == "open"
+        
+        router.breaker_cooldown_s = 3600
+        assert not router.is_available(ModelType.GPT35)
+        
+        router.breaker_cooldown_s = 0.0
+        assert router.is_available(ModelType.GPT35, claim_probe=True)
+        assert not router.is_available(ModelType.GPT35)  # one probe at a time
+        router.record_call(ModelType.GPT35, 300, 10, 10)
+        assert router.breakers[ModelType.GPT35].state.value == "closed"
+        assert router.get_live_stats()["gpt35"]["calls"] == 7
+
+    def test_unrecorded_probe_claim_expires(self):
+        """Test that a probe whose result is never recorded does not block the model forever"""
+        router = ModelRouter(breaker_cooldown_s=0.0, breaker_probe_timeout_s=30.0)
+        for _ in range(6):
+            router.record_call(ModelType.GPT35, 500, success=False)
+
+        assert router.is_available(ModelType.GPT35, claim_probe=True)
+        assert not router.is_available(ModelType.GPT35)
+
+        breaker = router.breakers[ModelType.GPT35]
+        breaker.probe_started_at -= 31.0  # probe lost (caller error, cancellation)
+        assert router.is_available(ModelType.GPT35, claim_probe=True)
+        assert breaker.state.value == "half_open" and breaker.probe_in_flight
+
+    def test_select_model_claims_probe(self):
+        """Test that select_model claims the half-open probe of the model it picks"""
+        router = ModelRouter(breaker_cooldown_s=0.0)
+        for model_type in router.models:
+            for _ in range(6):
+                router.record_call(model_type, 500, success=False)
+
+        first, _ = router.select_model(self._task())
+        assert router.breakers[first].probe_in_flight
+        second, _ = router.select_model(self._task())
+        assert second != first
+
+    def test_breaker_opens_on_latency_degradation(self):
+        """Test that recent p95 far above the baseline trips the breaker"""
+        router = ModelRouter(latency_slo_ms=1000)
+        for _ in range(5):
+            router.record_call(ModelType.CLAUDE, 5000, 10, 10)
+        assert router.breakers[ModelType.CLAUDE].state.value == "open"
+        assert "p95" in router.breakers[ModelType.CLAUDE].reason
+        assert router.route(self._task(TaskComplexity.COMPLEX)).model_type != ModelType.CLAUDE
@@ -0,0 +1,86 @@
+"""
+Unit tests for the betting predictor's model store round trip
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+pytest.importorskip("sklearn")
+pytest.importorskip("pandas")
+pytest.importorskip("joblib")
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "squads" / "ceo-bet" / "scripts"))
+
+from model_store import ModelStore
+from predictive_analysis import BettingPredictor, InferenceService, retrain
+
+
+def _fixtures(n, seed):
+    rng = np.random.default_rng(seed)
+    data = {
+        'home_team_elo': rng.normal(1500, 200, n),
+        'away_team_elo': rng.normal(1500, 200, n),
+        'home_form': rng.uniform(0, 1, n),
+        'away_form': rng.uniform(0, 1, n),
+        'h2h_home_wins': rng.integers(0, 10, n),
+        'h2h_away_wins': rng.integers(0, 10, n),
+        'avg_home_odds': rng.uniform(1.5, 4.0, n),
+        'avg_draw_odds': rng.uniform(2.5, 4.5, n),
+        'avg_away_odds': rng.uniform(1.5, 4.0, n),
+        'venue_advantage': rng.integers(0, 2, n),
+        'outcome': np.arange(n) % 3,
+    }
+    return {key: values.tolist() for key, values in data.items()}
+
+
+def _write(path, data):
+    path.write_text(json.dumps(data), encoding='utf-8')
+    return str(path)
+
+
+class TestModelRoundTrip:
+    """Test train -> save -> load -> update -> scan"""
+
+    def test_retrain_update_and_scan(self, tmp_path):
+        """Test a warm-start update becomes LATEST and is served after refresh"""
+        store = ModelStore(str(tmp_path / "models"))
+        first, _ = retrain(store, _write(tmp_path / "train.json", _fixtures(300, 1)), cv=0, n_jobs=1)
+
+        service = InferenceService(store, n_jobs=1)
+        fixtures = _fixtures(50, 3)
+        bets = service.scan_fixtures(fixtures, edge_threshold=-100.0)
+        assert service.version == first
+        assert len(bets) == 50  # best outcome of every fixture
+        assert np.all(np.diff(bets['edge_percent']) <= 0)
+
+        second, results = retrain(store, _write(tmp_path / "new.json", _fixtures(60, 2)),
+                                  incremental=10, n_jobs=1)
+        assert second != first
+        assert results['base_version'] == first
+        assert results['n_estimators'] == 110
+        assert store.latest() == second
+
+        predictor, meta = BettingPredictor.load(store)
+        assert meta['version'] == second
+        assert predictor.model.n_estimators == 110
+
+        assert service.refresh()
+        assert service.version == second
+        probs = service.predict_proba(predictor.prepare_features(fixtures))
+        assert probs.shape == (50, 3)
+        assert np.allclose(probs.sum(axis=1), 1.0)
+
+    def test_update_rejects_batch_missing_an_outcome(self, tmp_path):
+        """Test an incremental batch without every outcome leaves LATEST untouched"""
+        store = ModelStore(str(tmp_path / "models"))
+        first, _ = retrain(store, _write(tmp_path / "train.json", _fixtures(300, 1)), cv=0, n_jobs=1)
+        batch = _fixtures(30, 2)
+        batch['outcome'] = [2] * 30
+
+        with pytest.raises(ValueError):
+            retrain(store, _write(tmp_path / "new.json", batch), incremental=10, n_jobs=1)
+        assert store.latest() == first
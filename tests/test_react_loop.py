@@ -8,7 +8,7 @@ import asyncio
 from unittest.mock import Mock, patch, MagicMock
 from datetime import datetime, timedelta
 from src.az_os.core.react_loop import ReActLoop, ReActTurn, ReActStep
-from src.az_os.core import TaskState, TaskResult
+from src.az_os.core.storage import TaskState, TaskResult
 from src.az_os.core.llm_client import LLMClient
 from src.az_os.core.mcp_client import MCPClient
 
@@ -302,4 +302,105 @@ class TestReActLoop:
         assert mock_mcp_client.execute_tool.call_count == 2
         assert "Data from tool" in history[1].output
         assert "Processed data" in history[4].output
-        assert "Complete task" in result.output
\ No newline at end of file
+        assert "Complete task" in result.output
+
+class TestParallelToolCalls:
+    """Test concurrent tool execution and turn merging"""
+    
+    def test_parse_multiple_tool_calls(self):
+        """Test that every tool call in an action turn is parsed"""
+        react_loop = ReActLoop(MagicMock(), MagicMock())
+        calls = react_loop._parse_tool_calls(
+            "call tool 'filesystem.read' with params {'path': 'a.py'}\n"
+            "call tool 'web_fetch.fetch' with params {'url': 'https://x', 'opts': {'h': 1}}"
+        )
+        assert calls == [
+            ("filesystem.read", {"path": "a.py"}),
+            ("web_fetch.fetch", {"url": "https://x", "opts": {"h": 1}}),
+        ]
+    
+    def test_tool_calls_run_concurrently(self):
+        """Test that independent tool calls overlap, bounded by max_parallel_tools"""
+        in_flight = {"now": 0, "peak": 0}
+        
+        async def call(name, params):
+            in_flight["now"] += 1
+            in_flight["peak"] = max(in_flight["peak"], in_flight["now"])
+            await asyncio.sleep(0.05)
+            in_flight["now"] -= 1
+            return f"{name} ok"
+        
+        mock_mcp_client = MagicMock()
+        mock_mcp_client.call = call
+        react_loop = ReActLoop(MagicMock(), mock_mcp_client, max_parallel_tools=2)
+        results = react_loop._execute_tool_calls([("filesystem.read", {"path": str(i)}) for i in range(4)])
+        
+        assert [r.output for r in results] == ["filesystem.read ok"] * 4
+        assert in_flight["peak"] == 2
+        assert all(r.duration_ms > 0 for r in results)
+    
+    def test_merged_reflection_is_recorded(self):
+        """Test that MERGE_REFLECTION replaces observation + reflection with one call"""
+        mock_llm_client = MagicMock()
+        mock_llm_client.generate = MagicMock(side_effect=[
+            "Read two files",
+            "call tool 'a' with params {}\ncall tool 'b' with params {}\nMERGE_REFLECTION",
+            "Task done"
+        ])
+        mock_mcp_client = MagicMock()
+        mock_mcp_client.call = MagicMock(return_value="contents")
+        task = TaskState(task_id="t", task_type="test", description="Read files",
+                         created_at=1234567890, priority="medium")
+        
+        # max_turns=1 would stop right after reasoning; "Task done" ends turn 1
+        react_loop = ReActLoop(mock_llm_client, mock_mcp_client, max_turns=2)
+        result, history = react_loop.run_react_cycle(task, max_turns=2)
+        
+        assert [step.turn for step in history] == [ReActTurn.REASONING, ReActTurn.ACTION, ReActTurn.REFLECTION]
+        assert history[-1].merged
+        assert len(history[1].tool_calls) == 2
+        assert result.metrics["tool_calls"] == 2
+        assert mock_llm_client.generate.call_count == 3
+    
+    def test_async_callers_use_their_own_loop(self):
+        """Test that async code awaits tool calls on its loop instead of blocking it"""
+        mock_mcp_client = MagicMock()
+        
+        async def call(name, params):
+            await asyncio.sleep(0)
+            return asyncio.get_running_loop()
+        
+        mock_mcp_client.call = call
+        react_loop = ReActLoop(MagicMock(), mock_mcp_client)
+        
+        async def scenario():
+            results = await react_loop._execute_tool_calls_async([("a", {}), ("b", {})])
+            with pytest.raises(RuntimeError):
+                react_loop._execute_tool_calls([("a", {})])
+            return asyncio.get_running_loop(), results
+        
+        loop, results = asyncio.run(scenario())
+        assert all(r.output is loop for r in results)
+        assert react_loop._loop is None
+    
+    def test_skipped_reflection_goes_through_stop_check(self):
+        """Test that SKIP_REFLECTION feeds the observation back and still honours stop"""
+        mock_llm_client = MagicMock()
+        mock_llm_client.generate = MagicMock(side_effect=[
+            "Look around",
+            "Nothing to call",
+            "Observed the repo SKIP_REFLECTION",
+            "Look again",
+            "Nothing to call",
+            "Task finished SKIP_REFLECTION",
+        ])
+        task = TaskState(task_id="t", task_type="test", description="Explore",
+                         created_at=1234567890, priority="medium")
+        
+        react_loop = ReActLoop(mock_llm_client, MagicMock(), max_turns=5)
+        result, history = react_loop.run_react_cycle(task, max_turns=5)
+        
+        assert ReActTurn.REFLECTION not in [step.turn for step in history]
+        assert task.description == "Observed the repo SKIP_REFLECTION"
+        assert result.metrics["turns_executed"] == 2
+        assert mock_llm_client.generate.call_count == 6
@@ -0,0 +1,123 @@
+import json
+import os
+import zlib
+import pytest
+from datetime import datetime, timedelta
+from src.core.services.segment_sink import (
+    BLOCK_HEADER, COMPRESSOR_ZLIB, INDEX_SUFFIX, SEGMENT_MAGIC, SERIALIZER_JSON,
+    SegmentSink, SegmentSinkConfig, _Codec
+)
+
+
+BASE = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def _records(start: int, count: int):
+    return [{"n": i, "timestamp": (BASE + timedelta(minutes=i)).isoformat()} for i in range(start, start + count)]
+
+
+class _FailingFile:
+    """File proxy that tears the payload write of the next block"""
+
+    def __init__(self, file):
+        self._file = file
+        self.writes = 0
+
+    def write(self, data):
+        self.writes += 1
+        if self.writes == 2:
+            self._file.write(data[:len(data) // 2])
+            raise OSError("disk full")
+        return self._file.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+
+class TestSegmentSink:
+    """Test the append-only segment format, sidecar index and range scans"""
+
+    def _sink(self, tmp_path, **kwargs):
+        sink = SegmentSink(str(tmp_path), SegmentSinkConfig(**kwargs))
+        # Pin the codec so the on-disk format is the same with or without msgpack/zstd
+        sink._codec.serializer = SERIALIZER_JSON
+        sink._codec.compressor = COMPRESSOR_ZLIB
+        return sink
+
+    def test_block_format(self, tmp_path):
+        """Test that a batch is one header + compressed payload after the magic"""
+        sink = self._sink(tmp_path)
+        written = sink.append("metrics/s1", _records(0, 3))
+        sink.close()
+
+        (path,) = sink._segments("metrics/s1")
+        with open(path, "rb") as f:
+            assert f.read(len(SEGMENT_MAGIC)) == SEGMENT_MAGIC
+            header = f.read(BLOCK_HEADER.size)
+            length, count, min_ts, max_ts, serializer, compressor = BLOCK_HEADER.unpack(header)
+            payload = f.read()
+        assert written == BLOCK_HEADER.size + length == BLOCK_HEADER.size + len(payload)
+        assert (count, serializer, compressor) == (3, SERIALIZER_JSON, COMPRESSOR_ZLIB)
+        assert max_ts - min_ts == 2 * 60 * 1_000_000
+        assert json.loads(zlib.decompress(payload)) == _records(0, 3)
+        assert _Codec.decode(payload, serializer, compressor) == _records(0, 3)
+
+    def test_sidecar_index_written_on_close(self, tmp_path):
+        """Test that closing a segment writes its time range next to it"""
+        sink = self._sink(tmp_path)
+        sink.append("metrics/s1", _records(0, 2))
+        sink.append("metrics/s1", _records(10, 2))
+        (path,) = sink._segments("metrics/s1")
+        assert not os.path.exists(path + INDEX_SUFFIX)
+
+        sink.close()
+        with open(path + INDEX_SUFFIX) as f:
+            index = json.load(f)
+        assert index["records"] == 4
+        assert index["bytes"] == os.path.getsize(path)
+        assert sink._read_segment_bounds(path) == (index["min_ts_us"], index["max_ts_us"])
+        assert index["max_ts_us"] - index["min_ts_us"] == 11 * 60 * 1_000_000
+
+    def test_time_range_scan(self, tmp_path):
+        """Test that scans return only records in range and skip other segments"""
+        sink = self._sink(tmp_path, max_segment_bytes=1)  # one block per segment
+        sink.append("metrics/s1", _records(0, 5))
+        sink.append("metrics/s1", _records(100, 5))
+        sink.append("metrics/s2", _records(0, 5))
+        sink.close()
+
+        found = list(sink.scan("metrics/s1", BASE + timedelta(minutes=2), BASE + timedelta(minutes=101)))
+        assert [r["n"] for r in found] == [2, 3, 4, 100, 101]
+        assert [r["n"] for r in sink.scan("metrics/s1", start=BASE + timedelta(minutes=50))] == list(range(100, 105))
+        assert len(list(sink.scan("metrics/s1"))) == 10
+        assert sink.list_partitions() == ["metrics/s1", "metrics/s2"]
+
+    def test_failed_append_is_rolled_back(self, tmp_path):
+        """Test that a torn block is truncated so the segment stays readable"""
+        sink = self._sink(tmp_path)
+        sink.append("metrics/s1", _records(0, 2))
+        segment = sink._open_segments["metrics/s1"]
+        size = segment.size
+
+        real_file = segment.file
+        segment.file = _FailingFile(real_file)
+        with pytest.raises(OSError):
+            sink.append("metrics/s1", _records(2, 2))
+        segment.file = real_file
+        assert segment.size == size and os.path.getsize(segment.path) == size
+
+        sink.append("metrics/s1", _records(4, 2))
+        sink.close()
+        assert [r["n"] for r in sink.scan("metrics/s1")] == [0, 1, 4, 5]
+
+    def test_records_without_timestamp_use_ingest_time(self, tmp_path):
+        """Test that a missing timestamp is stored as the ingest time"""
+        sink = self._sink(tmp_path)
+        before = datetime.utcnow()
+        sink.append("events/s1", [{"n": 1}])
+        sink.close()
+
+        (record,) = list(sink.scan("events/s1", start=before - timedelta(seconds=1)))
+        stamped = datetime.fromisoformat(record["timestamp"]).replace(tzinfo=None)
+        assert before - timedelta(seconds=1) <= stamped <= datetime.utcnow()
+        assert list(sink.scan("events/s1", end=before - timedelta(seconds=1))) == []
@@ -0,0 +1,91 @@
+import pytest
+import asyncio
+from src.az_os.core.storage_engine import StorageEngine, StorageConfig
+
+
+def _run(coro):
+    return asyncio.new_event_loop().run_until_complete(coro)
+
+
+class TestStorageEngine:
+    """Test pooled connections and group commit"""
+
+    async def _engine(self, tmp_path, **kwargs):
+        engine = StorageEngine(str(tmp_path / "az.db"), StorageConfig(**kwargs))
+        async with engine.transaction() as db:
+            await db.execute("CREATE TABLE logs (id INTEGER PRIMARY KEY, message TEXT UNIQUE)")
+        return engine
+
+    def test_concurrent_writes_share_transactions(self, tmp_path):
+        """Test that a burst of writes is committed in few transactions"""
+        async def scenario():
+            engine = await self._engine(tmp_path, commit_window_ms=5)
+            await asyncio.gather(*[
+                engine.write("INSERT INTO logs (message) VALUES (?)", (f"m{i}",))
+                for i in range(200)
+            ])
+            row = await engine.fetchone("SELECT COUNT(*) FROM logs")
+            transactions = engine.stats["transactions"]
+            await engine.close()
+            return row[0], transactions
+
+        count, transactions = _run(scenario())
+        assert count == 200
+        assert transactions < 20
+
+    def test_write_nowait_visible_after_flush(self, tmp_path):
+        """Test read-your-writes for queued writes"""
+        async def scenario():
+            engine = await self._engine(tmp_path)
+            for i in range(10):
+                await engine.write_nowait("INSERT INTO logs (message) VALUES (?)", (f"m{i}",))
+            await engine.flush()
+            row = await engine.fetchone("SELECT COUNT(*) FROM logs")
+            await engine.close()
+            return row[0]
+
+        assert _run(scenario()) == 10
+
+    def test_failing_statement_isolated(self, tmp_path):
+        """Test that one bad write does not roll back the rest of its batch"""
+        async def scenario():
+            engine = await self._engine(tmp_path, commit_window_ms=5)
+            results = await asyncio.gather(
+                engine.write("INSERT INTO logs (message) VALUES (?)", ("a",)),
+                engine.write("INSERT INTO logs (message) VALUES (?)", ("a",)),
+                engine.write("INSERT INTO logs (message) VALUES (?)", ("b",)),
+                return_exceptions=True,
+            )
+            rows = await engine.fetchall("SELECT message FROM logs ORDER BY message")
+            await engine.close()
+            return results, rows
+
+        results, rows = _run(scenario())
+        assert sum(isinstance(r, Exception) for r in results) == 1
+        assert [r[0] for r in rows] == ["a", "b"]
+
+    def test_commit_loop_survives_rollback_failure(self, tmp_path):
+        """Test that a failing rollback fails the batch without stalling later writes"""
+        async def scenario():
+            engine = await self._engine(tmp_path)
+            rollback = engine._writer.rollback
+
+            async def broken_rollback():
+                raise RuntimeError("rollback failed")
+
+            engine._writer.rollback = broken_rollback
+            failed = await asyncio.gather(
+                asyncio.wait_for(engine.write("INSERT INTO missing (message) VALUES (?)", ("a",)), timeout=5),
+                return_exceptions=True,
+            )
+            await asyncio.wait_for(engine.flush(), timeout=5)
+
+            engine._writer.rollback = rollback
+            await asyncio.wait_for(engine.write("INSERT INTO logs (message) VALUES (?)", ("b",)), timeout=5)
+            rows = await engine.fetchall("SELECT message FROM logs")
+            await engine.close()
+            return failed, rows
+
+        failed, rows = _run(scenario())
+        assert isinstance(failed[0], RuntimeError)
+        assert [r[0] for r in rows] == ["b"]
@@ -2,6 +2,7 @@ import pytest
 import asyncio
 from unittest.mock import Mock, patch
 from datetime import datetime, timedelta
+import time
 from src.az_os.core.telemetry import Telemetry, HealthCheckResult, Metric, Alert, AlertLevel
 
 
@@ -317,4 +318,120 @@ class TestTelemetryPerformance:
         
         # Verify memory usage is reasonable
         assert len(telemetry.metrics) == 1000
-        assert len(telemetry.health_checks) == 100
\ No newline at end of file
+        assert len(telemetry.health_checks) == 100
+
+class TestTelemetrySampling:
+    """Test ring-buffer history, windowed alerts and the sampler"""
+    
+    def test_metric_ring_bounded_and_windowed(self):
+        """Test ring capacity and window aggregates"""
+        from src.az_os.core.telemetry import MetricRing
+        ring = MetricRing(capacity=100)
+        now = 1_000_000.0
+        for i in range(250):
+            ring.append(float(i), now - 250 + i)
+        
+        assert len(ring) == 100
+        assert ring.last() == 249.0
+        assert ring.aggregate(10, "count", now=now) == 10
+        assert ring.aggregate(10, "mean", now=now) == pytest.approx(244.5)
+        assert ring.aggregate(1000, "min", now=now) == 150.0
+        assert ring.aggregate(1000, "p95", now=now) == pytest.approx(244.05)
+        assert ring.aggregate(0.1, "mean", now=now + 100) is None
+    
+    def test_alerts_use_window_aggregates(self):
+        """Test error-rate and latency alerts are evaluated over their window"""
+        telemetry = Telemetry()
+        for i in range(100):
+            telemetry.record_request(latency_ms=3000.0 if i % 25 == 0 else 100.0, error=i % 5 == 0)
+        
+        names = {alert.name for alert in telemetry.should_alert()}
+        assert "High Error Rate" in names  # 20% errors over the window
+        assert "High Latency" not in names  # p95 is 100ms despite 4% slow calls
+        assert telemetry.metric_value("error_rate") == pytest.approx(0.2)
+        assert len(telemetry.alert_history) == 1
+        
+        # Suppressed within the cooldown
+        telemetry.should_alert()
+        assert len(telemetry.alert_history) == 1
+    
+    def test_sampler_publishes_snapshot(self):
+        """Test background sampler feeds the dashboard without blocking"""
+        telemetry = Telemetry()
+        telemetry.start_sampler(interval=0.01)
+        try:
+            deadline = time.time() + 5
+            while len(telemetry.history["cpu_percent"]) < 3 and time.time() < deadline:
+                time.sleep(0.01)
+            started = time.perf_counter()
+            data = telemetry.get_health_dashboard_data()
+            assert time.perf_counter() - started < 0.05
+        finally:
+            telemetry.stop_sampler()
+        
+        assert len(telemetry.history["cpu_percent"]) >= 3
+        assert data["health_checks"]["total"] == 5
+        assert "cpu_percent" in data["metrics"]
+    
+    def test_health_follows_metric_without_sampler(self):
+        """Test checks and dashboard sample inline when no sampler is running"""
+        telemetry = Telemetry()
+        
+        with patch('psutil.cpu_percent', return_value=10.0):
+            first = next(r for r in telemetry.check_health() if r.component == "system_resources")
+            dashboard = telemetry.get_health_dashboard_data()
+        with patch('psutil.cpu_percent', return_value=95.0):
+            second = next(r for r in telemetry.check_health() if r.component == "system_resources")
+            refreshed = telemetry.get_health_dashboard_data()
+        
+        assert first.status == "OK"
+        assert second.status == "WARNING"
+        assert "95.0" in second.message
+        assert dashboard["metrics"]["cpu_percent"] == 10.0
+        assert refreshed["metrics"]["cpu_percent"] == 95.0
+    
+    def test_should_alert_samples_without_sampler(self):
+        """Test gauge alerts see a fresh reading when no sampler is running"""
+        telemetry = Telemetry()
+        with patch('psutil.cpu_percent', return_value=97.0):
+            names = {alert.name for alert in telemetry.should_alert()}
+        
+        assert "High CPU Usage" in names
+        assert len(telemetry.history["cpu_percent"]) == 1
+    
+    def test_hourly_windows_keep_every_request(self):
+        """Test cost and error windows are not truncated by request volume"""
+        telemetry = Telemetry(history_size=100)
+        for _ in range(10_000):
+            telemetry.record_request(latency_ms=50.0, error=False, cost=0.02)
+        
+        assert telemetry.metric_value("cost", window=3600) == pytest.approx(200.0)
+        assert telemetry.metric_value("request_rate", window=3600) == pytest.approx(10_000 / 3600)
+        assert "Cost Spike" in {alert.name for alert in telemetry.should_alert()}
+    
+    def test_bucket_ring_window(self):
+        """Test bucketed history aggregates by whole buckets and expires old ones"""
+        from src.az_os.core.metric_ring import BucketRing
+        ring = BucketRing(span=60, resolution=1.0)
+        now = 1_000_000.0
+        for i in range(120):
+            ring.append(float(i % 2), now - 120 + i + 0.5)
+        
+        assert ring.aggregate(10, "count", now=now) == 10
+        assert ring.aggregate(10, "mean", now=now) == pytest.approx(0.5)
+        assert ring.aggregate(3600, "count", now=now) == 60  # older buckets were reused
+        assert ring.aggregate(5, "sum", now=now + 600) is None
+        with pytest.raises(ValueError):
+            ring.aggregate(10, "p95", now=now)
+    
+    def test_concurrent_checks_with_sampler(self):
+        """Test caller-thread checks do not race the sampler thread"""
+        telemetry = Telemetry()
+        telemetry.start_sampler(interval=0)
+        try:
+            for _ in range(50):
+                assert len(telemetry.check_health()) == 5
+                telemetry.should_alert()
+                telemetry.get_metrics()
+        finally:
+            telemetry.stop_sampler()
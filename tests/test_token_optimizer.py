@@ -0,0 +1,56 @@
+import pytest
+from src.az_os.core.token_optimizer import TokenCounter, TokenOptimizer, compress_text
+
+
+class TestTokenCounter:
+    """Test memoized token counting"""
+
+    def test_memo_is_bounded(self):
+        """Test that repeated segments are served from a bounded LRU memo"""
+        counter = TokenCounter(memo_size=2)
+        first = counter.count("You are a helpful assistant.")
+        assert first > 0
+        assert counter.count("You are a helpful assistant.") == first
+        counter.count("b")
+        counter.count("c")
+        assert len(counter._memo) == 2
+        assert "You are a helpful assistant." not in counter._memo
+
+    def test_counts_punctuation_and_long_words(self):
+        """Test the count is not a whitespace split"""
+        counter = TokenCounter()
+        assert counter.count("internationalization, tokenization!") > 2
+
+
+class TestCompression:
+    """Test single-pass prompt compression"""
+
+    def test_compress_text(self):
+        """Test comments, whitespace, phrases and repeated instructions in one pass"""
+        text = "# header\nIn order to win,   be concise.\n  // note\nIt is important to note that it works. Be concise again."
+        assert compress_text(text) == "To win, be concise. it works."
+
+    def test_cache_is_lru_with_ttl(self):
+        """Test bounded, expiring prompt cache"""
+        optimizer = TokenOptimizer(max_cache_size=1, cache_ttl=3600)
+        optimizer.optimize_prompt("Please do not stop.")
+        assert optimizer.optimize_prompt("Please do not stop.")[1].cache_hit
+        optimizer.optimize_prompt("Another prompt.")
+        assert len(optimizer.cache) == 1
+
+        optimizer.cache_ttl = -1
+        optimizer.optimize_prompt("Expired prompt.")
+        assert not optimizer.optimize_prompt("Expired prompt.")[1].cache_hit
+
+    def test_segments_cached_separately(self):
+        """Test that unchanged segments are reused when only the context changes"""
+        optimizer = TokenOptimizer()
+        segments = {"system": "Please do not guess.", "tools": "search(query)", "context": "doc 1"}
+        prompt, result = optimizer.optimize_segments(segments)
+        assert prompt == "Do not guess.\n\nsearch(query)\n\ndoc 1"
+        assert result.segments_cached == 0
+
+        segments["context"] = "doc 2"
+        prompt, result = optimizer.optimize_segments(segments)
+        assert result.segments_cached == 2
+        assert prompt.endswith("doc 2")